@@ -0,0 +1,5 @@
+"""
+Powtarzalne benchmarki webhooka Telegram i API rachunków.
+
+Uruchomienie: python -m benchmarks.run --help
+"""
@@ -0,0 +1,217 @@
+"""
+Benchmark wyszukiwania rachunków (`GET /bills/`) na dużym zbiorze.
+
+Zasila bazę z DATABASE_URL rachunkami (domyślnie milion, bez pozycji),
+a następnie mierzy zapytania `bill_search_statement` dla typowych filtrów
+interfejsu: pierwsza strona, głęboka strona po kluczu i przez OFFSET, sklep,
+rzadki status, miesiąc, zakres kwoty. Z `--compare` pomiar powtarzany jest
+bez indeksów złożonych. Wypisywany jest też plan zapytania.
+
+Zalecana jest osobna baza, np. postgresql+asyncpg://.../bills_bench lub
+sqlite+aiosqlite:///bench.db.
+
+Użycie:
+    python -m benchmarks.bill_search --bills 1000000 --compare
+    python -m benchmarks.bill_search --skip-seed --compare
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from benchmarks.seed import SHOP_NAMES
+from src.bill.services import bill_search_statement, encode_bill_cursor
+from src.db.models import Bill, ProcessingStatus, Shop, User
+
+SEED_BATCH_SIZE = 20_000
+SEARCH_INDEXES = [index for index in Bill.__table__.indexes if index.name.startswith("ix_bill_user_id_")]
+# Rozkład statusów: większość rachunków przetworzona, błędy rzadkie
+STATUS_WEIGHTS = {
+    ProcessingStatus.COMPLETED: 0.95,
+    ProcessingStatus.PENDING: 0.02,
+    ProcessingStatus.PROCESSING: 0.02,
+    ProcessingStatus.ERROR: 0.01,
+}
+
+
+async def seed_bills(engine: AsyncEngine, bills: int, users: int, shops: int, seed: int) -> None:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    tag = f"{seed}-{rng.randint(0, 10**6)}"
+
+    async with engine.begin() as conn:
+        user_ids = (await conn.execute(insert(User).returning(User.id), [
+            {"external_id": rng.randint(10**11, 10**12), "is_active": True, "created_at": now, "updated_at": now}
+            for _ in range(users)
+        ])).scalars().all()
+        shop_ids = (await conn.execute(insert(Shop).returning(Shop.id), [
+            {"name": f"{SHOP_NAMES[i % len(SHOP_NAMES)]} bench-{tag}-{i}", "created_at": now, "updated_at": now}
+            for i in range(shops)
+        ])).scalars().all()
+
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    start = time.perf_counter()
+    for offset in range(0, bills, SEED_BATCH_SIZE):
+        rows = [
+            {
+                "user_id": rng.choice(user_ids),
+                "shop_id": rng.choice(shop_ids),
+                "bill_date": now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+                "total_amount": Decimal(rng.randint(100, 80_000)) / 100,
+                "status": rng.choices(statuses, weights)[0],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for _ in range(min(SEED_BATCH_SIZE, bills - offset))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Bill), rows)
+    print(f"🌱 Seeded {bills} bills for {users} users in {time.perf_counter() - start:.1f}s")
+
+
+async def analyze(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+async def set_indexes(engine: AsyncEngine, enabled: bool) -> None:
+    def apply(connection) -> None:
+        for index in SEARCH_INDEXES:
+            if enabled:
+                index.create(connection, checkfirst=True)
+            else:
+                index.drop(connection, checkfirst=True)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(apply)
+    await analyze(engine)
+
+
+async def explain(engine: AsyncEngine, statement) -> List[str]:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    async with engine.connect() as conn:
+        prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+        rows = (await conn.execute(text(f"{prefix} {compiled}"))).all()
+    return [str(row[-1]) for row in rows]
+
+
+async def measure(call: Callable[[], Awaitable[int]], repeats: int) -> Dict[str, float]:
+    timings = []
+    rows = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = await call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(timings), "max_ms": max(timings), "rows": rows}
+
+
+async def build_scenarios(engine: AsyncEngine, page_size: int, deep_pages: int) -> Dict[str, dict]:
+    async with engine.connect() as conn:
+        user_id, _ = (await conn.execute(
+            select(Bill.user_id, func.count()).group_by(Bill.user_id).order_by(func.count().desc()).limit(1)
+        )).one()
+        shop_id = (await conn.execute(
+            select(Bill.shop_id).where(Bill.user_id == user_id).limit(1)
+        )).scalar_one()
+        newest = (await conn.execute(select(func.max(Bill.bill_date)).where(Bill.user_id == user_id))).scalar_one()
+
+        # Kursor strony numer `deep_pages` - przejście po kolejnych stronach jak w interfejsie
+        cursor = None
+        for _ in range(deep_pages):
+            result = await conn.execute(bill_search_statement(user_id, cursor=cursor, limit=page_size))
+            page = result.all()
+            cursor = encode_bill_cursor(page[page_size - 1])
+
+    if isinstance(newest, str):
+        newest = datetime.fromisoformat(newest)
+    month_start = newest - timedelta(days=60)
+    deep_offset = (
+        select(Bill).where(Bill.user_id == user_id)
+        .order_by(Bill.bill_date.desc(), Bill.id.desc())
+        .offset(deep_pages * page_size).limit(page_size + 1)
+    )
+    return {
+        "first page": {"statement": bill_search_statement(user_id, limit=page_size)},
+        f"page {deep_pages + 1} (keyset)": {"statement": bill_search_statement(user_id, cursor=cursor, limit=page_size)},
+        f"page {deep_pages + 1} (OFFSET)": {"statement": deep_offset},
+        "shop": {"statement": bill_search_statement(user_id, shop_id=shop_id, limit=page_size)},
+        "status ERROR": {"statement": bill_search_statement(user_id, status=ProcessingStatus.ERROR, limit=page_size)},
+        "one month": {"statement": bill_search_statement(
+            user_id, date_from=month_start, date_to=month_start + timedelta(days=30), limit=page_size
+        )},
+        "amount 500-800": {"statement": bill_search_statement(
+            user_id, min_total=Decimal("500"), max_total=Decimal("800"), limit=page_size
+        )},
+        "shop + month": {"statement": bill_search_statement(
+            user_id, shop_id=shop_id, date_from=month_start, date_to=month_start + timedelta(days=30), limit=page_size
+        )},
+    }
+
+
+async def run_scenarios(engine: AsyncEngine, scenarios: Dict[str, dict], repeats: int, label: str, show_plans: bool) -> Dict[str, dict]:
+    results = {}
+    for name, scenario in scenarios.items():
+        async def call(statement=scenario["statement"]) -> int:
+            async with engine.connect() as conn:
+                return len((await conn.execute(statement)).all())
+
+        await call()  # rozgrzanie cache stron
+        results[name] = await measure(call, repeats)
+        if show_plans:
+            results[name]["plan"] = await explain(engine, scenario["statement"])
+
+    print(f"\n{label}")
+    print(f"{'scenario':<24} {'rows':>5} {'median ms':>10} {'max ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<24} {result['rows']:>5} {result['median_ms']:>10.2f} {result['max_ms']:>10.2f}")
+        for line in result.get("plan", []):
+            print(f"{'':<26}{line}")
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    from src.db.main import engine
+    from src.db.migrations import migrate_database
+
+    try:
+        await migrate_database()
+        if not args.skip_seed:
+            await seed_bills(engine, args.bills, args.users, args.shops, args.seed)
+        await set_indexes(engine, True)
+        scenarios = await build_scenarios(engine, args.page_size, args.deep_pages)
+        with_indexes = await run_scenarios(engine, scenarios, args.repeats, "With composite indexes", args.plans)
+
+        if args.compare:
+            await set_indexes(engine, False)
+            try:
+                without = await run_scenarios(engine, scenarios, args.repeats, "Without composite indexes", args.plans)
+            finally:
+                await set_indexes(engine, True)
+            print(f"\n{'scenario':<24} {'speedup':>8}")
+            for name in scenarios:
+                speedup = without[name]["median_ms"] / max(with_indexes[name]["median_ms"], 1e-6)
+                print(f"{name:<24} {speedup:>7.1f}x")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bill search benchmark")
+    parser.add_argument("--bills", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--shops", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--deep-pages", type=int, default=100, help="keyset/OFFSET page depth to compare")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse bills already in the database")
+    parser.add_argument("--plans", action="store_true", help="print query plans")
+    parser.add_argument("--compare", action="store_true", help="repeat without composite indexes")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,163 @@
+"""
+Lokalny, fałszywy serwer Telegram Bot API do benchmarków.
+
+Obsługuje metody używane przez `src/telegram/services.py` (sendMessage, getFile,
+getMe, setWebhook, setMyCommands) oraz pobieranie plików. Opóźnienie odpowiedzi
+jest konfigurowalne, żeby modelować czas round tripu do prawdziwego API.
+
+Dokumenty (`documents/*.pdf`) to prawdziwy wielostronicowy PDF z warstwą
+tekstową, a zdjęcia (`*.jpg`) - lekko przekrzywiony JPEG paragonu, więc
+benchmark webhooka mierzy ekstrakcję stron i przygotowanie zdjęć, a nie
+obsługę błędu. Każde zdjęcie ma inny skrót treści (dopisek po znaczniku końca
+JPEG), żeby cache przygotowanych zdjęć nie pomijał pracy.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+# Pliki innych typów - treść nie ma znaczenia, liczy się rozmiar
+FAKE_FILE_SIZE = 250_000
+# E-paragon PDF serwowany dla dokumentów
+FAKE_PDF_PAGES = 3
+# Zdjęcie paragonu - dłuższy bok ponad IMAGE_PREPROCESS_MAX_SIDE, żeby objąć zmniejszanie
+FAKE_PHOTO_SIZE = (1536, 2048)
+FAKE_PHOTO_SKEW = 3.0
+# file_id dokumentów z benchmarks/updates.py
+_DOCUMENT_FILE_ID_PREFIX = "BQAC"
+
+
+def receipt_jpeg(size=FAKE_PHOTO_SIZE, skew: float = FAKE_PHOTO_SKEW, seed: int = 0) -> bytes:
+    """JPEG z wierszami paragonu obróconymi o `skew` stopni (generowany raz przy starcie)."""
+    import random
+
+    from PIL import Image, ImageDraw, ImageFont
+
+    from benchmarks.seed import PRODUCT_WORDS
+
+    rng = random.Random(seed)
+    image = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for row in range((size[1] - 120) // 56):
+        line = f"{rng.choice(PRODUCT_WORDS).upper()}  {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d}  A"
+        draw.text((120, 60 + row * 56), line, fill=0, font=font)
+    image = image.rotate(skew, fillcolor=255)
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def create_app(latency: float = 0.0, file_size: int = FAKE_FILE_SIZE) -> FastAPI:
+    """Tworzy aplikację fałszywego Bot API."""
+    from benchmarks.pdf_ingestion import text_pdf_bytes
+
+    app = FastAPI()
+    payload = os.urandom(file_size)
+    pdf = text_pdf_bytes(FAKE_PDF_PAGES)
+    photo = receipt_jpeg()
+    app.state.calls = {}
+
+    def content(file_path: str) -> bytes:
+        if file_path.endswith(".pdf"):
+            return pdf
+        if file_path.endswith(".jpg"):
+            # Dane po znaczniku końca JPEG są pomijane przy dekodowaniu
+            return photo + hashlib.md5(file_path.encode()).digest()
+        return payload
+
+    app.state.content = content
+
+    def _count(method: str) -> None:
+        app.state.calls[method] = app.state.calls.get(method, 0) + 1
+
+    @app.post("/bot{token}/{method}")
+    @app.get("/bot{token}/{method}")
+    async def bot_method(token: str, method: str, request: Request) -> dict:
+        _count(method)
+        if latency:
+            await asyncio.sleep(latency)
+
+        if method == "getFile":
+            data = await request.json()
+            file_id = data.get("file_id", "unknown")
+            if file_id.startswith(_DOCUMENT_FILE_ID_PREFIX):
+                file_path = f"documents/{file_id[-24:]}.pdf"
+            else:
+                file_path = f"photos/{file_id[-24:]}.jpg"
+            return {
+                "ok": True,
+                "result": {
+                    "file_id": file_id,
+                    "file_unique_id": file_id[-12:],
+                    "file_size": len(content(file_path)),
+                    "file_path": file_path,
+                },
+            }
+        if method == "getMe":
+            return {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "BillsBench", "username": "bills_bench_bot"}}
+        if method == "sendMessage":
+            data = await request.json()
+            return {"ok": True, "result": {"message_id": int(time.time() * 1000), "chat": {"id": data.get("chat_id")}}}
+        return {"ok": True, "result": True}
+
+    @app.get("/file/bot{token}/{file_path:path}")
+    async def download(token: str, file_path: str) -> Response:
+        _count("download")
+        if latency:
+            await asyncio.sleep(latency)
+        if file_path.endswith(".pdf"):
+            return Response(content=content(file_path), media_type="application/pdf")
+        return Response(content=content(file_path), media_type="image/jpeg")
+
+    return app
+
+
+class FakeBotApiServer:
+    """Serwer uvicorn w wątku w tle (start/stop z kodu benchmarku)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0):
+        self.app = create_app(latency=latency)
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def calls(self) -> dict:
+        return dict(self.app.state.calls)
+
+    def file_size(self, file_path: str) -> int:
+        """Rozmiar pliku serwowanego pod `file_path`."""
+        return len(self.app.state.content(file_path))
+
+    def start(self) -> "FakeBotApiServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake Bot API server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    args = parser.parse_args()
+    uvicorn.run(create_app(latency=args.latency), host="127.0.0.1", port=args.port)
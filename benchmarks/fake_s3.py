@@ -0,0 +1,184 @@
+"""
+Lokalny, fałszywy serwer zgodny z S3 (w stylu MinIO) do benchmarków i skryptów.
+
+Obsługuje operacje używane przez `src/files/storage.py`: PUT/GET (z Range)/HEAD/
+DELETE obiektu, multipart upload (create, upload part, complete, abort) oraz
+adresy podpisane w zapytaniu. Obiekty trzymane są w pamięci w jednym buckecie,
+a podpis Signature V4 i skrót treści każdego żądania są weryfikowane.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+from urllib.parse import unquote
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from src.files.storage import EMPTY_SHA256, S3Storage
+
+ACCESS_KEY = "fake-access-key"
+SECRET_KEY = "fake-secret-key"
+BUCKET = "bills"
+
+
+def _error(status: int, code: str) -> Response:
+    return Response(f"<Error><Code>{code}</Code></Error>", status_code=status, media_type="application/xml")
+
+
+def create_app(host: str) -> FastAPI:
+    """Tworzy aplikację fałszywego S3 dla klientów łączących się pod adresem `host`."""
+    app = FastAPI()
+    signer = S3Storage(f"http://{host}", BUCKET, ACCESS_KEY, SECRET_KEY)
+    app.state.objects = {}
+    app.state.uploads = {}
+    app.state.calls = {}
+
+    def _count(operation: str) -> None:
+        app.state.calls[operation] = app.state.calls.get(operation, 0) + 1
+
+    def _authorized(request: Request, body: bytes) -> bool:
+        path = request.scope["raw_path"].decode()
+        params = {name: value for name, value in request.query_params.multi_items()}
+        if "X-Amz-Signature" in params:
+            signature = params.pop("X-Amz-Signature")
+            timestamp = params["X-Amz-Date"]
+            issued = datetime.strptime(timestamp, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            if (datetime.now(timezone.utc) - issued).total_seconds() > int(params["X-Amz-Expires"]):
+                return False
+            _, expected = signer._signature(
+                request.method, path, signer._canonical_query(params), {"host": request.headers["host"]},
+                "UNSIGNED-PAYLOAD", timestamp
+            )
+            return expected == signature
+
+        authorization = request.headers.get("authorization", "")
+        payload_hash = request.headers.get("x-amz-content-sha256", "")
+        if payload_hash != (hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256):
+            return False
+        fields = dict(part.strip().split("=", 1) for part in authorization.split(" ", 1)[-1].split(","))
+        headers = {name: request.headers[name] for name in fields.get("SignedHeaders", "").split(";") if name}
+        _, expected = signer._signature(
+            request.method, path, signer._canonical_query(params), headers, payload_hash, request.headers["x-amz-date"]
+        )
+        return expected == fields.get("Signature")
+
+    @app.get("/_calls")
+    async def calls() -> dict:
+        return app.state.calls
+
+    @app.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD", "PUT", "POST", "DELETE"])
+    async def object_operation(bucket: str, key: str, request: Request) -> Response:
+        body = await request.body()
+        if bucket != BUCKET:
+            return _error(404, "NoSuchBucket")
+        if not _authorized(request, body):
+            return _error(403, "SignatureDoesNotMatch")
+        key = unquote(key)
+        params = request.query_params
+
+        if request.method == "POST" and "uploads" in params:
+            _count("create_multipart")
+            upload_id = uuid.uuid4().hex
+            app.state.uploads[upload_id] = {}
+            return Response(
+                f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>",
+                media_type="application/xml"
+            )
+        if request.method == "PUT" and "uploadId" in params:
+            _count("upload_part")
+            parts = app.state.uploads.get(params["uploadId"])
+            if parts is None:
+                return _error(404, "NoSuchUpload")
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            parts[int(params["partNumber"])] = (etag, body)
+            return Response(headers={"ETag": etag})
+        if request.method == "POST" and "uploadId" in params:
+            _count("complete_multipart")
+            parts = app.state.uploads.pop(params["uploadId"], None)
+            if parts is None:
+                return _error(404, "NoSuchUpload")
+            app.state.objects[key] = (b"".join(parts[number][1] for number in sorted(parts)), datetime.now(timezone.utc))
+            return Response(f"<CompleteMultipartUploadResult><Key>{key}</Key></CompleteMultipartUploadResult>")
+        if request.method == "DELETE" and "uploadId" in params:
+            _count("abort_multipart")
+            app.state.uploads.pop(params["uploadId"], None)
+            return Response(status_code=204)
+
+        if request.method == "PUT":
+            _count("put")
+            app.state.objects[key] = (body, datetime.now(timezone.utc))
+            return Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if request.method == "DELETE":
+            _count("delete")
+            app.state.objects.pop(key, None)
+            return Response(status_code=204)
+
+        stored = app.state.objects.get(key)
+        if stored is None:
+            return _error(404, "NoSuchKey")
+        data, modified = stored
+        headers = {"Last-Modified": format_datetime(modified, usegmt=True), "ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+        if request.method == "HEAD":
+            _count("head")
+            return Response(headers={**headers, "Content-Length": str(len(data))})
+
+        _count("get")
+        requested = request.headers.get("range")
+        if requested:
+            first, _, last = requested[6:].partition("-")
+            start = int(first)
+            end = min(int(last) + 1, len(data)) if last else len(data)
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+            return Response(data[start:end], status_code=206, headers=headers)
+        return Response(data, headers=headers)
+
+    return app
+
+
+class FakeS3Server:
+    """Serwer uvicorn w wątku w tle (start/stop z kodu benchmarku)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8766):
+        self.app = create_app(f"{host}:{port}")
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def calls(self) -> dict:
+        return dict(self.app.state.calls)
+
+    def storage(self, **kwargs) -> S3Storage:
+        return S3Storage(self.url, BUCKET, ACCESS_KEY, SECRET_KEY, **kwargs)
+
+    def start(self) -> "FakeS3Server":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake S3 server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake S3-compatible server")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    print(f"S3_ENDPOINT_URL=http://127.0.0.1:{args.port} S3_BUCKET={BUCKET} "
+          f"S3_ACCESS_KEY_ID={ACCESS_KEY} S3_SECRET_ACCESS_KEY={SECRET_KEY}")
+    uvicorn.run(create_app(f"127.0.0.1:{args.port}"), host="127.0.0.1", port=args.port)
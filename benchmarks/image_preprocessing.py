@@ -0,0 +1,104 @@
+"""
+Benchmark przygotowania zdjęć rachunków do OCR.
+
+Generuje syntetyczne zdjęcia paragonów (duży JPEG, tekst obrócony o znany
+kąt), mierzy czasy poszczególnych kroków i dokładność prostowania, trafienie
+w cache na dysku oraz przepustowość puli procesów razem z maksymalnym
+opóźnieniem pętli zdarzeń.
+
+Użycie:
+    python -m benchmarks.image_preprocessing --images 8 --size 4000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.pdf_ingestion import measure_loop_lag
+from benchmarks.seed import PRODUCT_WORDS
+
+
+def write_receipt_photo(path: Path, size: int, angle: float, seed: int = 0) -> None:
+    """Zapisuje JPEG z kolumną pozycji paragonu obróconą o `angle` stopni."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    receipt = Image.new("L", (size // 2, size), 235)
+    draw = ImageDraw.Draw(receipt)
+    font = ImageFont.load_default(size=size // 60)
+    line_height = size // 45
+    for row in range(40):
+        line = f"{rng.choice(PRODUCT_WORDS).upper()}  {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d}"
+        draw.text((size // 20, size // 20 + row * line_height), line, fill=40, font=font)
+
+    photo = Image.new("L", (size, size * 3 // 4 + size // 2), 90)
+    rotated = receipt.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=90)
+    photo.paste(rotated, ((photo.width - rotated.width) // 2, (photo.height - rotated.height) // 2))
+    photo.convert("RGB").save(path, quality=90)
+
+
+async def bench_pool(images: List[Path], output_dir: str, max_side: int) -> None:
+    from src.processing.images import preprocess_image
+    from src.processing.pool import run_in_pool, shutdown_pool
+
+    # Rozgrzanie puli (start procesów spawn) na osobnym katalogu wyników
+    await run_in_pool(preprocess_image, str(images[0]), output_dir + "_warmup", max_side)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(run_in_pool(preprocess_image, str(path), output_dir, max_side) for path in images))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lag = await lag_task
+    shutdown_pool()
+
+    print(f"  pool ({len(images)} images): {len(images) / elapsed:8.2f} images/s  max loop lag {lag * 1000:6.1f} ms")
+
+
+def main(args: argparse.Namespace) -> None:
+    from src.processing.images import STEPS, preprocess_image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        rng = random.Random(0)
+        angles = [round(rng.uniform(-6, 6), 1) for _ in range(args.images)]
+        images = []
+        for number, angle in enumerate(angles):
+            path = tmp_dir / f"receipt_{number}.jpg"
+            write_receipt_photo(path, args.size, angle, seed=number)
+            images.append(path)
+
+        print(f"🧾 {args.images} photos, {args.size}px, {images[0].stat().st_size / 1024:.0f} KiB each, max side {args.max_side}")
+
+        totals = {step: 0.0 for step in STEPS}
+        errors = []
+        for path, angle in zip(images, angles):
+            result = preprocess_image(str(path), str(tmp_dir / "inline"), args.max_side)
+            # Kąt prostujący jest przeciwny do kąta obrotu zdjęcia
+            errors.append(abs(result.skew_angle + angle))
+            for step, elapsed in result.timings.items():
+                totals[step] += elapsed
+        print("  in-process step averages: " + ", ".join(
+            f"{step} {totals[step] * 1000 / len(images):.1f} ms" for step in STEPS
+        ))
+        print(f"  deskew error: mean {sum(errors) / len(errors):.2f}°, max {max(errors):.2f}°")
+
+        start = time.perf_counter()
+        cached = preprocess_image(str(images[0]), str(tmp_dir / "inline"), args.max_side)
+        print(f"  cache hit: {(time.perf_counter() - start) * 1000:.1f} ms (cached={cached.cached})")
+
+        asyncio.run(bench_pool(images, str(tmp_dir / "pool"), args.max_side))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DEBUG", "false")
+    parser = argparse.ArgumentParser(description="Image preprocessing benchmark")
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", type=int, default=4000, help="longer side of the generated photo")
+    parser.add_argument("--max-side", type=int, default=2000)
+    main(parser.parse_args())
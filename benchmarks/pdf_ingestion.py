@@ -0,0 +1,150 @@
+"""
+Benchmark ekstrakcji stron z wielostronicowych PDF.
+
+Generuje dwa rodzaje dokumentów: z warstwą tekstową (e-paragony ze sklepów
+internetowych) i skany (same obrazy, wymagają renderowania). Mierzy
+stron/s w procesie oraz przez pulę procesów przy kilku dokumentach
+naraz, razem z maksymalnym opóźnieniem pętli zdarzeń w tym czasie.
+
+Użycie:
+    python -m benchmarks.pdf_ingestion --pages 10 --documents 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.seed import PRODUCT_WORDS
+
+
+def text_pdf_bytes(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """Minimalny PDF z warstwą tekstową (czcionka Helvetica)."""
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Pages - uzupełniane po utworzeniu stron
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(pages):
+        lines = [
+            f"{rng.choice(PRODUCT_WORDS).upper()} {rng.randint(1, 5)} x {rng.randint(1, 99)},{rng.randint(0, 99):02d} PLN"
+            for _ in range(lines_per_page)
+        ]
+        stream = "BT /F1 10 Tf 40 800 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode("latin-1", "replace")))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    body = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref_offset = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(body)
+
+
+def write_text_pdf(path: Path, pages: int, lines_per_page: int = 40, seed: int = 0) -> None:
+    """Zapisuje PDF z `text_pdf_bytes`."""
+    path.write_bytes(text_pdf_bytes(pages, lines_per_page, seed))
+
+
+def write_scanned_pdf(path: Path, pages: int, seed: int = 0) -> None:
+    """Zapisuje PDF złożony wyłącznie z obrazów (jak skan paragonu)."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(pages):
+        image = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        for row in range(60):
+            draw.text((80, 60 + row * 27), f"{rng.choice(PRODUCT_WORDS).upper()}  {rng.randint(1, 99)},{rng.randint(0, 99):02d}", fill=0)
+        images.append(image.convert("RGB"))
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Maksymalne opóźnienie wybudzenia pętli zdarzeń w trakcie pomiaru."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def bench_pool(documents: List[Path], output_dir: str, pages: int, dpi: int) -> None:
+    from src.processing.pdf import extract_pdf_pages
+    from src.processing.pool import run_in_pool, shutdown_pool
+
+    # Rozgrzanie puli (start procesów spawn)
+    await run_in_pool(extract_pdf_pages, str(documents[0]), output_dir, pages, dpi)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_in_pool(extract_pdf_pages, str(path), output_dir, pages, dpi) for path in documents
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lag = await lag_task
+    shutdown_pool()
+
+    total_pages = sum(len(result.pages) for result in results)
+    print(f"  pool ({len(documents)} docs):  {total_pages / elapsed:8.1f} pages/s  max loop lag {lag * 1000:6.1f} ms")
+
+
+def bench_inline(path: Path, output_dir: str, pages: int, dpi: int, runs: int = 3) -> None:
+    from src.processing.pdf import extract_pdf_pages
+
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        extraction = extract_pdf_pages(str(path), output_dir, pages, dpi)
+        best = min(best, time.perf_counter() - start)
+    print(
+        f"  in-process:          {len(extraction.pages) / best:8.1f} pages/s  "
+        f"({extraction.text_pages} text / {len(extraction.pages) - extraction.text_pages} rendered, "
+        f"{path.stat().st_size / 1024:.0f} KiB)"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        output_dir = str(tmp_dir / "pages")
+        for kind, writer in (("text layer", write_text_pdf), ("scanned", write_scanned_pdf)):
+            documents = []
+            for number in range(args.documents):
+                path = tmp_dir / f"{kind.replace(' ', '_')}_{number}.pdf"
+                writer(path, args.pages, seed=number)
+                documents.append(path)
+
+            print(f"📄 {kind}, {args.pages} pages, {args.dpi} dpi")
+            bench_inline(documents[0], output_dir, args.pages, args.dpi)
+            asyncio.run(bench_pool(documents, output_dir, args.pages, args.dpi))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DEBUG", "false")
+    parser = argparse.ArgumentParser(description="PDF ingestion benchmark")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=8, help="documents processed concurrently through the pool")
+    parser.add_argument("--dpi", type=int, default=200)
+    main(parser.parse_args())
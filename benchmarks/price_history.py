@@ -0,0 +1,137 @@
+"""
+Benchmark historii cen: agregat `pricehistory` kontra skanowanie pozycji.
+
+Zasila bazę (`benchmarks.seed`), wypełnia agregat od zera
+(`refresh_price_history`) i porównuje czasy zapytań "najtańszy sklep" oraz
+serii cen z agregatu z równoważnymi zapytaniami po `billitem` + `bill`.
+Mierzony jest też koszt przyrostowej aktualizacji przy dodawaniu pozycji.
+
+Użycie:
+    python -m benchmarks.price_history --bills 50000 --items-per-bill 15
+    python -m benchmarks.price_history --skip-seed
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable
+
+from sqlalchemy import Float, cast, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.seed import add_seed_arguments, params_from_args, seed
+from src.db.models import Bill, BillItem, Index, Shop
+from src.prices.services import get_cheapest_shops, get_price_history, record_item_prices, refresh_price_history
+
+
+async def timed(call: Callable[[], Awaitable], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def raw_cheapest(session: AsyncSession, index_id: int, since: date):
+    """To samo co get_cheapest_shops, ale bezpośrednio z pozycji rachunków."""
+    statement = (
+        select(
+            Bill.shop_id, Shop.name, func.min(BillItem.unit_price), func.max(BillItem.unit_price),
+            func.avg(cast(BillItem.unit_price, Float)).label("avg_price"), func.count(), func.max(Bill.bill_date)
+        )
+        .join(Bill, Bill.id == BillItem.bill_id)
+        .join(Shop, Shop.id == Bill.shop_id)
+        .where(BillItem.index_id == index_id, Bill.bill_date >= datetime.combine(since, datetime.min.time()))
+        .group_by(Bill.shop_id, Shop.name)
+        .order_by("avg_price")
+        .limit(10)
+    )
+    return (await session.execute(statement)).all()
+
+
+async def raw_history(session: AsyncSession, index_id: int, since: date):
+    day = func.date(Bill.bill_date)
+    statement = (
+        select(Bill.shop_id, day, func.min(BillItem.unit_price), func.max(BillItem.unit_price),
+               func.sum(BillItem.unit_price), func.count())
+        .join(Bill, Bill.id == BillItem.bill_id)
+        .where(BillItem.index_id == index_id, Bill.bill_date >= datetime.combine(since, datetime.min.time()))
+        .group_by(Bill.shop_id, day)
+    )
+    return (await session.execute(statement)).all()
+
+
+async def main(args: argparse.Namespace) -> None:
+    from src.db.main import engine
+    from src.db.migrations import migrate_database
+
+    try:
+        await migrate_database()
+        if not args.skip_seed:
+            summary = await seed(engine, params_from_args(args))
+            print(f"🌱 Seeded: {summary}")
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            start = time.perf_counter()
+            await refresh_price_history(session)
+            await session.commit()
+            print(f"🔁 Full aggregate rebuild: {time.perf_counter() - start:.2f}s")
+
+            index_ids = (await session.execute(select(Index.id))).scalars().all()
+            items = (await session.execute(select(func.count()).select_from(BillItem))).scalar_one()
+            rng = random.Random(args.seed)
+            probe = rng.sample(index_ids, min(args.probes, len(index_ids)))
+            today = date.today()
+            year_ago = today - timedelta(days=365)
+
+            print(f"\n{items} bill items, {len(index_ids)} products, median of {args.repeats} runs x {len(probe)} products")
+            print(f"{'query':<28} {'aggregate ms':>13} {'raw items ms':>13} {'speedup':>8}")
+            scenarios = {
+                "cheapest shop, 30 days": (
+                    lambda index_id: get_cheapest_shops(session, index_id, since=today - timedelta(days=30)),
+                    lambda index_id: raw_cheapest(session, index_id, today - timedelta(days=30)),
+                ),
+                "cheapest shop, 365 days": (
+                    lambda index_id: get_cheapest_shops(session, index_id, since=year_ago),
+                    lambda index_id: raw_cheapest(session, index_id, year_ago),
+                ),
+                "history, 365 days": (
+                    lambda index_id: get_price_history(session, index_id, year_ago, today),
+                    lambda index_id: raw_history(session, index_id, year_ago),
+                ),
+            }
+            for name, (aggregate, raw) in scenarios.items():
+                aggregate_ms = statistics.median([await timed(lambda: aggregate(i), args.repeats) for i in probe])
+                raw_ms = statistics.median([await timed(lambda: raw(i), args.repeats) for i in probe])
+                print(f"{name:<28} {aggregate_ms:>13.2f} {raw_ms:>13.2f} {raw_ms / max(aggregate_ms, 1e-6):>7.1f}x")
+
+            # Koszt utrzymania: upsert agregatu dla rachunku z 15 pozycjami (wycofywany)
+            shop_id = (await session.execute(select(Shop.id).limit(1))).scalar_one()
+            bill_items = [
+                BillItem(bill_id=0, index_id=rng.choice(index_ids), quantity=Decimal(1),
+                         unit_price=Decimal(rng.randint(99, 4999)) / 100, total_price=Decimal(1))
+                for _ in range(15)
+            ]
+
+            async def upsert() -> None:
+                await record_item_prices(session, shop_id, datetime.utcnow(), bill_items)
+                await session.rollback()
+
+            print(f"{'incremental upsert, 15 items':<28} {await timed(upsert, args.repeats):>13.2f}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DATABASE_ECHO", "false")
+    parser = argparse.ArgumentParser(description="Price history aggregate benchmark")
+    add_seed_arguments(parser)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse data already in the database")
+    parser.add_argument("--probes", type=int, default=10, help="products to query")
+    parser.add_argument("--repeats", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,335 @@
+"""
+Runner scenariuszy obciążeniowych dla webhooka i API rachunków.
+
+Aplikacja uruchamiana jest w procesie (httpx + ASGITransport), a wywołania
+Bot API trafiają do lokalnego fałszywego serwera (`benchmarks.fake_bot_api`).
+Można też wskazać działający serwer przez `--base-url` (np. gunicorn).
+
+Wyniki (p50/p95/p99, przepustowość, błędy) zapisywane są jako JSON
+oznaczony hashem commita, a `--compare` wypisuje różnice względem
+wcześniejszego pliku wyników.
+
+Webhook ze zdjęciem lub dokumentem odpowiada 200 także wtedy, gdy
+przetwarzanie rachunku skończyło się błędem. W procesie runner liczy więc
+przebiegi `_process_bill_pages` i błędy przygotowania zdjęć; scenariusz,
+w którym przetwarzanie nie wykonało się dla każdego żądania albo zdjęcie nie
+dało się przygotować, kończy runner kodem 1.
+
+Użycie:
+    python -m benchmarks.run --seed-data --requests 500 --concurrency 16
+    python -m benchmarks.run --scenarios bill_detail,messages_list --compare bench_results/abc123.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_ROOT / "bench_results"
+# Scenariusze, w których każde żądanie musi dojść do przetwarzania rachunku
+BILL_SCENARIOS = ("webhook_photo", "webhook_document")
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    duration: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    status_codes: Dict[str, int] = field(default_factory=dict)
+    bill_runs: Optional[int] = None  # Zakończone przebiegi przetwarzania rachunku (w procesie)
+
+
+class BillStageCounter:
+    """Zlicza zakończone przebiegi `services._process_bill_pages` i błędy przygotowania zdjęć (w procesie)."""
+
+    def __init__(self):
+        from src.telegram import services
+
+        self.completed = 0
+        process_bill_pages = services._process_bill_pages
+
+        async def counted(*args, **kwargs):
+            result = await process_bill_pages(*args, **kwargs)
+            self.completed += 1
+            return result
+
+        services._process_bill_pages = counted
+
+    @property
+    def preprocessing_errors(self) -> int:
+        from src.processing.images import preprocessing_stats
+        return preprocessing_stats.errors
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentyl metodą najbliższej rangi."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+@dataclass
+class Targets:
+    """Identyfikatory z bazy używane przez scenariusze GET."""
+    bill_ids: List[int]
+    file_bill_ids: List[int]
+    chat_ids: List[int]
+    search_terms: List[str]
+
+
+async def load_targets(limit: int = 1000) -> Targets:
+    from sqlalchemy import select
+    from src.db.main import engine
+    from src.db.models import Bill, TelegramMessage, User
+
+    async with engine.connect() as conn:
+        bill_ids = (await conn.execute(select(Bill.id).order_by(Bill.id.desc()).limit(limit))).scalars().all()
+        file_bill_ids = (await conn.execute(
+            select(TelegramMessage.bill_id)
+            .where(TelegramMessage.bill_id.isnot(None), TelegramMessage.file_path.isnot(None))
+            .limit(limit)
+        )).scalars().all()
+        chat_ids = (await conn.execute(select(User.external_id).limit(limit))).scalars().all()
+
+    return Targets(
+        bill_ids=list(bill_ids),
+        file_bill_ids=list(file_bill_ids),
+        chat_ids=list(chat_ids) or [1],
+        search_terms=["paragon", "lidl", "zakupy", "rachunek", "help"],
+    )
+
+
+RequestFactory = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def build_scenarios(targets: Targets, rng: random.Random) -> Dict[str, RequestFactory]:
+    from benchmarks.updates import UpdateStream
+
+    stream = UpdateStream(targets.chat_ids, seed=rng.randint(0, 10**6))
+
+    def webhook(kind: str) -> RequestFactory:
+        async def call(client: httpx.AsyncClient) -> httpx.Response:
+            return await client.post("/webhook", json=stream.next(kind))
+        return call
+
+    async def bill_detail(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get(f"/api/v1/bills/{rng.choice(targets.bill_ids)}")
+
+    async def messages_list(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/messages", params={"limit": 50, "offset": rng.randint(0, 500)})
+
+    async def messages_search(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/messages/search", params={"query": rng.choice(targets.search_terms), "limit": 20})
+
+    async def bill_file(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get(f"/api/v1/bills/{rng.choice(targets.file_bill_ids)}/file")
+
+    scenarios: Dict[str, RequestFactory] = {
+        "webhook_text": webhook("text"),
+        "webhook_photo": webhook("photo"),
+        "webhook_document": webhook("document"),
+        "webhook_edited": webhook("edited"),
+        "messages_list": messages_list,
+        "messages_search": messages_search,
+    }
+    if targets.bill_ids:
+        scenarios["bill_detail"] = bill_detail
+    if targets.file_bill_ids:
+        scenarios["bill_file"] = bill_file
+    return scenarios
+
+
+async def run_scenario(
+    name: str,
+    factory: RequestFactory,
+    client: httpx.AsyncClient,
+    requests: int,
+    concurrency: int,
+    warmup: int
+) -> ScenarioResult:
+    """Wykonuje `requests` żądań przy zadanej współbieżności i liczy statystyki."""
+    for _ in range(warmup):
+        await factory(client)
+
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await factory(client)
+                code = str(response.status_code)
+            except Exception as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for code, count in status_codes.items() if not code.startswith(("2", "3")))
+    return ScenarioResult(
+        name=name,
+        requests=len(latencies),
+        errors=errors,
+        duration=round(duration, 4),
+        throughput=round(len(latencies) / duration, 2) if duration else 0.0,
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 0.95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+        mean_ms=round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        status_codes=status_codes,
+    )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def print_results(results: List[ScenarioResult], baseline: Optional[dict] = None) -> None:
+    baseline_by_name = {r["name"]: r for r in (baseline or {}).get("scenarios", [])}
+    header = f"{'scenario':<18} {'req':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    if baseline_by_name:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    for r in results:
+        line = f"{r.name:<18} {r.requests:>6} {r.errors:>5} {r.throughput:>9.1f} {r.p50_ms:>9.2f} {r.p95_ms:>9.2f} {r.p99_ms:>9.2f}"
+        base = baseline_by_name.get(r.name)
+        if base:
+            dp95 = (r.p95_ms - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+            drps = (r.throughput - base["throughput"]) / base["throughput"] * 100 if base["throughput"] else 0.0
+            line += f" {dp95:>+7.1f}% {drps:>+7.1f}%"
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> int:
+    from benchmarks.fake_bot_api import FakeBotApiServer
+
+    from src.config import config
+
+    fake_api = None
+    if not args.base_url:
+        fake_api = FakeBotApiServer(port=args.bot_api_port, latency=args.bot_api_latency).start()
+        # Serwisy Telegram czytają konfigurację przy każdym wywołaniu
+        config.TELEGRAM_API_URL = fake_api.url
+        config.TELEGRAM_BOT_TOKEN = config.TELEGRAM_BOT_TOKEN or "123456:bench-token"
+
+    from src.db.main import engine
+    from src.db.migrations import migrate_database
+
+    if args.seed_data:
+        from benchmarks.seed import params_from_args, seed
+        await migrate_database()
+        summary = await seed(engine, params_from_args(args))
+        print(f"🌱 Seeded: {summary}")
+
+    targets = await load_targets()
+    rng = random.Random(args.seed)
+    scenarios = build_scenarios(targets, rng)
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from main import app
+        # Błędy aplikacji liczone są jako odpowiedzi 500, jak za prawdziwym serwerem
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    bill_stage = None if args.base_url else BillStageCounter()
+    results = []
+    failed = False
+    async with client:
+        for name in selected:
+            if name not in scenarios:
+                print(f"⚠️  Skipping unknown/unavailable scenario: {name}")
+                continue
+            print(f"▶️  {name}...")
+            before = bill_stage.completed if bill_stage else 0
+            errors_before = bill_stage.preprocessing_errors if bill_stage else 0
+            result = await run_scenario(
+                name, scenarios[name], client, args.requests, args.concurrency, args.warmup
+            )
+            if bill_stage and name in BILL_SCENARIOS:
+                result.bill_runs = bill_stage.completed - before
+                expected = result.requests + args.warmup
+                if result.bill_runs < expected:
+                    failed = True
+                    print(f"❌ {name}: bill processing completed {result.bill_runs}/{expected} times - see application log")
+                preprocessing_errors = bill_stage.preprocessing_errors - errors_before
+                if preprocessing_errors:
+                    failed = True
+                    print(f"❌ {name}: image preprocessing failed {preprocessing_errors} times - see application log")
+            results.append(result)
+
+    if fake_api:
+        print(f"📡 Fake Bot API calls: {fake_api.calls}")
+        fake_api.stop()
+    await engine.dispose()
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_results(results, baseline)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "params": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "scenarios": [asdict(r) for r in results],
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"💾 Results saved to {output}")
+    return 1 if failed else 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    from benchmarks.seed import add_seed_arguments
+
+    parser = argparse.ArgumentParser(description="Bills API load benchmarks")
+    parser.add_argument("--scenarios", help="comma separated scenario names (default: all)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--bot-api-port", type=int, default=8765)
+    parser.add_argument("--bot-api-latency", type=float, default=0.0, help="fake Bot API latency [s]")
+    parser.add_argument("--seed-data", action="store_true", help="seed the database before running")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--output", help="results JSON path (default: bench_results/<revision>.json)")
+    add_seed_arguments(parser)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    # Logowanie SQL i profil importów zaburzają pomiary
+    os.environ.setdefault("DATABASE_ECHO", "false")
+    os.environ.setdefault("DEBUG", "false")
+    sys.exit(asyncio.run(main(parse_args())))
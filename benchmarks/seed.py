@@ -0,0 +1,211 @@
+"""
+Zasilanie bazy realistycznymi danymi do benchmarków.
+
+Dane wstawiane są wsadowo przez Core (INSERT ... executemany), bez ORM.
+Zalecana jest osobna baza (`DATABASE_URL`), np. postgresql+asyncpg://.../bills_bench
+lub lokalny zamiennik sqlite+aiosqlite:///bench.db.
+
+Użycie:
+    python -m benchmarks.seed --bills 5000 --items-per-bill 15 --messages 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.db.models import (
+    Bill, BillItem, Category, Index, ProcessingStatus, Shop,
+    TelegramMessage, TelegramMessageStatus, TelegramMessageType, User,
+)
+from src.files.services import FileService
+
+BATCH_SIZE = 1000
+
+SHOP_NAMES = ("Biedronka", "Lidl", "Żabka", "Auchan", "Carrefour", "Kaufland", "Netto", "Dino", "Stokrotka", "Rossmann")
+CATEGORY_NAMES = ("Owoce", "Warzywa", "Nabiał", "Pieczywo", "Mięso", "Napoje", "Słodycze", "Chemia", "Kosmetyki", "Mrożonki")
+PRODUCT_WORDS = ("banan", "jabłko", "mleko", "chleb", "masło", "ser", "szynka", "woda", "sok", "jogurt",
+                 "pomidor", "ogórek", "czekolada", "kawa", "herbata", "ryż", "makaron", "jajka", "płyn", "mydło")
+MESSAGE_TEXTS = ("paragon biedronka", "zakupy lidl", "/start", "/help", "rachunek za prąd", "zakupy na weekend")
+
+
+@dataclass
+class SeedParams:
+    users: int = 50
+    shops: int = 20
+    indexes: int = 500
+    bills: int = 5000
+    items_per_bill: int = 15
+    messages: int = 20000
+    files: int = 100
+    seed: int = 42
+
+
+async def _insert_batches(engine: AsyncEngine, table, rows: List[dict], returning=None) -> list:
+    """Wstawia wiersze wsadami; opcjonalnie zwraca kolumnę z RETURNING."""
+    returned = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        statement = insert(table)
+        if returning is not None:
+            statement = statement.returning(returning)
+        async with engine.begin() as conn:
+            result = await conn.execute(statement, batch)
+            if returning is not None:
+                returned.extend(result.scalars().all())
+    return returned
+
+
+def _write_fake_photo(path: Path, rng: random.Random) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Nagłówek JPEG + losowa treść o rozmiarze typowego zdjęcia paragonu
+    path.write_bytes(b"\xff\xd8\xff\xe0" + rng.randbytes(rng.randint(150_000, 400_000)) + b"\xff\xd9")
+
+
+async def seed(engine: AsyncEngine, params: SeedParams) -> dict:
+    """Zasila bazę i zwraca podsumowanie wstawionych wierszy."""
+    rng = random.Random(params.seed)
+    tag = uuid.uuid4().hex[:6]
+    now = datetime.utcnow()
+
+    chat_ids = [rng.randint(10**9, 10**10) for _ in range(params.users)]
+    user_ids = await _insert_batches(engine, User.__table__, [
+        {"external_id": chat_id, "is_active": True, "created_at": now, "updated_at": now}
+        for chat_id in chat_ids
+    ], returning=User.__table__.c.id)
+
+    shop_ids = await _insert_batches(engine, Shop.__table__, [
+        {"name": f"{SHOP_NAMES[i % len(SHOP_NAMES)]} {tag}-{i}", "address": f"ul. Testowa {i}", "created_at": now, "updated_at": now}
+        for i in range(params.shops)
+    ], returning=Shop.__table__.c.id)
+
+    category_ids = await _insert_batches(engine, Category.__table__, [
+        {"name": f"{name} {tag}", "created_at": now, "updated_at": now}
+        for name in CATEGORY_NAMES
+    ], returning=Category.__table__.c.id)
+
+    index_ids = await _insert_batches(engine, Index.__table__, [
+        {
+            "name": f"{rng.choice(PRODUCT_WORDS)} {rng.choice(PRODUCT_WORDS)} {tag}-{i}",
+            "category_id": rng.choice(category_ids) if rng.random() < 0.8 else None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(params.indexes)
+    ], returning=Index.__table__.c.id)
+
+    bill_rows = []
+    for _ in range(params.bills):
+        bill_date = now - timedelta(days=rng.randint(0, 730), minutes=rng.randint(0, 1440))
+        bill_rows.append({
+            "bill_date": bill_date,
+            "total_amount": Decimal(rng.randint(500, 50000)) / 100,
+            "status": rng.choices(list(ProcessingStatus), weights=(5, 2, 90, 3))[0],
+            "user_id": rng.choice(user_ids),
+            "shop_id": rng.choice(shop_ids),
+            "created_at": bill_date,
+            "updated_at": bill_date,
+        })
+    bill_ids = await _insert_batches(engine, Bill.__table__, bill_rows, returning=Bill.__table__.c.id)
+
+    item_rows = []
+    for bill_id in bill_ids:
+        for _ in range(params.items_per_bill):
+            quantity = Decimal(rng.randint(1, 3000)) / 1000
+            unit_price = Decimal(rng.randint(99, 4999)) / 100
+            item_rows.append({
+                "bill_id": bill_id,
+                "index_id": rng.choice(index_ids),
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "total_price": (quantity * unit_price).quantize(Decimal("0.01")),
+                "original_text": f"{rng.choice(PRODUCT_WORDS).upper()} {quantity} x {unit_price}",
+                "confidence_score": rng.random(),
+                "created_at": now,
+            })
+    await _insert_batches(engine, BillItem.__table__, item_rows)
+
+    # Pliki zdjęć dla części rachunków (scenariusz pobierania plików)
+    photos_dir = Path(FileService.PHOTOS_DIR)
+    file_bills = bill_ids[:params.files]
+    file_paths = {}
+    for bill_id in file_bills:
+        path = photos_dir / f"bench_{tag}_{bill_id}.jpg"
+        _write_fake_photo(path, rng)
+        file_paths[bill_id] = str(path)
+
+    message_base = rng.randint(10**11, 10**12)
+    message_rows = []
+    for i in range(params.messages):
+        bill_id = file_bills[i] if i < len(file_bills) else None
+        chat_id = rng.choice(chat_ids)
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        is_photo = bill_id is not None or rng.random() < 0.3
+        message_rows.append({
+            "telegram_message_id": message_base + i,
+            "chat_id": chat_id,
+            "user_id": chat_id,
+            "message_type": TelegramMessageType.PHOTO if is_photo else TelegramMessageType.TEXT,
+            "content": "Zdjęcie rachunku" if is_photo else rng.choice(MESSAGE_TEXTS),
+            "file_id": f"bench-{message_base + i}" if is_photo else None,
+            "file_path": file_paths.get(bill_id),
+            "status": TelegramMessageStatus.SENT,
+            "bill_id": bill_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    await _insert_batches(engine, TelegramMessage.__table__, message_rows)
+
+    return {
+        "users": len(user_ids),
+        "shops": len(shop_ids),
+        "indexes": len(index_ids),
+        "bills": len(bill_ids),
+        "bill_items": len(item_rows),
+        "messages": len(message_rows),
+        "files": len(file_paths),
+    }
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = SeedParams()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--shops", type=int, default=defaults.shops)
+    parser.add_argument("--indexes", type=int, default=defaults.indexes)
+    parser.add_argument("--bills", type=int, default=defaults.bills)
+    parser.add_argument("--items-per-bill", type=int, default=defaults.items_per_bill)
+    parser.add_argument("--messages", type=int, default=defaults.messages)
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def params_from_args(args: argparse.Namespace) -> SeedParams:
+    return SeedParams(
+        users=args.users, shops=args.shops, indexes=args.indexes, bills=args.bills,
+        items_per_bill=args.items_per_bill, messages=args.messages, files=args.files, seed=args.seed,
+    )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from src.db.main import engine
+    from src.db.migrations import migrate_database
+
+    await migrate_database()
+    summary = await seed(engine, params_from_args(args))
+    print(f"✅ Seeded: {summary}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DATABASE_ECHO", "false")
+    parser = argparse.ArgumentParser(description="Seed the benchmark database")
+    add_seed_arguments(parser)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Generatory syntetycznych aktualizacji Telegram (webhook) do benchmarków.
+"""
+import itertools
+import random
+import time
+from typing import Any, Dict, Iterator, Optional
+
+UPDATE_KINDS = ("text", "photo", "document", "edited")
+
+_TEXTS = (
+    "/start",
+    "/help",
+    "Biedronka 23.45 zł",
+    "Paragon z Lidla, zakupy na weekend",
+    "Czy mogę wysłać kilka zdjęć naraz?",
+)
+
+
+def _message(message_id: int, chat_id: int, date: int) -> Dict[str, Any]:
+    return {
+        "message_id": message_id,
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Bench", "language_code": "pl"},
+        "chat": {"id": chat_id, "type": "private", "first_name": "Bench"},
+        "date": date,
+    }
+
+
+def _photo_sizes(message_id: int) -> list:
+    """Zestaw miniatur, jak wysyła Telegram (największa na końcu)."""
+    sizes = [(90, 120), (320, 427), (800, 1067), (1280, 1707)]
+    return [
+        {
+            "file_id": f"AgACAgIAAxkBAAI{message_id}_{width}",
+            "file_unique_id": f"AQAD{message_id}{width}",
+            "width": width,
+            "height": height,
+            "file_size": width * height // 8,
+        }
+        for width, height in sizes
+    ]
+
+
+def build_update(
+    kind: str,
+    update_id: int,
+    message_id: int,
+    chat_id: int,
+    date: int = 1_700_000_000,
+    rng: Optional[random.Random] = None,
+    media_group_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Buduje surowy słownik aktualizacji danego typu (text/photo/document/edited).
+
+    `media_group_id` dla typu photo tworzy część albumu.
+    """
+    rng = rng or random
+    message = _message(message_id, chat_id, date)
+
+    if kind == "text":
+        message["text"] = rng.choice(_TEXTS)
+    elif kind == "photo":
+        message["photo"] = _photo_sizes(message_id)
+        if media_group_id:
+            message["media_group_id"] = media_group_id
+        else:
+            message["caption"] = "Paragon"
+    elif kind == "document":
+        message["document"] = {
+            "file_id": f"BQACAgIAAxkBAAI{message_id}",
+            "file_unique_id": f"AgAD{message_id}",
+            "file_name": f"paragon_{message_id}.pdf",
+            "mime_type": "application/pdf",
+            "file_size": 180_000,
+        }
+    elif kind == "edited":
+        message["text"] = rng.choice(_TEXTS)
+        message["edit_date"] = date + 60
+        return {"update_id": update_id, "edited_message": message}
+    else:
+        raise ValueError(f"Unknown update kind: {kind}")
+
+    return {"update_id": update_id, "message": message}
+
+
+class UpdateStream:
+    """
+    Nieskończony strumień unikalnych aktualizacji.
+
+    `update_id` i `message_id` rosną monotonicznie od bazy z bieżącego czasu
+    (treść zależy tylko od `seed`), więc kolejne uruchomienia na tej samej
+    bazie nie są odrzucane jako ponowione aktualizacje (TelegramMessageKey).
+    """
+
+    def __init__(self, chat_ids: list, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        base = time.time_ns() // 1000
+        self._ids = itertools.count(base)
+        self.chat_ids = chat_ids
+
+    def next(self, kind: str) -> Dict[str, Any]:
+        update_id = next(self._ids)
+        return build_update(kind, update_id, update_id, self._random.choice(self.chat_ids), rng=self._random)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for kind in itertools.cycle(UPDATE_KINDS):
+            yield self.next(kind)
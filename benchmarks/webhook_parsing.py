@@ -0,0 +1,80 @@
+"""
+Mikro-benchmark przyjmowania webhooków: aktualizacje/s na jeden worker.
+
+Porównuje poprzednią ścieżkę (json.loads + TelegramWebhook(**dict)) z walidacją
+surowych bajtów (`TelegramWebhook.model_validate_json`) oraz mierzy cały
+endpoint `/webhook` z podmienionym przetwarzaniem (bez bazy i Bot API).
+
+Użycie:
+    python -m benchmarks.webhook_parsing [--iterations 20000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable
+
+from benchmarks.updates import build_update
+
+
+def _payload(kind: str) -> bytes:
+    update = build_update(kind, 1, 1, 123456789)
+    message = update.get("message") or update.get("edited_message")
+    # Pola, których schemat nie opisuje - typowe dla prawdziwych aktualizacji
+    message["entities"] = [{"type": "bot_command", "offset": 0, "length": 6}] * 20
+    message["forward_origin"] = {"type": "user", "date": 1_700_000_000, "sender_user": message["from"]}
+    return json.dumps(update).encode()
+
+
+def _rate(func: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - start)
+
+
+def parse_benchmark(iterations: int) -> None:
+    from src.telegram.schemas import TelegramWebhook
+
+    for kind in ("text", "photo"):
+        body = _payload(kind)
+        legacy = _rate(lambda: TelegramWebhook(**json.loads(body)), iterations)
+        fast = _rate(lambda: TelegramWebhook.model_validate_json(body), iterations)
+        print(f"{kind:<6} {len(body):>6} B  dict path: {legacy:>10.0f}/s  raw bytes: {fast:>10.0f}/s  ({fast / legacy:.2f}x)")
+
+
+async def endpoint_benchmark(iterations: int) -> None:
+    import httpx
+    from main import app
+    from src.telegram import services
+
+    async def _noop_process_webhook(session, webhook) -> bool:
+        return True
+
+    services.process_webhook = _noop_process_webhook
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for kind in ("text", "photo"):
+            body = _payload(kind)
+            headers = {"content-type": "application/json"}
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await client.post("/webhook", content=body, headers=headers)
+            rate = iterations / (time.perf_counter() - start)
+            print(f"{kind:<6} /webhook endpoint: {rate:>8.0f} updates/s")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("DATABASE_ECHO", "false")
+    os.environ.setdefault("DEBUG", "false")
+
+    parser = argparse.ArgumentParser(description="Webhook ingestion micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--endpoint-iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    parse_benchmark(args.iterations)
+    asyncio.run(endpoint_benchmark(args.endpoint_iterations))
@@ -12,4 +12,13 @@ errorlog = "-"
 loglevel = "info"
 proc_name = "bills-api"
 preload_app = True
-graceful_timeout = 30
\ No newline at end of file
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Migracje uruchamiane raz w procesie master, przed forkiem workerów."""
+    import asyncio
+    from src.db.migrations import migrate_database
+
+    if not asyncio.run(migrate_database()):
+        server.log.warning("Database migration failed - workers will start anyway")
@@ -1,28 +1,47 @@
 import logging
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
 from dotenv import load_dotenv
+from src.config import config
+from src.profiling import ImportProfiler
+
+# Profilowanie importów przy starcie (tylko w trybie debug)
+import_profiler = ImportProfiler().install() if config.DEBUG else None
+
+from fastapi import FastAPI
 import sentry_sdk
-from sentry_sdk.integrations.fastapi import FastApiIntegration
-from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
-from sentry_sdk.integrations.httpx import HttpxIntegration
 from src.bill.routes import router as router_bill
+from src.cache.responses import response_cache
+from src.cache.routes import router as router_cache
 from src.category.routes import router as router_category
-from src.db.main import init_db
+from src.db.main import engine
+from src.db.migrations import check_schema_version, migrate_database
 from src.files.routes import router as router_files
+from src.files.signed_urls import signing_enabled
+from src.files.storage import close_storage
 from src.index.routes import router as router_index
 from src.middleware import register_middleware
+from src.processing.pool import shutdown_pool
+from src.processing.receipts import recognition_enabled
+from src.prices.routes import router as router_prices
+from src.processing.routes import router as router_processing
 from src.shop.routes import router as router_shop
+from src.sync.routes import router as router_sync
 from src.user.routes import router as router_user
+from src.user.cache import start_invalidation_listener
 from src.telegram.routes import router as router_telegram
-from src.config import config
+from src.telegram.services import media_group_aggregator, resume_media_groups
+from src.telegram.update_log import update_log
 
 # Załaduj zmienne środowiskowe
 load_dotenv()
 
-# Inicjalizacja Sentry
+# Inicjalizacja Sentry - integracje importowane tylko gdy monitoring jest włączony
 if config.SENTRY_DSN:
+    from sentry_sdk.integrations.fastapi import FastApiIntegration
+    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+    from sentry_sdk.integrations.httpx import HttpxIntegration
+
     sentry_sdk.init(
         dsn=config.SENTRY_DSN,
         environment=config.SENTRY_ENVIRONMENT,
@@ -39,6 +58,11 @@ if config.SENTRY_DSN:
 else:
     print("⚠️  Sentry DSN not configured - error monitoring disabled")
 
+if import_profiler:
+    import_profiler.uninstall()
+    print("⏱️  Startup import profile:")
+    print(import_profiler.report())
+
 # Konfiguracja logowania
 logging.basicConfig(
     level=logging.INFO,
@@ -49,17 +73,43 @@ logging.basicConfig(
 async def lifespan(app: FastAPI):
     print("Starting up...")
     
-    # Uruchom migracje automatycznie
+    # Migracje uruchamia master gunicorna / faza release - worker tylko sprawdza wersję schematu
+    if config.RUN_MIGRATIONS_ON_STARTUP:
+        if not await migrate_database():
+            print("   Continuing without migrations...")
+    else:
+        await check_schema_version(engine)
+    
+    if not signing_enabled():
+        print("⚠️  FILE_URL_SECRET is not set - signed file URLs are disabled")
+    if not recognition_enabled():
+        print("⚠️  RECEIPT_PARSER is not set - receipt recognition is disabled, bills are not created from photos")
+    
+    try:
+        invalidation_listener = await start_invalidation_listener()
+    except Exception as e:
+        print(f"⚠️  User cache invalidation listener failed: {e}")
+        invalidation_listener = None
+    
+    # Albumy przerwane przez poprzedni proces (wyjątek lub awaria workera)
     try:
-        from scripts.auto_migrate import auto_migrate
-        await auto_migrate()
+        resumed = await resume_media_groups()
+        if resumed:
+            print(f"📸 Resuming {resumed} unfinished media groups")
     except Exception as e:
-        print(f"⚠️  Auto-migration failed: {e}")
-        print("   Continuing without migrations...")
+        print(f"⚠️  Resuming media groups failed: {e}")
     
-    await init_db()
     yield
     print("Shutting down...")
+    # Albumy czekające na kolejne części przetwarzane są przed zamknięciem workera
+    await media_group_aggregator.drain()
+    # Reszta bufora dziennika aktualizacji zapisywana jest przed wyjściem
+    await update_log.close()
+    if invalidation_listener:
+        await invalidation_listener.close()
+    await response_cache.close()
+    await close_storage()
+    shutdown_pool()
 
 version = "v1"
 
@@ -71,9 +121,13 @@ app = FastAPI(lifespan=lifespan,
 register_middleware(app)
 
 app.include_router(router_bill, prefix=f"/api/{version}")
+app.include_router(router_cache, prefix=f"/api/{version}")
 app.include_router(router_category, prefix=f"/api/{version}")
 app.include_router(router_files, prefix=f"/api/{version}")
 app.include_router(router_index, prefix=f"/api/{version}")
+app.include_router(router_prices, prefix=f"/api/{version}")
+app.include_router(router_processing, prefix=f"/api/{version}")
 app.include_router(router_shop, prefix=f"/api/{version}")
+app.include_router(router_sync, prefix=f"/api/{version}")
 app.include_router(router_user, prefix=f"/api/{version}")
 app.include_router(router_telegram, prefix="")
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Add media_group_id to telegram messages
+
+Revision ID: 3c5d2a7f9b10
+Revises: 8e41af9301f9
+Create Date: 2026-10-19 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5d2a7f9b10'
+down_revision: Union[str, None] = '8e41af9301f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: tabela powstaje później przez create_all z aktualnego modelu
+    columns = _columns("telegrammessage")
+    if columns and "media_group_id" not in columns:
+        op.add_column("telegrammessage", sa.Column("media_group_id", sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+        op.create_index(op.f("ix_telegrammessage_media_group_id"), "telegrammessage", ["media_group_id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if "media_group_id" in _columns("telegrammessage"):
+        op.drop_index(op.f("ix_telegrammessage_media_group_id"), table_name="telegrammessage")
+        op.drop_column("telegrammessage", "media_group_id")
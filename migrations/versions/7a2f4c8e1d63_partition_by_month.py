@@ -0,0 +1,52 @@
+"""Partition telegrammessage and billitem by month
+
+Revision ID: 7a2f4c8e1d63
+Revises: 3c5d2a7f9b10
+Create Date: 2026-10-19 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.db.partitions import PARTITIONED_TABLES, convert_to_plain, partition_tables
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2f4c8e1d63'
+down_revision: Union[str, None] = '3c5d2a7f9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Nowa baza: tabele powstają później przez create_all, a konwersję
+    # wykonuje _upgrade w src/db/migrations.py
+    if bind.dialect.name == "postgresql":
+        partition_tables(bind)
+        return
+
+    # Inne bazy: bez partycji, tylko indeks po created_at
+    inspector = sa.inspect(bind)
+    for table in PARTITIONED_TABLES:
+        if not inspector.has_table(table):
+            continue
+        if f"ix_{table}_created_at" not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(op.f(f"ix_{table}_created_at"), table, ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for table in PARTITIONED_TABLES:
+            convert_to_plain(bind, table)
+        return
+
+    inspector = sa.inspect(bind)
+    for table in PARTITIONED_TABLES:
+        if inspector.has_table(table) and f"ix_{table}_created_at" in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(op.f(f"ix_{table}_created_at"), table_name=table)
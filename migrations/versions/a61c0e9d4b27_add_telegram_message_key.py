@@ -0,0 +1,78 @@
+"""Add telegrammessagekey for idempotent webhook retries
+
+Revision ID: a61c0e9d4b27
+Revises: f3a9b27c4e18
+Create Date: 2026-10-19 21:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.db.partitions import is_partitioned
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61c0e9d4b27'
+down_revision: Union[str, None] = 'f3a9b27c4e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MESSAGE_ID_INDEX = "ix_telegrammessage_telegram_message_id"
+
+
+def _message_id_index(inspector) -> Union[dict, None]:
+    for index in inspector.get_indexes("telegrammessage"):
+        if index["name"] == MESSAGE_ID_INDEX:
+            return index
+    return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: tabela powstaje później przez create_all z aktualnego modelu
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("telegrammessage"):
+        return
+
+    if not inspector.has_table("telegrammessagekey"):
+        op.create_table(
+            "telegrammessagekey",
+            sa.Column("chat_id", sa.BigInteger(), nullable=False),
+            sa.Column("telegram_message_id", sa.BigInteger(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("chat_id", "telegram_message_id"),
+        )
+        op.create_index("ix_telegrammessagekey_created_at", "telegrammessagekey", ["created_at"])
+        # Klucze istniejących wiadomości; po partycjonowaniu w Postgresie mogły już powstać duplikaty
+        op.execute(
+            "INSERT INTO telegrammessagekey (chat_id, telegram_message_id, created_at) "
+            "SELECT chat_id, telegram_message_id, COALESCE(min(created_at), CURRENT_TIMESTAMP) "
+            "FROM telegrammessage WHERE chat_id IS NOT NULL AND telegram_message_id IS NOT NULL "
+            "GROUP BY chat_id, telegram_message_id"
+        )
+
+    # Model nie deklaruje już unikalności telegram_message_id (w partycjonowanej tabeli
+    # to zwykły indeks) - ten sam indeks także w niepartycjonowanych bazach
+    index = _message_id_index(inspector)
+    if index and index["unique"]:
+        op.drop_index(MESSAGE_ID_INDEX, table_name="telegrammessage")
+        op.create_index(MESSAGE_ID_INDEX, "telegrammessage", ["telegram_message_id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if inspector.has_table("telegrammessagekey"):
+        op.drop_index("ix_telegrammessagekey_created_at", table_name="telegrammessagekey")
+        op.drop_table("telegrammessagekey")
+
+    # Unikalny indeks tylko bez partycji (src/db/partitions.py)
+    partitioned = bind.dialect.name == "postgresql" and is_partitioned(bind, "telegrammessage")
+    index = _message_id_index(inspector) if inspector.has_table("telegrammessage") else None
+    if index and not index["unique"] and not partitioned:
+        op.drop_index(MESSAGE_ID_INDEX, table_name="telegrammessage")
+        op.create_index(MESSAGE_ID_INDEX, "telegrammessage", ["telegram_message_id"], unique=True)
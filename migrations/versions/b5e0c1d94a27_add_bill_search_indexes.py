@@ -0,0 +1,50 @@
+"""Add composite indexes for bill search
+
+Revision ID: b5e0c1d94a27
+Revises: 7a2f4c8e1d63
+Create Date: 2026-10-19 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e0c1d94a27'
+down_revision: Union[str, None] = '7a2f4c8e1d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BILL_INDEXES = {
+    "ix_bill_user_id_bill_date_id": ["user_id", "bill_date", "id"],
+    "ix_bill_user_id_shop_id_bill_date_id": ["user_id", "shop_id", "bill_date", "id"],
+    "ix_bill_user_id_status_bill_date_id": ["user_id", "status", "bill_date", "id"],
+}
+
+
+def _indexes(table: str) -> Union[set, None]:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: indeksy tworzy później create_all z aktualnego modelu
+    existing = _indexes("bill")
+    if existing is None:
+        return
+    for name, columns in BILL_INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "bill", columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    existing = _indexes("bill") or set()
+    for name in BILL_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name="bill")
@@ -0,0 +1,40 @@
+"""Add telegrammessage.attempts for album processing retries
+
+Revision ID: b7d2e4f6a813
+Revises: e8b3d5f10a94
+Create Date: 2026-10-19 23:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f6a813'
+down_revision: Union[str, None] = 'e8b3d5f10a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: tabela powstaje później przez create_all z aktualnego modelu.
+    # W PostgreSQL kolumna dodana do tabeli partycjonowanej trafia do wszystkich partycji
+    columns = _columns("telegrammessage")
+    if columns and "attempts" not in columns:
+        op.add_column("telegrammessage", sa.Column("attempts", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if "attempts" in _columns("telegrammessage"):
+        op.drop_column("telegrammessage", "attempts")
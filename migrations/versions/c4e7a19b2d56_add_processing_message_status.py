@@ -0,0 +1,40 @@
+"""Add PROCESSING to telegrammessagestatus
+
+Revision ID: c4e7a19b2d56
+Revises: a61c0e9d4b27
+Create Date: 2026-10-19 21:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a19b2d56'
+down_revision: Union[str, None] = 'a61c0e9d4b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_enum_type(bind) -> bool:
+    return bool(bind.execute(sa.text("SELECT to_regtype('telegrammessagestatus')")).scalar())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tylko PostgreSQL ma natywny typ enum (SQLite zapisuje nazwę jako tekst);
+    # nowa baza dostaje typ z nową wartością przez create_all.
+    # ADD VALUE w transakcji wymaga PostgreSQL 12+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and _has_enum_type(bind):
+        op.execute("ALTER TYPE telegrammessagestatus ADD VALUE IF NOT EXISTS 'PROCESSING' AFTER 'SENT'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Wartości enuma nie da się usunąć - przejęte części albumu wracają do SENT
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and _has_enum_type(bind):
+        op.execute("UPDATE telegrammessage SET status = 'SENT' WHERE status = 'PROCESSING'")
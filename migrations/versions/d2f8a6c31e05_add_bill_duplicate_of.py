@@ -0,0 +1,44 @@
+"""Add duplicate_of_id to bills
+
+Revision ID: d2f8a6c31e05
+Revises: b5e0c1d94a27
+Create Date: 2026-10-19 16:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f8a6c31e05'
+down_revision: Union[str, None] = 'b5e0c1d94a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: kolumna powstaje później przez create_all z aktualnego modelu
+    columns = _columns("bill")
+    if columns and "duplicate_of_id" not in columns:
+        op.add_column("bill", sa.Column("duplicate_of_id", sa.Integer(), nullable=True))
+        # SQLite nie dodaje ograniczeń do istniejącej tabeli
+        if op.get_bind().dialect.name != "sqlite":
+            op.create_foreign_key("bill_duplicate_of_id_fkey", "bill", "bill", ["duplicate_of_id"], ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if "duplicate_of_id" in _columns("bill"):
+        if op.get_bind().dialect.name != "sqlite":
+            op.drop_constraint("bill_duplicate_of_id_fkey", "bill", type_="foreignkey")
+        op.drop_column("bill", "duplicate_of_id")
@@ -0,0 +1,59 @@
+"""Add commit-ordered syncchange.seq and syncsequence counters
+
+Revision ID: e8b3d5f10a94
+Revises: c4e7a19b2d56
+Create Date: 2026-10-19 22:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3d5f10a94'
+down_revision: Union[str, None] = 'c4e7a19b2d56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: tabele powstają później przez create_all z aktualnego modelu
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("syncchange"):
+        return
+
+    if "seq" not in {column["name"] for column in inspector.get_columns("syncchange")}:
+        # seq = id - kursory wydane przed migracją wskazują dalej to samo miejsce dziennika
+        with op.batch_alter_table("syncchange") as batch_op:
+            batch_op.add_column(sa.Column("seq", sa.BigInteger(), nullable=True))
+        op.execute("UPDATE syncchange SET seq = id")
+        with op.batch_alter_table("syncchange") as batch_op:
+            batch_op.alter_column("seq", existing_type=sa.BigInteger(), nullable=False)
+            batch_op.drop_index("ix_syncchange_user_id_id")
+            batch_op.create_index("ix_syncchange_user_id_seq", ["user_id", "seq"], unique=True)
+
+    if not inspector.has_table("syncsequence"):
+        op.create_table(
+            "syncsequence",
+            sa.Column("user_id", sa.BigInteger(), autoincrement=False, nullable=False),
+            sa.Column("seq", sa.BigInteger(), server_default="0", nullable=False),
+            sa.PrimaryKeyConstraint("user_id"),
+        )
+        op.execute("INSERT INTO syncsequence (user_id, seq) SELECT user_id, max(seq) FROM syncchange GROUP BY user_id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if inspector.has_table("syncsequence"):
+        op.drop_table("syncsequence")
+    if inspector.has_table("syncchange") and "seq" in {column["name"] for column in inspector.get_columns("syncchange")}:
+        with op.batch_alter_table("syncchange") as batch_op:
+            batch_op.drop_index("ix_syncchange_user_id_seq")
+            batch_op.create_index("ix_syncchange_user_id_id", ["user_id", "id"])
+            batch_op.drop_column("seq")
@@ -0,0 +1,42 @@
+"""Add tax_id to shops
+
+Revision ID: f3a9b27c4e18
+Revises: d2f8a6c31e05
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9b27c4e18'
+down_revision: Union[str, None] = 'd2f8a6c31e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nowa baza: kolumna powstaje później przez create_all z aktualnego modelu;
+    # tabelę shopalias create_all tworzy także w istniejącej bazie
+    columns = _columns("shop")
+    if columns and "tax_id" not in columns:
+        op.add_column("shop", sa.Column("tax_id", sa.String(), nullable=True))
+        op.create_index("ix_shop_tax_id", "shop", ["tax_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if "tax_id" in _columns("shop"):
+        op.drop_index("ix_shop_tax_id", table_name="shop")
+        op.drop_column("shop", "tax_id")
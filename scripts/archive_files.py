@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Archiwizacja starych plików rachunków do segmentów - do uruchamiania z crona.
+
+Pliki wiadomości starszych niż `FILE_ARCHIVE_AFTER_DAYS` (lub `--days`)
+są rekompresowane i przenoszone do `uploads/archive/segment_*.pack`, a stare
+pliki pochodne (strony PDF, obrazy przygotowane do OCR) usuwane. Tylko jedno
+zadanie naraz (blokada pliku w katalogu archiwum). `--dry-run` pokazuje,
+ile miejsca zostałoby zwolnione; `--sweep` usuwa oryginały pozostawione przez
+przerwane wcześniej zadanie.
+
+Użycie:
+    python scripts/archive_files.py [--days N] [--limit N] [--dry-run] [--sweep]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.main import engine
+from src.files.archive import archive_old_files, archive_store, sweep_archived_originals
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+async def main(args: argparse.Namespace) -> int:
+    days = config.FILE_ARCHIVE_AFTER_DAYS if args.days is None else args.days
+    if days <= 0:
+        print("ℹ️  File archiving is disabled (FILE_ARCHIVE_AFTER_DAYS=0)")
+        return 0
+
+    try:
+        with archive_store.lock():
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                if args.sweep:
+                    removed = await sweep_archived_originals(session)
+                    print(f"🧹 Removed {removed} already archived originals")
+                stats = await archive_old_files(session, days, limit=args.limit, dry_run=args.dry_run)
+    except BlockingIOError:
+        print("⚠️ Another archiving job is running")
+        return 1
+    except Exception as e:
+        print(f"❌ File archiving failed: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+
+    prefix = "🧪 Would archive" if args.dry_run else "✅ Archived"
+    print(f"{prefix} {stats['archived']} files older than {days} days: "
+          f"{_mb(stats['bytes_before'])} -> {_mb(stats['bytes_after'])}")
+    print(f"   missing on disk: {stats['missing']}, "
+          f"derived files removed: {stats['derived_removed']} ({_mb(stats['derived_bytes'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old receipt files into packed archive segments")
+    parser.add_argument("--days", type=int, default=None, help="archive files older than N days")
+    parser.add_argument("--limit", type=int, default=5000, help="max files per run")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing")
+    parser.add_argument("--sweep", action="store_true", help="remove originals of already archived files")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 """
-Automatyczne uruchamianie migracji przy starcie aplikacji
+Uruchamianie migracji w fazie release / w procesie master gunicorna.
+
+Migracje wykonywane są w procesie przez API Alembica (src/db/migrations.py),
+pod blokadą doradczą Postgresa - równoległe uruchomienia nie ścigają się.
 """
 import asyncio
-import os
 import sys
-import subprocess
 from pathlib import Path
 
 # Dodaj src do ścieżki Python
@@ -13,53 +14,15 @@ project_root = Path(__file__).parent.parent
 
 sys.path.insert(0, str(project_root))
 
-from src.config import config
-
-async def auto_migrate():
-    """Automatycznie uruchamia migracje przy starcie"""
-    print("🔄 Auto-migrating database...")
-
-    # Ustaw zmienne środowiskowe
-    env = os.environ.copy()
-    env["DATABASE_URL"] = config.DATABASE_URL
-
-    try:
-        # Sprawdź status migracji
-        result = subprocess.run(
-            [sys.executable, "scripts/alembic_wrapper.py", "current"],
-            env=env,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+from src.db.migrations import migrate_database
 
-        print(f"📊 Current migration status: {result.stdout.strip()}")
 
-        # Uruchom migracje
-        result = subprocess.run(
-            [sys.executable, "scripts/alembic_wrapper.py", "upgrade", "head"],
-            env=env,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        print("✅ Database migrations completed successfully!")
-        if result.stdout:
-            print(result.stdout)
-
-        return True
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Migration failed: {e}")
-        print("------ Alembic STDOUT ------")
-        print(e.stdout)
-        print("------ Alembic STDERR ------")
-        print(e.stderr)
-        return False
+async def auto_migrate():
+    """Uruchamia migracje do najnowszej wersji"""
+    return await migrate_database()
 
 
 if __name__ == "__main__":
     success = asyncio.run(auto_migrate())
     if not success:
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark czasu startu aplikacji (import `main` + lifespan).
+
+Każdy pomiar importu wykonywany jest w świeżym interpreterze, tak jak przy
+recyklingu workera gunicorna (`max_requests`). Skrypt kończy się kodem 1,
+jeśli mediana przekroczy budżet - nadaje się jako bramka w CI.
+
+Użycie:
+    python scripts/benchmark_startup.py [--runs 5] [--import-budget 2.0] [--lifespan-budget 1.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+MEASURE_IMPORT = (
+    "import time, json; start = time.perf_counter(); import main; "
+    "print(json.dumps({'import': time.perf_counter() - start}))"
+)
+
+
+def measure_import(runs: int) -> list:
+    """Mierzy czas `import main` w osobnych procesach."""
+    env = os.environ.copy()
+    # Profiler importów sam kosztuje - wyłączamy go na czas pomiaru
+    env["DEBUG"] = "false"
+
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE_IMPORT],
+            cwd=project_root,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        last_line = result.stdout.strip().splitlines()[-1]
+        timings.append(json.loads(last_line)["import"])
+    return timings
+
+
+async def measure_lifespan() -> float:
+    """Mierzy czas wejścia i wyjścia z lifespan aplikacji."""
+    from main import app
+    from src.db.main import engine
+
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        pass
+    elapsed = time.perf_counter() - start
+    # Połączenie z puli (wątek aiosqlite) blokowałoby zakończenie procesu
+    await engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=2.0, help="seconds")
+    parser.add_argument("--lifespan-budget", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    print(f"⏱️  Measuring `import main` ({args.runs} runs)...")
+    import_timings = measure_import(args.runs)
+    import_median = statistics.median(import_timings)
+    print(f"   median={import_median:.3f}s min={min(import_timings):.3f}s max={max(import_timings):.3f}s")
+
+    print("⏱️  Measuring lifespan...")
+    lifespan_time = asyncio.run(measure_lifespan())
+    print(f"   lifespan={lifespan_time:.3f}s")
+
+    failed = False
+    if import_median > args.import_budget:
+        print(f"❌ Import time {import_median:.3f}s exceeds budget {args.import_budget:.3f}s")
+        failed = True
+    if lifespan_time > args.lifespan_budget:
+        print(f"❌ Lifespan time {lifespan_time:.3f}s exceeds budget {args.lifespan_budget:.3f}s")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Sprawdza wykrywanie zduplikowanych rachunków na bazie z DATABASE_URL.
+
+Sprawdzane są: ten sam paragon rozpoznany ponownie (odcisk treści), to samo
+zdjęcie po ponownej kompresji i zmniejszeniu (skrót percepcyjny), brak
+fałszywego alarmu dla innego rachunku (także bez pozycji, z tym samym
+sklepem, dniem i sumą), tryb `merge`, rachunki tworzone przez
+API z pozycjami dodawanymi później oraz czas sprawdzenia przy dużej historii.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_bill_dedup.py
+"""
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image, ImageDraw
+from sqlalchemy import func, insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.bill import dedup
+from src.bill import services as bill_services
+from src.bill.schemas import BillCreate
+from src.billitem.schemas import BillItemCreate
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Bill, BillFingerprint
+from src.processing.images import image_dhash
+from src.processing.receipts import ParsedItem, ParsedReceipt
+from src.user import cache as user_cache
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def receipt(seed: int, items: int = 8) -> ParsedReceipt:
+    rng = random.Random(seed)
+    return ParsedReceipt(
+        items=[
+            ParsedItem(
+                original_text=f"PRODUKT {rng.randint(1, 999)}",
+                quantity=Decimal("1.000"),
+                unit_price=Decimal(rng.randint(100, 5000)) / 100,
+                total_price=Decimal(rng.randint(100, 5000)) / 100,
+            )
+            for _ in range(items)
+        ],
+        shop_name=f"Sklep duplikatów {seed % 3}",
+        bill_date=datetime(2026, 10, 1 + seed % 20, 12, 30),
+    )
+
+
+def receipt_photo(path: Path, seed: int, scale: float = 1.0, quality: int = 92) -> None:
+    rng = random.Random(seed)
+    image = Image.new("L", (1200, 2000), 240)
+    draw = ImageDraw.Draw(image)
+    for line in range(45):
+        width = rng.randint(300, 1000)
+        draw.rectangle((100, 80 + line * 42, 100 + width, 100 + line * 42), fill=30)
+    if scale != 1.0:
+        image = image.resize((int(image.width * scale), int(image.height * scale)), Image.Resampling.BILINEAR)
+    image.save(path, "JPEG", quality=quality)
+
+
+async def bill_count(session: AsyncSession, user_id: int) -> int:
+    return (await session.execute(select(func.count()).select_from(Bill).where(Bill.user_id == user_id))).scalar_one()
+
+
+async def main() -> int:
+    await migrate_database()
+    results = []
+    run = random.randrange(10**6)
+
+    with tempfile.TemporaryDirectory() as directory:
+        photos = {}
+        for name, seed, scale, quality in (("a", 1, 1.0, 92), ("a_forwarded", 1, 0.8, 60), ("b", 2, 1.0, 92)):
+            path = Path(directory) / f"{name}.jpg"
+            receipt_photo(path, seed, scale, quality)
+            photos[name] = image_dhash(str(path))
+    distance = dedup.hamming_distance(photos["a"], photos["a_forwarded"])
+    unrelated = dedup.hamming_distance(photos["a"], photos["b"])
+    results.append(report("perceptual hash", distance <= 3 < unrelated, f"recompressed {distance} bits, other photo {unrelated} bits"))
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await user_cache.get_or_create_user(session, 900_000_000 + run)
+        await session.commit()
+
+        first, original = await bill_services.create_bill_from_parsed(session, user.id, receipt(run), phash=photos["a"])
+        again, again_of = await bill_services.create_bill_from_parsed(session, user.id, receipt(run))
+        results.append(report("same receipt flagged", original is None and again_of == first.id and again.duplicate_of_id == first.id))
+
+        # Inny wynik rozpoznania (np. nowsza wersja parsera), ale to samo zdjęcie przekazane dalej
+        forwarded, forwarded_of = await bill_services.create_bill_from_parsed(
+            session, user.id, receipt(run + 1000), phash=photos["a_forwarded"]
+        )
+        results.append(report("forwarded photo flagged", forwarded_of == first.id))
+
+        other, other_of = await bill_services.create_bill_from_parsed(session, user.id, receipt(run + 1), phash=photos["b"])
+        results.append(report("different receipt not flagged", other_of is None and other.duplicate_of_id is None))
+
+        config.BILL_DUPLICATE_MODE = "merge"
+        before = await bill_count(session, user.id)
+        merged, merged_of = await bill_services.create_bill_from_parsed(session, user.id, receipt(run))
+        config.BILL_DUPLICATE_MODE = "flag"
+        results.append(report(
+            "merge mode keeps one bill", merged.id == first.id and merged_of == first.id and await bill_count(session, user.id) == before
+        ))
+
+        # Dwa zakupy bez rozpoznanych pozycji: ten sam sklep, dzień i suma, inne zdjęcia
+        config.BILL_DUPLICATE_MODE = "merge"
+        before = await bill_count(session, user.id)
+        itemless = []
+        for phash in (photos["a"] ^ 0xFFFF_FFFF_FFFF_FFFF, photos["b"] ^ 0xFFFF_FFFF_FFFF_FFFF):
+            parsed = receipt(run + 2, items=0)
+            parsed.total_amount = Decimal("23.40")
+            itemless.append(await bill_services.create_bill_from_parsed(session, user.id, parsed, phash=phash))
+        config.BILL_DUPLICATE_MODE = "flag"
+        results.append(report(
+            "item-less bills not merged by shop, day and total",
+            all(original is None for _, original in itemless) and await bill_count(session, user.id) == before + 2
+        ))
+
+        items = [
+            BillItemCreate(quantity=Decimal("1"), unit_price=Decimal("3.50"), total_price=Decimal("3.50"), original_text=f"Chleb {run}"),
+            BillItemCreate(quantity=Decimal("2"), unit_price=Decimal("4.00"), total_price=Decimal("8.00"), original_text="Mleko"),
+        ]
+        api_bills = []
+        for extra in (None, None, "Masło"):
+            bill = await bill_services.create_bill(session, BillCreate(
+                user_id=user.id, shop_id=first.shop_id, bill_date=datetime(2026, 9, 1, 10), total_amount=Decimal("11.50")
+            ))
+            bill_items = items + ([BillItemCreate(quantity=Decimal("1"), unit_price=Decimal("0"), total_price=Decimal("0"), original_text=extra)] if extra else [])
+            await bill_services.add_items_to_bill(session, bill, bill_items)
+            api_bills.append(bill)
+        results.append(report(
+            "API bills checked after items",
+            api_bills[0].duplicate_of_id is None and api_bills[1].duplicate_of_id == api_bills[0].id and api_bills[2].duplicate_of_id is None
+        ))
+
+        # Duża historia jednego użytkownika - czas sprawdzenia nie powinien rosnąć z jej rozmiarem
+        rng = random.Random(run)
+        timings = {}
+        for size in (1_000, 50_000):
+            heavy = await user_cache.get_or_create_user(session, 910_000_000 + run + size)
+            await session.commit()
+            bill_ids = (await session.execute(insert(Bill).returning(Bill.id), [
+                {"user_id": heavy.id, "bill_date": datetime(2026, 1, 1), "status": "COMPLETED",
+                 "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+                for _ in range(size)
+            ])).scalars().all()
+            rows = []
+            for bill_id in bill_ids:
+                phash = rng.getrandbits(64)
+                bands = dedup.phash_bands(phash)
+                rows.append({
+                    "bill_id": bill_id, "user_id": heavy.id, "fingerprint": f"{rng.getrandbits(128):032x}",
+                    "phash": dedup._signed(phash), **{f"phash_band_{band}": value for band, value in enumerate(bands)},
+                })
+            await session.execute(insert(BillFingerprint), rows)
+            await session.commit()
+
+            probes = [rng.getrandbits(64) for _ in range(50)]
+            start = time.perf_counter()
+            for probe in probes:
+                await dedup.find_duplicate(session, heavy.id, f"{probe:032x}", probe)
+            timings[size] = (time.perf_counter() - start) / len(probes) * 1000
+        results.append(report(
+            "lookup independent of history size", timings[50_000] < timings[1_000] * 3,
+            ", ".join(f"{size} bills: {elapsed:.2f} ms" for size, elapsed in timings.items())
+        ))
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Sprawdza propozycje kategorii (src/category/suggestions.py) na bazie z DATABASE_URL.
+
+Dodaje syntetyczne kategorie i indeksy, a następnie sprawdza: trafność na
+nazwach spoza macierzy, partię przez `POST /api/v1/categories/suggest` bez
+zapytań do bazy, przypisanie kategorii przy tworzeniu indeksu i koszt tego
+kroku, przyrostowe naniesienie nowego indeksu, zmiany kategorii i usunięcia
+(bez przebudowy) oraz przebudowę w tle po przekroczeniu progu zmian.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_category_suggestions.py --indexes 20000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import event, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Category, Index
+from src.category.suggestions import category_suggester
+
+CATEGORIES = {
+    "nabiał": ["mleko", "masło", "śmietana", "ser żółty", "twaróg", "jogurt naturalny", "kefir", "maślanka"],
+    "pieczywo": ["chleb żytni", "bułka kajzerka", "bagietka", "chleb tostowy", "rogal", "bułka grahamka"],
+    "owoce i warzywa": ["jabłka", "gruszki", "ziemniaki", "cebula", "pomidory", "ogórki", "marchew", "banany"],
+    "mięso i wędliny": ["kiełbasa śląska", "szynka", "pierś z kurczaka", "boczek", "parówki", "schab"],
+    "napoje": ["kawa mielona", "herbata czarna", "sok pomarańczowy", "woda źródlana", "piwo jasne", "cola"],
+    "chemia": ["proszek do prania", "płyn do naczyń", "papier toaletowy", "mydło", "szampon", "pasta do zębów"],
+}
+VARIANTS = ["łaciate", "extra", "bio", "classic", "premium", "light", "domowe", "wiejskie", "świeże", "duże", "1l", "500g"]
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def product_name(rng: random.Random, category: str) -> str:
+    return f"{rng.choice(CATEGORIES[category])} {rng.choice(VARIANTS)} {rng.randint(1, 999)}"
+
+
+async def main_check(count: int) -> int:
+    await migrate_database()
+    results = []
+    run = uuid.uuid4().hex[:6]
+    rng = random.Random(3)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        categories = {name: Category(name=f"{name} {run}") for name in CATEGORIES}
+        session.add_all(categories.values())
+        await session.commit()
+        category_ids = {name: category.id for name, category in categories.items()}
+
+        rows = []
+        for number in range(count):
+            category = rng.choice(list(CATEGORIES))
+            rows.append({
+                "name": f"{product_name(rng, category)} {number} {run}",
+                "category_id": category_ids[category],
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            })
+        await session.execute(insert(Index), rows)
+        await session.commit()
+
+        start = time.perf_counter()
+        await category_suggester.load(session)
+        results.append(report(
+            "matrix built", len(category_suggester) >= count,
+            f"{category_suggester.stats()} in {(time.perf_counter() - start) * 1000:.0f} ms"
+        ))
+        loaded_at = category_suggester.loaded_at
+
+        # Trafność na nowych nazwach (inne liczby i warianty, bez sufiksu przebiegu)
+        held_out = [(category, product_name(rng, category)) for category in CATEGORIES for _ in range(200)]
+        start = time.perf_counter()
+        suggestions = category_suggester.suggest([name for _, name in held_out])
+        batch_ms = (time.perf_counter() - start) * 1000
+        correct = sum(
+            1 for (category, _), suggestion in zip(held_out, suggestions)
+            if suggestion and suggestion.category_id == category_ids[category]
+        )
+        results.append(report(
+            "held-out accuracy", correct / len(held_out) >= 0.95,
+            f"{correct}/{len(held_out)}, batch of {len(held_out)} in {batch_ms:.0f} ms"
+        ))
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(1))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statements.clear()
+            response = await client.post("/api/v1/categories/suggest", json={
+                "names": ["Jogurt grecki 400g", "Płyn do płukania", "qqqq"]
+            })
+            body = response.json()
+            results.append(report(
+                "API batch without database",
+                response.status_code == 200 and not statements
+                and body[0]["category_id"] == category_ids["nabiał"]
+                and body[1]["category_id"] == category_ids["chemia"] and body[2]["category_id"] is None,
+                ", ".join(f"{item['name']} -> {item['category_id']} ({item['score']})" for item in body)
+            ))
+
+            created = await client.post("/api/v1/indexes/", json={"name": f"Mleko UHT 3,2% {run}"})
+            results.append(report(
+                "category assigned on index creation",
+                created.status_code == 201 and created.json()["category_id"] == category_ids["nabiał"],
+                str(created.json().get("category_id"))
+            ))
+
+            # Koszt kroku w tworzeniu indeksu: dopisanie poprzedniego nowego indeksu + propozycja
+            timings = []
+            for number in range(200):
+                category = rng.choice(list(CATEGORIES))
+                session.add(Index(name=f"{product_name(rng, category)} inline {number} {run}", category_id=category_ids[category]))
+                await session.commit()
+                start = time.perf_counter()
+                category_suggester.suggest([product_name(rng, category)])
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results.append(report(
+                "inline cost per new index", timings[int(len(timings) * 0.99) - 1] < 5,
+                f"median {statistics.median(timings):.2f} ms, p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms"
+            ))
+
+            novel = Index(name=f"Zestaw qwzx {run}", category_id=category_ids["chemia"])
+            session.add(novel)
+            await session.commit()
+            first, = category_suggester.suggest(["qwzx"])
+            novel.category_id = category_ids["napoje"]
+            await session.commit()
+            moved, = category_suggester.suggest(["qwzx"])
+            await session.delete(novel)
+            await session.commit()
+            gone, = category_suggester.suggest(["qwzx"])
+            results.append(report(
+                "incremental add, recategorize and delete",
+                first and first.category_id == category_ids["chemia"] and first.neighbour_id == novel.id
+                and moved and moved.category_id == category_ids["napoje"] and gone is None
+                and category_suggester.loaded_at == loaded_at,
+                str(category_suggester.stats())
+            ))
+
+            # Zmiany ponad próg - przebudowa w tle, zapytania w tym czasie korzystają z dotychczasowej macierzy
+            session.add_all(
+                Index(name=f"{product_name(rng, 'napoje')} bulk {number} {run}", category_id=category_ids["napoje"])
+                for number in range(int(count * config.CATEGORY_SUGGESTION_REBUILD_RATIO) + 1)
+            )
+            await session.commit()
+            category_suggester.suggest(["sok"])
+            stale = category_suggester.outdated
+            await category_suggester.ensure_loaded(session)
+            task = category_suggester._refresh_task
+            served_during_rebuild = bool(category_suggester.suggest(["sok jabłkowy"])[0])
+            await task
+            results.append(report(
+                "background rebuild after many changes",
+                stale and served_during_rebuild and not category_suggester.outdated
+                and category_suggester.stats()["incremental_columns"] == 0,
+                str(category_suggester.stats())
+            ))
+
+    return 0 if all(results) else 1
+
+
+async def run(count: int) -> int:
+    try:
+        return await main_check(count)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--indexes", type=int, default=20000)
+    sys.exit(asyncio.run(run(parser.parse_args().indexes)))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Sprawdza archiwizację plików do segmentów na bazie z DATABASE_URL.
+
+Tworzy stare wiadomości ze zdjęciami, archiwizuje je do tymczasowego katalogu
+segmentów i sprawdza: usunięcie oryginałów, zmniejszenie rozmiaru, przejście
+do kolejnego segmentu, odczyt przez `FileService.get_file_by_bill` (seek +
+read) oraz odczyt segmentu bez indeksu.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_file_archive.py
+"""
+import asyncio
+import io
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from PIL import Image, ImageDraw
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Bill, ProcessingStatus, TelegramMessage, TelegramMessageType
+from src.files import archive
+from src.files.services import FileService
+from src.user import cache as user_cache
+
+FILES = 12
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def receipt_photo(path: Path, seed: int) -> None:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (2400, 3200), (235, 232, 225))
+    draw = ImageDraw.Draw(image)
+    for line in range(60):
+        y = 120 + line * 48
+        draw.text((200, y), f"POZYCJA {line} {'X' * rng.randint(5, 30)} {rng.randint(1, 99)},99", fill=(30, 30, 30))
+    image.save(path, "JPEG", quality=95)
+
+
+async def main() -> int:
+    await migrate_database()
+    results = []
+    run = uuid.uuid4().hex[:8]
+    photos_dir = FileService.PHOTOS_DIR
+    photos_dir.mkdir(parents=True, exist_ok=True)
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Mały segment, żeby wymusić przejście do kolejnego
+        store = archive.SegmentStore(Path(directory), segment_size=300_000)
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            user = await user_cache.get_or_create_user(session, 987_654_322)
+            bill = Bill(user_id=user.id, bill_date=datetime.utcnow(), status=ProcessingStatus.COMPLETED)
+            session.add(bill)
+            await session.commit()
+
+            paths = []
+            for number in range(FILES):
+                path = photos_dir / f"archive_check_{run}_{number}.jpg"
+                receipt_photo(path, number)
+                paths.append(str(path))
+                session.add(TelegramMessage(
+                    telegram_message_id=random.randint(10**12, 10**13),
+                    chat_id=987_654_322,
+                    message_type=TelegramMessageType.PHOTO,
+                    content="",
+                    file_path=str(path),
+                    user_id=user.external_id,
+                    bill_id=bill.id if number == 0 else None,
+                    created_at=old,
+                ))
+            await session.commit()
+            originals = {path: Path(path).read_bytes() for path in paths}
+
+            stats = await archive.archive_old_files(session, 180, dry_run=True, store=store)
+            results.append(report(
+                "dry run keeps files", stats["archived"] >= FILES and all(Path(p).exists() for p in paths),
+                f"would archive {stats['archived']}"
+            ))
+
+            stats = await archive.archive_old_files(session, 180, store=store)
+            segments = store.segments()
+            results.append(report(
+                "originals moved to segments", not any(Path(p).exists() for p in paths) and len(segments) > 1,
+                f"{stats['archived']} files in {len(segments)} segments, "
+                f"{stats['bytes_before'] // 1024} KB -> {stats['bytes_after'] // 1024} KB"
+            ))
+
+            file_path, file_info = await FileService.get_file_by_bill(session, bill.id)
+            entry = await archive.get_archived_file(session, file_path)
+            start = time.perf_counter()
+            data = await archive.read_archived_file(entry, store)
+            elapsed = time.perf_counter() - start
+            with Image.open(io.BytesIO(data)) as restored:
+                size = restored.size
+            results.append(report(
+                "bill file resolved from archive",
+                file_path == paths[0] and file_info.archived and file_info.file_size == len(data),
+                f"{len(originals[paths[0]]) // 1024} KB -> {len(data) // 1024} KB, {size}, read {elapsed * 1000:.2f} ms"
+            ))
+
+            scanned = [record for segment in segments for record in archive.iter_segment(segment)]
+            ours = {record.file_path for record in scanned}
+            results.append(report("segments readable without index", set(paths) <= ours, f"{len(scanned)} records"))
+
+            again = await archive.archive_old_files(session, 180, store=store)
+            results.append(report("second run is a no-op", again["archived"] == 0))
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Sprawdza podpowiedzi produktów (src/index/autocomplete.py) na bazie z DATABASE_URL.
+
+Dodaje syntetyczne indeksy i sprawdza: normalizację polskich znaków,
+dopasowanie po wyrazie i synonimie, kolejność według użycia, przyrostowe
+naniesienie utworzenia, zmiany nazwy, usunięcia indeksu i przypisań pozycji
+(bez przeładowania), zgodność zapamiętanych list prefiksów z pełnym
+wyszukiwaniem po losowych zmianach, brak zapytań do bazy przy podpowiedziach
+oraz czas odpowiedzi dla prefiksów różnej długości.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_index_autocomplete.py --indexes 20000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import event, insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Bill, BillItem, Index, ProcessingStatus
+from src.index.autocomplete import _entry, index_autocomplete, normalize
+from src.user import cache as user_cache
+
+PRODUCTS = [
+    "mleko", "masło", "śmietana", "ser żółty", "twaróg", "jogurt naturalny", "chleb żytni", "bułka kajzerka",
+    "jabłka", "gruszki", "ziemniaki", "cebula", "pomidory", "ogórki kiszone", "kiełbasa śląska", "szynka",
+    "łosoś wędzony", "pierś z kurczaka", "makaron świderki", "ryż biały", "mąka pszenna", "cukier", "sól",
+    "kawa mielona", "herbata czarna", "sok pomarańczowy", "woda źródlana", "piwo jasne", "czekolada gorzka",
+]
+VARIANTS = ["łaciate", "extra", "bio", "classic", "premium", "light", "domowe", "wiejskie", "świeże", "duże"]
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def names(suggestions) -> list:
+    return [suggestion.entry.name for suggestion in suggestions]
+
+
+async def main_check(count: int) -> int:
+    await migrate_database()
+    results = []
+    run = uuid.uuid4().hex[:6]
+    rng = random.Random(7)
+
+    results.append(report(
+        "normalization", normalize("  Żółć ŁÓDŹ\tŚwięta ") == "zolc lodz swieta", normalize("  Żółć ŁÓDŹ\tŚwięta ")
+    ))
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        rows = [
+            {
+                "name": f"{rng.choice(PRODUCTS)} {rng.choice(VARIANTS)} {number} {run}",
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            }
+            for number in range(count)
+        ]
+        await session.execute(insert(Index), rows)
+        await session.commit()
+
+        start = time.perf_counter()
+        await index_autocomplete.load(session)
+        load_ms = (time.perf_counter() - start) * 1000
+        results.append(report(
+            "full load", len(index_autocomplete) >= count,
+            f"{index_autocomplete.stats()['indexes']} indexes, {index_autocomplete.stats()['terms']} terms in {load_ms:.0f} ms"
+        ))
+        loaded_at = index_autocomplete.loaded_at
+
+        word = index_autocomplete.suggest("zolty extra", limit=5)
+        results.append(report(
+            "match by inner word without diacritics",
+            bool(word) and all("żółty extra" in name for name in names(word)), ", ".join(names(word)[:2])
+        ))
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(1))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            created = await client.post("/api/v1/indexes/", json={
+                "name": f"Mleko UHT {run}", "synonyms": {"pl": ["mleczko", "Mleko karton"], "en": "milk"}
+            })
+            first = created.json()
+            second = (await client.post("/api/v1/indexes/", json={"name": f"Mleko zsiadłe {run}"})).json()
+            statements.clear()
+            response = await client.get("/api/v1/indexes/autocomplete", params={"q": "MLECZ", "limit": 50})
+            results.append(report(
+                "created index and synonym served without reload or query",
+                created.status_code == 201 and any(
+                    item["id"] == first["id"] and item["matched"] == "mleczko" for item in response.json()
+                ) and not statements and index_autocomplete.loaded_at == loaded_at,
+                f"{len(statements)} queries"
+            ))
+
+            user = await user_cache.get_or_create_user(session, rng.randint(10**9, 10**10))
+            bill = Bill(user_id=user.id, bill_date=datetime.utcnow(), status=ProcessingStatus.COMPLETED)
+            session.add(bill)
+            await session.flush()
+            items = [
+                BillItem(bill_id=bill.id, quantity=Decimal(1), unit_price=Decimal("3.49"),
+                         total_price=Decimal("3.49"), index_id=index_id)
+                for index_id in (second["id"], second["id"], second["id"], first["id"])
+            ]
+            session.add_all(items)
+            await session.commit()
+            ranked = (await client.get("/api/v1/indexes/autocomplete", params={"q": "mleko"})).json()
+            own = [item for item in ranked if item["name"].endswith(run) and item["id"] in (first["id"], second["id"])]
+            results.append(report(
+                "ranked by usage", [item["id"] for item in own] == [second["id"], first["id"]]
+                and own[0]["usage_count"] == 3,
+                ", ".join(f"{item['name']} ({item['usage_count']})" for item in own)
+            ))
+
+            items[0].index_id = first["id"]
+            items[1].index_id = first["id"]
+            await session.commit()
+            ranked = (await client.get("/api/v1/indexes/autocomplete", params={"q": "mleko"})).json()
+            own = [item for item in ranked if item["id"] in (first["id"], second["id"])]
+            results.append(report(
+                "reassigned items update usage", [item["usage_count"] for item in own] == [3, 1]
+                and own[0]["id"] == first["id"]
+            ))
+
+            db_index = await session.get(Index, second["id"])
+            db_index.name = f"Kefir {run}"
+            await session.commit()
+            renamed = index_autocomplete.suggest(f"kefir {run}")
+            stale = [s for s in index_autocomplete.suggest(f"mleko zsiadle {run}") if s.entry.id == second["id"]]
+            results.append(report("rename", names(renamed) == [f"Kefir {run}"] and not stale))
+
+            for item in items:
+                await session.delete(item)
+            await session.delete(db_index)
+            await session.commit()
+            results.append(report(
+                "delete", not index_autocomplete.suggest(f"kefir {run}")
+                and index_autocomplete.suggest("mleczko")[0].usage_count == 0
+                and index_autocomplete.loaded_at == loaded_at
+            ))
+
+            statements.clear()
+            start = time.perf_counter()
+            for _ in range(200):
+                await client.get("/api/v1/indexes/autocomplete", params={"q": "ser"})
+            api_ms = (time.perf_counter() - start) / 200 * 1000
+            results.append(report(
+                "API without database", not statements, f"{len(statements)} queries, {api_ms:.2f} ms per request"
+            ))
+
+    # Zapamiętane listy prefiksów po losowych zmianach muszą dawać to samo co pełne wyszukiwanie
+    prefixes = sorted({normalize(name)[:length] for name in PRODUCTS + VARIANTS for length in (0, 1, 2, 3)})
+    for prefix in prefixes:
+        index_autocomplete.suggest(prefix)
+    ids = list(index_autocomplete._entries)
+    for step in range(3000):
+        index_id = rng.choice(ids)
+        if step % 10 == 0:
+            entry = index_autocomplete._entries[index_id]
+            index_autocomplete.upsert(_entry(index_id, f"{rng.choice(PRODUCTS)} {step} {run}", entry.category_id, None))
+        else:
+            index_autocomplete.add_usage(index_id, rng.choice([1, 1, 1, 2, -1]))
+    mismatched = [
+        prefix for prefix in prefixes
+        if [(s.entry.id, s.matched) for s in index_autocomplete.suggest(prefix)]
+        != [(index_id, label) for index_id, label, _ in index_autocomplete._ranked(index_autocomplete._matches(prefix), 10)]
+    ]
+    results.append(report(
+        "cached prefixes consistent after 3000 changes", not mismatched,
+        f"{len(prefixes)} prefixes, {index_autocomplete.stats()['cached_prefixes']} cached"
+        + (f", mismatched: {mismatched[:5]}" if mismatched else "")
+    ))
+
+    # Czas samej podpowiedzi: wpisywanie kolejnych liter nazw (pierwsze przejście wypełnia listy prefiksów)
+    typed = []
+    for _ in range(500):
+        text = normalize(rng.choice(PRODUCTS) + " " + rng.choice(VARIANTS))
+        typed.extend(text[:length] for length in range(1, min(len(text), 8) + 1))
+    for label in ("first pass", "second pass"):
+        timings = {}
+        for prefix in typed:
+            start = time.perf_counter()
+            index_autocomplete.suggest(prefix, limit=10)
+            timings.setdefault(min(len(prefix), 4), []).append((time.perf_counter() - start) * 1000)
+        worst = 0.0
+        for length, values in sorted(timings.items()):
+            values.sort()
+            p99 = values[int(len(values) * 0.99) - 1]
+            worst = max(worst, p99)
+            print(f"   {label}, prefix {length}{'+' if length == 4 else ''} chars: "
+                  f"median {statistics.median(values):.3f} ms, p99 {p99:.3f} ms, max {values[-1]:.3f} ms")
+    results.append(report("keystroke latency", worst < 1.0, f"warm p99 {worst:.3f} ms at {len(index_autocomplete)} indexes"))
+
+    return 0 if all(results) else 1
+
+
+async def run(count: int) -> int:
+    try:
+        return await main_check(count)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--indexes", type=int, default=20000)
+    sys.exit(asyncio.run(run(parser.parse_args().indexes)))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Sprawdza przejmowanie albumów (`services._process_media_group`) na bazie z
+`DATABASE_URL`.
+
+Części albumu przychodzą przez `services.process_webhook`; pobieranie zdjęć,
+Bot API i rozpoznawanie rachunku są podmieniane. Sprawdza: wyjątek po
+przejęciu (np. błąd rozpoznania) zwalnia części do SENT, a kolejne
+przetworzenie kończy się DELIVERED; dwa równoczesne przetworzenia - jeden
+rachunek; nieudane pobieranie - FAILED; przejęcie porzucone przez przerwany
+worker (PROCESSING starsze niż `TELEGRAM_MEDIA_GROUP_CLAIM_TIMEOUT`) wznawia
+`resume_media_groups`, a świeżego przejęcia nie; album, który zawsze kończy
+się wyjątkiem, po `TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS` próbach ma status FAILED,
+nie jest już wznawiany, a użytkownik dostaje jeden komunikat o błędzie.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_media_groups.py
+"""
+import asyncio
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.updates import build_update
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import SyncChange, SyncSequence, TelegramMessage, TelegramMessageKey, TelegramMessageStatus, User
+from src.telegram import services
+from src.telegram.schemas import TelegramWebhook
+
+PARTS = 3
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+class FakeProcessing:
+    """Atrapy pobierania i rozpoznawania; `fail_pages`/`fail_downloads` wywołują błąd."""
+
+    def __init__(self):
+        self.fail_pages = False
+        self.fail_downloads = False
+        self.bills = 0
+        self.errors = 0
+
+    async def send_text_message(self, chat_id: int, text: str) -> bool:
+        if "Wystąpił błąd" in text:
+            self.errors += 1
+        return True
+
+    async def download_photo(self, chat_id: int, file_id: str, name_suffix: str = ""):
+        await asyncio.sleep(0.01)
+        return None if self.fail_downloads else f"uploads/photos/album_check_{file_id}{name_suffix}.jpg"
+
+    async def process_bill_pages(self, chat_id: int, pages) -> int:
+        await asyncio.sleep(0.01)
+        if self.fail_pages:
+            raise RuntimeError("receipt recognition failed")
+        self.bills += 1
+        return self.bills
+
+
+async def main_check() -> int:
+    await migrate_database()
+    fake = FakeProcessing()
+    services.send_text_message = fake.send_text_message
+    services._download_photo = fake.download_photo
+    services._process_bill_pages = fake.process_bill_pages
+    results = []
+    chat_id = random.randint(10**9, 10**10)
+    first_message_id = random.randint(10**9, 10**10)
+
+    async def album() -> str:
+        """Nowy album w bazie (części SENT), bez uruchamiania agregatora."""
+        nonlocal first_message_id
+        media_group_id = uuid.uuid4().hex
+        for number in range(PARTS):
+            update = build_update("photo", 1, first_message_id + number, chat_id, media_group_id=media_group_id)
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                await services.process_webhook(session, TelegramWebhook.model_validate(update))
+        first_message_id += PARTS
+        services.media_group_aggregator._pending.pop((chat_id, media_group_id)).timer.cancel()
+        return media_group_id
+
+    async def statuses(media_group_id: str) -> list:
+        async with engine.connect() as conn:
+            return list((await conn.execute(
+                select(TelegramMessage.status).where(TelegramMessage.media_group_id == media_group_id)
+            )).scalars())
+
+    try:
+        group = await album()
+        fake.fail_pages = True
+        await services._process_media_group(chat_id, group)
+        released = await statuses(group)
+        fake.fail_pages = False
+        await services._process_media_group(chat_id, group)
+        delivered = await statuses(group)
+        results.append(report(
+            "exception after claim releases parts",
+            released == [TelegramMessageStatus.SENT] * PARTS and delivered == [TelegramMessageStatus.DELIVERED] * PARTS
+            and fake.bills == 1,
+            f"{released[0].name} after failure, {delivered[0].name} after retry"
+        ))
+
+        group = await album()
+        await asyncio.gather(*(services._process_media_group(chat_id, group) for _ in range(2)))
+        results.append(report(
+            "concurrent processing claims once",
+            fake.bills == 2 and await statuses(group) == [TelegramMessageStatus.DELIVERED] * PARTS,
+            f"{fake.bills - 1} bill(s)"
+        ))
+
+        group = await album()
+        fake.fail_downloads = True
+        await services._process_media_group(chat_id, group)
+        fake.fail_downloads = False
+        results.append(report(
+            "failed download marks parts failed", await statuses(group) == [TelegramMessageStatus.FAILED] * PARTS
+        ))
+
+        # Worker przerwany po przejęciu: jedno przejęcie porzucone dawno, drugie trwa
+        abandoned, in_progress = await album(), await album()
+        async with AsyncSession(engine) as session:
+            for media_group_id, claimed_at in (
+                (abandoned, datetime.utcnow() - timedelta(hours=1)),
+                (in_progress, datetime.utcnow()),
+            ):
+                await session.execute(
+                    update(TelegramMessage)
+                    .where(TelegramMessage.media_group_id == media_group_id)
+                    .values(status=TelegramMessageStatus.PROCESSING, updated_at=claimed_at)
+                )
+            await session.commit()
+        resumed = await services.resume_media_groups()
+        await services.media_group_aggregator.drain()
+        results.append(report(
+            "abandoned claim resumed, fresh claim left alone",
+            resumed >= 1 and await statuses(abandoned) == [TelegramMessageStatus.DELIVERED] * PARTS
+            and await statuses(in_progress) == [TelegramMessageStatus.PROCESSING] * PARTS,
+            f"{resumed} group(s) resumed"
+        ))
+
+        # Album, który zawsze kończy się wyjątkiem: pierwsza próba przy odbiorze, kolejne przy starcie workera
+        group = await album()
+        fake.fail_pages, fake.errors = True, 0
+        await services._process_media_group(chat_id, group)
+        for _ in range(config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS):
+            async with AsyncSession(engine) as session:
+                await session.execute(
+                    update(TelegramMessage)
+                    .where(TelegramMessage.media_group_id == group)
+                    .values(updated_at=datetime.utcnow() - timedelta(hours=1))
+                )
+                await session.commit()
+            await services.resume_media_groups()
+            await services.media_group_aggregator.drain()
+        fake.fail_pages = False
+        async with engine.connect() as conn:
+            attempts = list((await conn.execute(
+                select(TelegramMessage.attempts).where(TelegramMessage.media_group_id == group)
+            )).scalars())
+        results.append(report(
+            "failing album gives up after max attempts",
+            await statuses(group) == [TelegramMessageStatus.FAILED] * PARTS
+            and attempts == [config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS] * PARTS and fake.errors == 1,
+            f"attempts {attempts[0]}, {fake.errors} error message(s)"
+        ))
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(TelegramMessage).where(TelegramMessage.chat_id == chat_id))
+            await conn.execute(delete(TelegramMessageKey).where(TelegramMessageKey.chat_id == chat_id))
+            await conn.execute(delete(SyncChange).where(
+                SyncChange.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(SyncSequence).where(
+                SyncSequence.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(User).where(User.external_id == chat_id))
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main_check()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
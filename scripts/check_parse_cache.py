@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Sprawdza cache wyników rozpoznania rachunków na bazie z DATABASE_URL.
+
+Sprawdzane są: chybienie i zapis, trafienie bez ponownego rozpoznawania,
+single-flight dla równoczesnych duplikatów, unieważnienie przez zmianę wersji
+parsera, brak zapamiętywania nierozpoznanych rachunków, wywołanie funkcji
+z `RECEIPT_PARSER` (i brak rozpoznawania bez niej) oraz czas odtworzenia
+`Bill`/`BillItem` z zapisanego wyniku.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_parse_cache.py
+"""
+import asyncio
+import hashlib
+import sys
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.bill.services import create_bill_from_parsed
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import BillItem
+from src.processing.parse_cache import ParseResultCache
+from src.processing import receipts
+from src.processing.pages import BillPage
+from src.processing.receipts import ParsedItem, ParsedReceipt
+from src.user import cache as user_cache
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def sample_receipt(items: int = 30) -> ParsedReceipt:
+    return ParsedReceipt(
+        items=[
+            ParsedItem(
+                original_text=f"POZYCJA {number}",
+                quantity=Decimal("1.000"),
+                unit_price=Decimal(f"{number}.99"),
+                total_price=Decimal(f"{number}.99"),
+                confidence_score=0.9,
+            )
+            for number in range(1, items + 1)
+        ],
+        shop_name="Sklep testowy",
+    )
+
+
+def parse_pages(pages) -> ParsedReceipt:
+    """Funkcja rozpoznająca dla `RECEIPT_PARSER` - pozycja na stronę."""
+    return sample_receipt(items=len(pages))
+
+
+def check_receipt_parser() -> bool:
+    pages = [BillPage(number=number, text="PARAGON FISKALNY", source="pdf_text") for number in (1, 2)]
+    configured = config.RECEIPT_PARSER
+    try:
+        config.RECEIPT_PARSER = None
+        receipts.receipt_parser.cache_clear()
+        disabled = receipts.parse_receipt(pages)
+        config.RECEIPT_PARSER = f"{__name__}:parse_pages"
+        receipts.receipt_parser.cache_clear()
+        parsed = receipts.parse_receipt(pages)
+        version = receipts.parser_version()
+    finally:
+        config.RECEIPT_PARSER = configured
+        receipts.receipt_parser.cache_clear()
+    return report(
+        "RECEIPT_PARSER extension point",
+        disabled is None and parsed is not None and len(parsed.items) == 2 and version != receipts.PARSER_VERSION,
+        f"disabled -> {disabled}, configured -> {len(parsed.items) if parsed else None} items, version {version}"
+    )
+
+
+async def main() -> int:
+    await migrate_database()
+    # Losowy klucz - skrypt można uruchamiać wielokrotnie na tej samej bazie
+    content_hash = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+    cache = ParseResultCache(parser_version="check-1")
+    parses = 0
+
+    async def parse():
+        nonlocal parses
+        parses += 1
+        await asyncio.sleep(0.05)
+        return sample_receipt()
+
+    results = []
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        first, first_cached = await cache.get_or_parse(session, content_hash, parse)
+        second, second_cached = await cache.get_or_parse(session, content_hash, parse)
+        results.append(report(
+            "miss then hit", parses == 1 and not first_cached and second_cached and first == second,
+            f"parses={parses}"
+        ))
+
+    # Równoczesne duplikaty (np. przekazana dalej wiadomość) - osobne sesje jak w workerze
+    parses = 0
+    duplicate_hash = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+
+    async def duplicate():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            return await cache.get_or_parse(session, duplicate_hash, parse)
+
+    outcomes = await asyncio.gather(*(duplicate() for _ in range(20)))
+    results.append(report(
+        "single-flight", parses == 1 and all(receipt is not None for receipt, _ in outcomes),
+        f"20 concurrent duplicates -> parses={parses}"
+    ))
+
+    parses = 0
+    bumped = ParseResultCache(parser_version="check-2")
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        _, cached = await bumped.get_or_parse(session, content_hash, parse)
+    results.append(report("parser version bump invalidates", parses == 1 and not cached, f"parses={parses}"))
+
+    unrecognised_hash = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        await cache.get_or_parse(session, unrecognised_hash, lambda: asyncio.sleep(0, result=None))
+        stored = await cache.get(session, unrecognised_hash)
+    results.append(report("unrecognised receipt not cached", stored is None))
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await user_cache.get_or_create_user(session, 987_654_321)
+        await session.commit()
+
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            receipt, cached = await cache.get_or_parse(session, content_hash, parse)
+            bill, _ = await create_bill_from_parsed(session, user.id, receipt)
+            timings.append(time.perf_counter() - start)
+
+        result = await session.execute(select(func.count()).select_from(BillItem).where(BillItem.bill_id == bill.id))
+        item_count = result.scalar_one()
+    results.append(report(
+        "bill rebuilt from cache", cached and item_count == 30 and bill.total_amount == sum(i.total_price for i in receipt.items),
+        f"{item_count} items, best {min(timings) * 1000:.1f} ms per lookup + rebuild"
+    ))
+
+    results.append(check_receipt_parser())
+
+    print(f"   stats: {cache.stats()}")
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Sprawdza partycjonowanie miesięczne (src/db/partitions.py) na bazie
+PostgreSQL z `DATABASE_URL` - na innych bazach nic nie robi.
+
+Po migracji sprawdza: `telegrammessage` i `billitem` są partycjonowane,
+`telegrammessagekey` jest zwykłą tabelą z kluczem (chat_id,
+telegram_message_id), indeks `telegram_message_id` jest nieunikalny jak w
+modelu (autogenerate nie widzi różnicy), ponowiony webhook zapisuje
+wiadomość raz. W wycofywanej transakcji: konwersja tabeli testowej
+(unikalność z kluczem partycjonowania zostaje, bez niego - zwykły indeks),
+powrót `convert_to_plain` (z przywróconą unikalnością), usuwanie starych
+kluczy przy retencji, migracja przy włączonej retencji nie odłącza starych
+partycji, a plik rachunku po odłączeniu wiadomości znajduje się przez
+`Bill.image_url`.
+
+Użycie:
+    DATABASE_URL=postgresql+asyncpg://localhost/check python scripts/check_partitions.py
+"""
+import asyncio
+import random
+import sys
+import uuid
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import sqlalchemy as sa
+from sqlalchemy import delete, func, insert, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.updates import build_update
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import _upgrade, migrate_database
+from src.db.models import (
+    Bill, SyncChange, SyncSequence, TelegramMessage, TelegramMessageKey, TelegramMessageType, User
+)
+from src.db.partitions import (
+    MESSAGE_KEY_TABLE, add_months, apply_retention, convert_to_partitioned, convert_to_plain,
+    create_month_partition, is_partitioned, list_month_partitions, month_start
+)
+from src.files.services import FileService
+from src.telegram import services
+from src.telegram.schemas import TelegramWebhook
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def _fake_send_text_message(chat_id: int, text: str) -> bool:
+    return True
+
+
+def _indexes(conn, table: str) -> dict:
+    return {index["name"]: index for index in sa.inspect(conn).get_indexes(table)}
+
+
+def _schema_checks(conn) -> list:
+    results = []
+    inspector = sa.inspect(conn)
+    results.append(report(
+        "tables partitioned",
+        is_partitioned(conn, "telegrammessage") and is_partitioned(conn, "billitem")
+        and not is_partitioned(conn, MESSAGE_KEY_TABLE)
+    ))
+    key = inspector.get_pk_constraint(MESSAGE_KEY_TABLE)["constrained_columns"]
+    index = _indexes(conn, "telegrammessage").get("ix_telegrammessage_telegram_message_id")
+    column = TelegramMessage.__table__.c.telegram_message_id
+    results.append(report(
+        "message key table and index match the model",
+        key == ["chat_id", "telegram_message_id"] and index is not None
+        and not index["unique"] and not column.unique,
+        f"key {key}, index unique={index and index['unique']}"
+    ))
+    return results
+
+
+def _ddl_checks(conn) -> list:
+    """Konwersja tabeli testowej i retencja kluczy - wycofywane przez wywołującego."""
+    results = []
+    table = f"partition_check_{uuid.uuid4().hex[:8]}"
+    conn.execute(text(
+        f"CREATE TABLE {table} (id SERIAL PRIMARY KEY, created_at TIMESTAMPTZ DEFAULT now(), "
+        f"external_id BIGINT, number BIGINT)"
+    ))
+    conn.execute(text(f"CREATE UNIQUE INDEX ix_{table}_external_id ON {table} (external_id)"))
+    conn.execute(text(f"CREATE UNIQUE INDEX ix_{table}_number_created_at ON {table} (number, created_at)"))
+    conn.execute(text(
+        f"INSERT INTO {table} (created_at, external_id, number) "
+        f"SELECT now() - make_interval(days => n * 20), n, n FROM generate_series(1, 50) AS n"
+    ))
+
+    converted = convert_to_partitioned(conn, table, months_ahead=1)
+    indexes = _indexes(conn, table)
+    rows = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    results.append(report(
+        "conversion keeps rows and unique indexes with the partition key",
+        converted and is_partitioned(conn, table) and rows == 50
+        and not indexes[f"ix_{table}_external_id"]["unique"]
+        and indexes[f"ix_{table}_number_created_at"]["unique"],
+        f"{rows} rows, {len(indexes)} indexes"
+    ))
+    inserted = conn.execute(text(f"INSERT INTO {table} (external_id, number) VALUES (51, 51) RETURNING id")).scalar()
+
+    plain = convert_to_plain(conn, table)
+    results.append(report(
+        "convert_to_plain restores unique indexes",
+        plain and not is_partitioned(conn, table) and inserted == 51
+        and _indexes(conn, table)[f"ix_{table}_external_id"]["unique"]
+    ))
+
+    conn.execute(text(
+        f"INSERT INTO {MESSAGE_KEY_TABLE} (chat_id, telegram_message_id, created_at) "
+        f"VALUES (-1, -1, '2000-01-01 00:00:00+00'), (-1, -2, now())"
+    ))
+    apply_retention(conn, 1, "archive", today=date(2000, 3, 1))
+    left = conn.execute(text(f"SELECT count(*) FROM {MESSAGE_KEY_TABLE} WHERE chat_id = -1")).scalar()
+    results.append(report("retention prunes old message keys", left == 1, f"{left} of 2 left"))
+    return results
+
+
+def _old_bill(conn, month: date, message_file: str, image_url: str) -> int:
+    """Rachunek ze zdjęciem w wiadomości z partycji sprzed `month` miesięcy."""
+    create_month_partition(conn, "telegrammessage", month)
+    external_id = random.randint(10**9, 10**10)
+    now = datetime.utcnow()
+    user_id = conn.execute(insert(User).values(
+        external_id=external_id, is_active=True, created_at=now, updated_at=now
+    ).returning(User.id)).scalar_one()
+    bill_id = conn.execute(insert(Bill).values(
+        user_id=user_id, bill_date=now, image_url=image_url, created_at=now, updated_at=now
+    ).returning(Bill.id)).scalar_one()
+    conn.execute(insert(TelegramMessage).values(
+        telegram_message_id=random.randint(10**9, 10**10), chat_id=external_id, message_type=TelegramMessageType.PHOTO,
+        content="", file_path=message_file, user_id=external_id, bill_id=bill_id,
+        created_at=datetime.combine(month, time(12), tzinfo=timezone.utc), updated_at=now
+    ))
+    return bill_id
+
+
+async def _retention_checks() -> list:
+    """Migracja z włączoną retencją i plik rachunku po odłączeniu wiadomości - wycofywane."""
+    results = []
+    old_month = add_months(month_start(date.today()), -24)
+    run = uuid.uuid4().hex[:8]
+    message_file, bill_file = (Path(f"uploads/photos/partition_check_{run}_{name}.jpg") for name in ("message", "bill"))
+    message_file.parent.mkdir(parents=True, exist_ok=True)
+    for path in (message_file, bill_file):
+        path.write_bytes(b"\xff\xd8\xff\xd9")
+    retention = config.TELEGRAM_MESSAGE_RETENTION_MONTHS
+    async with engine.connect() as conn:
+        try:
+            bill_id = await conn.run_sync(_old_bill, old_month, str(message_file), str(bill_file))
+            config.TELEGRAM_MESSAGE_RETENTION_MONTHS = 1
+            await conn.run_sync(_upgrade)
+            partitions = await conn.run_sync(list_month_partitions, "telegrammessage")
+            results.append(report("migration does not apply retention", old_month in partitions))
+
+            session = AsyncSession(bind=conn)
+            before, _ = await FileService.get_file_by_bill(session, bill_id)
+            await conn.run_sync(apply_retention, 1, "drop")
+            after, info = await FileService.get_file_by_bill(session, bill_id)
+            results.append(report(
+                "bill file found after retention",
+                before == str(message_file) and after == str(bill_file) and info.exists,
+                f"{before} -> {after}"
+            ))
+        finally:
+            config.TELEGRAM_MESSAGE_RETENTION_MONTHS = retention
+            await conn.rollback()
+            for path in (message_file, bill_file):
+                path.unlink(missing_ok=True)
+    return results
+
+
+async def main_check() -> int:
+    if engine.dialect.name != "postgresql":
+        print(f"ℹ️  Partitioning is PostgreSQL-only (database: {engine.dialect.name})")
+        return 0
+
+    await migrate_database()
+    services.send_text_message = _fake_send_text_message
+    results = []
+    async with engine.connect() as conn:
+        results.extend(await conn.run_sync(_schema_checks))
+    async with engine.connect() as conn:
+        # DDL w Postgresie jest transakcyjny - tabela testowa i zmiany retencji znikają
+        try:
+            results.extend(await conn.run_sync(_ddl_checks))
+        finally:
+            await conn.rollback()
+    results.extend(await _retention_checks())
+
+    chat_id = random.randint(10**9, 10**10)
+    message_id = random.randint(10**9, 10**10)
+    update = TelegramWebhook.model_validate(build_update("text", 1, message_id, chat_id))
+    try:
+        for _ in range(2):
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                await services.process_webhook(session, update)
+        async with engine.connect() as conn:
+            stored = (await conn.execute(
+                select(func.count()).select_from(TelegramMessage).where(TelegramMessage.chat_id == chat_id)
+            )).scalar_one()
+        results.append(report("retried webhook stored once", stored == 1, f"{stored} message(s)"))
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(delete(TelegramMessage).where(TelegramMessage.chat_id == chat_id))
+            await conn.execute(delete(TelegramMessageKey).where(TelegramMessageKey.chat_id == chat_id))
+            await conn.execute(delete(SyncChange).where(
+                SyncChange.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(SyncSequence).where(
+                SyncSequence.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(User).where(User.external_id == chat_id))
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main_check()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Sprawdza agregat historii cen na bazie z DATABASE_URL.
+
+Dodaje pozycje rachunków przez serwisy rachunków i porównuje przyrostowo
+utrzymywany agregat z przeliczonym od zera, sprawdza przeniesienie cen po
+zmianie sklepu rachunku, próbkowanie serii i ranking najtańszych sklepów.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_price_history.py
+"""
+import asyncio
+import random
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.bill import services as bill_services
+from src.bill.schemas import BillCreate, BillUpdate
+from src.billitem.schemas import BillItemCreate
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Index, PriceHistory, Shop
+from src.prices.services import get_cheapest_shops, get_price_history, refresh_price_history
+from src.user import cache as user_cache
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def snapshot(session: AsyncSession, index_ids) -> set:
+    result = await session.execute(
+        select(
+            PriceHistory.index_id, PriceHistory.shop_id, PriceHistory.day, PriceHistory.min_price,
+            PriceHistory.max_price, PriceHistory.price_sum, PriceHistory.price_count
+        ).where(PriceHistory.index_id.in_(index_ids))
+    )
+    return {(*row[:3], Decimal(row[3]), Decimal(row[4]), Decimal(row[5]), row[6]) for row in result.all()}
+
+
+async def main() -> int:
+    await migrate_database()
+    rng = random.Random(7)
+    tag = uuid.uuid4().hex[:8]
+    results = []
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await user_cache.get_or_create_user(session, 987_654_323)
+        shops = [Shop(name=f"Sklep cen {tag}-{number}") for number in range(3)]
+        products = [Index(name=f"produkt {tag}-{number}") for number in range(4)]
+        session.add_all(shops + products)
+        await session.commit()
+        index_ids = [product.id for product in products]
+
+        # Sklep 0 najtańszy, sklep 2 najdroższy; kilka rachunków tego samego dnia
+        today = datetime.utcnow().replace(hour=12)
+        bills = []
+        for number in range(60):
+            shop = rng.randrange(3)
+            bill = await bill_services.create_bill(session, BillCreate(
+                user_id=user.id, shop_id=shops[shop].id, bill_date=today - timedelta(days=rng.randrange(120))
+            ))
+            items = [
+                BillItemCreate(
+                    quantity=Decimal("1"),
+                    unit_price=Decimal(rng.randint(100, 300) + shop * 100) / 100,
+                    total_price=Decimal("1"),
+                    index_id=rng.choice(index_ids),
+                )
+                for _ in range(rng.randint(1, 6))
+            ]
+            await bill_services.add_items_to_bill(session, bill, items)
+            bills.append(bill)
+
+        incremental = await snapshot(session, index_ids)
+        await refresh_price_history(session, set(index_ids))
+        await session.commit()
+        rebuilt = await snapshot(session, index_ids)
+        results.append(report("incremental aggregate matches rebuild", incremental == rebuilt, f"{len(rebuilt)} rows"))
+
+        moved = bills[0]
+        new_shop = next(shop for shop in shops if shop.id != moved.shop_id)
+        await bill_services.update_bill(session, moved, BillUpdate(shop_id=new_shop.id))
+        after_move = await snapshot(session, index_ids)
+        await refresh_price_history(session, set(index_ids))
+        await session.commit()
+        results.append(report("shop change moves prices", after_move == await snapshot(session, index_ids)))
+
+        width, series = await get_price_history(
+            session, index_ids[0], date.today() - timedelta(days=119), date.today(), max_points=10
+        )
+        points = max(len(points) for points in series.values())
+        total = sum(point["count"] for points in series.values() for point in points)
+        raw_total = sum(row[6] for row in rebuilt if row[0] == index_ids[0])
+        results.append(report(
+            "downsampled series", width == 12 and points <= 10 and total == raw_total,
+            f"{width}-day buckets, {points} points, {total} items"
+        ))
+
+        cheapest = await get_cheapest_shops(session, index_ids[0], since=date.today() - timedelta(days=120))
+        results.append(report(
+            "cheapest shop", [row["shop_id"] for row in cheapest] == [shop.id for shop in shops],
+            ", ".join(f"{row['shop_name']}: {row['avg_price']}" for row in cheapest)
+        ))
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Sprawdza cache odpowiedzi na obu backendach: w procesie i Redis.
+
+Bez `--redis-url` backend Redis testowany jest na lokalnym zamienniku -
+minimalnym serwerze protokołu RESP (PING/GET/SET/DEL) uruchamianym w skrypcie.
+Sprawdzane są: chybienie i trafienie, single-flight, unieważnienie,
+unieważnienie w trakcie ładowania oraz działanie przy niedostępnym backendzie.
+Na bazie z `DATABASE_URL` sprawdza też, że zmiana użytkownika, sklepu (także
+NIP zapisany przez `learn_tax_id`), indeksu i kategorii unieważnia odpowiedzi
+rachunków, które je zawierają (`GET /bills/{id}`).
+
+Użycie:
+    python scripts/check_response_cache.py [--redis-url redis://localhost:6379/0]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+from src.cache.backends import MemoryBackend, RedisBackend
+from src.cache.responses import ResponseCache
+
+
+class RespStandIn:
+    """Minimalny serwer RESP2 w pamięci - wystarczający dla RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def start(self) -> "RespStandIn":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _execute(self, args) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command == b"GET":
+            entry = self.data.get(args[1])
+            if entry is None or entry[0] <= time.monotonic():
+                self.data.pop(args[1], None)
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(entry[1]), entry[1])
+        if command == b"SET":
+            ttl = float("inf")
+            if len(args) >= 5 and args[3].upper() == b"PX":
+                ttl = int(args[4]) / 1000
+            self.data[args[1]] = (time.monotonic() + ttl, args[2])
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            while (args := await self._read_command(reader)) is not None:
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def check_backend(label: str, backend) -> bool:
+    cache = ResponseCache(backend, ttl=5.0)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b'{"id": 1}'
+
+    results = []
+    first = await cache.get_or_load("bill:1", loader)
+    second = await cache.get_or_load("bill:1", loader)
+    results.append(report(f"{label} miss then hit", first == second == b'{"id": 1}' and calls == 1, f"loader calls={calls}"))
+
+    calls = 0
+    values = await asyncio.gather(*(cache.get_or_load("bill:2", loader) for _ in range(50)))
+    results.append(report(
+        f"{label} single-flight", calls == 1 and all(v == b'{"id": 1}' for v in values),
+        f"50 concurrent misses -> loader calls={calls}, coalesced={cache.stats()['coalesced']}"
+    ))
+
+    calls = 0
+    await cache.invalidate("bill:1")
+    await cache.get_or_load("bill:1", loader)
+    results.append(report(f"{label} invalidation", calls == 1, f"loader calls after invalidate={calls}"))
+
+    # Unieważnienie w trakcie ładowania - stary wynik nie może trafić do cache
+    calls = 0
+    load = asyncio.create_task(cache.get_or_load("bill:3", loader))
+    await asyncio.sleep(0.01)
+    await cache.invalidate("bill:3")
+    await load
+    await cache.get_or_load("bill:3", loader)
+    results.append(report(f"{label} invalidation during load", calls == 2, f"loader calls={calls}"))
+
+    missing = await cache.get_or_load("bill:404", lambda: asyncio.sleep(0, result=None))
+    results.append(report(f"{label} missing resource", missing is None and await backend.get("bill:404") is None))
+
+    print(f"   stats: {cache.stats()}")
+    return all(results)
+
+
+async def check_backend_outage(url: str) -> bool:
+    backend = RedisBackend(url)
+    cache = ResponseCache(backend, ttl=5.0)
+
+    async def loader():
+        return b"{}"
+
+    value = await cache.get_or_load("bill:1", loader)
+    await backend.close()
+    return report("redis outage falls back to loader", value == b"{}" and cache.errors >= 1, f"errors={cache.errors}")
+
+
+async def check_embedded_data() -> bool:
+    import main as app_main
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from src.bill.cache import pending_invalidations
+    from src.db.main import engine
+    from src.db.migrations import migrate_database
+    from src.db.models import BillItem, Category, Index, Shop
+    from src.shop.services import learn_tax_id
+
+    async def rename(model, entity_id: int, name: str) -> None:
+        async with AsyncSession(engine) as session:
+            entity = await session.get(model, entity_id)
+            entity.name = name
+            await session.commit()
+        await asyncio.gather(*pending_invalidations)
+
+    await migrate_database()
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api/v1") as client:
+            run = int(time.time() * 1_000_000)
+            user = (await client.post("/users", json={"external_id": run})).json()
+            shop = (await client.post("/shops", json={"name": f"Sklep {run}"})).json()
+            category = (await client.post("/categories/", json={"name": f"Kategoria {run}"})).json()
+            index = (await client.post("/indexes/", json={"name": f"Indeks {run}", "category_id": category["id"]})).json()
+            bill = (await client.post("/bills/", json={
+                "user_id": user["id"], "shop_id": shop["id"], "bill_date": "2026-10-19T10:00:00"
+            })).json()
+            async with AsyncSession(engine) as session:
+                session.add(BillItem(
+                    bill_id=bill["id"], quantity=1, unit_price="2.50", total_price="2.50", index_id=index["id"]
+                ))
+                await session.commit()
+            url = f"/bills/{bill['id']}"
+
+            before = (await client.get(url)).json()
+            await client.patch(f"/users/{user['id']}", json={"is_active": False})
+            after = (await client.get(url)).json()
+            results.append(report(
+                "user update invalidates cached bills",
+                before["user"]["is_active"] is True and after["user"]["is_active"] is False,
+                f"is_active {before['user']['is_active']} -> {after['user']['is_active']}"
+            ))
+
+            renames = (
+                ("shop", Shop, shop["id"], lambda body: body["shop"]["name"]),
+                ("index", Index, index["id"], lambda body: body["items"][0]["index"]["name"]),
+                ("category", Category, category["id"], lambda body: body["items"][0]["index"]["category"]["name"]),
+            )
+            for label, model, entity_id, read in renames:
+                before = read((await client.get(url)).json())
+                await rename(model, entity_id, f"{before} (renamed)")
+                after = read((await client.get(url)).json())
+                results.append(report(
+                    f"{label} rename invalidates cached bills", after == f"{before} (renamed)", f"{before} -> {after}"
+                ))
+
+            before = (await client.get(url)).json()["shop"]["tax_id"]
+            async with AsyncSession(engine) as session:
+                await learn_tax_id(session, shop["id"], "5260250274")
+                await session.commit()
+            await asyncio.gather(*pending_invalidations)
+            after = (await client.get(url)).json()["shop"]["tax_id"]
+            results.append(report("learned tax id invalidates cached bills", after == "5260250274", f"{before} -> {after}"))
+    finally:
+        await engine.dispose()
+    return all(results)
+
+
+async def main(args: argparse.Namespace) -> int:
+    ok = await check_backend("memory", MemoryBackend(maxsize=100))
+
+    stand_in = None
+    url = args.redis_url
+    if not url:
+        stand_in = await RespStandIn().start()
+        url = stand_in.url
+        print(f"🧪 RESP stand-in listening on {url}")
+
+    backend = RedisBackend(url, prefix="bills:check:")
+    ok = await check_backend("redis", backend) and ok
+    await backend.close()
+
+    if stand_in:
+        await stand_in.stop()
+        ok = await check_backend_outage(url) and ok
+
+    ok = await check_embedded_data() and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response cache checks")
+    parser.add_argument("--redis-url", help="run the Redis backend checks against a real server")
+    sys.exit(asyncio.run(main(parser.parse_args())))
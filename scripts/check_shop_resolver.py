@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Sprawdza rozpoznawanie sklepów (src/shop/resolver.py) na bazie z DATABASE_URL.
+
+Dodaje syntetyczne sklepy i sprawdza: normalizację nazw z formą prawną
+i odczyt NIP, dopasowanie nagłówka po nazwie, literówce OCR i NIP,
+zapamiętanie aliasu i NIP przy tworzeniu rachunku (kolejny nagłówek
+trafia dokładnie), utworzenie nieznanego sklepu, przyrostowe naniesienie
+zmiany nazwy i usunięcia, brak zapytań do bazy przy dopasowaniu oraz czas
+dopasowania. Literówka w numerze sklepu nie jest dopasowywana.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_shop_resolver.py --shops 5000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import event, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from src.bill.services import create_bill_from_parsed
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Shop, ShopAlias
+from src.processing.receipts import ParsedItem, ParsedReceipt
+from src.shop.resolver import extract_tax_id, shop_key, shop_resolver
+from src.user import cache as user_cache
+
+WORDS = [
+    "piekarnia", "market", "delikatesy", "warzywniak", "apteka", "drogeria", "kiosk", "hurtownia",
+    "sklep", "spożywczy", "rybny", "mięsny", "osiedlowy", "centrum", "dom", "ogród", "zoo", "bazar",
+]
+LEGAL = ["", " Sp. z o.o.", " S.A.", " sp.j.", " s.c."]
+WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def tax_id(rng: random.Random) -> str:
+    """Losowy NIP z poprawną sumą kontrolną."""
+    while True:
+        digits = [rng.randint(0, 9) for _ in range(9)]
+        checksum = sum(digit * weight for digit, weight in zip(digits, WEIGHTS)) % 11
+        if checksum < 10:
+            return "".join(map(str, digits)) + str(checksum)
+
+
+def dashed(number: str) -> str:
+    return f"{number[:3]}-{number[3:6]}-{number[6:8]}-{number[8:]}"
+
+
+def receipt(header: str, price: str = "4.99") -> ParsedReceipt:
+    item = ParsedItem(original_text="Chleb", quantity=Decimal(1), unit_price=Decimal(price), total_price=Decimal(price))
+    return ParsedReceipt(items=[item], header=header, bill_date=datetime.utcnow())
+
+
+async def main_check(count: int) -> int:
+    await migrate_database()
+    results = []
+    run = uuid.uuid4().hex[:6]
+    rng = random.Random(11)
+
+    results.append(report(
+        "legal form stripped",
+        shop_key("LIDL Sp. z o.o. sp.k.") == "lidl" and shop_key("Jeronimo Martins Polska S.A.") == "jeronimo martins polska"
+        and shop_key("ŻABKA POLSKA SP. Z O.O.") == "zabka polska",
+        shop_key("LIDL Sp. z o.o. sp.k.")
+    ))
+    results.append(report(
+        "tax id with checksum",
+        extract_tax_id("NIP 781-18-97-358") == "7811897358" and extract_tax_id("NIP: PL 7811897359") is None,
+        str(extract_tax_id("NIP 781-18-97-358"))
+    ))
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        rows = [
+            {
+                "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {number} {run}{rng.choice(LEGAL)}",
+                "address": f"ul. {rng.choice(WORDS).title()} {rng.randint(1, 200)}",
+                "tax_id": tax_id(rng) if number % 2 else None,
+                "created_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            }
+            for number in range(count)
+        ]
+        await session.execute(insert(Shop), rows)
+        chain = Shop(name=f"Lidl {run}", address="ul. Poznańska 48, 62-080 Tarnowo Podgórne")
+        other = Shop(name=f"Biedronka {run}")
+        session.add_all([chain, other])
+        await session.commit()
+
+        start = time.perf_counter()
+        await shop_resolver.load(session)
+        results.append(report(
+            "loaded", len(shop_resolver) >= count + 2,
+            f"{shop_resolver.stats()} in {(time.perf_counter() - start) * 1000:.0f} ms"
+        ))
+        loaded_at = shop_resolver.loaded_at
+
+        chain_tax_id = tax_id(rng)
+        header = (
+            f"LIDL {run.upper()} SP. Z O.O. SP.K.\nul. Poznańska 48\n62-080 Tarnowo Podgórne\n"
+            f"NIP {dashed(chain_tax_id)}\n2026-10-19 nr wydr. 1234\nPARAGON FISKALNY"
+        )
+        match = shop_resolver.resolve(header)
+        results.append(report(
+            "header matched by name", match is not None and match.shop_id == chain.id and match.method == "name"
+            and match.tax_id == chain_tax_id,
+            str(match)
+        ))
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(1))
+        user = await user_cache.get_or_create_user(session, rng.randint(10**9, 10**10))
+
+        # Literówka OCR: dopasowanie przybliżone, zapamiętanie aliasu i NIP
+        typo = f"BlEDR0NKA {run.upper()}\nul. Wiejska 3\nNIP {dashed(tax_id(rng))}"
+        fuzzy = shop_resolver.resolve(typo)
+        bill, _ = await create_bill_from_parsed(session, user.id, receipt(typo))
+        again = shop_resolver.resolve(typo)
+        alias = (await session.execute(select(ShopAlias).where(ShopAlias.shop_id == other.id))).scalars().all()
+        results.append(report(
+            "OCR typo matched, alias and tax id learned",
+            fuzzy is not None and fuzzy.method == "fuzzy" and fuzzy.shop_id == other.id and bill.shop_id == other.id
+            and again is not None and again.method == "tax_id" and [row.alias for row in alias] == [fuzzy.alias]
+            and shop_resolver.shop(other.id).tax_id == fuzzy.tax_id,
+            f"{fuzzy.matched!r} <- {fuzzy.alias!r} ({fuzzy.score}), then {again.method if again else None}"
+        ))
+
+        numbered = shop_resolver.resolve(f"Biedronka {run} 12")
+        results.append(report("different store number not matched", numbered is None, str(numbered)))
+
+        # Inna nazwa z tym samym NIP
+        renamed_header = f"Sklep Biedronka nr 7\nNIP {dashed(fuzzy.tax_id)}"
+        by_tax_id = shop_resolver.resolve(renamed_header)
+        results.append(report(
+            "matched by tax id", by_tax_id is not None and by_tax_id.shop_id == other.id and by_tax_id.method == "tax_id"
+            and by_tax_id.alias == "sklep biedronka nr 7"
+        ))
+
+        statements.clear()
+        bill, _ = await create_bill_from_parsed(session, user.id, receipt(header, "5.49"))
+        shop_statements = len(statements)
+        statements.clear()
+        bill, _ = await create_bill_from_parsed(session, user.id, receipt(header, "6.49"))
+        results.append(report(
+            "known shop resolved without shop queries",
+            bill.shop_id == chain.id and len(statements) == shop_statements - 1,
+            f"{shop_statements} statements with tax id update, {len(statements)} after"
+        ))
+
+        unknown_tax_id = tax_id(rng)
+        unknown = f"Warzywniak u Kasi {run}\nul. Polna 1\nNIP {unknown_tax_id}"
+        bill, _ = await create_bill_from_parsed(session, user.id, receipt(unknown))
+        created = await session.get(Shop, bill.shop_id)
+        match = shop_resolver.resolve(f"WARZYWNIAK U KASI {run.upper()} S.C.")
+        results.append(report(
+            "unknown shop created and resolvable without reload",
+            created.name == f"Warzywniak u Kasi {run}" and created.tax_id == unknown_tax_id
+            and match is not None and match.shop_id == created.id and shop_resolver.loaded_at == loaded_at
+        ))
+
+        florist = Shop(name=f"Kwiaciarnia Róża {run}", tax_id=tax_id(rng))
+        session.add(florist)
+        await session.commit()
+        florist.name = f"Kwiaciarnia Tulipan {run}"
+        await session.commit()
+        renamed = shop_resolver.resolve(f"KWIACIARNIA TULIPAN {run.upper()}")
+        await session.delete(florist)
+        await session.commit()
+        gone = shop_resolver.resolve(f"Kwiaciarnia Tulipan {run}\nNIP {florist.tax_id}")
+        results.append(report(
+            "rename and delete applied incrementally",
+            renamed is not None and renamed.shop_id == florist.id and renamed.method == "name"
+            and gone is None and shop_resolver.loaded_at == loaded_at
+        ))
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statements.clear()
+            response = await client.post("/api/v1/shops/resolve", json={"text": header})
+            results.append(report(
+                "API without database",
+                response.status_code == 200 and response.json()["shop_id"] == chain.id and not statements,
+                f"{response.json()}, {len(statements)} queries"
+            ))
+
+    # Czas dopasowania: nagłówki istniejących sklepów - dokładne, z literówką i nieznane
+    names = [row["name"] for row in rng.sample(rows, 300)]
+
+    def typo_of(name: str) -> str:
+        position = rng.randrange(len(name))
+        return name[:position] + rng.choice("xyzq") + name[position + 1:]
+
+    for label, texts in (
+        ("exact", [f"{name.upper()}\nul. Prosta 1\n00-001 Warszawa" for name in names]),
+        ("typo", [typo_of(name) for name in names]),
+        ("unknown", [f"Nieznany sklep {number}\nul. Krzywa 2" for number in range(300)]),
+    ):
+        timings = []
+        found = 0
+        for text in texts:
+            start = time.perf_counter()
+            match = shop_resolver.resolve(text)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += match is not None
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        results.append(report(
+            f"{label} headers", p99 < 5 and (found == len(texts) if label == "exact" else True)
+            and (found == 0 if label == "unknown" else True),
+            f"{found}/{len(texts)} matched, median {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms"
+        ))
+
+    return 0 if all(results) else 1
+
+
+async def run(count: int) -> int:
+    try:
+        return await main_check(count)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shops", type=int, default=5000)
+    sys.exit(asyncio.run(run(parser.parse_args().shops)))
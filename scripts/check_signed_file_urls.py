@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Sprawdza podpisane adresy plików na bazie z DATABASE_URL.
+
+Wydaje adres przez `POST /api/v1/files/access` i sprawdza: pobranie pliku
+bez zapytań do bazy, odrzucenie zmienionego podpisu, ścieżki i wygasłego
+adresu, odmowę dla innego użytkownika, nagłówki X-Accel-Redirect/X-Sendfile,
+wysyłkę przez `zerocopysend`, plik z segmentu archiwum (i odrzucenie rekordu
+spoza segmentu), odmowę dostępu do samych segmentów przez
+`GET /api/v1/files/...` oraz 503 bez `FILE_URL_SECRET` lub z kluczem domyślnym.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_signed_file_urls.py
+"""
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import ArchivedFile, Bill, ProcessingStatus, TelegramMessage, TelegramMessageType
+from src.files import archive
+from src.files.services import FileService
+from src.files.signed_urls import (
+    PLACEHOLDER_SECRETS, ZEROCOPY_EXTENSION, FileRangeResponse, archive_location_valid, sign_file_url
+)
+from src.user import cache as user_cache
+
+REQUESTS = 200
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def main_check() -> int:
+    await migrate_database()
+    results = []
+    config.FILE_URL_SECRET = config.FILE_URL_SECRET or os.urandom(32).hex()
+    run = uuid.uuid4().hex[:8]
+    FileService.PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
+    photo = FileService.PHOTOS_DIR / f"signed_check_{run}.jpg"
+    photo.write_bytes(os.urandom(300_000))
+    chat_id = random.randint(10**9, 10**10)
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            user = await user_cache.get_or_create_user(session, chat_id)
+            bill = Bill(user_id=user.id, bill_date=datetime.utcnow(), status=ProcessingStatus.COMPLETED)
+            session.add(bill)
+            await session.commit()
+            session.add(TelegramMessage(
+                telegram_message_id=random.randint(10**12, 10**13),
+                chat_id=chat_id,
+                message_type=TelegramMessageType.PHOTO,
+                content="",
+                file_path=str(photo),
+                user_id=user.external_id,
+                bill_id=bill.id,
+            ))
+            await session.commit()
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/v1/files/access", json={
+                "file_path": "", "bill_id": bill.id, "user_id": chat_id, "expires_in": 60
+            })
+            access = response.json()
+            url = access["file_url"]
+            results.append(report("access granted", response.status_code == 200 and access["access_granted"], url))
+
+            denied = await client.post("/api/v1/files/access", json={"file_path": "", "bill_id": bill.id, "user_id": chat_id + 1})
+            results.append(report("other user denied", denied.status_code == 403 and not denied.json()["access_granted"]))
+
+            statements.clear()
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = await client.get(url)
+            elapsed = (time.perf_counter() - start) / REQUESTS * 1000
+            results.append(report(
+                "signed download without database",
+                response.status_code == 200 and response.content == photo.read_bytes() and not statements,
+                f"{len(statements)} queries for {REQUESTS} downloads, {elapsed:.2f} ms each"
+            ))
+
+            tampered = url.replace("signature=", "signature=A")
+            other_path = url.replace(photo.name, "other.jpg")
+            expired_url, _ = sign_file_url("/api/v1/files/signed", str(photo), ttl=-10)
+            codes = [(await client.get(candidate)).status_code for candidate in (tampered, other_path, expired_url)]
+            results.append(report("tampered and expired rejected", codes == [403, 403, 410], str(codes)))
+
+            secret, disabled = config.FILE_URL_SECRET, []
+            for candidate in (None, *PLACEHOLDER_SECRETS):
+                config.FILE_URL_SECRET = candidate
+                disabled.append((await client.get(url)).status_code)
+                disabled.append((await client.post("/api/v1/files/access", json={
+                    "file_path": "", "bill_id": bill.id, "user_id": chat_id
+                })).status_code)
+            config.FILE_URL_SECRET = secret
+            results.append(report("disabled without own secret", set(disabled) == {503}, str(disabled)))
+
+            config.FILE_SERVE_OFFLOAD = "x-accel"
+            accel = await client.get(url)
+            config.FILE_SERVE_OFFLOAD = "x-sendfile"
+            sendfile = await client.get(url)
+            config.FILE_SERVE_OFFLOAD = "none"
+            results.append(report(
+                "offload headers",
+                accel.headers.get("x-accel-redirect") == f"/protected-uploads/photos/{photo.name}" and not accel.content
+                and sendfile.headers.get("x-sendfile") == str(photo.resolve()) and not sendfile.content,
+                f"{accel.headers.get('x-accel-redirect')}, {sendfile.headers.get('x-sendfile')}"
+            ))
+
+            # Segment archiwum (pliki wielu użytkowników) nie jest dostępny przez /files
+            FileService.ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+            segment = FileService.ARCHIVE_DIR / f"segment_check_{run}.pack"
+            segment.write_bytes(os.urandom(1000))
+            try:
+                blocked = [
+                    (await client.get(f"/api/v1/files/{prefix}{candidate}")).status_code
+                    for prefix in ("", "info/")
+                    for candidate in (segment.as_posix(), f"uploads/photos/../archive/{segment.name}")
+                ]
+                plain = (await client.get(f"/api/v1/files/{photo.as_posix()}")).status_code
+            finally:
+                segment.unlink()
+            results.append(report(
+                "archive segments not served", blocked == [403] * 4 and plain == 200, f"{blocked}, photo {plain}"
+            ))
+
+            with tempfile.TemporaryDirectory() as directory:
+                store = archive.SegmentStore(Path(directory), segment_size=10_000_000)
+                store.append([archive.PackedFile("uploads/photos/padding.jpg", os.urandom(1234), "image/jpeg", 1234)])
+                data = os.urandom(50_000)
+                record, = store.append([archive.PackedFile(f"uploads/photos/archived_{run}.jpg", data, "image/jpeg", len(data))])
+                entry = ArchivedFile(
+                    file_path=record.file_path, segment=record.segment, offset=record.offset, length=record.length,
+                    original_size=len(data), media_type="image/jpeg", sha256=hashlib.sha256(data).hexdigest()
+                )
+                archived_url, _ = sign_file_url("/api/v1/files/signed", entry.file_path, archived=entry)
+                default_directory, archive.archive_store.directory = archive.archive_store.directory, Path(directory)
+                try:
+                    response = await client.get(archived_url)
+                    outside = [
+                        archive_location_valid(ArchivedFile(**{**entry.model_dump(), **change}))
+                        for change in ({"length": entry.length + 1}, {"offset": -1}, {"segment": f"../{entry.segment}"})
+                    ]
+                    bounds = archive_location_valid(entry) and not any(outside)
+                finally:
+                    archive.archive_store.directory = default_directory
+                results.append(report(
+                    "archived file from segment", response.status_code == 200 and response.content == data
+                    and response.headers["content-type"] == "image/jpeg"
+                ))
+                results.append(report("archive location checked against segment", bounds, str(outside)))
+
+        sent = []
+
+        async def send(message: dict) -> None:
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "extensions": {ZEROCOPY_EXTENSION: {}}}
+        await FileRangeResponse(photo, offset=100, length=5000, media_type="image/jpeg")(scope, None, send)
+        results.append(report(
+            "zerocopysend used when supported",
+            sent[-1]["type"] == ZEROCOPY_EXTENSION and sent[-1]["offset"] == 100 and sent[-1]["count"] == 5000
+        ))
+    finally:
+        photo.unlink(missing_ok=True)
+
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main_check()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Sprawdza magazyn plików (src/files/storage.py) na bazie z DATABASE_URL.
+
+Uruchamia lokalny, fałszywy serwer S3 (`benchmarks.fake_s3`) w osobnym
+procesie i sprawdza: zapis multipart i jednym PUT, pamięć przy zapisie
+i odczycie dużego pliku, przerwany zapis (abort), odczyt zakresu, pobieranie
+z Telegrama przez `download_file`, endpointy plików z odpowiedzią 206 oraz
+przekierowanie podpisanego adresu na adres S3. Na koniec to samo API na
+magazynie lokalnym.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_storage.py
+"""
+import asyncio
+import hashlib
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from benchmarks import fake_s3
+from benchmarks.fake_bot_api import FakeBotApiServer
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import TelegramMessage, TelegramMessageType
+from src.files.storage import LocalStorage, S3Storage, set_storage, storage_key
+from src.telegram.services import download_file
+from src.user import cache as user_cache
+
+S3_PORT = 8767
+BOT_API_PORT = 8768
+LARGE_FILE = 48 * 1024 * 1024
+PART_SIZE = 8 * 1024 * 1024
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def generated(size: int, seed: int, fail_after: int = 0):
+    """Porcje pseudolosowych danych bez trzymania całości w pamięci."""
+    rng = random.Random(seed)
+    sent = 0
+    while sent < size:
+        chunk = rng.randbytes(min(256 * 1024, size - sent))
+        sent += len(chunk)
+        if fail_after and sent > fail_after:
+            raise ConnectionError("client went away")
+        yield chunk
+
+
+def generated_sha256(size: int, seed: int) -> str:
+    rng = random.Random(seed)
+    digest = hashlib.sha256()
+    sent = 0
+    while sent < size:
+        chunk = rng.randbytes(min(256 * 1024, size - sent))
+        sent += len(chunk)
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def start_fake_s3() -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_s3", "--port", str(S3_PORT)],
+        cwd=project_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", S3_PORT), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake S3 server did not start")
+
+
+async def check_s3(storage: S3Storage, results: list) -> None:
+    async def calls() -> dict:
+        return (await storage.client.get(f"{storage.endpoint_url}/_calls")).json()
+
+    run = uuid.uuid4().hex[:8]
+    key = f"photos/large_{run}.bin"
+    tracemalloc.start()
+    size = await storage.save_stream(key, generated(LARGE_FILE, 1))
+    _, upload_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    digest = hashlib.sha256()
+    async for chunk in storage.iter_range(key):
+        digest.update(chunk)
+    _, download_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    counted = await calls()
+    # Pamięć przy zapisie zależy od rozmiaru części, nie pliku: bufor, wysyłana część i kopia w h11
+    results.append(report(
+        "multipart upload and streamed read",
+        size == LARGE_FILE and digest.hexdigest() == generated_sha256(LARGE_FILE, 1)
+        and counted.get("upload_part") == LARGE_FILE // PART_SIZE and upload_peak < 4 * PART_SIZE
+        and download_peak < PART_SIZE,
+        f"{LARGE_FILE // 2**20} MB in {counted.get('upload_part')} parts, "
+        f"peak memory upload {upload_peak / 2**20:.1f} MB, download {download_peak / 2**20:.1f} MB"
+    ))
+
+    small = os.urandom(200_000)
+
+    async def one_chunk():
+        yield small
+
+    await storage.save_stream(f"photos/small_{run}.jpg", one_chunk())
+    stored = await storage.stat(f"photos/small_{run}.jpg")
+    ranged = b"".join([chunk async for chunk in storage.iter_range(f"photos/small_{run}.jpg", 1000, 1100)])
+    results.append(report(
+        "single PUT, stat and ranged read",
+        stored.size == len(small) and ranged == small[1000:1100] and (await calls()).get("put") == 1
+    ))
+
+    aborted_key = f"photos/aborted_{run}.bin"
+    try:
+        await storage.save_stream(aborted_key, generated(3 * PART_SIZE, 2, fail_after=2 * PART_SIZE))
+    except ConnectionError:
+        pass
+    results.append(report(
+        "interrupted upload aborted",
+        await storage.stat(aborted_key) is None and (await calls()).get("abort_multipart") == 1
+    ))
+
+    await storage.delete(f"photos/small_{run}.jpg")
+    results.append(report("delete", await storage.stat(f"photos/small_{run}.jpg") is None))
+
+
+async def check_app(storage, results: list, label: str, bot_api: FakeBotApiServer) -> None:
+    """Pobranie z Telegrama do magazynu i endpointy plików dla danego magazynu."""
+    set_storage(storage)
+    run = uuid.uuid4().hex[:8]
+    chat_id = random.randint(10**9, 10**10)
+    local_path = f"uploads/photos/storage_check_{run}.jpg"
+
+    ok = await download_file(f"photos/{run}.jpg", local_path)
+    stored = await storage.stat(storage_key(local_path))
+    await storage.discard_working_copy(local_path)
+    working_copy_left = Path(local_path).exists()
+    results.append(report(
+        f"{label}: download_file stores file",
+        ok and stored is not None and stored.size == bot_api.file_size(f"photos/{run}.jpg")
+        and working_copy_left == storage.is_local
+    ))
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await user_cache.get_or_create_user(session, chat_id)
+        message = TelegramMessage(
+            telegram_message_id=random.randint(10**12, 10**13),
+            chat_id=chat_id,
+            message_type=TelegramMessageType.PHOTO,
+            content="",
+            file_path=local_path,
+            user_id=user.external_id,
+            created_at=datetime.utcnow(),
+        )
+        session.add(message)
+        await session.commit()
+
+    data = await storage.read_bytes(storage_key(local_path))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        full = await client.get(f"/api/v1/files/telegram/{message.id}/file")
+        partial = await client.get(f"/api/v1/files/telegram/{message.id}/file", headers={"Range": "bytes=100-199"})
+        results.append(report(
+            f"{label}: file endpoint with Range",
+            full.status_code == 200 and full.content == data
+            and partial.status_code == 206 and partial.content == data[100:200],
+            partial.headers.get("content-range", "")
+        ))
+
+        access = (await client.post("/api/v1/files/access", json={"file_path": "", "message_id": message.id})).json()
+        signed = await client.get(access["file_url"])
+        if signed.status_code == 307:
+            async with httpx.AsyncClient() as direct:
+                fetched = await direct.get(signed.headers["location"])
+            ok = fetched.status_code == 200 and fetched.content == data
+            detail = "redirect to presigned S3 URL"
+        else:
+            ok = signed.status_code == 200 and signed.content == data
+            detail = "served by worker"
+        results.append(report(f"{label}: signed URL", ok, detail))
+
+    await storage.delete(storage_key(local_path))
+
+
+async def main_check() -> int:
+    await migrate_database()
+    results = []
+    bot_api = FakeBotApiServer(port=BOT_API_PORT).start()
+    config.TELEGRAM_API_URL = bot_api.url
+    config.TELEGRAM_BOT_TOKEN = "123456:storage-check"
+    config.FILE_URL_SECRET = config.FILE_URL_SECRET or os.urandom(32).hex()
+    process = start_fake_s3()
+    storage = S3Storage(
+        f"http://127.0.0.1:{S3_PORT}", fake_s3.BUCKET, fake_s3.ACCESS_KEY, fake_s3.SECRET_KEY, part_size=PART_SIZE
+    )
+    try:
+        await check_s3(storage, results)
+        await check_app(storage, results, "s3", bot_api)
+        await check_app(LocalStorage(), results, "local", bot_api)
+    finally:
+        set_storage(None)
+        await storage.close()
+        process.terminate()
+        process.wait(timeout=10)
+        bot_api.stop()
+    return 0 if all(results) else 1
+
+
+async def run() -> int:
+    try:
+        return await main_check()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Sprawdza synchronizację przyrostową (GET /api/v1/users/{user_id}/changes)
+na bazie z `DATABASE_URL`.
+
+Tworzy użytkownika, rachunki z pozycjami i wiadomości, a następnie sprawdza:
+pierwsze wywołanie z `reset`, zmiany widoczne od razu po commit, jeden wpis
+na obiekt zmieniony kilka razy, tombstone po usunięciu rachunku (także jego
+pozycji), zmiany wiadomości zapisane z pominięciem ORM, brak wpisów po
+wycofanej transakcji, stronicowanie bez luk i powtórzeń, transakcję
+zatwierdzoną po równoległej (kursor jej nie przeskakuje), 400/410 dla
+złego/wygasłego kursora, plan zapytania (zakres indeksu przy dzienniku innych
+użytkowników) i koszt pustego odpytania.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_sync_changes.py --changes 200000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import event, insert, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import main
+from benchmarks.updates import build_update
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import Bill, BillItem, SyncChange, TelegramMessage
+from src.sync.changes import record_message_changes
+from src.sync.services import encode_sync_cursor
+from src.telegram import services as telegram_services
+from src.telegram.schemas import TelegramWebhook
+from src.user.cache import get_or_create_user
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+async def _fake_send_text_message(chat_id: int, text: str) -> bool:
+    return True
+
+
+def item(price: str) -> dict:
+    return {
+        "quantity": Decimal(1), "unit_price": Decimal(price), "total_price": Decimal(price),
+        "original_text": f"Produkt {price}",
+    }
+
+
+async def main_check(count: int) -> int:
+    await migrate_database()
+    telegram_services.send_text_message = _fake_send_text_message
+    results = []
+    rng = random.Random()
+    chat_id = rng.randint(10**9, 10**10)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        user = await get_or_create_user(session, chat_id)
+        await session.commit()
+
+        # Dziennik innych użytkowników - strona ma być zakresem indeksu, nie skanem
+        now = datetime.utcnow() - timedelta(minutes=5)
+        for start in range(0, count, 50_000):
+            await session.execute(insert(SyncChange), [
+                {"user_id": -rng.randint(1, 10**9), "seq": number, "entity": "bill", "entity_id": number,
+                 "deleted": False, "changed_at": now}
+                for number in range(start, min(start + 50_000, count))
+            ])
+        await session.commit()
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2:4]))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test/api/v1") as client:
+        async def changes(cursor=None, limit=None) -> dict:
+            params = {key: value for key, value in (("cursor", cursor), ("limit", limit)) if value is not None}
+            response = await client.get(f"/users/{user.id}/changes", params=params)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        first = await changes()
+        results.append(report("initial call requests reset", first["reset"] and not first["bills"]))
+        cursor = first["cursor"]
+
+        bill = (await client.post("/bills/", json={"user_id": user.id, "bill_date": "2026-10-19T10:00:00"})).json()
+        async with AsyncSession(engine) as session:
+            session.add_all(BillItem(bill_id=bill["id"], **item(price)) for price in ("1.99", "2.49", "3.00"))
+            await session.commit()
+        page = await changes(cursor)
+        results.append(report(
+            "new bill and items right after commit",
+            [b["id"] for b in page["bills"]] == [bill["id"]] and len(page["items"]) == 3
+            and all(i["bill_id"] == bill["id"] for i in page["items"]) and not page["deleted"],
+            f"{len(page['bills'])} bills + {len(page['items'])} items"
+        ))
+        cursor = page["cursor"]
+
+        for status in ("processing", "completed"):
+            await client.patch(f"/bills/{bill['id']}", json={"status": status})
+        page = await changes(cursor)
+        results.append(report(
+            "several updates coalesced",
+            len(page["bills"]) == 1 and page["bills"][0]["status"] == "completed" and not page["items"],
+            f"{len(page['bills'])} bills"
+        ))
+        cursor = page["cursor"]
+
+        # Wiadomości: zapis przez ORM i UPDATE z pominięciem ORM
+        webhook = TelegramWebhook.model_validate(build_update("text", 1, int(time.time() * 1000), chat_id))
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await telegram_services.process_webhook(session, webhook)
+        page = await changes(cursor)
+        message_ids = [message["id"] for message in page["messages"]]
+        cursor = page["cursor"]
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            await session.execute(
+                update(TelegramMessage).where(TelegramMessage.id.in_(message_ids)).values(file_path="photos/x.jpg")
+            )
+            await record_message_changes(session, chat_id, message_ids)
+            await session.commit()
+        core = await changes(cursor)
+        results.append(report(
+            "messages via ORM and bulk UPDATE",
+            len(message_ids) == 1 and [message["id"] for message in core["messages"]] == message_ids,
+            str(page["messages"][0]["content"] if page["messages"] else None)
+        ))
+        cursor = core["cursor"]
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            session.add(Bill(user_id=user.id, bill_date=datetime.utcnow()))
+            await session.flush()
+            await session.rollback()
+            db_bill = await session.get(Bill, bill["id"])
+            await session.delete(db_bill)
+            await session.commit()
+        page = await changes(cursor)
+        deleted = {(tombstone["entity"], tombstone["id"]) for tombstone in page["deleted"]}
+        results.append(report(
+            "tombstones for bill and items, nothing from rollback",
+            not page["bills"] and ("bill", bill["id"]) in deleted and len(deleted) == 4,
+            str(sorted(deleted))
+        ))
+        cursor = page["cursor"]
+
+        # Stronicowanie: 25 rachunków, strony po 10 wpisów
+        created = set()
+        for number in range(25):
+            response = await client.post("/bills/", json={"user_id": user.id, "bill_date": f"2026-09-{number % 28 + 1:02d}T12:00:00"})
+            created.add(response.json()["id"])
+        seen = []
+        pages = 0
+        while True:
+            page = await changes(cursor, limit=10)
+            pages += 1
+            seen.extend(b["id"] for b in page["bills"])
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                break
+        results.append(report(
+            "pagination without gaps or repeats", sorted(seen) == sorted(created) and pages == 3,
+            f"{len(seen)} bills in {pages} pages"
+        ))
+
+        # Transakcja zapisana wcześniej, zatwierdzona po równoległej: odpytanie w trakcie
+        # nie może przesunąć kursora za jej zmianę
+        slow_id, fast_id = sorted(created)[:2]
+        async with AsyncSession(engine) as slow:
+            (await slow.get(Bill, slow_id)).error_message = "slow"
+            await slow.flush()
+
+            async def fast() -> None:
+                async with AsyncSession(engine) as session:
+                    (await session.get(Bill, fast_id)).error_message = "fast"
+                    await session.commit()
+
+            fast_task = asyncio.create_task(fast())
+            await asyncio.sleep(0.3)
+            during = await changes(cursor)
+            await slow.commit()
+        await fast_task
+        after = await changes(during["cursor"])
+        results.append(report(
+            "late commit not skipped",
+            not during["bills"] and sorted(b["id"] for b in after["bills"]) == [slow_id, fast_id],
+            f"{len(during['bills'])} bills during, {len(after['bills'])} after"
+        ))
+        cursor = after["cursor"]
+
+        invalid = await client.get(f"/users/{user.id}/changes", params={"cursor": "zzz"})
+        expired = await client.get(f"/users/{user.id}/changes", params={
+            "cursor": encode_sync_cursor(datetime.utcnow() - timedelta(days=config.SYNC_CHANGE_RETENTION_DAYS + 1), 1)
+        })
+        results.append(report(
+            "invalid and expired cursors", invalid.status_code == 400 and expired.status_code == 410,
+            f"{invalid.status_code}, {expired.status_code}"
+        ))
+
+        # Koszt pustego odpytania
+        timings = []
+        for _ in range(200):
+            statements.clear()
+            start = time.perf_counter()
+            page = await changes(cursor)
+            timings.append((time.perf_counter() - start) * 1000)
+        feed_statements = list(statements)
+        async with engine.connect() as connection:
+            statement, parameters = feed_statements[-1]
+            plan = " ".join(str(row[-1]) for row in (await connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, parameters
+            )).all()) if engine.dialect.name == "sqlite" else "n/a"
+        timings.sort()
+        results.append(report(
+            "empty poll is one index range query",
+            len(feed_statements) == 1 and not page["bills"] and ("ix_syncchange_user_id_seq" in plan or plan == "n/a"),
+            f"median {statistics.median(timings):.2f} ms, p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms "
+            f"with {count} changes of other users; plan: {plan}"
+        ))
+
+    return 0 if all(results) else 1
+
+
+async def run(count: int) -> int:
+    try:
+        return await main_check(count)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, default=200_000)
+    sys.exit(asyncio.run(run(parser.parse_args().changes)))
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Sprawdza dziennik aktualizacji (src/telegram/update_log.py) i odtwarzanie.
+
+Zapisuje syntetyczne aktualizacje do małych segmentów w katalogu
+tymczasowym i sprawdza: koszt `append` w webhooku i stopień kompresji,
+odczyt tych samych ciał w tej samej kolejności, wybór bloków z indeksu dla
+zakresu `update_id` i czasu, odczyt po przerwanym zapisie i bez pliku
+`.idx`, scalenie segmentów dwóch workerów, zapis ciała przez webhook
+(także niepoprawnego), brak dostępu do segmentów przez `/files`,
+odtworzenie przez `services.process_webhook` na bazie z `DATABASE_URL`
+(z fałszywym Bot API; ten sam zakres odtworzony dwa razy nie tworzy
+duplikatów wiadomości, a z przesuniętymi id - tworzy je raz) i dokładność
+tempa `--rate`.
+
+Użycie:
+    DATABASE_URL=sqlite+aiosqlite:///./check.db python scripts/check_update_log.py --updates 20000
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from sqlalchemy import func
+from sqlmodel import select
+
+from benchmarks.fake_bot_api import FakeBotApiServer
+from benchmarks.updates import build_update
+from scripts.replay_updates import process_in_process, shifted
+from src.config import config
+from src.db.main import engine
+from src.db.migrations import migrate_database
+from src.db.models import TelegramMessage
+from src.processing.pool import shutdown_pool
+from src.telegram import services
+from src.telegram.update_log import (
+    BLOCK_HEADER, UpdateLog, iter_updates, read_index, replay, segments, select_blocks, update_log
+)
+
+BOT_API_PORT = 8767
+START = 1_790_000_000.0  # Czas odbioru pierwszej syntetycznej aktualizacji (s)
+
+
+def report(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def synthetic(count: int, rng: random.Random, first_id: int = 500_000):
+    """(update_id, czas odbioru, ciało) - co 10 ms, typy jak w ruchu produkcyjnym."""
+    for number in range(count):
+        kind = rng.choices(["text", "photo", "document", "edited"], weights=[6, 3, 1, 1])[0]
+        update = build_update(kind, first_id + number, number + 1, rng.randint(10**8, 10**9), rng=rng)
+        yield first_id + number, START + number / 100, json.dumps(update).encode()
+
+
+async def write_log(directory: Path, records, **options) -> tuple:
+    log = UpdateLog(directory, **{
+        "segment_size": 256 * 1024, "flush_interval": 0.05, "flush_bytes": 64 * 1024, "max_buffer": 8 * 1024 * 1024,
+        **options,
+    })
+    timings = []
+    for number, (update_id, received_at, body) in enumerate(records):
+        start = time.perf_counter()
+        log.append(body, update_id, received_at)
+        timings.append((time.perf_counter() - start) * 1_000_000)
+        if number % 100 == 0:
+            # Webhooki przychodzą partiami - pętla oddaje sterowanie zadaniu zapisu
+            await asyncio.sleep(0.002)
+    await log.close()
+    return log, timings
+
+
+def truncated_copy(source: Path, target: Path, cut: int) -> Path:
+    """Kopia segmentu (bez .idx) z ostatnim blokiem uciętym o `cut` bajtów."""
+    target.mkdir()
+    copy = target / source.name
+    data = source.read_bytes()
+    copy.write_bytes(data[:len(data) - cut])
+    return copy
+
+
+async def main_check(count: int) -> int:
+    results = []
+    rng = random.Random(7)
+    workdir = Path(tempfile.mkdtemp(prefix="update_log_"))
+    try:
+        records = list(synthetic(count, rng))
+        directory = workdir / "single"
+        log, timings = await write_log(directory, records)
+        raw = sum(len(body) for _, _, body in records)
+        on_disk = sum(path.stat().st_size for path in directory.iterdir())
+        timings.sort()
+        results.append(report(
+            "append cost and compression",
+            timings[int(len(timings) * 0.99) - 1] < 50 and on_disk * 3 < raw and log.dropped == 0,
+            f"median {statistics.median(timings):.1f} µs, p99 {timings[int(len(timings) * 0.99) - 1]:.1f} µs, "
+            f"{raw / 1024:.0f} KiB -> {on_disk / 1024:.0f} KiB in {len(segments(directory))} segments, {log.stats()}"
+        ))
+
+        start = time.perf_counter()
+        read = list(iter_updates(directory))
+        read_ms = (time.perf_counter() - start) * 1000
+        results.append(report(
+            "read back in order",
+            [(update.update_id, update.body) for update in read] == [(update_id, body) for update_id, _, body in records],
+            f"{len(read)} updates in {read_ms:.0f} ms"
+        ))
+
+        # Zakres update_id: tylko bloki z indeksu, które go obejmują
+        low, high = records[count // 2][0], records[count // 2 + 99][0]
+        all_blocks = sum(len(read_index(path)) for path in segments(directory))
+        chosen = sum(len(select_blocks(path, from_update_id=low, to_update_id=high)) for path in segments(directory))
+        by_id = list(iter_updates(directory, from_update_id=low, to_update_id=high))
+        results.append(report(
+            "update id range via index",
+            [update.update_id for update in by_id] == list(range(low, high + 1)) and chosen <= 4,
+            f"{chosen}/{all_blocks} blocks decompressed"
+        ))
+
+        since = records[1000][1]
+        until = records[1500][1]
+        by_time = list(iter_updates(
+            directory,
+            since=datetime.fromtimestamp(since, timezone.utc).replace(tzinfo=None),
+            until=datetime.fromtimestamp(until, timezone.utc),
+        ))
+        results.append(report(
+            "time range",
+            [update.update_id for update in by_time] == [update_id for update_id, _, _ in records[1000:1500]],
+            f"{len(by_time)} updates"
+        ))
+
+        # Przerwany zapis: niepełny ostatni blok, indeks nie pasuje do segmentu lub go brak
+        last = segments(directory)[-1]
+        blocks = read_index(last)
+        torn = truncated_copy(last, workdir / "torn", BLOCK_HEADER.size)
+        shutil.copy(last.with_suffix(".idx"), torn.with_suffix(".idx"))
+        recovered = list(iter_updates(torn.parent))
+        torn.with_suffix(".idx").unlink()
+        rebuilt = list(iter_updates(torn.parent))
+        expected = sum(block.count for block in blocks[:-1])
+        results.append(report(
+            "torn tail and missing index",
+            len(recovered) == len(rebuilt) == expected and len(read_index(torn)) == len(blocks) - 1,
+            f"{expected} updates in {len(blocks) - 1} complete blocks"
+        ))
+
+        # Dwa workery piszące równocześnie do jednego katalogu
+        merged_dir = workdir / "merged"
+        first, second = records[:2000:2], records[1:2000:2]
+        await asyncio.gather(write_log(merged_dir, first), write_log(merged_dir, second))
+        merged = [update.update_id for update in iter_updates(merged_dir)]
+        results.append(report(
+            "two writers merged by receive time",
+            merged == [update_id for update_id, _, _ in records[:2000]],
+            f"{len(segments(merged_dir))} segments"
+        ))
+
+        pace = await replay(records[:200], lambda update: asyncio.sleep(0, True), rate=400, concurrency=4)
+        results.append(report(
+            "rate pacing", 0.45 <= pace.duration <= 0.6 and pace.succeeded == 200,
+            f"200 updates at 400/s in {pace.duration:.3f} s, max lag {pace.max_lag * 1000:.1f} ms"
+        ))
+
+        # Webhook zapisuje ciało, a odtworzenie tworzy wiadomości od nowa
+        await migrate_database()
+        import main
+
+        bot_api = FakeBotApiServer(port=BOT_API_PORT).start()
+        config.TELEGRAM_API_URL = bot_api.url
+        config.TELEGRAM_BOT_TOKEN = config.TELEGRAM_BOT_TOKEN or "123456:check-token"
+        update_log.directory = workdir / "webhook"
+        chat_id = random.randint(10**9, 10**10)  # Nowy czat przy każdym uruchomieniu
+        first_message_id = int(time.time() * 1000)
+        bodies = [
+            json.dumps(build_update("text", 900_000 + number, first_message_id + number, chat_id, rng=rng)).encode()
+            for number in range(20)
+        ]
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                statuses = [
+                    (await client.post("/webhook", content=body)).status_code for body in bodies
+                ]
+                invalid = await client.post("/webhook", content=b'{"message": 1}')
+            await update_log.close()
+            logged = list(iter_updates(update_log.directory))
+            results.append(report(
+                "webhook bodies logged",
+                statuses == [200] * len(bodies) and invalid.status_code == 400
+                and [update.body for update in logged] == bodies + [b'{"message": 1}']
+                and logged[-1].update_id is None,
+                f"{len(logged)} logged, {update_log.stats()}"
+            ))
+
+            # Segment w uploads/ (stara lokalizacja) nie jest serwowany przez /files
+            exposed = Path("uploads/update_log") / segments(update_log.directory)[0].name
+            exposed.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(segments(update_log.directory)[0], exposed)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test/api/v1") as client:
+                    served = (await client.get(f"/files/{exposed.as_posix()}")).status_code
+                    info = (await client.get(f"/files/info/{exposed.as_posix()}")).status_code
+            finally:
+                exposed.unlink()
+                if not any(exposed.parent.iterdir()):
+                    exposed.parent.rmdir()
+            results.append(report(
+                "log not served by files route",
+                served == info == 403 and not Path(config.UPDATE_LOG_DIR).resolve().is_relative_to(Path("uploads").resolve()),
+                f"{served}, {info}, UPDATE_LOG_DIR={config.UPDATE_LOG_DIR}"
+            ))
+
+            async def messages() -> int:
+                async with engine.connect() as connection:
+                    statement = select(func.count()).select_from(TelegramMessage).where(TelegramMessage.chat_id == chat_id)
+                    return (await connection.execute(statement)).scalar_one()
+
+            valid = [update for update in logged if update.update_id is not None]
+            before = await messages()
+            # Te same id wiadomości, dwa razy - zapisane wiadomości są pomijane
+            repeated = [await replay(valid, process_in_process, concurrency=4) for _ in range(2)]
+            unchanged = await messages()
+            replayed = await replay(
+                (shifted(update, len(bodies)) for update in valid), process_in_process, concurrency=4
+            )
+            again = await replay(
+                (shifted(update, len(bodies)) for update in valid), process_in_process, concurrency=4
+            )
+            after = await messages()
+            results.append(report(
+                "in-process replay",
+                before == unchanged == len(bodies) and all(stats.skipped == len(bodies) for stats in repeated)
+                and replayed.succeeded == len(bodies) and again.skipped == len(bodies) and after == 2 * len(bodies),
+                f"{before} -> {unchanged} -> {after} messages, {replayed.succeeded} processed ({replayed.throughput:.0f}/s), "
+                f"{again.skipped} skipped on second replay, "
+                f"p95 {replayed.percentile(0.95) * 1000:.1f} ms, Bot API calls {bot_api.calls}"
+            ))
+        finally:
+            await services.media_group_aggregator.drain()
+            bot_api.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return 0 if all(results) else 1
+
+
+async def run(count: int) -> int:
+    try:
+        return await main_check(count)
+    finally:
+        shutdown_pool()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    sys.exit(asyncio.run(run(parser.parse_args().updates)))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Sprawdza liczbę zapytań i commitów na jeden webhook Telegram.
+
+Wywołania Bot API są podmieniane na atrapy, więc skrypt potrzebuje tylko
+bazy z `DATABASE_URL` (migrowanej na starcie). Dla każdego scenariusza
+sprawdza też, że wiadomość i jej klucz TelegramMessageKey zostały zapisane,
+a obsługa nie zalogowała błędu (process_webhook łapie wyjątki), oraz że
+ponowiony webhook (ta sama wiadomość) nie zapisuje jej drugi raz. Utworzone
+rekordy są usuwane na końcu. Kończy się kodem 1, jeśli któryś typ
+aktualizacji przekroczy oczekiwania albo nie zostanie zapisany.
+
+Użycie:
+    python scripts/check_webhook_roundtrips.py
+"""
+import asyncio
+import logging
+import random
+import sys
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, event, func, select, text
+
+from benchmarks.updates import build_update
+from src.db.main import engine, get_session
+from src.db.migrations import migrate_database
+from src.db.models import SyncChange, SyncSequence, TelegramMessage, TelegramMessageKey, User
+from src.processing.images import PreprocessedImage, preprocess_image
+from src.processing.pages import BillPage
+from src.processing.pdf import PdfExtraction
+from src.processing.receipts import parse_receipt
+from src.telegram import services
+from src.telegram.schemas import TelegramWebhook
+
+# Scenariusz -> (maks. liczba zapytań, maks. liczba commitów)
+# Zdjęcie i dokument: zapis file_path + odczyt cache wyników rozpoznania;
+# każdy zapis wiadomości dopisuje wpis dziennika zmian z numerem z licznika
+# użytkownika (src/sync/changes.py), a nowa wiadomość także klucz
+# TelegramMessageKey (ponowione webhooki)
+EXPECTED = {
+    "text_new_user": (5, 1),
+    "text_known_user": (4, 1),
+    "photo_known_user": (8, 2),
+    "document_known_user": (8, 2),
+}
+
+
+class RoundTripCounter:
+    """Zlicza zapytania i commity wykonane przez silnik."""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.statements += 1
+
+    def _on_commit(self, *args, **kwargs) -> None:
+        self.commits += 1
+
+    def attach(self, sync_engine) -> None:
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(sync_engine, "commit", self._on_commit)
+
+
+class ErrorCollector(logging.Handler):
+    """Zbiera komunikaty błędów zalogowane podczas obsługi webhooka."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+async def _fake_send_text_message(chat_id: int, text: str) -> bool:
+    return True
+
+
+async def _fake_get_file_path(file_id: str):
+    return "photos/file_0.jpg"
+
+
+async def _fake_download_file(file_path: str, local_path: str, max_bytes=None) -> bool:
+    return True
+
+
+async def _fake_run_in_pool(func, *args):
+    if func is preprocess_image:
+        return PreprocessedImage(path=args[0], content_hash="0" * 64, cached=True)
+    if func is parse_receipt:
+        return None
+    return PdfExtraction(page_count=1, pages=[BillPage(number=1, text="PARAGON FISKALNY", source="pdf_text")])
+
+
+async def run_update(update: TelegramWebhook) -> None:
+    session_gen = get_session()
+    session = await session_gen.__anext__()
+    try:
+        await services.process_webhook(session, update)
+    finally:
+        await session_gen.aclose()
+
+
+async def stored_message(chat_id: int, message_id: int) -> tuple:
+    """Zwraca (liczba wiadomości, liczba kluczy) zapisanych dla wiadomości."""
+    async with engine.connect() as conn:
+        messages = (await conn.execute(
+            select(func.count()).select_from(TelegramMessage).where(
+                TelegramMessage.chat_id == chat_id, TelegramMessage.telegram_message_id == message_id
+            )
+        )).scalar_one()
+        keys = (await conn.execute(
+            select(func.count()).select_from(TelegramMessageKey).where(
+                TelegramMessageKey.chat_id == chat_id, TelegramMessageKey.telegram_message_id == message_id
+            )
+        )).scalar_one()
+    return messages, keys
+
+
+async def main() -> int:
+    # Bez schematu process_webhook tylko loguje błędy - sprawdzenie nie może przejść
+    if not await migrate_database():
+        await engine.dispose()
+        return 1
+
+    services.send_text_message = _fake_send_text_message
+    services.get_file_path = _fake_get_file_path
+    services.download_file = _fake_download_file
+    services.run_in_pool = _fake_run_in_pool
+
+    # Rozgrzanie połączenia (inicjalizacja dialektu wykonuje własne zapytania)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    counter = RoundTripCounter()
+    counter.attach(engine.sync_engine)
+    errors = ErrorCollector()
+    logging.getLogger().addHandler(errors)
+
+    chat_id = random.randint(10**12, 10**13)
+    base_id = random.randint(10**12, 10**13)
+    failed = False
+
+    try:
+        for offset, (kind, (max_statements, max_commits)) in enumerate(EXPECTED.items()):
+            counter.reset()
+            errors.messages.clear()
+            update_kind = kind.split("_")[0]
+            update = TelegramWebhook.model_validate(build_update(update_kind, base_id + offset, base_id + offset, chat_id))
+            await run_update(update)
+            statements, commits = counter.statements, counter.commits
+            messages, keys = await stored_message(chat_id, base_id + offset)
+            ok = (
+                statements <= max_statements and commits <= max_commits
+                and messages == 1 and keys == 1 and not errors.messages
+            )
+            failed = failed or not ok
+            print(
+                f"{'✅' if ok else '❌'} {kind}: statements={statements} (max {max_statements}), "
+                f"commits={commits} (max {max_commits}), stored={messages} message(s), {keys} key(s)"
+                + (f", errors: {errors.messages}" if errors.messages else "")
+            )
+
+        # Telegram ponawia aktualizację, gdy nie dostanie odpowiedzi na czas
+        retried = TelegramWebhook.model_validate(build_update("text", base_id, base_id, chat_id))
+        await run_update(retried)
+        stored, _ = await stored_message(chat_id, base_id)
+        failed = failed or stored != 1
+        print(f"{'✅' if stored == 1 else '❌'} retried update: {stored} message(s) stored")
+    finally:
+        logging.getLogger().removeHandler(errors)
+        async with engine.begin() as conn:
+            await conn.execute(delete(TelegramMessage).where(TelegramMessage.chat_id == chat_id))
+            await conn.execute(delete(TelegramMessageKey).where(TelegramMessageKey.chat_id == chat_id))
+            await conn.execute(delete(SyncChange).where(
+                SyncChange.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(SyncSequence).where(
+                SyncSequence.user_id.in_(select(User.id).where(User.external_id == chat_id))
+            ))
+            await conn.execute(delete(User).where(User.external_id == chat_id))
+        await engine.dispose()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Utrzymanie partycji miesięcznych (PostgreSQL) - do uruchamiania z crona.
+
+Tworzy partycje na `PARTITION_MONTHS_AHEAD` miesięcy naprzód i stosuje
+retencję wiadomości (`TELEGRAM_MESSAGE_RETENTION_MONTHS`,
+`PARTITION_RETENTION_MODE`). Działa pod tą samą blokadą doradczą co
+migracje. `--dry-run` wypisuje polecenia i wycofuje transakcję.
+
+Użycie:
+    python scripts/maintain_partitions.py [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import event, pool, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import config
+from src.db.migrations import MIGRATION_LOCK_KEY
+from src.db.partitions import maintain_partitions
+
+
+def _echo_ddl(conn, cursor, statement, *args) -> None:
+    if not statement.lstrip().upper().startswith("SELECT"):
+        print(f"   {statement}")
+
+
+def _maintain(connection, dry_run: bool) -> dict:
+    if connection.dialect.name != "postgresql":
+        print(f"ℹ️  Partitioning is PostgreSQL-only (database: {connection.dialect.name})")
+        return {"created": [], "detached": []}
+
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    if dry_run:
+        event.listen(connection, "before_cursor_execute", _echo_ddl)
+    return maintain_partitions(connection)
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = create_async_engine(config.DATABASE_URL, poolclass=pool.NullPool)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            result = await conn.run_sync(_maintain, args.dry_run)
+            if args.dry_run:
+                await transaction.rollback()
+            else:
+                await transaction.commit()
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+
+    created, detached = ("🧪 Would create", "🧪 Would detach") if args.dry_run else ("✅ Created", "✅ Detached")
+    print(f"{created}: {result['created'] or '-'}")
+    print(f"{detached}: {result['detached'] or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly partition maintenance")
+    parser.add_argument("--dry-run", action="store_true", help="print DDL and roll back")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Usuwa stare wpisy dziennika zmian synchronizacji - do uruchamiania z crona.
+
+Wpisy starsze niż `SYNC_CHANGE_RETENTION_DAYS` (lub `--days`) są usuwane;
+klient z kursorem starszym niż retencja dostaje 410 i pobiera dane od nowa.
+
+Użycie:
+    python scripts/prune_sync_changes.py [--days N]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.main import engine
+from src.sync.services import prune_changes
+
+
+async def main(args: argparse.Namespace) -> int:
+    days = config.SYNC_CHANGE_RETENTION_DAYS if args.days is None else args.days
+    try:
+        async with AsyncSession(engine) as session:
+            removed = await prune_changes(session, days)
+    except Exception as e:
+        print(f"❌ Pruning sync changes failed: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+
+    print(f"✅ Removed {removed} sync changes older than {days} days")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Wypełnia od zera agregat historii cen (`pricehistory`) z pozycji rachunków.
+
+Potrzebne raz po wdrożeniu historii cen na istniejącej bazie oraz po
+ręcznych zmianach w `billitem`/`bill` z pominięciem serwisów. Przeliczenie
+odbywa się w jednej transakcji.
+
+Użycie:
+    python scripts/rebuild_price_history.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.main import engine
+from src.db.models import PriceHistory
+from src.prices.services import refresh_price_history
+
+
+async def main() -> int:
+    start = time.perf_counter()
+    try:
+        async with AsyncSession(engine) as session:
+            await refresh_price_history(session)
+            await session.commit()
+            rows = (await session.execute(select(func.count()).select_from(PriceHistory))).scalar_one()
+    except Exception as e:
+        print(f"❌ Price history rebuild failed: {e}")
+        return 1
+    finally:
+        await engine.dispose()
+
+    print(f"✅ Rebuilt price history: {rows} rows in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Odtwarza aktualizacje z dziennika (`UPDATE_LOG_DIR`) - ponowne przetworzenie
+po poprawkach parsera albo generator realistycznego ruchu.
+
+Domyślnie aktualizacje trafiają bezpośrednio do `services.process_webhook`
+na bazie z `DATABASE_URL` (każda we własnej sesji, jak w webhooku);
+`--base-url` wysyła surowe ciała na `<base-url>/webhook` działającej
+instancji. Tempo: `--rate N` aktualizacji/s, `--speed X` - odstępy jak przy
+odbiorze przyspieszone X razy, bez obu - tak szybko, jak pozwala
+`--concurrency`.
+
+Aktualizacje wiadomości, które są już w bazie (klucz czat + id wiadomości,
+`TelegramMessageKey`), są pomijane przed przetworzeniem - odtworzenie tego
+samego zakresu dwa razy nie tworzy duplikatów wiadomości ani rachunków.
+Ponowne przetworzenie po poprawkach parsera uruchamia się więc na osobnej
+bazie, a jako generator ruchu na tej samej bazie z `--message-id-offset N`
+(id wiadomości przesunięte o N). Przy `--base-url` duplikaty odrzuca webhook
+instancji.
+
+Uwaga: odtworzenie wysyła odpowiedzi do czatów. `--fake-bot-api` uruchamia lokalny, fałszywy Bot API
+(benchmarks/fake_bot_api.py), więc nic nie trafia do Telegrama - przy
+`--base-url` instancja musi mieć własny `TELEGRAM_API_URL`.
+
+Użycie:
+    python scripts/replay_updates.py --since 2026-10-01T00:00 --until 2026-10-02T00:00 --fake-bot-api
+    python scripts/replay_updates.py --from-update-id 1000 --to-update-id 2000 --dry-run
+    python scripts/replay_updates.py --rate 200 --concurrency 32 --base-url http://localhost:8000/api/v1
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# Dodaj src do ścieżki Python
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.main import engine
+from src.db.models import TelegramMessageKey
+from src.processing.pool import shutdown_pool
+from src.telegram import services
+from src.telegram.schemas import TelegramWebhook
+from src.telegram.update_log import LoggedUpdate, ReplayStats, iter_updates, replay
+
+FAKE_BOT_API_PORT = 8766
+
+
+def _updates(args: argparse.Namespace):
+    updates = iter_updates(
+        Path(args.dir),
+        since=args.since,
+        until=args.until,
+        from_update_id=args.from_update_id,
+        to_update_id=args.to_update_id,
+    )
+    count = 0
+    for update in updates:
+        if args.limit is not None and count >= args.limit:
+            return
+        # Ciała odrzucone przez walidację nie mają update_id - pomijane, chyba że --include-invalid
+        if update.update_id is None and not args.include_invalid:
+            continue
+        count += 1
+        if args.message_id_offset:
+            update = shifted(update, args.message_id_offset)
+        yield update
+
+
+def shifted(update: LoggedUpdate, offset: int) -> LoggedUpdate:
+    """Kopia aktualizacji z id wiadomości przesuniętym o `offset` (niepoprawne ciała bez zmian)."""
+    try:
+        data = json.loads(update.body)
+        for key in ("message", "edited_message"):
+            if isinstance(data.get(key), dict) and isinstance(data[key].get("message_id"), int):
+                data[key]["message_id"] += offset
+    except (ValueError, AttributeError):
+        return update
+    return LoggedUpdate(update.update_id, update.received_ms, json.dumps(data).encode())
+
+
+async def process_in_process(update: LoggedUpdate) -> Optional[bool]:
+    """Przetwarza aktualizację jak webhook; None - wiadomość jest już w bazie."""
+    try:
+        webhook = TelegramWebhook.model_validate_json(update.body)
+    except ValidationError:
+        return False
+    message = webhook.message or webhook.edited_message
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        if message and await session.get(TelegramMessageKey, (message.chat.id, message.message_id)):
+            return None
+        return await services.process_webhook(session, webhook)
+
+
+def _report(stats: ReplayStats) -> None:
+    print(f"✅ Replayed {stats.total} updates in {stats.duration:.2f} s ({stats.throughput:.1f}/s)")
+    print(f"   succeeded: {stats.succeeded}, skipped (already stored): {stats.skipped}, failed: {stats.failed}, "
+          f"max schedule lag: {stats.max_lag * 1000:.0f} ms")
+    print(f"   latency p50 {stats.percentile(0.5) * 1000:.1f} ms, "
+          f"p95 {stats.percentile(0.95) * 1000:.1f} ms, p99 {stats.percentile(0.99) * 1000:.1f} ms")
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.dry_run:
+        count = 0
+        first = last = None
+        for update in _updates(args):
+            count += 1
+            first = first or update
+            last = update
+        if not count:
+            print("ℹ️  No logged updates in range")
+            return 0
+        print(f"🧪 Would replay {count} updates: "
+              f"{first.received_at:%Y-%m-%d %H:%M:%S} - {last.received_at:%Y-%m-%d %H:%M:%S} UTC")
+        return 0
+
+    bot_api = None
+    if args.fake_bot_api:
+        from benchmarks.fake_bot_api import FakeBotApiServer
+
+        bot_api = FakeBotApiServer(port=args.fake_bot_api_port).start()
+        config.TELEGRAM_API_URL = bot_api.url
+        config.TELEGRAM_BOT_TOKEN = config.TELEGRAM_BOT_TOKEN or "123456:replay-token"
+
+    client = None
+    handler = process_in_process
+    if args.base_url:
+        client = httpx.AsyncClient(
+            base_url=args.base_url.rstrip("/"),
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+
+        async def handler(update: LoggedUpdate) -> bool:
+            response = await client.post(
+                "/webhook", content=update.body, headers={"Content-Type": "application/json"}
+            )
+            return response.status_code == 200
+
+    try:
+        stats = await replay(
+            _updates(args), handler, rate=args.rate, speed=args.speed, concurrency=args.concurrency
+        )
+        # Albumy czekające na kolejne części
+        await services.media_group_aggregator.drain()
+    except Exception as e:
+        print(f"❌ Replay failed: {e}")
+        return 1
+    finally:
+        if client:
+            await client.aclose()
+        shutdown_pool()
+        await engine.dispose()
+        if bot_api:
+            print(f"   fake Bot API calls: {bot_api.calls}")
+            bot_api.stop()
+
+    _report(stats)
+    return 0 if not stats.failed else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=config.UPDATE_LOG_DIR)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Czas odbioru od (UTC, ISO)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Czas odbioru do (UTC, ISO, bez końca)")
+    parser.add_argument("--from-update-id", type=int)
+    parser.add_argument("--to-update-id", type=int)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--include-invalid", action="store_true")
+    parser.add_argument("--message-id-offset", type=int, default=0, help="Przesunięcie id wiadomości")
+    parser.add_argument("--rate", type=float, default=0.0, help="Aktualizacji na sekundę (0 = bez limitu)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Krotność tempa z dziennika (0 = bez limitu)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", help="Np. http://localhost:8000/api/v1 - zamiast przetwarzania w procesie")
+    parser.add_argument("--fake-bot-api", action="store_true")
+    parser.add_argument("--fake-bot-api-port", type=int, default=FAKE_BOT_API_PORT)
+    parser.add_argument("--dry-run", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,97 @@
+"""
+Unieważnianie odpowiedzi `GET /bills/{id}` po zmianie danych słownikowych.
+
+Odpowiedź (BillReadWithDetails) zawiera sklep oraz pozycje z indeksem i jego
+kategorią. Flush, który zmienia lub usuwa sklep, indeks albo kategorię,
+zapamiętuje w sesji klucze rachunków odwołujących się do nich; po commit są
+usuwane z cache odpowiedzi, przy wycofaniu - porzucane. Zapisy z pominięciem
+ORM (UPDATE w `learn_tax_id`) zgłaszane są przez `invalidate_bills_after_commit`.
+"""
+import asyncio
+import logging
+from typing import Iterable, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache.responses import bill_key, response_cache
+from src.db.models import Bill, BillItem, Category, Index, Shop
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "bill_response_invalidations"
+
+# Zadania unieważnień uruchomione po commit - referencje chronią je przed GC
+pending_invalidations: Set[asyncio.Task] = set()
+
+
+def _referencing_bill_keys(
+    connection: Connection,
+    shop_ids: Iterable[int] = (),
+    index_ids: Iterable[int] = (),
+    category_ids: Iterable[int] = ()
+) -> Set[str]:
+    """Klucze rachunków ze sklepem, indeksem pozycji lub kategorią indeksu z podanych."""
+    shop_ids, index_ids, category_ids = set(shop_ids), set(index_ids), set(category_ids)
+    statements = []
+    if shop_ids:
+        statements.append(select(Bill.id).where(Bill.shop_id.in_(shop_ids)))
+    if index_ids:
+        statements.append(select(BillItem.bill_id).where(BillItem.index_id.in_(index_ids)).distinct())
+    if category_ids:
+        statements.append(
+            select(BillItem.bill_id)
+            .join(Index, BillItem.index_id == Index.id)
+            .where(Index.category_id.in_(category_ids))
+            .distinct()
+        )
+    return {bill_key(bill_id) for statement in statements for bill_id in connection.execute(statement).scalars()}
+
+
+async def invalidate_bills_after_commit(
+    session: AsyncSession,
+    shop_ids: Iterable[int] = (),
+    index_ids: Iterable[int] = (),
+    category_ids: Iterable[int] = ()
+) -> None:
+    """Zmiana zapisana z pominięciem ORM - odpowiedzi rachunków znikną z cache po commit."""
+    keys = await session.run_sync(
+        lambda sync_session: _referencing_bill_keys(sync_session.connection(), shop_ids, index_ids, category_ids)
+    )
+    session.info.setdefault(_PENDING_KEY, set()).update(keys)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_bill_keys(session: Session, flush_context) -> None:
+    changed = [obj for obj in session.dirty if session.is_modified(obj)] + list(session.deleted)
+    ids = {Shop: set(), Index: set(), Category: set()}
+    for obj in changed:
+        if type(obj) in ids and obj.id is not None:
+            ids[type(obj)].add(obj.id)
+    if not any(ids.values()):
+        return
+    keys = _referencing_bill_keys(session.connection(), ids[Shop], ids[Index], ids[Category])
+    session.info.setdefault(_PENDING_KEY, set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_bill_keys(session: Session) -> None:
+    keys = session.info.pop(_PENDING_KEY, None)
+    if not keys:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Sesja synchroniczna poza pętlą zdarzeń (skrypty) - cache odpowiedzi żyje w workerach
+        logger.debug(f"No event loop to invalidate {len(keys)} cached bill responses")
+        return
+    task = loop.create_task(response_cache.invalidate(*keys))
+    pending_invalidations.add(task)
+    task.add_done_callback(pending_invalidations.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bill_keys(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,156 @@
+"""
+Wykrywanie zduplikowanych rachunków.
+
+Każdy rachunek dostaje w `billfingerprint` dwa odciski:
+
+- SHA-256 kanonicznej treści: sklep, dzień, suma i multizbiór pozycji
+  (znormalizowany tekst, ilość, cena) - ten sam paragon rozpoznany ponownie;
+  rachunek bez pozycji go nie ma,
+- skrót percepcyjny zdjęcia (dHash, `src.processing.images.image_dhash`) -
+  to samo zdjęcie przesłane ponownie lub przekazane dalej (inna kompresja).
+
+Sprawdzenie nowego rachunku to wyszukiwanie w indeksach użytkownika, bez
+przeglądania jego historii: odcisk treści - równość, skrót zdjęcia - równość
+któregokolwiek z 4 pasm po 16 bitów. Skróty różniące się o najwyżej 3 bity
+mają co najmniej jedno wspólne pasmo (zasada szufladkowa), a kandydaci są
+sprawdzani odległością Hamminga.
+"""
+import hashlib
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select, union_all
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import Bill, BillFingerprint
+
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 16
+# Pasma gwarantują wykrycie skrótów różniących się o najwyżej PHASH_BANDS - 1 bitów
+MAX_PHASH_DISTANCE = PHASH_BANDS - 1
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return re.sub(r"\W+", " ", (text or "").lower()).strip()
+
+
+def _amount(value, places: str = "0.01") -> str:
+    return str(Decimal(value).quantize(Decimal(places))) if value is not None else ""
+
+
+def bill_fingerprint(
+    shop_id: Optional[int],
+    bill_date: datetime,
+    total_amount: Optional[Decimal],
+    items: Iterable
+) -> Optional[str]:
+    """
+    SHA-256 kanonicznej treści rachunku albo None dla rachunku bez pozycji -
+    ten sam sklep, dzień i suma to zbyt często dwa różne zakupy. Taki
+    rachunek może być duplikatem tylko przez skrót zdjęcia.
+    """
+    lines = sorted(
+        f"{_normalize_text(item.original_text)}|{_amount(item.quantity, '0.001')}|{_amount(item.total_price)}"
+        for item in items
+    )
+    if not lines:
+        return None
+    canonical = "\n".join([str(shop_id or ""), bill_date.date().isoformat(), _amount(total_amount), *lines])
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _signed(phash: int) -> int:
+    """64-bitowy skrót bez znaku -> BIGINT ze znakiem."""
+    return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+
+def phash_bands(phash: int) -> List[int]:
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return [(phash >> (band * PHASH_BAND_BITS)) & mask for band in range(PHASH_BANDS)]
+
+
+def hamming_distance(left: int, right: int) -> int:
+    return bin((left ^ right) & ((1 << 64) - 1)).count("1")
+
+
+async def find_duplicate(
+    session: AsyncSession,
+    user_id: int,
+    fingerprint: Optional[str],
+    phash: Optional[int] = None,
+    exclude_bill_id: Optional[int] = None
+) -> Optional[int]:
+    """Zwraca ID pierwotnego rachunku użytkownika, którego duplikatem jest nowy rachunek."""
+    candidates = []
+    if fingerprint is not None:
+        statement = select(BillFingerprint.bill_id).where(
+            BillFingerprint.user_id == user_id,
+            BillFingerprint.fingerprint == fingerprint
+        )
+        if exclude_bill_id is not None:
+            statement = statement.where(BillFingerprint.bill_id != exclude_bill_id)
+        result = await session.execute(statement.order_by(BillFingerprint.bill_id).limit(1))
+        candidates.extend(result.scalars().all())
+
+    max_distance = min(config.BILL_DUPLICATE_PHASH_DISTANCE, MAX_PHASH_DISTANCE)
+    if phash is not None and not candidates:
+        # Osobne zapytanie na pasmo zamiast OR - każde korzysta ze swojego indeksu
+        lookups = []
+        for band, value in enumerate(phash_bands(phash)):
+            lookup = select(BillFingerprint.bill_id, BillFingerprint.phash).where(
+                BillFingerprint.user_id == user_id,
+                getattr(BillFingerprint, f"phash_band_{band}") == value
+            )
+            if exclude_bill_id is not None:
+                lookup = lookup.where(BillFingerprint.bill_id != exclude_bill_id)
+            lookups.append(lookup)
+        statement = union_all(*lookups)
+        result = await session.execute(statement)
+        candidates.extend(
+            bill_id for bill_id, stored in set(result.all())
+            if hamming_distance(stored, phash) <= max_distance
+        )
+
+    if not candidates:
+        return None
+    # Wskazujemy pierwotny rachunek, a nie inny duplikat
+    result = await session.execute(select(Bill.id, Bill.duplicate_of_id).where(Bill.id == min(candidates)))
+    bill_id, duplicate_of_id = result.one()
+    return duplicate_of_id or bill_id
+
+
+async def register_bill(
+    session: AsyncSession,
+    bill: Bill,
+    items: Iterable = (),
+    phash: Optional[int] = None
+) -> Optional[int]:
+    """
+    Zapisuje (lub aktualizuje) odciski rachunku i ustawia `duplicate_of_id`
+    zgodnie z aktualną treścią. Bez commita. Zwraca ID pierwotnego rachunku
+    albo None. Rachunek musi mieć już ID (po flush).
+    """
+    items = list(items)
+    fingerprint = bill_fingerprint(bill.shop_id, bill.bill_date, bill.total_amount, items)
+
+    result = await session.execute(select(BillFingerprint).where(BillFingerprint.bill_id == bill.id))
+    record = result.scalar_one_or_none()
+    if record is None:
+        record = BillFingerprint(bill_id=bill.id, user_id=bill.user_id)
+    if phash is None and record.phash is not None:
+        phash = record.phash & ((1 << 64) - 1)
+
+    original = None
+    if config.BILL_DUPLICATE_MODE != "off":
+        original = await find_duplicate(session, bill.user_id, fingerprint, phash, exclude_bill_id=bill.id)
+    bill.duplicate_of_id = original
+
+    record.fingerprint = fingerprint
+    if phash is not None:
+        record.phash = _signed(phash)
+        record.phash_band_0, record.phash_band_1, record.phash_band_2, record.phash_band_3 = phash_bands(phash)
+    session.add_all([record, bill])
+    return original
@@ -1,11 +1,15 @@
-from src.bill.schemas import BillCreate, BillRead, BillUpdate, BillReadWithDetails
+from datetime import datetime
+from decimal import Decimal
+from src.bill.schemas import BillCreate, BillPage, BillRead, BillUpdate, BillReadWithDetails
 from src.billitem.schemas import BillItemCreate
 from src.db.main import get_session
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, Response
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
+from typing import List, Optional
 from src.bill import services
+from src.cache.responses import bill_key, response_cache
+from src.db.models import ProcessingStatus
 from src.files.services import FileService
 from src.files.schemas import FileResponse as FileResponseSchema
 
@@ -21,15 +25,63 @@ async def create_bill(bill_in: BillCreate, session: AsyncSession = Depends(get_s
     return await services.create_bill(session=session, bill_in=bill_in)
 
 
+@router.get("/", response_model=BillPage)
+async def search_bills(
+    user_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    shop_id: Optional[int] = None,
+    bill_status: Optional[ProcessingStatus] = Query(None, alias="status"),
+    min_total: Optional[Decimal] = None,
+    max_total: Optional[Decimal] = None,
+    include_duplicates: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Wyszukuje rachunki użytkownika od najnowszych.
+
+    Filtry: zakres `bill_date` (`date_from` włącznie, `date_to` wyłącznie),
+    sklep, status i zakres kwoty; duplikaty (`duplicate_of_id`) są pomijane,
+    chyba że `include_duplicates=true`. Kolejną stronę pobiera się z `cursor`
+    równym `next_cursor` poprzedniej odpowiedzi.
+    """
+    try:
+        bills, next_cursor = await services.search_bills(
+            session,
+            user_id=user_id,
+            date_from=date_from,
+            date_to=date_to,
+            shop_id=shop_id,
+            status=bill_status,
+            min_total=min_total,
+            max_total=max_total,
+            include_duplicates=include_duplicates,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return BillPage(items=bills, next_cursor=next_cursor)
+
+
 @router.get("/{bill_id}", response_model=BillReadWithDetails)
 async def get_bill(bill_id: int, session: AsyncSession = Depends(get_session)):
     """
     Pobiera pełne informacje o rachunku wraz z pozycjami.
+    Odpowiedź serwowana jest z cache (read-through), unieważnianego przy zapisie.
     """
-    db_bill = await services.get_bill(session, bill_id=bill_id)
-    if not db_bill:
+    async def load_bill() -> Optional[bytes]:
+        db_bill = await services.get_bill_with_details(session, bill_id=bill_id)
+        if not db_bill:
+            return None
+        return BillReadWithDetails.model_validate(db_bill).model_dump_json().encode()
+
+    body = await response_cache.get_or_load(bill_key(bill_id), load_bill)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bill not found")
-    return db_bill
+    return Response(content=body, media_type="application/json")
 
 
 @router.patch("/{bill_id}", response_model=BillRead)
@@ -100,15 +152,8 @@ async def get_bill_file(
                 detail="No file associated with this bill"
             )
         
-        # Pobierz typ MIME
-        media_type = FileService.get_file_content_type(file_path)
-        
-        # Zwróć plik
-        return FileResponse(
-            path=file_path,
-            media_type=media_type,
-            filename=file_info.file_name
-        )
+        # Zwróć plik (z magazynu lub z archiwum)
+        return await FileService.file_response(session, file_path, file_info)
         
     except HTTPException:
         raise
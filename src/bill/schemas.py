@@ -24,6 +24,7 @@ class BillRead(BillBase):
     created_at: datetime
     updated_at: datetime
     user_id: int
+    duplicate_of_id: Optional[int] = None  # Rachunek, którego ten jest duplikatem
 
 class BillUpdate(SQLModel):
     bill_date: Optional[datetime] = None
@@ -33,6 +34,11 @@ class BillUpdate(SQLModel):
     status: Optional[str] = None
     error_message: Optional[str] = None
 
+# Strona wyników wyszukiwania; next_cursor przekazuje się jako `cursor` po kolejną stronę
+class BillPage(SQLModel):
+    items: List[BillRead] = []
+    next_cursor: Optional[str] = None
+
 # Główny, zagnieżdżony schemat do odczytu całego rachunku
 class BillReadWithDetails(BillRead):
     user: UserRead
@@ -1,26 +1,123 @@
-from typing import List, Optional
+import base64
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.models import Bill, BillItem, ProcessingStatus
+from src.db.models import Bill, BillItem, Index, ProcessingStatus
 from src.bill.schemas import BillCreate, BillUpdate
 from src.billitem.schemas import BillItemCreate
+from src.bill import dedup
+from src.cache.responses import bill_key, response_cache
+from src.prices.services import get_bill_index_ids, record_item_prices, refresh_price_history
+from src.config import config
+from src.processing.receipts import ParsedReceipt
+from src.shop.services import resolve_receipt_shop
 
 
 async def get_bill(session: AsyncSession, bill_id: int) -> Optional[Bill]:
     """Pobiera jeden rachunek po jego ID."""
     return await session.get(Bill, bill_id)
 
+async def get_bill_with_details(session: AsyncSession, bill_id: int) -> Optional[Bill]:
+    """Pobiera rachunek z użytkownikiem, sklepem i pozycjami (ładowanymi z góry, bez lazy-load w async)."""
+    statement = (
+        select(Bill)
+        .where(Bill.id == bill_id)
+        .options(
+            selectinload(Bill.user),
+            selectinload(Bill.shop),
+            selectinload(Bill.items).selectinload(BillItem.index).selectinload(Index.category),
+        )
+    )
+    result = await session.execute(statement)
+    return result.scalar_one_or_none()
+
 async def get_bills_by_user(session: AsyncSession, user_id: int, skip: int = 0, limit: int = 100) -> List[Bill]:
-    """Pobiera listę rachunków dla danego użytkownika."""
-    statement = select(Bill).where(Bill.user_id == user_id).offset(skip).limit(limit)
+    """Pobiera listę rachunków dla danego użytkownika (od najnowszych)."""
+    statement = (
+        select(Bill)
+        .where(Bill.user_id == user_id)
+        .order_by(Bill.bill_date.desc(), Bill.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
     result = await session.execute(statement)
-    return result.all()
+    return result.scalars().all()
+
+def encode_bill_cursor(bill: Bill) -> str:
+    """Kursor stronicowania - pozycja rachunku w kolejności (bill_date, id)."""
+    raw = f"{bill.bill_date.isoformat()}|{bill.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_bill_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Odczytuje kursor; ValueError dla niepoprawnego."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        bill_date, bill_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(bill_date), int(bill_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def bill_search_statement(
+    user_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    shop_id: Optional[int] = None,
+    status: Optional[ProcessingStatus] = None,
+    min_total: Optional[Decimal] = None,
+    max_total: Optional[Decimal] = None,
+    include_duplicates: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 50
+):
+    """
+    Zapytanie wyszukiwania rachunków: od najnowszych, stronicowane po kluczu
+    (bill_date, id) zamiast OFFSET - koszt strony nie rośnie z jej numerem.
+    Filtry sklepu i statusu mają własne indeksy złożone (model `Bill`), zakres
+    kwoty i pomijanie duplikatów to filtry dodatkowe. Pobiera `limit + 1` wierszy, żeby wiedzieć,
+    czy istnieje kolejna strona.
+    """
+    statement = select(Bill).where(Bill.user_id == user_id)
+    if shop_id is not None:
+        statement = statement.where(Bill.shop_id == shop_id)
+    if status is not None:
+        statement = statement.where(Bill.status == status)
+    if date_from is not None:
+        statement = statement.where(Bill.bill_date >= date_from)
+    if date_to is not None:
+        statement = statement.where(Bill.bill_date < date_to)
+    if min_total is not None:
+        statement = statement.where(Bill.total_amount >= min_total)
+    if max_total is not None:
+        statement = statement.where(Bill.total_amount <= max_total)
+    if not include_duplicates:
+        statement = statement.where(Bill.duplicate_of_id.is_(None))
+    if cursor is not None:
+        statement = statement.where(tuple_(Bill.bill_date, Bill.id) < decode_bill_cursor(cursor))
+    return statement.order_by(Bill.bill_date.desc(), Bill.id.desc()).limit(limit + 1)
+
+async def search_bills(session: AsyncSession, user_id: int, limit: int = 50, **filters) -> Tuple[List[Bill], Optional[str]]:
+    """Wyszukuje rachunki (`bill_search_statement`); zwraca (rachunki, kursor następnej strony lub None)."""
+    result = await session.execute(bill_search_statement(user_id, limit=limit, **filters))
+    bills = list(result.scalars().all())
+
+    next_cursor = encode_bill_cursor(bills[limit - 1]) if len(bills) > limit else None
+    return bills[:limit], next_cursor
+
+async def _bill_items(session: AsyncSession, bill_id: int) -> List[BillItem]:
+    result = await session.execute(select(BillItem).where(BillItem.bill_id == bill_id))
+    return list(result.scalars().all())
 
 async def create_bill(session: AsyncSession, bill_in: BillCreate) -> Bill:
-    """Tworzy nowy wpis dla rachunku (bez pozycji)."""
+    """Tworzy nowy wpis dla rachunku (bez pozycji); duplikat wcześniejszego dostaje `duplicate_of_id`."""
     db_bill = Bill.model_validate(bill_in)
     db_bill.status = ProcessingStatus.PENDING
     session.add(db_bill)
+    await session.flush()
+    await dedup.register_bill(session, db_bill)
     await session.commit()
     await session.refresh(db_bill)
     return db_bill
@@ -28,21 +125,100 @@ async def create_bill(session: AsyncSession, bill_in: BillCreate) -> Bill:
 async def update_bill(session: AsyncSession, db_bill: Bill, bill_in: BillUpdate) -> Bill:
     """Aktualizuje dane rachunku."""
     bill_data = bill_in.model_dump(exclude_unset=True)
+    # Zmiana sklepu lub dnia przenosi ceny pozycji w agregacie - przeliczamy dotknięte produkty
+    moves_prices = (
+        bill_data.get("shop_id", db_bill.shop_id) != db_bill.shop_id
+        or ("bill_date" in bill_data and bill_data["bill_date"].date() != db_bill.bill_date.date())
+    )
+    changes_fingerprint = moves_prices or bill_data.get("total_amount", db_bill.total_amount) != db_bill.total_amount
+    was_duplicate = db_bill.duplicate_of_id is not None
     for key, value in bill_data.items():
         setattr(db_bill, key, value)
     session.add(db_bill)
+    if changes_fingerprint:
+        await dedup.register_bill(session, db_bill, await _bill_items(session, db_bill.id))
+    if moves_prices or was_duplicate != (db_bill.duplicate_of_id is not None):
+        await refresh_price_history(session, await get_bill_index_ids(session, db_bill.id))
     await session.commit()
+    await response_cache.invalidate(bill_key(db_bill.id))
     await session.refresh(db_bill)
     return db_bill
 
 async def add_items_to_bill(session: AsyncSession, db_bill: Bill, items_in: List[BillItemCreate]) -> Bill:
     """Dodaje listę pozycji do istniejącego rachunku."""
+    db_items = []
     for item_in in items_in:
         # Tworzy obiekt BillItem i od razu przypisuje mu bill_id
         db_item = BillItem.model_validate(item_in, update={"bill_id": db_bill.id})
         session.add(db_item)
+        db_items.append(db_item)
     
+    # Pełna lista pozycji zmienia odcisk rachunku - sprawdzamy duplikat ponownie
+    was_duplicate = db_bill.duplicate_of_id is not None
+    await dedup.register_bill(session, db_bill, await _bill_items(session, db_bill.id))
+    if was_duplicate != (db_bill.duplicate_of_id is not None):
+        await refresh_price_history(session, await get_bill_index_ids(session, db_bill.id))
+    elif db_bill.duplicate_of_id is None:
+        await record_item_prices(session, db_bill.shop_id, db_bill.bill_date, db_items)
     await session.commit()
+    await response_cache.invalidate(bill_key(db_bill.id))
     # Odświeżenie obiektu rachunku spowoduje załadowanie nowo dodanych pozycji
     await session.refresh(db_bill)
-    return db_bill
\ No newline at end of file
+    return db_bill
+
+async def create_bill_from_parsed(
+    session: AsyncSession,
+    user_id: int,
+    receipt: ParsedReceipt,
+    image_url: Optional[str] = None,
+    phash: Optional[int] = None
+) -> Tuple[Bill, Optional[int]]:
+    """
+    Tworzy rachunek z pozycjami z wyniku rozpoznania (świeżego lub z cache) w jednej transakcji.
+
+    Zwraca (rachunek, ID pierwotnego rachunku, jeśli to duplikat). W trybie
+    `BILL_DUPLICATE_MODE=merge` duplikat nie jest tworzony - zwracany jest
+    pierwotny rachunek; w trybie `flag` nowy rachunek dostaje `duplicate_of_id`.
+    """
+    shop_id = await resolve_receipt_shop(session, receipt)
+
+    total_amount = receipt.total_amount
+    if total_amount is None and receipt.items:
+        total_amount = sum(item.total_price for item in receipt.items)
+    bill_date = receipt.bill_date or datetime.utcnow()
+
+    if config.BILL_DUPLICATE_MODE == "merge":
+        fingerprint = dedup.bill_fingerprint(shop_id, bill_date, total_amount, receipt.items)
+        original = await dedup.find_duplicate(session, user_id, fingerprint, phash)
+        if original is not None:
+            await session.commit()
+            return await session.get(Bill, original), original
+
+    db_bill = Bill(
+        bill_date=bill_date,
+        total_amount=total_amount,
+        image_url=image_url,
+        status=ProcessingStatus.COMPLETED,
+        user_id=user_id,
+        shop_id=shop_id,
+    )
+    session.add(db_bill)
+    await session.flush()
+
+    db_items = [
+        BillItem(
+            bill_id=db_bill.id,
+            quantity=item.quantity,
+            unit_price=item.unit_price,
+            total_price=item.total_price,
+            original_text=item.original_text,
+            confidence_score=item.confidence_score,
+        )
+        for item in receipt.items
+    ]
+    session.add_all(db_items)
+    original = await dedup.register_bill(session, db_bill, db_items, phash)
+    if original is None:
+        await record_item_prices(session, shop_id, db_bill.bill_date, db_items)
+    await session.commit()
+    return db_bill, original
@@ -0,0 +1,89 @@
+"""
+Backendy cache odpowiedzi: w procesie (LRU), Redis (protokół RESP) i pusty.
+
+Wszystkie backendy przechowują gotowe bajty odpowiedzi pod kluczem tekstowym.
+"""
+from typing import Optional
+
+from src.cache.memory import TTLCache
+
+
+class NullBackend:
+    """Backend wyłączonego cache - nic nie zapamiętuje."""
+    name = "none"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend:
+    """
+    Cache w pamięci workera.
+
+    Unieważnienia działają tylko lokalnie - przy wielu workerach pozostałe
+    widzą stare dane najdłużej przez TTL.
+    """
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class RedisBackend:
+    """Cache współdzielony przez workery w serwerze zgodnym z protokołem Redis."""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "bills:response:"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        # RESP2 - obsługiwany także przez starsze serwery i zamienniki Redis
+        self._client = redis.from_url(url, protocol=2, socket_timeout=1.0, socket_connect_timeout=1.0)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*(self.prefix + key for key in keys))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_backend(name: str, maxsize: int = 5000, redis_url: Optional[str] = None):
+    """Tworzy backend na podstawie nazwy z konfiguracji."""
+    if name == "memory":
+        return MemoryBackend(maxsize=maxsize)
+    if name == "redis":
+        if not redis_url:
+            raise ValueError("Redis response cache backend requires a Redis URL")
+        return RedisBackend(redis_url)
+    if name == "none":
+        return NullBackend()
+    raise ValueError(f"Unknown response cache backend: {name}")
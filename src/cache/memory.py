@@ -0,0 +1,82 @@
+"""
+Lokalny (w procesie) cache LRU z czasem życia wpisów.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+# Znacznik zapamiętanego braku wartości (negative caching)
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache LRU z TTL, bezpieczny wątkowo.
+
+    Obsługuje wpisy negatywne (`set_missing`) z osobnym, krótszym TTL -
+    `get` zwraca wtedy `MISSING`, odróżnialne od braku wpisu (`None`).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Zwraca wartość, `MISSING` dla wpisu negatywnego lub `None` gdy brak/wygasł."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Zapisuje wartość, usuwając najdawniej używany wpis po przekroczeniu rozmiaru."""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set_missing(self, key: Hashable) -> None:
+        """Zapamiętuje brak wartości dla klucza."""
+        self.set(key, MISSING, ttl=self.negative_ttl)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Statystyki trafień do endpointów diagnostycznych."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,115 @@
+"""
+Cache odpowiedzi GET typu read-through z ochroną przed lawiną zapytań.
+
+Endpoint przekazuje klucz zasobu i funkcję ładującą gotowe bajty JSON.
+Równoczesne chybienia tego samego klucza w workerze czekają na jedno
+ładowanie (single-flight). Serwisy zapisujące unieważniają klucze po commit.
+Błędy backendu (np. niedostępny Redis) nie przerywają odczytu - odpowiedź
+jest wtedy ładowana z bazy.
+"""
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.cache.backends import create_backend
+from src.cache.singleflight import SingleFlight
+from src.config import broker_url, config
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Optional[bytes]]]
+
+
+def bill_key(bill_id: int) -> str:
+    return f"bill:{bill_id}"
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class ResponseCache:
+    """Read-through cache odpowiedzi z metrykami trafień."""
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.errors = 0
+        self._flights = SingleFlight()
+        # Unieważnienia w trakcie ładowania - wynik takiego ładowania nie trafia do cache
+        self._invalidated: Dict[str, int] = {}
+
+    async def get_or_load(self, key: str, loader: Loader) -> Optional[bytes]:
+        """Zwraca bajty z cache albo ładuje je (raz na klucz) i zapisuje. None nie jest zapamiętywane."""
+        cached = await self._backend_get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        async def load() -> Optional[bytes]:
+            self.loads += 1
+            self._invalidated[key] = 0
+            try:
+                value = await loader()
+                if value is not None and not self._invalidated[key]:
+                    await self._backend_set(key, value)
+                return value
+            finally:
+                self._invalidated.pop(key, None)
+
+        return await self._flights.do(key, load)
+
+    async def invalidate(self, *keys: str) -> None:
+        """Usuwa klucze z cache; wywoływane po zatwierdzeniu zmian."""
+        for key in keys:
+            if key in self._invalidated:
+                self._invalidated[key] += 1
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache invalidation failed for {keys}: {e}")
+
+    async def _backend_get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache read failed for '{key}': {e}")
+            return None
+
+    async def _backend_set(self, key: str, value: bytes) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Response cache write failed for '{key}': {e}")
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "coalesced": self._flights.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    create_backend(
+        config.RESPONSE_CACHE_BACKEND,
+        maxsize=config.RESPONSE_CACHE_SIZE,
+        redis_url=config.RESPONSE_CACHE_REDIS_URL or broker_url,
+    ),
+    ttl=config.RESPONSE_CACHE_TTL,
+)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from src.cache.responses import response_cache
+from src.telegram.services import file_info_cache
+from src.user.cache import user_cache
+
+router = APIRouter(prefix="/cache", tags=["Cache"])
+
+
+@router.get("/stats")
+async def get_cache_stats() -> dict:
+    """
+    Metryki trafień cache odpowiedzi, użytkowników webhooków i getFile (dla bieżącego workera).
+    """
+    return {
+        "responses": response_cache.stats(),
+        "users": user_cache.stats(),
+        "telegram_files": file_info_cache.stats(),
+    }
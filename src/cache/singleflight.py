@@ -0,0 +1,51 @@
+"""
+Łączenie równoczesnych wywołań dla tego samego klucza (single-flight).
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Pierwsze wywołanie dla klucza wykonuje funkcję, kolejne - do czasu jej
+    zakończenia - czekają na ten sam wynik (lub wyjątek).
+
+    Jeśli wywołanie prowadzące zostanie przerwane, oczekujący wykonują
+    funkcję samodzielnie.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                return await func()
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Oczekujący dostaną wyjątek; oznacz go jako odebrany, gdy nikt nie czeka
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
@@ -1,4 +1,6 @@
-from src.category.schemas import CategoryCreate, CategoryRead
+from src.category.schemas import (
+    CategoryCreate, CategoryRead, CategorySuggestionRead, CategorySuggestionRequest
+)
 from src.db.main import get_session
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -20,6 +22,27 @@ async def create_category(category_in: CategoryCreate, session: AsyncSession = D
         )
     return await services.create_category(session, category_in=category_in)
 
+@router.post("/suggest", response_model=List[CategorySuggestionRead])
+async def suggest_categories(request: CategorySuggestionRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Proponuje kategorie dla nazw produktów na podstawie najbardziej podobnych
+    nazw indeksów, które mają już kategorię. Wynik (`score`, 0-1) łączy zgodność
+    sąsiadów z podobieństwem najbliższego z nich.
+    """
+    if len(request.names) > 1000:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At most 1000 names per request")
+    suggestions = await services.suggest_categories(session, request.names)
+    return [
+        CategorySuggestionRead(
+            name=name,
+            category_id=suggestion.category_id,
+            score=suggestion.score,
+            neighbour_id=suggestion.neighbour_id,
+            similarity=suggestion.similarity,
+        ) if suggestion else CategorySuggestionRead(name=name)
+        for name, suggestion in zip(request.names, suggestions)
+    ]
+
 # @router.get("/", response_model=List[CategoryRead])
 # async def get_categories(skip: int = 0, limit: int = 100, session: AsyncSession = Depends(get_session)):
 #     """
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from sqlmodel import SQLModel
 
 class CategoryBase(SQLModel):
@@ -11,4 +11,13 @@ class CategoryRead(CategoryBase):
     id: int
 
 class CategoryUpdate(SQLModel):
-    name: Optional[str] = None
\ No newline at end of file
+    name: Optional[str] = None
+class CategorySuggestionRequest(SQLModel):
+    names: List[str]
+
+class CategorySuggestionRead(SQLModel):
+    name: str
+    category_id: Optional[int] = None  # None - brak podobnych indeksów z kategorią
+    score: float = 0.0
+    neighbour_id: Optional[int] = None  # Najbliższy indeks z proponowaną kategorią
+    similarity: float = 0.0
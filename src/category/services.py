@@ -1,9 +1,12 @@
-from typing import Optional
+from typing import TYPE_CHECKING, List, Optional
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.db.models import Category
 from src.category.schemas import CategoryCreate
 
+if TYPE_CHECKING:
+    from src.category.suggestions import CategorySuggestion
+
 
 async def get_category_by_name(session: AsyncSession, name: str) -> Optional[Category]:
     """Pobiera kategorię po jej nazwie."""
@@ -24,4 +27,12 @@ async def get_or_create_category(session: AsyncSession, category_in: CategoryCre
     db_category = await get_category_by_name(session, name=category_in.name)
     if not db_category:
         db_category = await create_category(session, category_in)
-    return db_category
\ No newline at end of file
+    return db_category
+
+async def suggest_categories(session: AsyncSession, names: List[str]) -> List[Optional["CategorySuggestion"]]:
+    """Propozycje kategorii dla nazw produktów (jedna partia, kolejność jak w `names`)."""
+    # NumPy/SciPy importowane przy pierwszej propozycji, nie przy starcie workera
+    from src.category.suggestions import category_suggester
+
+    await category_suggester.ensure_loaded(session)
+    return category_suggester.suggest(names)
@@ -0,0 +1,335 @@
+"""
+Propozycje kategorii dla nowych indeksów produktów.
+
+Nazwy indeksów z kategorią zamieniane są na wektory TF-IDF n-gramów znaków
+(3- i 4-gramy w obrębie wyrazów, po normalizacji z `src.index.autocomplete`)
+w macierzy rzadkiej SciPy z wektorami o normie 1. Dla nowych nazw - od razu
+całą partią - liczone jest podobieństwo kosinusowe do wszystkich indeksów
+jednym mnożeniem macierzy; kategorię wybiera głosowanie `k` najbliższych
+sąsiadów ważone podobieństwem.
+
+Zmiany indeksów zatwierdzone w tym procesie nanoszone są przyrostowo: nowe
+nazwy dopisywane są jako kolumny z bieżącymi wagami IDF, a usunięte lub
+zmienione - wyłączane. Wagi IDF i macierz przelicza od nowa przebudowa w tle,
+gdy zmienionych kolumn jest więcej niż `CATEGORY_SUGGESTION_REBUILD_RATIO`
+macierzy, oraz co `CATEGORY_SUGGESTION_REFRESH_INTERVAL` sekund.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import Index
+from src.index.autocomplete import normalize
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (3, 4)
+
+# Klucz w Session.info ze zmianami indeksów do naniesienia po commit
+_PENDING_KEY = "category_suggestions_pending"
+
+
+@dataclass(frozen=True)
+class CategorySuggestion:
+    category_id: int
+    score: float  # Udział kategorii w głosach sąsiadów razy podobieństwo najbliższego z nich (0-1)
+    neighbour_id: int  # Najbliższy indeks z tą kategorią
+    similarity: float  # Podobieństwo kosinusowe do niego
+
+
+def ngrams(name: str) -> Counter:
+    """N-gramy znaków wyrazów otoczonych spacjami ("ser" -> " se", "ser", "er ", " ser", "ser ")."""
+    counts: Counter = Counter()
+    for word in normalize(name).split(" "):
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            counts.update(padded[position:position + size] for position in range(len(padded) - size + 1))
+    return counts
+
+
+def _count_matrix(names: List[str], vocabulary: Dict[str, int], grow: bool) -> sparse.csr_matrix:
+    """Liczności n-gramów (wiersz = nazwa); z `grow` nieznane n-gramy dopisywane są do słownika."""
+    rows, columns, counts = [], [], []
+    for row, name in enumerate(names):
+        for gram, count in ngrams(name).items():
+            column = vocabulary.get(gram)
+            if column is None and grow:
+                column = vocabulary[gram] = len(vocabulary)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+                counts.append(count)
+    return sparse.csr_matrix(
+        (np.array(counts, dtype=np.float64), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+        shape=(len(names), len(vocabulary))
+    )
+
+
+def _tfidf(counts: sparse.csr_matrix, idf: np.ndarray) -> sparse.csr_matrix:
+    """TF (1 + log) razy IDF, wiersze o normie 1."""
+    matrix = counts.copy()
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def _build(names: List[str]) -> Tuple[Dict[str, int], np.ndarray, sparse.csr_matrix]:
+    """Słownik, wagi IDF i macierz n-gram x nazwa - bez stanu, więc może działać w wątku."""
+    vocabulary: Dict[str, int] = {}
+    counts = _count_matrix(names, vocabulary, grow=True)
+    document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+    # Wygładzone IDF jak w scikit-learn: n-gram z każdej nazwy nadal ma wagę 1
+    idf = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+    return vocabulary, idf, _tfidf(counts, idf).T.tocsr()
+
+
+class CategorySuggester:
+    """
+    Macierz TF-IDF nazw indeksów z kategorią, przechowywana od razu w postaci
+    transponowanej (wiersz = n-gram, kolumna = indeks) - mnożenie przez nią
+    wektorów nowych nazw nie wymaga konwersji formatu przy każdym zapytaniu.
+
+    Indeksy dodane po budowie trafiają do małej macierzy przyrostowej
+    (`_delta`), więc dopisanie nazwy nie kopiuje całej macierzy. Słownik
+    n-gramów tylko rośnie; nowe n-gramy dostają IDF jak n-gram z jednej nazwy.
+    """
+
+    def __init__(self):
+        self.loaded_at: Optional[float] = None
+        self.outdated = False
+        self._names: Dict[int, Tuple[str, int]] = {}  # id indeksu -> (nazwa, kategoria)
+        self._install({}, {}, np.zeros(0), sparse.csr_matrix((0, 0)))
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Zmiany zatwierdzone w trakcie ładowania - nanoszone ponownie na nową macierz
+        self._replay: Optional[List[Tuple[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None or self.outdated
+            or time.monotonic() - self.loaded_at > config.CATEGORY_SUGGESTION_REFRESH_INTERVAL
+        )
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """Pierwsze użycie czeka na zbudowanie macierzy, kolejne przebudowy idą w tle."""
+        if self.loaded_at is None:
+            async with self._lock:
+                if self.loaded_at is None:
+                    await self.load(session)
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        from src.db.main import engine
+
+        try:
+            async with AsyncSession(engine) as session:
+                await self.load(session)
+        except Exception as e:
+            logger.warning(f"Category suggestions refresh failed: {e}")
+
+    async def load(self, session: AsyncSession) -> None:
+        """Pełna budowa z bazy; obliczenia w wątku, bez blokowania pętli zdarzeń."""
+        self._replay = []
+        try:
+            result = await session.execute(
+                select(Index.id, Index.name, Index.category_id).where(Index.category_id.isnot(None))
+            )
+            names = {row.id: (row.name, row.category_id) for row in result.all()}
+            start = time.perf_counter()
+            built = await asyncio.to_thread(_build, [name for name, _ in names.values()])
+            replay = self._replay
+        finally:
+            self._replay = None
+        self._install(names, *built)
+        self.apply(replay)
+        self.loaded_at = time.monotonic()
+        self.outdated = False
+        logger.info(
+            f"Category suggestions built: {len(names)} indexes, {len(built[0])} n-grams "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+    def build(self, names: Dict[int, Tuple[str, int]]) -> None:
+        """Pełna budowa z podanych nazw (id indeksu -> (nazwa, kategoria))."""
+        self._install(names, *_build([name for name, _ in names.values()]))
+
+    def _install(
+        self,
+        names: Dict[int, Tuple[str, int]],
+        vocabulary: Dict[str, int],
+        idf: np.ndarray,
+        matrix: sparse.csr_matrix
+    ) -> None:
+        self._names = dict(names)
+        self._vocabulary, self._idf, self._matrix = vocabulary, idf, matrix
+        self._delta_rows = sparse.csr_matrix((0, len(vocabulary)))
+        self._delta = sparse.csr_matrix((len(vocabulary), 0))
+        self._index_ids = np.fromiter(names.keys(), dtype=np.int64, count=len(names))
+        self._category_ids = np.fromiter((category for _, category in names.values()), dtype=np.int64, count=len(names))
+        self._live = np.ones(len(names), dtype=bool)  # Kolumny usuniętych i zmienionych indeksów - False
+        self._columns = {index_id: column for column, index_id in enumerate(names)}
+        self._built_columns = len(names)
+        self._changes = 0  # Dopisane i wyłączone kolumny od ostatniej budowy
+        self._pending: List[Tuple[int, str, int]] = []
+
+    def _vectorize(self, names: List[str], grow: bool = False) -> sparse.csr_matrix:
+        counts = _count_matrix(names, self._vocabulary, grow)
+        if len(self._vocabulary) > len(self._idf):
+            # Nowy n-gram występuje na razie w jednej nazwie
+            new_idf = np.log((1 + len(self._names)) / 2) + 1
+            self._idf = np.concatenate([self._idf, np.full(len(self._vocabulary) - len(self._idf), new_idf)])
+        return _tfidf(counts, self._idf)
+
+    def _flush_pending(self) -> None:
+        """Dopisuje zebrane nowe nazwy do macierzy przyrostowej."""
+        if not self._pending:
+            return
+        if self._changes > config.CATEGORY_SUGGESTION_REBUILD_RATIO * max(self._built_columns, 1):
+            # Wagi IDF i macierz przeliczy przebudowa w tle przy następnym `ensure_loaded`
+            self.outdated = True
+
+        pending, self._pending = self._pending, []
+        vectors = self._vectorize([name for _, name, _ in pending], grow=True)
+        width = len(self._vocabulary)
+        self._matrix.resize((width, self._matrix.shape[1]))
+        self._delta_rows.resize((self._delta_rows.shape[0], width))
+        self._delta_rows = sparse.vstack([self._delta_rows, vectors], format="csr")
+        self._delta = self._delta_rows.T.tocsr()
+        first_column = len(self._index_ids)
+        self._index_ids = np.concatenate([self._index_ids, [index_id for index_id, _, _ in pending]])
+        self._category_ids = np.concatenate([self._category_ids, [category_id for _, _, category_id in pending]])
+        self._live = np.concatenate([self._live, np.ones(len(pending), dtype=bool)])
+        for offset, (index_id, _, _) in enumerate(pending):
+            self._columns[index_id] = first_column + offset
+
+    def upsert(self, index_id: int, name: str, category_id: Optional[int]) -> None:
+        previous = self._names.get(index_id)
+        if previous == (name, category_id):
+            return
+        if previous is not None and previous[0] == name and category_id is not None and index_id in self._columns:
+            # Zmiana samej kategorii - wektor nazwy bez zmian
+            self._category_ids[self._columns[index_id]] = category_id
+            self._names[index_id] = (name, category_id)
+            return
+        self.remove(index_id)
+        if category_id is not None:
+            self._names[index_id] = (name, category_id)
+            self._pending.append((index_id, name, category_id))
+            self._changes += 1
+
+    def remove(self, index_id: int) -> None:
+        if self._names.pop(index_id, None) is None:
+            return
+        column = self._columns.pop(index_id, None)
+        if column is not None:
+            self._live[column] = False
+            self._changes += 1
+        self._pending = [item for item in self._pending if item[0] != index_id]
+
+    def suggest(self, names: List[str], neighbours: Optional[int] = None) -> List[Optional[CategorySuggestion]]:
+        """Propozycja kategorii dla każdej nazwy (None, gdy brak podobnych indeksów)."""
+        self._flush_pending()
+        if not names:
+            return []
+        if not len(self._index_ids):
+            return [None] * len(names)
+        neighbours = neighbours or config.CATEGORY_SUGGESTION_NEIGHBOURS
+        vectors = self._vectorize(names)
+        similarities = vectors @ self._matrix
+        if self._delta.shape[1]:
+            similarities = sparse.hstack([similarities, vectors @ self._delta], format="csr")
+        similarities = similarities.tocsr()
+
+        suggestions: List[Optional[CategorySuggestion]] = []
+        for row in range(len(names)):
+            start, end = similarities.indptr[row], similarities.indptr[row + 1]
+            values, columns = similarities.data[start:end], similarities.indices[start:end]
+            keep = (values > 0) & self._live[columns]
+            values, columns = values[keep], columns[keep]
+            if not len(values):
+                suggestions.append(None)
+                continue
+            if len(values) > neighbours:
+                nearest = np.argpartition(values, -neighbours)[-neighbours:]
+                values, columns = values[nearest], columns[nearest]
+            categories = self._category_ids[columns]
+            votes: Dict[int, float] = {}
+            for category_id, value in zip(categories.tolist(), values.tolist()):
+                votes[category_id] = votes.get(category_id, 0.0) + value
+            category_id = max(votes, key=votes.get)
+            best = int(np.argmax(np.where(categories == category_id, values, -1)))
+            suggestions.append(CategorySuggestion(
+                category_id=category_id,
+                score=round(float(votes[category_id] / values.sum() * values[best]), 4),
+                neighbour_id=int(self._index_ids[columns[best]]),
+                similarity=round(float(values[best]), 4),
+            ))
+        return suggestions
+
+    def apply(self, changes: List[Tuple[str, Any]]) -> None:
+        """Nanosi zmiany zebrane z zatwierdzonej transakcji."""
+        if self._replay is not None:
+            self._replay.extend(changes)
+        for kind, value in changes:
+            if kind == "upsert":
+                self.upsert(*value)
+            elif kind == "remove":
+                self.remove(value)
+            else:
+                self.outdated = True
+
+    def stats(self) -> dict:
+        return {
+            "indexes": len(self._names),
+            "columns": len(self._index_ids),
+            "incremental_columns": self._delta.shape[1],
+            "ngrams": len(self._vocabulary),
+        }
+
+
+category_suggester = CategorySuggester()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    if category_suggester.loaded_at is None:
+        return
+    changes = session.info.setdefault(_PENDING_KEY, [])
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Index) and (obj in session.new or session.is_modified(obj)):
+            state = inspect(obj).dict
+            if all(name in state for name in ("id", "name", "category_id")):
+                changes.append(("upsert", (state["id"], state["name"], state["category_id"])))
+            else:
+                changes.append(("reload", None))
+    for obj in session.deleted:
+        if isinstance(obj, Index):
+            changes.append(("remove", obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        category_suggester.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -2,12 +2,12 @@ from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import create_async_engine
 from src.db.models import *
 from src.config import config
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 engine = create_async_engine(
     config.DATABASE_URL,
-    echo=True # Set to True for debugging, False for production
+    echo=config.DATABASE_ECHO # Set to True for debugging, False for production
 )
 
 async def init_db():
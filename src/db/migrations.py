@@ -0,0 +1,117 @@
+"""
+Koordynacja migracji bazy danych przy starcie aplikacji.
+
+Migracje uruchamiane są raz - w procesie master gunicorna (hook `on_starting`)
+albo w fazie release (`python scripts/auto_migrate.py`) - przez API Alembica,
+bez podprocesów. Workery wykonują jedynie tani odczyt wersji schematu.
+"""
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import pool, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+
+from src.config import config
+from src.db.models import *
+from src.db.partitions import ensure_future_partitions, partition_tables
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+ALEMBIC_INI = PROJECT_ROOT / "alembic.ini"
+
+# Stały klucz blokady doradczej Postgresa - wspólny dla wszystkich procesów aplikacji
+MIGRATION_LOCK_KEY = 0x62696C6C73  # "bills"
+
+
+def _alembic_config():
+    """Tworzy konfigurację Alembica niezależną od katalogu roboczego."""
+    # Alembic importowany leniwie - workery potrzebują go tylko do odczytu head
+    from alembic.config import Config
+
+    alembic_cfg = Config(str(ALEMBIC_INI))
+    alembic_cfg.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    alembic_cfg.set_main_option("sqlalchemy.url", config.DATABASE_URL)
+    return alembic_cfg
+
+
+@lru_cache(maxsize=1)
+def get_head_revision() -> Optional[str]:
+    """Zwraca docelową rewizję (head) ze skryptów migracji."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def _upgrade(connection: Connection) -> None:
+    """Uruchamia migracje na przekazanym połączeniu (wewnątrz transakcji)."""
+    from alembic import command
+
+    if connection.dialect.name == "postgresql":
+        # Blokada zwalniana automatycznie przy zakończeniu transakcji
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"),
+            {"key": MIGRATION_LOCK_KEY}
+        )
+
+    alembic_cfg = _alembic_config()
+    alembic_cfg.attributes["connection"] = connection
+    command.upgrade(alembic_cfg, "head")
+
+    SQLModel.metadata.create_all(connection)
+
+    # Tabele utworzone właśnie przez create_all są jeszcze zwykłe - konwersja jest
+    # idempotentna; potem partycje na kolejne miesiące (PostgreSQL). Retencja
+    # usuwa dane, więc tylko z crona (scripts/maintain_partitions.py), nie przy starcie
+    partition_tables(connection)
+    ensure_future_partitions(connection, config.PARTITION_MONTHS_AHEAD)
+
+
+async def migrate_database() -> bool:
+    """
+    Uruchamia migracje do najnowszej wersji pod blokadą doradczą.
+
+    Używa osobnego silnika bez puli połączeń, żeby proces master gunicorna
+    nie przekazywał otwartych połączeń do forkowanych workerów.
+    """
+    print("🔄 Migrating database...")
+    migration_engine = create_async_engine(config.DATABASE_URL, poolclass=pool.NullPool)
+
+    try:
+        async with migration_engine.begin() as conn:
+            await conn.run_sync(_upgrade)
+
+        print(f"✅ Database migrated to revision: {get_head_revision()}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        logger.exception("Database migration failed")
+        return False
+
+    finally:
+        await migration_engine.dispose()
+
+
+async def check_schema_version(engine: AsyncEngine) -> bool:
+    """Sprawdza czy baza jest zmigrowana do wersji oczekiwanej przez kod."""
+    expected = get_head_revision()
+
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            current = result.scalar()
+    except Exception as e:
+        print(f"⚠️  Could not read schema version: {e}")
+        return False
+
+    if current != expected:
+        print(f"⚠️  Schema version mismatch: database={current}, expected={expected}")
+        print("   Run: python scripts/auto_migrate.py")
+        return False
+
+    return True
@@ -1,10 +1,11 @@
 import enum
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
-from sqlmodel import Field, Relationship, SQLModel, Column, DateTime, Numeric, func, JSON
-from sqlalchemy import BigInteger, ForeignKey
+from sqlmodel import Field, Relationship, SQLModel, Column, Date, DateTime, Numeric, func, JSON
+from sqlalchemy import BigInteger, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import Index as DbIndex
 
 # --- Enum dla statusu przetwarzania ---
 
@@ -38,6 +39,7 @@ class Shop(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(unique=True, index=True)
     address: Optional[str] = Field(default=None)
+    tax_id: Optional[str] = Field(default=None, index=True)  # NIP - 10 cyfr bez kresek
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
@@ -48,6 +50,22 @@ class Shop(SQLModel, table=True):
     )
 
     bills: List["Bill"] = Relationship(back_populates="shop")
+    aliases: List["ShopAlias"] = Relationship(back_populates="shop")
+
+class ShopAlias(SQLModel, table=True):
+    """
+    Dodatkowa nazwa sklepu z nagłówków rachunków (src/shop/resolver.py),
+    zapisana znormalizowana - np. "lidl polska" dla sklepu "Lidl".
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int = Field(foreign_key="shop.id", index=True)
+    alias: str = Field(unique=True)
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+
+    shop: Optional[Shop] = Relationship(back_populates="aliases")
 
 class Category(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -86,6 +104,14 @@ class Index(SQLModel, table=True):
     bill_items: List["BillItem"] = Relationship(back_populates="index")
 
 class Bill(SQLModel, table=True):
+    # Wyszukiwanie rachunków (src/bill/services.py:search_bills): filtr użytkownika,
+    # opcjonalnie sklepu/statusu, zakres i kolejność (bill_date, id) - stronicowanie po kluczu
+    __table_args__ = (
+        DbIndex("ix_bill_user_id_bill_date_id", "user_id", "bill_date", "id"),
+        DbIndex("ix_bill_user_id_shop_id_bill_date_id", "user_id", "shop_id", "bill_date", "id"),
+        DbIndex("ix_bill_user_id_status_bill_date_id", "user_id", "status", "bill_date", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     bill_date: datetime
     total_amount: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
@@ -107,6 +133,9 @@ class Bill(SQLModel, table=True):
     shop_id: Optional[int] = Field(default=None, foreign_key="shop.id")
     shop: Optional[Shop] = Relationship(back_populates="bills")
 
+    # Rachunek rozpoznany jako duplikat wcześniejszego (src/bill/dedup.py)
+    duplicate_of_id: Optional[int] = Field(default=None, foreign_key="bill.id")
+
     items: List["BillItem"] = Relationship(
         back_populates="bill",
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
@@ -127,17 +156,118 @@ class BillItem(SQLModel, table=True):
     index_id: Optional[int] = Field(default=None, foreign_key="index.id")
     index: Optional[Index] = Relationship(back_populates="bill_items")
     
+    # Klucz partycjonowania w PostgreSQL (src/db/partitions.py)
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    )
+
+class BillFingerprint(SQLModel, table=True):
+    """
+    Odciski rachunku do wykrywania duplikatów (src/bill/dedup.py): SHA-256
+    treści (sklep, dzień, suma, pozycje) i skrót percepcyjny zdjęcia podzielony
+    na 4 pasma po 16 bitów - każde z własnym indeksem.
+    """
+    __table_args__ = (
+        DbIndex("ix_billfingerprint_user_id_fingerprint", "user_id", "fingerprint"),
+        DbIndex("ix_billfingerprint_user_id_phash_band_0", "user_id", "phash_band_0"),
+        DbIndex("ix_billfingerprint_user_id_phash_band_1", "user_id", "phash_band_1"),
+        DbIndex("ix_billfingerprint_user_id_phash_band_2", "user_id", "phash_band_2"),
+        DbIndex("ix_billfingerprint_user_id_phash_band_3", "user_id", "phash_band_3"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bill_id: int = Field(foreign_key="bill.id", unique=True)
+    user_id: int = Field(foreign_key="user.id")
+    fingerprint: Optional[str] = Field(default=None)
+    phash: Optional[int] = Field(default=None, sa_column=Column("phash", BigInteger))  # 64 bity ze znakiem
+    phash_band_0: Optional[int] = Field(default=None)
+    phash_band_1: Optional[int] = Field(default=None)
+    phash_band_2: Optional[int] = Field(default=None)
+    phash_band_3: Optional[int] = Field(default=None)
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
 
+class PriceHistory(SQLModel, table=True):
+    """
+    Dzienny agregat cen jednostkowych produktu w sklepie (src/prices/services.py).
+    Średnia = price_sum / price_count - obie wartości można aktualizować przyrostowo.
+    """
+    __table_args__ = (UniqueConstraint("index_id", "shop_id", "day"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    index_id: int = Field(foreign_key="index.id")
+    shop_id: int = Field(foreign_key="shop.id")
+    day: date = Field(sa_column=Column(Date, nullable=False))  # Dzień z Bill.bill_date
+    min_price: Decimal = Field(sa_column=Column(Numeric(10, 2), nullable=False))
+    max_price: Decimal = Field(sa_column=Column(Numeric(10, 2), nullable=False))
+    price_sum: Decimal = Field(sa_column=Column(Numeric(14, 2), nullable=False))
+    price_count: int
+
+class ReceiptParseResult(SQLModel, table=True):
+    """Zapamiętany wynik rozpoznania rachunku dla treści obrazu i wersji parsera."""
+    __table_args__ = (UniqueConstraint("content_hash", "parser_version"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_hash: str = Field(index=True)  # SHA-256 treści (obrazu lub stron rachunku)
+    parser_version: str
+    result: Dict[str, Any] = Field(sa_column=Column(JSON))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+
+class SyncChange(SQLModel, table=True):
+    """
+    Dziennik zmian rachunków, pozycji i wiadomości do synchronizacji
+    przyrostowej (src/sync/). `seq` to numer zmiany użytkownika w kolejności
+    commit (licznik `SyncSequence`) i kursor klienta; usunięcie zapisywane
+    jest jako zmiana z `deleted` (tombstone). `user_id` to User.id - bez
+    klucza obcego, dziennik nie blokuje usuwania.
+    """
+    __table_args__ = (DbIndex("ix_syncchange_user_id_seq", "user_id", "seq", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    seq: int = Field(sa_column=Column("seq", BigInteger, nullable=False))
+    entity: str  # bill, item lub message
+    entity_id: int
+    deleted: bool = Field(default=False)
+    changed_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # UTC bez strefy, czas flush
+
+class SyncSequence(SQLModel, table=True):
+    """
+    Ostatni przydzielony `SyncChange.seq` użytkownika. Zwiększany przez
+    UPDATE, który blokuje wiersz do końca transakcji - numery zmian jednego
+    użytkownika rosną w kolejności zatwierdzania (src/sync/changes.py).
+    """
+    user_id: int = Field(sa_column=Column("user_id", BigInteger, primary_key=True, autoincrement=False))
+    seq: int = Field(default=0, sa_column=Column("seq", BigInteger, nullable=False, server_default="0"))
+
+class ArchivedFile(SQLModel, table=True):
+    """Położenie pliku przeniesionego do segmentu archiwum (src/files/archive.py)."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    file_path: str = Field(sa_column=Column("file_path", String, unique=True, index=True))  # Pierwotna ścieżka
+    segment: str  # Nazwa pliku segmentu w katalogu archiwum
+    offset: int = Field(sa_column=Column("offset", BigInteger, nullable=False))  # Początek danych w segmencie
+    length: int
+    original_size: int
+    media_type: str
+    sha256: str  # Skrót zapisanych danych - kontrola przy odczycie
+    archived_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+    )
+
 # =============================================================================
 # Telegram Integration Models
 # =============================================================================
 
 class TelegramMessageStatus(str, enum.Enum):
     SENT = "sent"
+    PROCESSING = "processing"  # Część albumu przejęta do przetworzenia
     DELIVERED = "delivered"
     READ = "read"
     FAILED = "failed"
@@ -153,8 +283,9 @@ class TelegramMessageType(str, enum.Enum):
 
 class TelegramMessage(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Bez unique - w partycjonowanej tabeli nie jest możliwy; unikalność pilnuje TelegramMessageKey
     telegram_message_id: int = Field(
-        sa_column=Column("telegram_message_id", BigInteger, unique=True, index=True)
+        sa_column=Column("telegram_message_id", BigInteger, index=True)
     )
     chat_id: int = Field(
         sa_column=Column("chat_id", BigInteger, index=True)
@@ -163,11 +294,15 @@ class TelegramMessage(SQLModel, table=True):
     content: str
     file_id: Optional[str] = Field(default=None)
     file_path: Optional[str] = Field(default=None)  # Lokalna ścieżka do pobranego pliku
+    media_group_id: Optional[str] = Field(default=None, index=True)  # Album (kilka zdjęć jednego rachunku)
     status: TelegramMessageStatus = Field(default=TelegramMessageStatus.SENT)
     error_message: Optional[str] = Field(default=None)
+    # Liczba przejęć części albumu do przetworzenia (limit TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS)
+    attempts: int = Field(default=0, sa_column=Column("attempts", Integer, nullable=False, server_default="0"))
+    # Klucz partycjonowania w PostgreSQL (src/db/partitions.py)
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
-        sa_column=Column(DateTime(timezone=True), server_default=func.now())
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), index=True)
     )
     updated_at: datetime = Field(
         default_factory=datetime.utcnow,
@@ -181,4 +316,20 @@ class TelegramMessage(SQLModel, table=True):
     
     # Relacja do rachunku (jeśli wiadomość zawierała zdjęcie rachunku)
     bill_id: Optional[int] = Field(default=None, foreign_key="bill.id")
-    bill: Optional[Bill] = Relationship(back_populates="telegram_messages")
\ No newline at end of file
+    bill: Optional[Bill] = Relationship(back_populates="telegram_messages")
+
+class TelegramMessageKey(SQLModel, table=True):
+    """
+    Klucz (czat, id wiadomości Telegrama) każdej zapisanej wiadomości.
+
+    Zwykła, niepartycjonowana tabela: w partycjonowanej `telegrammessage`
+    indeks unikalny musiałby obejmować `created_at` (src/db/partitions.py).
+    Zapisywany w transakcji wiadomości - ponowiony przez Telegram webhook
+    kończy się IntegrityError i nie tworzy drugiej wiadomości ani rachunku.
+    """
+    chat_id: int = Field(sa_column=Column("chat_id", BigInteger, primary_key=True))
+    telegram_message_id: int = Field(sa_column=Column("telegram_message_id", BigInteger, primary_key=True))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    )
@@ -0,0 +1,365 @@
+"""
+Partycjonowanie zakresowe po miesiącach `created_at` (tylko PostgreSQL).
+
+Tabele rosnące w czasie (`telegrammessage`, `billitem`) są partycjonowane
+deklaratywnie: `PARTITION BY RANGE (created_at)`, jedna partycja na miesiąc
+(`<tabela>_pRRRR_MM`) i partycja domyślna (`<tabela>_default`) dla wierszy
+spoza utworzonych zakresów. Klucz partycjonowania musi wchodzić do klucza
+głównego i indeksów unikalnych, więc klucz główny w bazie to
+`(id, created_at)`; ORM nadal identyfikuje wiersze po `id`. Unikalność
+bez klucza partycjonowania (`telegram_message_id`) pilnuje osobna, zwykła
+tabela `telegrammessagekey`.
+
+Zadanie utrzymaniowe (`maintain_partitions`, scripts/maintain_partitions.py
+z crona) tworzy partycje na kolejne miesiące i stosuje retencję: stare
+partycje wiadomości są odłączane (DETACH) i przenoszone do schematu
+`archive` albo usuwane - bez masowych DELETE. Migracje przy starcie tworzą
+tylko partycje (`ensure_future_partitions`), retencji nie uruchamiają. Na
+innych bazach (SQLite lokalnie) wszystkie funkcje nic nie robią.
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("telegrammessage", "billitem")
+# Retencja dotyczy tylko wiadomości - pozycje rachunków to dane użytkownika
+RETENTION_TABLES = ("telegrammessage",)
+PARTITION_KEY = "created_at"
+# Klucze (chat_id, telegram_message_id) - unikalność, której partycjonowana tabela nie zapewni
+MESSAGE_KEY_TABLE = "telegrammessagekey"
+ARCHIVE_SCHEMA = "archive"
+# Komentarz indeksu, który przy konwersji stracił unikalność - `convert_to_plain` ją przywraca
+DEMOTED_UNIQUE_COMMENT = "unique before partitioning"
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+# --- Zakresy miesięcy --------------------------------------------------------
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    # Granice w UTC - niezależne od strefy czasowej sesji
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+# --- Odczyt stanu ------------------------------------------------------------
+
+def is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return bool(conn.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND c.relnamespace = current_schema()::regnamespace)"
+        ),
+        {"table": table}
+    ).scalar())
+
+
+def list_month_partitions(conn: Connection, table: str) -> Dict[date, str]:
+    """Miesięczne partycje tabeli (bez partycji domyślnej), po miesiącu."""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND p.relnamespace = current_schema()::regnamespace"
+        ),
+        {"table": table}
+    ).scalars()
+
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+# --- Konwersja tabeli --------------------------------------------------------
+
+def _capture_schema(conn: Connection, table: str) -> dict:
+    """Indeksy, ograniczenia unikalne i klucze obce tabeli - odtwarzane po konwersji."""
+    inspector = sa.inspect(conn)
+    indexes = [index for index in inspector.get_indexes(table) if not index.get("duplicates_constraint")]
+    for index in indexes:
+        comment = conn.execute(
+            text("SELECT obj_description(to_regclass(:name), 'pg_class')"), {"name": index["name"]}
+        ).scalar()
+        index["unique"] = index["unique"] or comment == DEMOTED_UNIQUE_COMMENT
+    return {
+        "indexes": indexes,
+        "uniques": inspector.get_unique_constraints(table),
+        "foreign_keys": inspector.get_foreign_keys(table),
+        "columns": [column["name"] for column in inspector.get_columns(table)],
+    }
+
+
+def _restore_schema(conn: Connection, table: str, schema: dict, partitioned: bool) -> None:
+    q = conn.dialect.identifier_preparer.quote
+
+    indexed = [list(index["column_names"]) for index in schema["indexes"]]
+    for constraint in schema["uniques"]:
+        indexed.append(list(constraint["column_names"]))
+        # Unikalność bez klucza partycjonowania nie jest możliwa - zostaje zwykły indeks
+        unique = not partitioned or PARTITION_KEY in constraint["column_names"]
+        columns = ", ".join(q(column) for column in constraint["column_names"])
+        if unique:
+            conn.execute(text(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(constraint['name'])} UNIQUE ({columns})"))
+        else:
+            logger.warning(f"{table}: unique constraint {constraint['name']} recreated as a non-unique index")
+            conn.execute(text(f"CREATE INDEX {q(constraint['name'])} ON {q(table)} ({columns})"))
+            conn.execute(text(f"COMMENT ON INDEX {q(constraint['name'])} IS '{DEMOTED_UNIQUE_COMMENT}'"))
+
+    for index in schema["indexes"]:
+        if any(column is None for column in index["column_names"]):
+            logger.warning(f"{table}: expression index {index['name']} not recreated")
+            continue
+        unique = index["unique"] and (not partitioned or PARTITION_KEY in index["column_names"])
+        if index["unique"] and not unique:
+            logger.warning(f"{table}: unique index {index['name']} recreated as non-unique")
+        columns = ", ".join(q(column) for column in index["column_names"])
+        conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {q(index['name'])} ON {q(table)} ({columns})"))
+        if index["unique"] and not unique:
+            conn.execute(text(f"COMMENT ON INDEX {q(index['name'])} IS '{DEMOTED_UNIQUE_COMMENT}'"))
+
+    # Listy i statystyki sortują/filtrują po created_at
+    if not any(columns and columns[0] == PARTITION_KEY for columns in indexed):
+        conn.execute(text(f"CREATE INDEX {q(f'ix_{table}_{PARTITION_KEY}')} ON {q(table)} ({q(PARTITION_KEY)})"))
+
+    for fk in schema["foreign_keys"]:
+        columns = ", ".join(q(column) for column in fk["constrained_columns"])
+        referred = ", ".join(q(column) for column in fk["referred_columns"])
+        options = "".join(
+            f" ON {action.upper()} {fk['options'][action].upper()}"
+            for action in ("ondelete", "onupdate") if fk.get("options", {}).get(action)
+        )
+        conn.execute(text(
+            f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(fk['name'])} FOREIGN KEY ({columns}) "
+            f"REFERENCES {q(fk['referred_table'])} ({referred}){options}"
+        ))
+
+
+def convert_to_partitioned(conn: Connection, table: str, months_ahead: int = 3, today: Optional[date] = None) -> bool:
+    """
+    Zamienia zwykłą tabelę na partycjonowaną po miesiącach, przenosząc dane.
+
+    Idempotentne: pomija tabele już partycjonowane lub nieistniejące.
+    Wykonywane w transakcji wywołującego (DDL w Postgresie jest transakcyjny).
+    """
+    if not is_postgres(conn) or not sa.inspect(conn).has_table(table) or is_partitioned(conn, table):
+        return False
+
+    q = conn.dialect.identifier_preparer.quote
+    legacy = f"{table}_unpartitioned"
+    schema = _capture_schema(conn, table)
+
+    conn.execute(text(f"ALTER TABLE {q(table)} RENAME TO {q(legacy)}"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+
+    conn.execute(text(f"CREATE TABLE {q(table)} (LIKE {q(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE ({q(PARTITION_KEY)})"))
+    conn.execute(text(
+        f"ALTER TABLE {q(table)} ALTER COLUMN {q(PARTITION_KEY)} SET DEFAULT now(), "
+        f"ALTER COLUMN {q(PARTITION_KEY)} SET NOT NULL"
+    ))
+
+    oldest = conn.execute(text(f"SELECT min({q(PARTITION_KEY)}) FROM {q(legacy)}")).scalar()
+    current = month_start(today or _today())
+    month = month_start(oldest) if oldest else current
+    while month <= add_months(current, months_ahead):
+        conn.execute(text(
+            f"CREATE TABLE {q(partition_name(table, month))} PARTITION OF {q(table)} "
+            f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+        ))
+        month = add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE {q(f'{table}_default')} PARTITION OF {q(table)} DEFAULT"))
+
+    columns = ", ".join(q(column) for column in schema["columns"])
+    selected = ", ".join(
+        f"COALESCE({q(column)}, now())" if column == PARTITION_KEY else q(column)
+        for column in schema["columns"]
+    )
+    conn.execute(text(f"INSERT INTO {q(table)} ({columns}) SELECT {selected} FROM {q(legacy)}"))
+
+    if sequence:
+        # Sekwencja id przechodzi na nową tabelę, zanim stara zostanie usunięta
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {q(table)}.id"))
+    conn.execute(text(f"DROP TABLE {q(legacy)}"))
+
+    conn.execute(text(f"ALTER TABLE {q(table)} ADD PRIMARY KEY (id, {q(PARTITION_KEY)})"))
+    _restore_schema(conn, table, schema, partitioned=True)
+    conn.execute(text(f"ANALYZE {q(table)}"))
+    logger.info(f"{table}: converted to monthly range partitions")
+    return True
+
+
+def convert_to_plain(conn: Connection, table: str) -> bool:
+    """Odwrotność `convert_to_partitioned` (downgrade migracji)."""
+    if not is_postgres(conn) or not sa.inspect(conn).has_table(table) or not is_partitioned(conn, table):
+        return False
+
+    q = conn.dialect.identifier_preparer.quote
+    partitioned = f"{table}_partitioned"
+    schema = _capture_schema(conn, table)
+
+    conn.execute(text(f"ALTER TABLE {q(table)} RENAME TO {q(partitioned)}"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": partitioned}).scalar()
+    conn.execute(text(f"CREATE TABLE {q(table)} (LIKE {q(partitioned)} INCLUDING DEFAULTS)"))
+    conn.execute(text(f"INSERT INTO {q(table)} SELECT * FROM {q(partitioned)}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {q(table)}.id"))
+    conn.execute(text(f"DROP TABLE {q(partitioned)}"))
+
+    conn.execute(text(f"ALTER TABLE {q(table)} ADD PRIMARY KEY (id)"))
+    _restore_schema(conn, table, schema, partitioned=False)
+    return True
+
+
+def partition_tables(conn: Connection) -> List[str]:
+    """Konwertuje wszystkie tabele z `PARTITIONED_TABLES`; zwraca nazwy skonwertowanych."""
+    return [
+        table for table in PARTITIONED_TABLES
+        if convert_to_partitioned(conn, table, config.PARTITION_MONTHS_AHEAD)
+    ]
+
+
+# --- Utrzymanie --------------------------------------------------------------
+
+def create_month_partition(conn: Connection, table: str, month: date) -> bool:
+    """
+    Tworzy partycję na miesiąc. Wiersze z tego zakresu, które trafiły do
+    partycji domyślnej, są do niej przenoszone.
+    """
+    q = conn.dialect.identifier_preparer.quote
+    name = partition_name(table, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    default = f"{table}_default"
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    in_range = f"{q(PARTITION_KEY)} >= {lower} AND {q(PARTITION_KEY)} < {upper}"
+    has_rows = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {q(default)} WHERE {in_range})")).scalar()
+
+    if not has_rows:
+        conn.execute(text(f"CREATE TABLE {q(name)} PARTITION OF {q(table)} FOR VALUES FROM ({lower}) TO ({upper})"))
+    else:
+        conn.execute(text(f"CREATE TABLE {q(name)} (LIKE {q(table)} INCLUDING DEFAULTS)"))
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {q(default)} WHERE {in_range} RETURNING *) "
+            f"INSERT INTO {q(name)} SELECT * FROM moved"
+        ))
+        conn.execute(text(f"ALTER TABLE {q(table)} ATTACH PARTITION {q(name)} FOR VALUES FROM ({lower}) TO ({upper})"))
+    return True
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Zapewnia partycje od bieżącego miesiąca do `months_ahead` miesięcy naprzód."""
+    if not is_postgres(conn):
+        return []
+    current = month_start(today or _today())
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if create_month_partition(conn, table, month):
+                created.append(partition_name(table, month))
+    return created
+
+
+def retention_cutoff(retention_months: int, today: Optional[date] = None) -> date:
+    """Początek najstarszego miesiąca wiadomości, który zostaje po retencji."""
+    return add_months(month_start(today or _today()), -retention_months)
+
+
+def apply_retention(conn: Connection, retention_months: int, mode: str = "archive", today: Optional[date] = None) -> List[str]:
+    """
+    Odłącza partycje wiadomości starsze niż `retention_months` pełnych miesięcy.
+
+    `archive` przenosi je do schematu `archive` (bez kluczy obcych - archiwum nie
+    blokuje usuwania rachunków i użytkowników), `drop` usuwa je. Odłączenie nie
+    zapisuje tombstone w dzienniku synchronizacji - klienci dostają granicę
+    retencji w `SyncChanges.messages_since` (src/sync/services.py).
+
+    Pliki odłączonych wiadomości zostają w magazynie. Plik rachunku
+    (`FileService.get_file_by_bill`) znajdowany jest wtedy przez
+    `Bill.image_url`; rachunek bez niego traci powiązanie z plikiem.
+    """
+    if retention_months <= 0:
+        return []
+    if mode not in ("archive", "drop"):
+        raise ValueError(f"Unknown retention mode: {mode}")
+
+    q = conn.dialect.identifier_preparer.quote
+    cutoff = retention_cutoff(retention_months, today)
+    detached = []
+    for table in RETENTION_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for month, name in sorted(list_month_partitions(conn, table).items()):
+            if month >= cutoff:
+                continue
+            conn.execute(text(f"ALTER TABLE {q(table)} DETACH PARTITION {q(name)}"))
+            if mode == "drop":
+                conn.execute(text(f"DROP TABLE {q(name)}"))
+            else:
+                foreign_keys = conn.execute(
+                    text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'f'"),
+                    {"name": name}
+                ).scalars().all()
+                for constraint in foreign_keys:
+                    conn.execute(text(f"ALTER TABLE {q(name)} DROP CONSTRAINT {q(constraint)}"))
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {q(ARCHIVE_SCHEMA)}"))
+                conn.execute(text(f"ALTER TABLE {q(name)} SET SCHEMA {q(ARCHIVE_SCHEMA)}"))
+            detached.append(name)
+
+    # Klucze wiadomości starszych niż retencja - Telegram ponawia aktualizacje najwyżej przez dobę
+    if sa.inspect(conn).has_table(MESSAGE_KEY_TABLE):
+        conn.execute(text(f"DELETE FROM {q(MESSAGE_KEY_TABLE)} WHERE created_at < {_bound(cutoff)}"))
+    return detached
+
+
+def maintain_partitions(conn: Connection, today: Optional[date] = None) -> Dict[str, List[str]]:
+    """Zadanie utrzymaniowe: partycje na przyszłe miesiące i retencja wiadomości."""
+    if not is_postgres(conn):
+        return {"created": [], "detached": []}
+
+    created = ensure_future_partitions(conn, config.PARTITION_MONTHS_AHEAD, today)
+    detached = apply_retention(
+        conn,
+        config.TELEGRAM_MESSAGE_RETENTION_MONTHS,
+        config.PARTITION_RETENTION_MODE,
+        today
+    )
+    if created or detached:
+        logger.info(f"Partition maintenance: created={created}, detached={detached}")
+    return {"created": created, "detached": detached}
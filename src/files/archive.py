@@ -0,0 +1,349 @@
+"""
+Archiwum starych plików w spakowanych segmentach (zimna warstwa).
+
+Zdjęcia rachunków starsze niż `FILE_ARCHIVE_AFTER_DAYS` są rekompresowane
+(JPEG o jakości `FILE_ARCHIVE_JPEG_QUALITY`, dłuższy bok najwyżej
+`FILE_ARCHIVE_MAX_SIDE`) i dopisywane do segmentów
+`uploads/archive/segment_NNNNNN.pack` - wiele plików w jednym pliku, więc
+liczba i-węzłów nie rośnie razem z liczbą rachunków. Położenie pliku
+(segment, przesunięcie, długość) trzyma tabela `ArchivedFile`, a odczyt to
+seek + read. `TelegramMessage.file_path` się nie zmienia - `FileService`
+sięga do archiwum, gdy pliku nie ma już na dysku.
+
+Kolejność kroków chroni przed utratą danych: dopisanie i fsync segmentu,
+commit indeksu, dopiero potem usunięcie oryginałów. Przerwanie po dopisaniu
+zostawia w segmencie nieużywane bajty, a po commicie - oryginał, który
+usuwa `sweep_archived_originals`.
+
+Rekord w segmencie: nagłówek (magic, długość ścieżki, długość danych),
+ścieżka w UTF-8 i dane - segment da się odczytać bez bazy (`iter_segment`).
+"""
+import asyncio
+import fcntl
+import hashlib
+import io
+import mimetypes
+import os
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import exists
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import ArchivedFile, TelegramMessage
+from src.files.storage import get_storage
+
+UPLOADS_DIR = Path("uploads")
+ARCHIVE_DIR = UPLOADS_DIR / "archive"
+# Pliki pochodne (strony PDF, obrazy po przygotowaniu do OCR) - da się je odtworzyć, więc są tylko usuwane
+DERIVED_DIRS = (UPLOADS_DIR / "documents" / "pages", UPLOADS_DIR / "preprocessed")
+# Kopie robocze plików przy magazynie zdalnym (src/files/storage.py) - zostają tylko po przerwanym przetwarzaniu
+WORKING_DIRS = (UPLOADS_DIR / "photos", UPLOADS_DIR / "documents")
+
+RECORD_MAGIC = b"BLA1"
+RECORD_HEADER = struct.Struct(">4sHQ")
+SEGMENT_NAME = "segment_{:06d}.pack"
+RECOMPRESS_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+@dataclass
+class PackedFile:
+    file_path: str
+    data: bytes
+    media_type: str
+    original_size: int
+
+
+@dataclass
+class SegmentRecord:
+    file_path: str
+    segment: str
+    offset: int  # Początek danych (za nagłówkiem i ścieżką)
+    length: int
+
+
+def recompress(data: bytes, file_path: str, quality: int, max_side: int) -> Tuple[bytes, str]:
+    """Zwraca (dane, typ MIME); zostawia oryginał, gdy rekompresja nic nie daje."""
+    media_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    if Path(file_path).suffix.lower() not in RECOMPRESS_SUFFIXES:
+        return data, media_type
+
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.draft("RGB", (max_side, max_side))
+            image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not recompress {file_path}: {e}")
+        return data, media_type
+
+    packed = buffer.getvalue()
+    if len(packed) >= len(data):
+        return data, media_type
+    return packed, "image/jpeg"
+
+
+def pack_file(file_path: str, quality: int, max_side: int) -> PackedFile:
+    data = Path(file_path).read_bytes()
+    packed, media_type = recompress(data, file_path, quality, max_side)
+    return PackedFile(file_path=file_path, data=packed, media_type=media_type, original_size=len(data))
+
+
+class SegmentStore:
+    """Segmenty archiwum - pliki tylko do dopisywania o rozmiarze do `segment_size`."""
+
+    def __init__(self, directory: Path, segment_size: int):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Wyłączna blokada zapisu; drugie zadanie archiwizacji dostaje BlockingIOError."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("segment_*.pack"))
+
+    def _writable_segment(self) -> Path:
+        segments = self.segments()
+        if segments and segments[-1].stat().st_size < self.segment_size:
+            return segments[-1]
+        number = int(segments[-1].stem.split("_")[1]) + 1 if segments else 1
+        return self.directory / SEGMENT_NAME.format(number)
+
+    def _sync_directory(self) -> None:
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def append(self, files: List[PackedFile]) -> List[SegmentRecord]:
+        """Dopisuje pliki i wykonuje fsync - zwrócone położenia są trwałe."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        records = []
+        handle = None
+        try:
+            for packed in files:
+                if handle is None or handle.tell() >= self.segment_size:
+                    if handle is not None:
+                        handle.flush()
+                        os.fsync(handle.fileno())
+                        handle.close()
+                    handle = open(self._writable_segment(), "ab")
+                    handle.seek(0, os.SEEK_END)
+
+                name = packed.file_path.encode("utf-8")
+                start = handle.tell()
+                handle.write(RECORD_HEADER.pack(RECORD_MAGIC, len(name), len(packed.data)))
+                handle.write(name)
+                handle.write(packed.data)
+                records.append(SegmentRecord(
+                    file_path=packed.file_path,
+                    segment=Path(handle.name).name,
+                    offset=start + RECORD_HEADER.size + len(name),
+                    length=len(packed.data),
+                ))
+            if handle is not None:
+                handle.flush()
+                os.fsync(handle.fileno())
+        finally:
+            if handle is not None:
+                handle.close()
+        self._sync_directory()
+        return records
+
+    def read(self, segment: str, offset: int, length: int) -> bytes:
+        with open(self.directory / Path(segment).name, "rb") as handle:
+            handle.seek(offset)
+            data = handle.read(length)
+        if len(data) != length:
+            raise OSError(f"Archive segment {segment} is truncated at offset {offset}")
+        return data
+
+
+def iter_segment(path: Path) -> Iterator[SegmentRecord]:
+    """Odczytuje rekordy segmentu bez indeksu; kończy na uszkodzonym rekordzie."""
+    size = path.stat().st_size
+    with open(path, "rb") as handle:
+        while True:
+            start = handle.tell()
+            header = handle.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            magic, name_length, length = RECORD_HEADER.unpack(header)
+            offset = start + RECORD_HEADER.size + name_length
+            if magic != RECORD_MAGIC or offset + length > size:
+                print(f"⚠️ Damaged record in {path.name} at offset {start}")
+                return
+            name = handle.read(name_length).decode("utf-8")
+            yield SegmentRecord(file_path=name, segment=path.name, offset=offset, length=length)
+            handle.seek(length, os.SEEK_CUR)
+
+
+archive_store = SegmentStore(ARCHIVE_DIR, config.FILE_ARCHIVE_SEGMENT_SIZE)
+
+
+async def get_archived_file(session: AsyncSession, file_path: str) -> Optional[ArchivedFile]:
+    result = await session.exec(select(ArchivedFile).where(ArchivedFile.file_path == file_path))
+    return result.first()
+
+
+async def read_archived_file(entry: ArchivedFile, store: SegmentStore = archive_store) -> bytes:
+    data = await asyncio.to_thread(store.read, entry.segment, entry.offset, entry.length)
+    if hashlib.sha256(data).hexdigest() != entry.sha256:
+        raise OSError(f"Archived file {entry.file_path} failed checksum verification")
+    return data
+
+
+def _is_uploaded_file(file_path: str) -> bool:
+    path = Path(file_path)
+    return path.resolve().is_relative_to(UPLOADS_DIR.resolve()) and path.is_file()
+
+
+def _prune_derived(cutoff: datetime, dry_run: bool, directories: Tuple[Path, ...] = DERIVED_DIRS) -> Tuple[int, int]:
+    removed = freed = 0
+    threshold = cutoff.timestamp()
+    for directory in directories:
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            stat = path.stat()
+            if path.is_file() and stat.st_mtime < threshold:
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
+
+
+async def archive_old_files(
+    session: AsyncSession,
+    older_than_days: Optional[int] = None,
+    limit: int = 5000,
+    batch_size: int = 100,
+    dry_run: bool = False,
+    store: SegmentStore = archive_store,
+) -> dict:
+    """
+    Przenosi pliki wiadomości starszych niż `older_than_days` do segmentów
+    archiwum i usuwa stare pliki pochodne. Zwraca statystyki przebiegu.
+    """
+    days = config.FILE_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    stats = {
+        "archived": 0,
+        "missing": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "derived_removed": 0,
+        "derived_bytes": 0,
+    }
+
+    if not get_storage().is_local:
+        # Pliki są w magazynie zdalnym (zimną warstwę zapewniają reguły cyklu życia bucketu);
+        # na dysku zostają tylko pliki pochodne i porzucone kopie robocze
+        stats["derived_removed"], stats["derived_bytes"] = await asyncio.to_thread(
+            _prune_derived, cutoff, dry_run, DERIVED_DIRS + WORKING_DIRS
+        )
+        return stats
+
+    last_id = 0
+    while stats["archived"] < limit:
+        stmt = (
+            select(TelegramMessage.id, TelegramMessage.file_path)
+            .where(
+                TelegramMessage.file_path.isnot(None),
+                TelegramMessage.created_at < cutoff,
+                TelegramMessage.id > last_id,
+                ~exists().where(ArchivedFile.file_path == TelegramMessage.file_path),
+            )
+            .order_by(TelegramMessage.id)
+            .limit(batch_size)
+        )
+        rows = (await session.exec(stmt)).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        paths = []
+        for _, file_path in rows:
+            if file_path in paths:
+                continue
+            if _is_uploaded_file(file_path):
+                paths.append(file_path)
+            else:
+                stats["missing"] += 1
+        paths = paths[:limit - stats["archived"]]
+        if not paths:
+            continue
+
+        packed = [
+            await asyncio.to_thread(pack_file, path, config.FILE_ARCHIVE_JPEG_QUALITY, config.FILE_ARCHIVE_MAX_SIDE)
+            for path in paths
+        ]
+        stats["bytes_before"] += sum(item.original_size for item in packed)
+        stats["bytes_after"] += sum(len(item.data) for item in packed)
+        stats["archived"] += len(packed)
+        if dry_run:
+            continue
+
+        records = await asyncio.to_thread(store.append, packed)
+        session.add_all([
+            ArchivedFile(
+                file_path=record.file_path,
+                segment=record.segment,
+                offset=record.offset,
+                length=record.length,
+                original_size=item.original_size,
+                media_type=item.media_type,
+                sha256=hashlib.sha256(item.data).hexdigest(),
+            )
+            for item, record in zip(packed, records)
+        ])
+        await session.commit()
+
+        for path in paths:
+            Path(path).unlink(missing_ok=True)
+
+    stats["derived_removed"], stats["derived_bytes"] = await asyncio.to_thread(_prune_derived, cutoff, dry_run)
+    return stats
+
+
+async def sweep_archived_originals(session: AsyncSession, batch_size: int = 1000) -> int:
+    """Usuwa oryginały plików, które są już w archiwum (np. po przerwanym zadaniu)."""
+    removed = 0
+    last_id = 0
+    while True:
+        stmt = (
+            select(ArchivedFile.id, ArchivedFile.file_path)
+            .where(ArchivedFile.id > last_id)
+            .order_by(ArchivedFile.id)
+            .limit(batch_size)
+        )
+        rows = (await session.exec(stmt)).all()
+        if not rows:
+            return removed
+        last_id = rows[-1][0]
+        for _, file_path in rows:
+            if _is_uploaded_file(file_path):
+                Path(file_path).unlink()
+                removed += 1
@@ -1,15 +1,14 @@
 """
 Endpointy API do zarządzania plikami w aplikacji Bills.
 """
-from pathlib import Path
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Response
 from fastapi.responses import FileResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.db.main import get_session
 from src.files.services import FileService
-from src.files.schemas import FileInfo, FileResponse as FileResponseSchema
+from src.files.schemas import FileAccessRequest, FileAccessResponse, FileInfo, FileResponse as FileResponseSchema
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
@@ -34,7 +33,7 @@ async def get_file_info(
         safe_path = FileService.get_safe_file_path(file_path)
         
         # Pobierz informacje o pliku
-        file_info = FileService._get_file_info(safe_path)
+        file_info = await FileService._get_file_info(safe_path)
         
         if not file_info:
             raise HTTPException(
@@ -57,102 +56,63 @@ async def get_file_info(
         )
 
 
-@router.get("/{file_path:path}", response_model=None)
-async def serve_file(
-    file_path: str,
+@router.post("/access", response_model=FileAccessResponse)
+async def create_file_access(
+    access_request: FileAccessRequest,
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session)
-) -> FileResponse:
+) -> FileAccessResponse:
     """
-    Serwuje plik do pobrania.
+    Sprawdza dostęp do pliku i wydaje podpisany, wygasający adres.
     
     Args:
-        file_path: Ścieżka do pliku (względna do katalogu uploads)
+        access_request: Plik (bill_id, message_id lub file_path), użytkownik i ważność adresu
+        request: Żądanie HTTP (do zbudowania adresu)
+        response: Odpowiedź HTTP (status przy odmowie)
         session: Sesja bazy danych
     
     Returns:
-        FileResponse: Plik do pobrania
+        FileAccessResponse: Adres pliku i czas wygaśnięcia
     """
-    print(f"🔍 DEBUG: serve_file called with file_path: {file_path}")
-    
     try:
-        # Upewnij się, że katalogi istnieją
-        print(f"🔧 Ensuring directories exist...")
-        FileService._ensure_directories()
-        print(f"✅ Directories ensured")
-        
-        # DEBUG: Wyświetl wszystkie pliki w katalogu uploads
-        print("🔍 DEBUG: Listing all files in uploads directory...")
-        uploads_dir = Path(FileService.UPLOADS_DIR)
-        if uploads_dir.exists():
-            print(f"📁 Uploads directory: {uploads_dir.absolute()}")
-            file_count = 0
-            for root in uploads_dir.rglob("*"):
-                if root.is_file():
-                    file_count += 1
-                    file_size = root.stat().st_size if root.exists() else 0
-                    print(f"  📄 {root} ({file_size} bytes)")
-            print(f"📊 Total files found: {file_count}")
-        else:
-            print(f"❌ Uploads directory does not exist: {uploads_dir.absolute()}")
-        
-        print(f"🎯 Requested file path: {file_path}")
-        
-        # Waliduj ścieżkę pliku
-        print(f"🔍 Validating file path...")
-        safe_path = FileService.get_safe_file_path(file_path)
-        print(f"✅ Safe file path: {safe_path} (type: {type(safe_path)})")
-        
-        # Sprawdź czy plik istnieje
-        print(f"🔍 Checking if file exists...")
-        path_obj = Path(safe_path)
-        if not path_obj.exists():
-            print(f"❌ File does not exist: {safe_path}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found"
-            )
-        
-        print(f"✅ File exists: {safe_path}")
-        
-        # Pobierz typ MIME
-        print(f"🔍 Getting MIME type...")
-        media_type = FileService.get_file_content_type(safe_path)
-        print(f"📄 Media type: {media_type} (type: {type(media_type)})")
+        base_path = request.url.path.rsplit("/access", 1)[0] + "/signed"
+        access = await FileService.create_file_access(session, access_request, base_path)
+        if not access.access_granted:
+            response.status_code = status.HTTP_403_FORBIDDEN
+        return access
         
-        # Przygotuj dane
-        filename = path_obj.name
-        print(f"📄 Filename: {filename} (type: {type(filename)})")
-        
-        # Konwertuj wszystko na string
-        safe_path_str = str(safe_path)
-        filename_str = str(filename)
-        media_type_str = str(media_type)
-        
-        print(f"📄 Final values - path: {safe_path_str}, filename: {filename_str}, media_type: {media_type_str}")
-        
-        # Utwórz FileResponse
-        print(f"🔍 Creating FileResponse...")
-        response = FileResponse(
-            path=safe_path_str,
-            media_type=media_type_str,
-            filename=filename_str
-        )
-        print(f"✅ FileResponse created successfully: {response}")
-        return response
-        
-    except HTTPException as e:
-        print(f"❌ HTTPException in serve_file: {e}")
+    except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Exception in serve_file: {e}")
-        import traceback
-        traceback.print_exc()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error serving file: {str(e)}"
+            detail=f"Error creating file access: {str(e)}"
         )
 
 
+@router.get("/signed/{file_path:path}", response_model=None)
+async def serve_signed_file(
+    file_path: str,
+    expires: int = Query(..., description="Czas wygaśnięcia (timestamp UNIX)"),
+    signature: str = Query(..., description="Podpis HMAC adresu"),
+    archive: Optional[str] = Query(None, description="Położenie pliku w segmencie archiwum")
+) -> Response:
+    """
+    Serwuje plik z podpisanego adresu (bez dostępu do bazy danych).
+    
+    Args:
+        file_path: Ścieżka pliku z adresu
+        expires: Czas wygaśnięcia adresu
+        signature: Podpis adresu
+        archive: Podpisane położenie pliku w archiwum
+    
+    Returns:
+        Response: Plik, albo nagłówek X-Accel-Redirect/X-Sendfile dla proxy
+    """
+    return FileService.signed_file_response(file_path, expires, signature, archive)
+
+
 @router.get("/telegram/{message_id}/file", response_model=None)
 async def get_telegram_message_file(
     message_id: int,
@@ -171,24 +131,6 @@ async def get_telegram_message_file(
     try:
         print(f"🔍 DEBUG: Getting file for Telegram message ID: {message_id}")
         
-        # Upewnij się, że katalogi istnieją
-        FileService._ensure_directories()
-        
-        # DEBUG: Wyświetl wszystkie pliki w katalogu uploads
-        print("🔍 DEBUG: Listing all files in uploads directory...")
-        uploads_dir = Path(FileService.UPLOADS_DIR)
-        if uploads_dir.exists():
-            print(f"📁 Uploads directory: {uploads_dir.absolute()}")
-            for root, dirs, files in uploads_dir.rglob("*"):
-                if files:
-                    print(f"  📂 {root}:")
-                    for file in files:
-                        file_path_full = root / file
-                        file_size = file_path_full.stat().st_size if file_path_full.exists() else 0
-                        print(f"    📄 {file} ({file_size} bytes)")
-        else:
-            print(f"❌ Uploads directory does not exist: {uploads_dir.absolute()}")
-        
         # Pobierz plik z wiadomości Telegram
         file_path, file_info = await FileService.get_file_by_telegram_message(
             session, message_id
@@ -204,16 +146,9 @@ async def get_telegram_message_file(
                 detail="File not found"
             )
         
-        # Pobierz typ MIME
-        media_type = FileService.get_file_content_type(file_path)
-        print(f"📄 Media type: {media_type}")
-        
-        # Zwróć plik
-        return FileResponseSchema(
-            path=file_path,
-            media_type=media_type,
-            filename=file_info.file_name
-        )
+        # Zwróć plik (z magazynu lub z archiwum)
+        print(f"📄 Media type: {file_info.file_type}, archived: {file_info.archived}")
+        return await FileService.file_response(session, file_path, file_info)
         
     except HTTPException:
         raise
@@ -285,24 +220,6 @@ async def get_bill_file(
     try:
         print(f"🔍 DEBUG: Getting file for bill ID: {bill_id}")
         
-        # Upewnij się, że katalogi istnieją
-        FileService._ensure_directories()
-        
-        # DEBUG: Wyświetl wszystkie pliki w katalogu uploads
-        print("🔍 DEBUG: Listing all files in uploads directory...")
-        uploads_dir = Path(FileService.UPLOADS_DIR)
-        if uploads_dir.exists():
-            print(f"📁 Uploads directory: {uploads_dir.absolute()}")
-            for root, dirs, files in uploads_dir.rglob("*"):
-                if files:
-                    print(f"  📂 {root}:")
-                    for file in files:
-                        file_path_full = root / file
-                        file_size = file_path_full.stat().st_size if file_path_full.exists() else 0
-                        print(f"    📄 {file} ({file_size} bytes)")
-        else:
-            print(f"❌ Uploads directory does not exist: {uploads_dir.absolute()}")
-        
         # Pobierz plik z rachunku
         file_path, file_info = await FileService.get_file_by_bill(
             session, bill_id
@@ -318,16 +235,9 @@ async def get_bill_file(
                 detail="File not found"
             )
         
-        # Pobierz typ MIME
-        media_type = FileService.get_file_content_type(file_path)
-        print(f"📄 Media type: {media_type}")
-        
-        # Zwróć plik
-        return FileResponseSchema(
-            path=file_path,
-            media_type=media_type,
-            filename=file_info.file_name
-        )
+        # Zwróć plik (z magazynu lub z archiwum)
+        print(f"📄 Media type: {file_info.file_type}, archived: {file_info.archived}")
+        return await FileService.file_response(session, file_path, file_info)
         
     except HTTPException:
         raise
@@ -379,3 +289,42 @@ async def get_bill_file_info(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting bill file info: {str(e)}"
         )
+
+
+# Ścieżka dowolna - rejestrowana na końcu, żeby nie przesłaniała pozostałych endpointów
+@router.get("/{file_path:path}", response_model=None)
+async def serve_file(
+    file_path: str,
+    session: AsyncSession = Depends(get_session)
+) -> Response:
+    """
+    Serwuje plik do pobrania.
+    
+    Args:
+        file_path: Ścieżka do pliku (względna do katalogu uploads)
+        session: Sesja bazy danych
+    
+    Returns:
+        Response: Plik do pobrania (z magazynu plików lub z archiwum)
+    """
+    try:
+        # Waliduj ścieżkę pliku
+        FileService.get_safe_file_path(file_path)
+        
+        # Sprawdź czy plik istnieje (w magazynie lub w archiwum)
+        file_info = await FileService._resolve_file_info(session, file_path)
+        if not file_info.exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+        
+        return await FileService.file_response(session, file_path, file_info)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error serving file: {str(e)}"
+        )
@@ -16,6 +16,7 @@ class FileInfo(SQLModel):
     created_at: datetime
     modified_at: datetime
     exists: bool
+    archived: bool = False  # Plik w segmencie archiwum (src/files/archive.py), nie na dysku
 
 
 class FileResponse(SQLModel):
@@ -31,6 +32,7 @@ class FileAccessRequest(SQLModel):
     user_id: Optional[int] = None
     bill_id: Optional[int] = None
     message_id: Optional[int] = None
+    expires_in: Optional[int] = None  # Ważność adresu w sekundach (domyślnie FILE_URL_TTL)
 
 
 class FileAccessResponse(SQLModel):
@@ -3,15 +3,24 @@ Serwisy do zarządzania plikami w aplikacji Bills.
 """
 import os
 import mimetypes
-from pathlib import Path
+import time
+from pathlib import Path, PurePosixPath
 from typing import Optional, Tuple
 from datetime import datetime, timedelta
-from fastapi import HTTPException, status
+from fastapi import HTTPException, status, Response
+from fastapi.responses import FileResponse, RedirectResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+from src.config import config
 from src.db.models import TelegramMessage, Bill, User
+from src.files.archive import get_archived_file, read_archived_file
 from src.files.schemas import FileInfo, FileAccessRequest, FileAccessResponse
+from src.files.storage import StorageResponse, get_storage, storage_key
+from src.files.signed_urls import (
+    FileRangeResponse, archive_location_valid, archive_segment_path, offload_headers, parse_archive_location,
+    sign_file_url, signing_enabled, verify_file_signature
+)
 
 
 class FileService:
@@ -21,6 +30,11 @@ class FileService:
     UPLOADS_DIR = Path("uploads")
     PHOTOS_DIR = UPLOADS_DIR / "photos"
     DOCUMENTS_DIR = UPLOADS_DIR / "documents"
+    ARCHIVE_DIR = UPLOADS_DIR / "archive"
+    # Katalogi wewnętrzne - nigdy nie są serwowane, nawet jeśli leżą w uploads:
+    # segmenty archiwum (pliki wszystkich użytkowników, odczyt tylko po indeksie)
+    # i dziennik aktualizacji (mógł zostać tu skonfigurowany lub z wcześniejszej wersji)
+    INTERNAL_DIRS = (ARCHIVE_DIR, UPLOADS_DIR / "update_log", Path(config.UPDATE_LOG_DIR))
     
     # Dozwolone typy plików
     ALLOWED_IMAGE_TYPES = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
@@ -36,12 +50,16 @@ class FileService:
         print(f"✅ Directories created successfully")
     
     @classmethod
-    def _get_file_info(cls, file_path: str) -> Optional[FileInfo]:
-        """Pobiera informacje o pliku."""
+    async def _get_file_info(cls, file_path: str) -> FileInfo:
+        """Pobiera informacje o pliku z magazynu plików."""
         try:
-            path = Path(file_path)
+            try:
+                stored = await get_storage().stat(storage_key(file_path))
+            except ValueError:
+                stored = None
             
-            if not path.exists():
+            path = PurePosixPath(Path(file_path).as_posix())
+            if not stored:
                 return FileInfo(
                     file_path=file_path,
                     file_name=path.name,
@@ -52,16 +70,15 @@ class FileService:
                     exists=False
                 )
             
-            stat = path.stat()
-            mime_type, _ = mimetypes.guess_type(str(path))
+            mime_type, _ = mimetypes.guess_type(path.name)
             
             return FileInfo(
-                file_path=str(path),
+                file_path=file_path,
                 file_name=path.name,
-                file_size=stat.st_size,
+                file_size=stored.size,
                 file_type=mime_type or "unknown",
-                created_at=datetime.fromtimestamp(stat.st_ctime),
-                modified_at=datetime.fromtimestamp(stat.st_mtime),
+                created_at=stored.modified_at,
+                modified_at=stored.modified_at,
                 exists=True
             )
         except Exception as e:
@@ -70,6 +87,167 @@ class FileService:
                 detail=f"Error getting file info: {str(e)}"
             )
     
+    @classmethod
+    async def _resolve_file_info(cls, session: AsyncSession, file_path: str) -> FileInfo:
+        """Informacje o pliku z magazynu, a gdy go tam nie ma - z indeksu archiwum."""
+        file_info = await cls._get_file_info(file_path)
+        if file_info.exists:
+            return file_info
+        
+        entry = await get_archived_file(session, file_path)
+        if not entry:
+            return file_info
+        
+        path = Path(file_path)
+        file_name = path.name
+        if entry.media_type != cls.get_file_content_type(file_path):
+            # Rekompresja zmieniła format (np. PNG -> JPEG)
+            file_name = path.stem + (mimetypes.guess_extension(entry.media_type) or path.suffix)
+        return FileInfo(
+            file_path=file_path,
+            file_name=file_name,
+            file_size=entry.length,
+            file_type=entry.media_type,
+            created_at=entry.archived_at,
+            modified_at=entry.archived_at,
+            exists=True,
+            archived=True
+        )
+    
+    @classmethod
+    async def file_response(cls, session: AsyncSession, file_path: str, file_info: FileInfo) -> Response:
+        """Odpowiedź z plikiem - z magazynu (strumieniowo) lub odczytanym z segmentu archiwum."""
+        if not file_info.archived:
+            storage = get_storage()
+            key = storage_key(file_path)
+            local_path = storage.local_path(key)
+            if local_path is not None:
+                return FileResponse(
+                    path=str(local_path),
+                    media_type=cls.get_file_content_type(file_path),
+                    filename=file_info.file_name
+                )
+            return StorageResponse(
+                storage,
+                key,
+                file_info.file_size,
+                media_type=cls.get_file_content_type(file_path),
+                headers={"Content-Disposition": f'attachment; filename="{file_info.file_name}"'}
+            )
+        
+        entry = await get_archived_file(session, file_path)
+        if not entry:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found in archive"
+            )
+        content = await read_archived_file(entry)
+        return Response(
+            content=content,
+            media_type=entry.media_type,
+            headers={"Content-Disposition": f'attachment; filename="{file_info.file_name}"'}
+        )
+    
+    @classmethod
+    async def create_file_access(
+        cls,
+        session: AsyncSession,
+        request: FileAccessRequest,
+        base_path: str
+    ) -> FileAccessResponse:
+        """
+        Sprawdza dostęp do pliku (rachunku, wiadomości lub ścieżki) i wydaje
+        podpisany adres ważny `expires_in` sekund. Jedyny krok z bazą danych.
+        """
+        cls._require_signing()
+        if request.bill_id is not None:
+            file_path, file_info = await cls.get_file_by_bill(session, request.bill_id)
+        elif request.message_id is not None:
+            file_path, file_info = await cls.get_file_by_telegram_message(session, request.message_id)
+        else:
+            cls.get_safe_file_path(request.file_path)
+            file_path = request.file_path
+            file_info = await cls._resolve_file_info(session, file_path)
+            if not file_info.exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="File not found"
+                )
+        
+        if not await cls.validate_file_access(session, file_path, request.user_id):
+            return FileAccessResponse(
+                status="error",
+                message="Access denied",
+                access_granted=False
+            )
+        
+        archived = await get_archived_file(session, file_path) if file_info.archived else None
+        if archived and not archive_location_valid(archived):
+            print(f"❌ Archived file outside its segment: {file_path} ({archived.segment}:{archived.offset}:{archived.length})")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="File not found"
+            )
+        file_url, expires = sign_file_url(base_path, file_path, request.expires_in, archived)
+        return FileAccessResponse(
+            status="success",
+            message="File access granted",
+            access_granted=True,
+            file_url=file_url,
+            expires_at=datetime.utcfromtimestamp(expires)
+        )
+    
+    @staticmethod
+    def _require_signing() -> None:
+        if not signing_enabled():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Signed file URLs are disabled: FILE_URL_SECRET is not set"
+            )
+    
+    @classmethod
+    def signed_file_response(
+        cls,
+        file_path: str,
+        expires: int,
+        signature: str,
+        archive: Optional[str] = None
+    ) -> Response:
+        """Odpowiedź dla podpisanego adresu - bez dostępu do bazy danych."""
+        cls._require_signing()
+        rejected = verify_file_signature(file_path, expires, signature, archive or "")
+        if rejected == "expired":
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="File URL expired")
+        if rejected:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid file URL signature")
+        
+        remaining = max(expires - int(time.time()), 0)
+        headers = {"Cache-Control": f"private, max-age={remaining}"}
+        storage = get_storage()
+        key = storage_key(cls.get_safe_file_path(file_path))
+        path = storage.local_path(key)
+        if path is not None and path.is_file():
+            offloaded = offload_headers(path.resolve(), cls.UPLOADS_DIR)
+            headers["Content-Disposition"] = f'inline; filename="{path.name}"'
+            if offloaded:
+                # Typ i długość ustawia proxy na podstawie pliku
+                return Response(headers={**headers, **offloaded})
+            return FileRangeResponse(path, media_type=cls.get_file_content_type(file_path), headers=headers)
+        
+        presigned_url = None if archive else storage.presigned_url(key, max(remaining, 1))
+        if presigned_url:
+            # Magazyn zdalny wysyła plik bezpośrednio klientowi
+            return RedirectResponse(presigned_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers=headers)
+        
+        if archive:
+            segment, offset, length, media_type = parse_archive_location(archive)
+            return FileRangeResponse(archive_segment_path(segment), offset, length, media_type, headers)
+        
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
     @classmethod
     async def get_file_by_telegram_message(
         cls, 
@@ -105,7 +283,7 @@ class FileService:
             
             # Sprawdź czy plik istnieje
             print(f"🔍 Getting file info for: {message.file_path}")
-            file_info = cls._get_file_info(message.file_path)
+            file_info = await cls._resolve_file_info(session, message.file_path)
             print(f"📄 File info: {file_info}")
             
             if not file_info or not file_info.exists:
@@ -148,21 +326,22 @@ class FileService:
                 )
             
             # Znajdź powiązaną wiadomość Telegram z plikiem
-            stmt = select(TelegramMessage).where(
+            stmt = select(TelegramMessage.file_path).where(
                 TelegramMessage.bill_id == bill_id,
                 TelegramMessage.file_path.isnot(None)
             )
             result = await session.exec(stmt)
-            message = result.first()
+            # Wiadomość mogła zostać odłączona z partycją przez retencję - zostaje zdjęcie rachunku
+            file_path = result.first() or bill.image_url
             
-            if not message or not message.file_path:
+            if not file_path:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="No file associated with this bill"
                 )
             
-            # Sprawdź czy plik istnieje
-            file_info = cls._get_file_info(message.file_path)
+            # Sprawdź czy plik istnieje (na dysku lub w archiwum)
+            file_info = await cls._resolve_file_info(session, file_path)
             
             if not file_info.exists:
                 raise HTTPException(
@@ -170,7 +349,7 @@ class FileService:
                     detail="File not found on disk"
                 )
             
-            return message.file_path, file_info
+            return file_path, file_info
             
         except HTTPException:
             raise
@@ -189,8 +368,8 @@ class FileService:
     ) -> bool:
         """Waliduje czy użytkownik ma dostęp do pliku."""
         try:
-            # Sprawdź czy plik istnieje
-            if not Path(file_path).exists():
+            # Sprawdź czy plik istnieje (w magazynie lub w archiwum)
+            if not (await cls._get_file_info(file_path)).exists and not await get_archived_file(session, file_path):
                 return False
             
             # Jeśli nie podano user_id, sprawdź tylko czy plik istnieje
@@ -225,6 +404,12 @@ class FileService:
                     detail="Access denied: File outside uploads directory"
                 )
             
+            if cls.is_internal_path(path):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied: Internal file"
+                )
+            
             return str(path)
             
         except HTTPException:
@@ -235,6 +420,16 @@ class FileService:
                 detail=f"Error validating file path: {str(e)}"
             )
     
+    @classmethod
+    def is_internal_path(cls, path: Path) -> bool:
+        """Czy ścieżka leży w jednym z katalogów wewnętrznych (`INTERNAL_DIRS`)."""
+        path = Path(path).resolve()
+        for directory in cls.INTERNAL_DIRS:
+            directory = directory.resolve()
+            if path == directory or directory in path.parents:
+                return True
+        return False
+    
     @classmethod
     def get_file_content_type(cls, file_path: str) -> str:
         """Pobiera typ MIME pliku."""
@@ -0,0 +1,187 @@
+"""
+Podpisane, wygasające adresy plików.
+
+Dostęp sprawdzany jest raz, przy wydawaniu adresu (`POST /files/access`).
+Adres zawiera ścieżkę, czas wygaśnięcia i podpis HMAC-SHA256, więc
+serwowanie (`GET /files/signed/...`) nie potrzebuje bazy. Dla plików
+przeniesionych do archiwum (`src/files/archive.py`) podpisywane jest też
+położenie rekordu w segmencie (segment, przesunięcie, długość, typ MIME),
+sprawdzone przy wydawaniu względem rozmiaru segmentu.
+
+Klucz HMAC to wyłącznie `FILE_URL_SECRET` - bez niego (albo z wartością
+domyślną z konfiguracji, znaną publicznie) adresy nie są wydawane ani przyjmowane.
+
+Bajty pliku mogą w ogóle nie przechodzić przez workera:
+
+- `FILE_SERVE_OFFLOAD=x-accel` - nagłówek `X-Accel-Redirect` (nginx, lokalizacja
+  `internal` pod `FILE_ACCEL_REDIRECT_PREFIX`),
+- `FILE_SERVE_OFFLOAD=x-sendfile` - nagłówek `X-Sendfile` (Apache, lighttpd),
+- `none` - odpowiedź z workera przez rozszerzenie ASGI `http.response.zerocopysend`
+  (sendfile), a gdy serwer go nie obsługuje - czytana porcjami w wątku.
+
+Rekordy archiwum nie są osobnymi plikami, więc zawsze wysyła je worker.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src.config import Settings, config
+from src.db.models import ArchivedFile
+from src.files.archive import archive_store
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+# Domyślne klucze z konfiguracji są w repozytorium - podpis nimi da się podrobić
+PLACEHOLDER_SECRETS = frozenset(Settings.model_fields[name].default for name in ("SECRET_KEY", "JWT_SECRET_KEY"))
+
+
+class FileUrlSigningDisabled(RuntimeError):
+    """Brak własnego `FILE_URL_SECRET` - podpisane adresy są wyłączone."""
+
+
+def signing_enabled() -> bool:
+    return bool(config.FILE_URL_SECRET) and config.FILE_URL_SECRET not in PLACEHOLDER_SECRETS
+
+
+def _secret() -> bytes:
+    if not signing_enabled():
+        raise FileUrlSigningDisabled("FILE_URL_SECRET is not set")
+    return config.FILE_URL_SECRET.encode()
+
+
+def _signature(file_path: str, expires: int, location: str) -> str:
+    message = f"{file_path}\n{expires}\n{location}".encode()
+    digest = hmac.new(_secret(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def archive_location(entry: ArchivedFile) -> str:
+    return f"{entry.segment}:{entry.offset}:{entry.length}:{entry.media_type}"
+
+
+def archive_location_valid(entry: ArchivedFile) -> bool:
+    """Czy rekord archiwum mieści się w istniejącym segmencie."""
+    path = archive_segment_path(entry.segment)
+    return (
+        entry.segment == path.name
+        and entry.offset >= 0
+        and entry.length >= 0
+        and path.is_file()
+        and entry.offset + entry.length <= path.stat().st_size
+    )
+
+
+def parse_archive_location(location: str) -> Tuple[str, int, int, str]:
+    segment, offset, length, media_type = location.split(":", 3)
+    return Path(segment).name, int(offset), int(length), media_type
+
+
+def sign_file_url(
+    base_path: str,
+    file_path: str,
+    ttl: Optional[int] = None,
+    archived: Optional[ArchivedFile] = None
+) -> Tuple[str, int]:
+    """Zwraca (adres względny, czas wygaśnięcia jako timestamp UNIX)."""
+    ttl = min(ttl or config.FILE_URL_TTL, config.FILE_URL_MAX_TTL)
+    expires = int(time.time()) + ttl
+    location = archive_location(archived) if archived else ""
+    params = {"expires": expires, "signature": _signature(file_path, expires, location)}
+    if location:
+        params["archive"] = location
+    return f"{base_path}/{quote(file_path)}?{urlencode(params)}", expires
+
+
+def verify_file_signature(
+    file_path: str,
+    expires: int,
+    signature: str,
+    location: str = "",
+    now: Optional[float] = None
+) -> Optional[str]:
+    """Zwraca None dla poprawnego adresu albo powód odrzucenia ("invalid", "expired")."""
+    if not hmac.compare_digest(_signature(file_path, expires, location), signature):
+        return "invalid"
+    if expires < (time.time() if now is None else now):
+        return "expired"
+    return None
+
+
+def offload_headers(absolute_path: Path, uploads_dir: Path) -> Optional[dict]:
+    """Nagłówki przekazujące wysyłkę pliku z dysku serwerowi proxy (None - wysyła worker)."""
+    if config.FILE_SERVE_OFFLOAD == "x-accel":
+        relative = absolute_path.relative_to(uploads_dir.resolve()).as_posix()
+        return {"X-Accel-Redirect": quote(config.FILE_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative)}
+    if config.FILE_SERVE_OFFLOAD == "x-sendfile":
+        return {"X-Sendfile": str(absolute_path)}
+    return None
+
+
+def archive_segment_path(segment: str) -> Path:
+    return archive_store.directory / Path(segment).name
+
+
+class FileRangeResponse(Response):
+    """
+    Odpowiedź z fragmentem pliku [offset, offset + length) - całym plikiem albo
+    rekordem segmentu archiwum. Z `zerocopysend` dane wysyła jądro (sendfile).
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int = 0,
+        length: Optional[int] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[dict] = None
+    ):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        handle = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            if self.length is None:
+                self.length = os.fstat(handle.fileno()).st_size - self.offset
+            self.headers["content-length"] = str(self.length)
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": handle,
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False,
+                })
+            else:
+                await asyncio.to_thread(handle.seek, self.offset)
+                remaining = self.length
+                while True:
+                    chunk = await asyncio.to_thread(handle.read, min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    more_body = bool(chunk) and remaining > 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                    if not more_body:
+                        break
+        finally:
+            handle.close()
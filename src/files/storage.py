@@ -0,0 +1,517 @@
+"""
+Magazyn plików rachunków: dysk lokalny albo usługa zgodna z S3 (AWS S3, MinIO, R2).
+
+Kluczem obiektu jest ścieżka względem katalogu uploads ("photos/photo_1.jpg").
+W bazie (`telegrammessage.file_path`) zostają dotychczasowe ścieżki
+"uploads/photos/..." - `storage_key` zamienia je na klucze, więc zmiana
+`STORAGE_BACKEND` nie wymaga migracji danych (poza skopiowaniem plików).
+
+Przetwarzanie (OCR, PDF) potrzebuje pliku na dysku: plik pobierany z Telegrama
+zapisywany jest lokalnie jako kopia robocza, publikowany w magazynie
+(`save_file`), a przy magazynie zdalnym kopia robocza jest usuwana po
+przetworzeniu (`discard_working_copy`). Dzięki temu kilka kontenerów może
+obsługiwać te same pliki bez wspólnego dysku.
+
+Żaden z magazynów nie trzyma całego pliku w pamięci: zapis idzie porcjami
+(w S3 - multipart upload po `S3_PART_SIZE` bajtów, mniejsze pliki jednym PUT),
+odczyt to strumień wybranego zakresu bajtów.
+"""
+import abc
+import asyncio
+import hashlib
+import hmac
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import httpx
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src.config import config
+
+UPLOADS_DIR = Path("uploads")
+CHUNK_SIZE = 256 * 1024
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+# Minimalna część multipart w S3 (poza ostatnią)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class StorageError(Exception):
+    """Błąd magazynu plików (np. odpowiedź S3 inna niż oczekiwana)."""
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    modified_at: datetime
+    etag: Optional[str] = None
+
+
+def storage_key(file_path: str) -> str:
+    """Ścieżka pliku ("uploads/photos/x.jpg" lub bezwzględna) -> klucz w magazynie ("photos/x.jpg")."""
+    path = Path(file_path)
+    if path.is_absolute():
+        path = path.relative_to(UPLOADS_DIR.resolve())
+    parts = PurePosixPath(path.as_posix()).parts
+    if parts and parts[0] == UPLOADS_DIR.name:
+        parts = parts[1:]
+    if not parts or any(part in ("..", ".") for part in parts):
+        raise ValueError(f"Invalid storage path: {file_path}")
+    return "/".join(parts)
+
+
+async def _iter_file(path: Path, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Porcje pliku z zakresu [start, end) czytane w wątku."""
+    handle = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(handle.seek, start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+            chunk = await asyncio.to_thread(handle.read, size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+async def _single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+class Storage(abc.ABC):
+    """Wspólny interfejs magazynów plików."""
+
+    is_local = False
+
+    @abc.abstractmethod
+    async def save_stream(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        """Zapisuje obiekt z porcji danych; zwraca liczbę bajtów."""
+
+    async def save_file(self, key: str, source: Path) -> int:
+        """Publikuje plik z dysku (kopię roboczą) pod kluczem."""
+        return await self.save_stream(key, _iter_file(Path(source)))
+
+    @abc.abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """Rozmiar i data modyfikacji obiektu albo None, gdy go nie ma."""
+
+    @abc.abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Strumień bajtów obiektu z zakresu [start, end)."""
+
+    async def read_bytes(self, key: str) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_range(key)])
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        """Usuwa obiekt; brak obiektu nie jest błędem."""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Ścieżka pliku na dysku tego procesu albo None (magazyn zdalny)."""
+        return None
+
+    def presigned_url(self, key: str, expires_in: int) -> Optional[str]:
+        """Adres bezpośredniego pobrania z magazynu albo None, gdy magazyn go nie wydaje."""
+        return None
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        """Plik na dysku na czas bloku - przy magazynie zdalnym pobrany do pliku tymczasowego."""
+        path = self.local_path(key)
+        if path is not None:
+            yield path
+            return
+        descriptor, name = tempfile.mkstemp(suffix=PurePosixPath(key).suffix)
+        try:
+            with os.fdopen(descriptor, "wb") as handle:
+                async for chunk in self.iter_range(key):
+                    await asyncio.to_thread(handle.write, chunk)
+            yield Path(name)
+        finally:
+            os.unlink(name)
+
+    async def discard_working_copy(self, file_path: Optional[str]) -> None:
+        """Usuwa lokalną kopię roboczą pliku, który jest już w magazynie zdalnym."""
+        if not file_path or self.is_local:
+            return
+        await asyncio.to_thread(Path(file_path).unlink, True)
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorage(Storage):
+    """Pliki w katalogu na dysku (domyślnie uploads/)."""
+
+    is_local = True
+
+    def __init__(self, root: Path = UPLOADS_DIR):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / key
+
+    async def save_stream(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        path = self.local_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.part")
+        size = 0
+        try:
+            with open(tmp_path, "wb") as handle:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    handle.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return size
+
+    async def save_file(self, key: str, source: Path) -> int:
+        path = self.local_path(key)
+        if Path(source).resolve() == path.resolve():
+            # Kopia robocza jest już plikiem w magazynie
+            return path.stat().st_size
+        return await super().save_file(key, source)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        path = self.local_path(key)
+        try:
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not path.is_file():
+            return None
+        return StoredObject(key=key, size=stat.st_size, modified_at=datetime.fromtimestamp(stat.st_mtime))
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        return _iter_file(self.local_path(key), start, end)
+
+    async def delete(self, key: str) -> None:
+        self.local_path(key).unlink(missing_ok=True)
+
+
+class S3Storage(Storage):
+    """
+    Bucket w usłudze zgodnej z S3, adresowanie path-style
+    ("{endpoint}/{bucket}/{key}"), żądania podpisywane AWS Signature V4.
+    """
+
+    service = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        part_size: int = 8 * 1024 * 1024,
+        timeout: float = 60.0,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = httpx.URL(self.endpoint_url).netloc.decode()
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- Signature V4 ---
+
+    def _object_path(self, key: str) -> str:
+        return f"/{quote(self.bucket, safe='-_.~')}/{quote(key, safe='-_.~/')}"
+
+    @staticmethod
+    def _canonical_query(params: Dict[str, str]) -> str:
+        return "&".join(
+            f"{quote(name, safe='-_.~')}={quote(str(value), safe='-_.~')}"
+            for name, value in sorted(params.items())
+        )
+
+    def _signing_key(self, day: str) -> bytes:
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (day, self.region, self.service, "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def _signature(self, method: str, path: str, query: str, headers: Dict[str, str], payload_hash: str, timestamp: str) -> Tuple[str, str]:
+        """Zwraca (podpisane nagłówki, podpis)."""
+        names = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+        canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in names)
+        signed_headers = ";".join(names)
+        canonical_request = "\n".join([method, path, query, canonical_headers, signed_headers, payload_hash])
+        scope = f"{timestamp[:8]}/{self.region}/{self.service}/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", timestamp, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+        signature = hmac.new(self._signing_key(timestamp[:8]), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return signed_headers, signature
+
+    def sign_headers(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        payload_hash: str = EMPTY_SHA256,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, str]:
+        """Nagłówki żądania z podpisem w `Authorization`."""
+        timestamp = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+        headers = {**(headers or {}), "host": self.host, "x-amz-content-sha256": payload_hash, "x-amz-date": timestamp}
+        signed_headers, signature = self._signature(
+            method, path, self._canonical_query(params or {}), headers, payload_hash, timestamp
+        )
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{timestamp[:8]}/{self.region}/{self.service}/aws4_request, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        del headers["host"]
+        return headers
+
+    def presigned_url(self, key: str, expires_in: int, now: Optional[datetime] = None) -> str:
+        timestamp = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+        path = self._object_path(key)
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{timestamp[:8]}/{self.region}/{self.service}/aws4_request",
+            "X-Amz-Date": timestamp,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        query = self._canonical_query(params)
+        _, signature = self._signature("GET", path, query, {"host": self.host}, "UNSIGNED-PAYLOAD", timestamp)
+        return f"{self.endpoint_url}{path}?{query}&X-Amz-Signature={signature}"
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        params: Optional[Dict[str, str]] = None,
+        content: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+        expected: Tuple[int, ...] = (200,),
+    ) -> httpx.Response:
+        path = self._object_path(key)
+        payload_hash = hashlib.sha256(content).hexdigest() if content else EMPTY_SHA256
+        signed = self.sign_headers(method, path, params, headers, payload_hash)
+        query = self._canonical_query(params or {})
+        url = f"{self.endpoint_url}{path}" + (f"?{query}" if query else "")
+        body = None
+        if content:
+            # Odpowiedź httpx jest w cyklu referencji z żądaniem - treść jako generator
+            # zwalnia część multipart od razu po wysłaniu, a nie dopiero przy GC
+            signed["content-length"] = str(len(content))
+            body = _single_chunk(content)
+            del content
+        response = await self.client.request(method, url, content=body, headers=signed)
+        if response.status_code not in expected:
+            raise StorageError(f"S3 {method} {key}: HTTP {response.status_code} {response.text[:300]}")
+        return response
+
+    # --- Operacje na obiektach ---
+
+    async def save_stream(self, key: str, chunks: AsyncIterable[bytes]) -> int:
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts: List[Tuple[int, str]] = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = await self._create_multipart(key)
+                    with memoryview(buffer) as view:
+                        part = bytes(view[:self.part_size])
+                    del buffer[:self.part_size]
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, part))
+
+            if upload_id is None:
+                await self._request("PUT", key, content=bytes(buffer))
+                return size
+            if buffer or not parts:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._complete_multipart(key, upload_id, parts)
+            return size
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self._request("DELETE", key, {"uploadId": upload_id}, expected=(204, 200, 404))
+                except Exception:
+                    pass
+            raise
+
+    async def _create_multipart(self, key: str) -> str:
+        response = await self._request("POST", key, {"uploads": ""})
+        upload_id = ElementTree.fromstring(response.content).find("{*}UploadId")
+        if upload_id is None or not upload_id.text:
+            raise StorageError(f"S3 CreateMultipartUpload {key}: no UploadId")
+        return upload_id.text
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> Tuple[int, str]:
+        response = await self._request("PUT", key, {"partNumber": str(number), "uploadId": upload_id}, content=data)
+        return number, response.headers["etag"]
+
+    async def _complete_multipart(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+        ) + "</CompleteMultipartUpload>"
+        response = await self._request("POST", key, {"uploadId": upload_id}, content=body.encode())
+        # S3 potrafi zwrócić 200 z błędem w treści
+        if b"<Error>" in response.content:
+            raise StorageError(f"S3 CompleteMultipartUpload {key}: {response.text[:300]}")
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        response = await self._request("HEAD", key, expected=(200, 404))
+        if response.status_code == 404:
+            return None
+        modified = response.headers.get("last-modified")
+        return StoredObject(
+            key=key,
+            size=int(response.headers["content-length"]),
+            modified_at=parsedate_to_datetime(modified).replace(tzinfo=None) if modified else datetime.utcnow(),
+            etag=response.headers.get("etag"),
+        )
+
+    async def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        path = self._object_path(key)
+        signed = self.sign_headers("GET", path, headers=headers)
+        async with self.client.stream("GET", f"{self.endpoint_url}{path}", headers=signed) as response:
+            if response.status_code not in (200, 206):
+                body = await response.aread()
+                raise StorageError(f"S3 GET {key}: HTTP {response.status_code} {body[:300]!r}")
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        await self._request("DELETE", key, expected=(200, 204, 404))
+
+
+def create_storage() -> Storage:
+    if config.STORAGE_BACKEND == "s3":
+        if not (config.S3_ENDPOINT_URL and config.S3_BUCKET and config.S3_ACCESS_KEY_ID and config.S3_SECRET_ACCESS_KEY):
+            raise RuntimeError("S3 storage requires S3_ENDPOINT_URL, S3_BUCKET, S3_ACCESS_KEY_ID and S3_SECRET_ACCESS_KEY")
+        return S3Storage(
+            config.S3_ENDPOINT_URL,
+            config.S3_BUCKET,
+            config.S3_ACCESS_KEY_ID,
+            config.S3_SECRET_ACCESS_KEY,
+            region=config.S3_REGION,
+            part_size=config.S3_PART_SIZE,
+        )
+    return LocalStorage(UPLOADS_DIR)
+
+
+_storage: Optional[Storage] = None
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+async def close_storage() -> None:
+    """Zamyka połączenia magazynu procesu (przy zamykaniu workera)."""
+    if _storage is not None:
+        await _storage.close()
+
+
+def set_storage(storage: Optional[Storage]) -> None:
+    """Podmienia magazyn procesu (skrypty sprawdzające); None - ponownie z konfiguracji."""
+    global _storage
+    _storage = storage
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Pojedynczy zakres "bytes=a-b" -> [start, end); None - cały plik (także dla wielu zakresów)."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            start, end = max(size - int(last), 0), size
+        else:
+            start, end = int(first), min(int(last) + 1, size) if last else size
+    except ValueError:
+        return None
+    if start >= end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class StorageResponse(Response):
+    """
+    Odpowiedź strumieniowana z magazynu, z obsługą pojedynczego zakresu
+    (`Range: bytes=a-b` -> 206) - bez buforowania pliku w pamięci.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        key: str,
+        size: int,
+        media_type: Optional[str] = None,
+        headers: Optional[dict] = None,
+    ):
+        self.storage = storage
+        self.key = key
+        self.size = size
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            requested = parse_range(Headers(scope=scope).get("range"), self.size)
+        except ValueError:
+            await Response(status_code=416, headers={"Content-Range": f"bytes */{self.size}"})(scope, receive, send)
+            return
+        start, end = requested or (0, self.size)
+        if requested:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{self.size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async for chunk in self.storage.iter_range(self.key, start, end):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
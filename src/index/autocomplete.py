@@ -0,0 +1,362 @@
+"""
+Podpowiedzi produktów (`Index`) w procesie workera.
+
+Nazwy i synonimy indeksów, znormalizowane (wielkość liter, polskie znaki),
+trzymane są w posortowanej tablicy haseł - prefiks wyszukiwany jest przez
+bisect, bez zapytania do bazy. Hasłem jest cała nazwa i każdy jej wyraz od
+drugiego ("mleko łaciate" znajdzie też "lac"). Wyniki sortowane są po liczbie
+pozycji rachunków przypisanych do indeksu.
+
+Zmiany indeksów i przypisań pozycji zatwierdzone przez ORM w tym procesie
+nanoszone są przyrostowo (zdarzenia sesji, jak w `src/user/cache.py`). Zmiany
+z innych workerów i usunięcia hurtowe (np. retencja partycji) uwzględnia
+pełne przeładowanie co `INDEX_AUTOCOMPLETE_REFRESH_INTERVAL` sekund.
+"""
+import asyncio
+import heapq
+import logging
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import BillItem, Index
+
+logger = logging.getLogger(__name__)
+
+# Litery, które nie rozkładają się w NFKD na literę bazową i znak diakrytyczny
+_TRANSLITERATION = str.maketrans({"ł": "l", "Ł": "l", "ß": "ss", "æ": "ae", "ø": "o", "đ": "d"})
+_WHITESPACE = re.compile(r"\s+")
+# Koniec zakresu prefiksu w posortowanej tablicy
+_PREFIX_END = "\U0010ffff"
+# Prefiksy pasujące do większej liczby indeksów mają zapamiętaną czołówkę wyników
+_TOP_CACHE_MIN_MATCHES = 200
+
+# Klucz w Session.info ze zmianami do naniesienia po commit
+_PENDING_KEY = "index_autocomplete_pending"
+
+
+def normalize(text: str) -> str:
+    """Małe litery bez polskich znaków i z pojedynczymi spacjami ("Żółć  Ł" -> "zolc l")."""
+    text = unicodedata.normalize("NFKD", text.translate(_TRANSLITERATION).casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def synonym_terms(synonyms: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Synonimy z pola JSON: wartości tekstowe i listy tekstów
+    (`{"pl": ["mleczko"], "en": "milk"}`), a gdy ich brak - klucze
+    (`{"mleczko": 1}`).
+    """
+    if not synonyms:
+        return []
+    terms = []
+    for value in synonyms.values():
+        if isinstance(value, str):
+            terms.append(value)
+        elif isinstance(value, list):
+            terms.extend(item for item in value if isinstance(item, str))
+    return terms or [key for key in synonyms if isinstance(key, str)]
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """Niezależna od sesji migawka indeksu."""
+    id: int
+    name: str
+    category_id: Optional[int]
+    synonyms: Tuple[str, ...]
+    normalized_name: str
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    entry: IndexEntry
+    usage_count: int
+    matched: str  # Nazwa lub synonim, do którego pasuje prefiks
+
+
+def _entry(index_id: int, name: str, category_id: Optional[int], synonyms: Optional[Dict[str, Any]]) -> IndexEntry:
+    return IndexEntry(
+        id=index_id,
+        name=name,
+        category_id=category_id,
+        synonyms=tuple(synonym_terms(synonyms)),
+        normalized_name=normalize(name),
+    )
+
+
+def _terms(entry: IndexEntry) -> Dict[str, Tuple[str, bool]]:
+    """Hasła indeksu: znormalizowane hasło -> (tekst źródłowy, czy to początek nazwy/synonimu)."""
+    terms: Dict[str, Tuple[str, bool]] = {}
+    for label in (entry.name, *entry.synonyms):
+        words = normalize(label).split(" ")
+        for position in range(len(words)):
+            term = " ".join(words[position:])
+            if term and (term not in terms or position == 0 and not terms[term][1]):
+                terms[term] = (label, position == 0)
+    return terms
+
+
+class IndexAutocomplete:
+    """
+    Posortowana tablica haseł `(hasło, id indeksu, tekst źródłowy, początek)`.
+
+    Prefiks wyznacza ciągły zakres tablicy (dwa bisect); z zakresu wybierane
+    jest `limit` indeksów o największym użyciu. Wstawienie i usunięcie hasła
+    to bisect + przesunięcie tablicy.
+
+    Krótkie prefiksy obejmują tysiące haseł, więc dla prefiksów z ponad
+    `_TOP_CACHE_MIN_MATCHES` indeksami zapamiętywane jest pierwsze
+    `INDEX_AUTOCOMPLETE_MAX_LIMIT` wyników. Nowy indeks i wzrost użycia
+    poprawiają zapamiętane listy w miejscu; usunięcie, zmiana nazwy i spadek
+    użycia usuwają tylko listy, na których indeks był.
+    """
+
+    def __init__(self):
+        self.loaded_at: Optional[float] = None
+        self.outdated = False
+        self._terms: List[Tuple[str, int, str, bool]] = []
+        self._entries: Dict[int, IndexEntry] = {}
+        self._usage: Counter = Counter()
+        self._top: Dict[str, List[Tuple[int, str, bool]]] = {}
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None or self.outdated
+            or time.monotonic() - self.loaded_at > config.INDEX_AUTOCOMPLETE_REFRESH_INTERVAL
+        )
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Pierwsze użycie czeka na załadowanie; później przeładowanie po upływie
+        czasu odświeżania odbywa się w tle, a zapytania korzystają z poprzedniej tablicy.
+        """
+        if self.loaded_at is None:
+            async with self._lock:
+                if self.loaded_at is None:
+                    await self.load(session)
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        from src.db.main import engine
+
+        try:
+            async with AsyncSession(engine) as session:
+                await self.load(session)
+        except Exception as e:
+            logger.warning(f"Index autocomplete refresh failed: {e}")
+
+    async def load(self, session: AsyncSession) -> None:
+        """Pełne przeładowanie: indeksy i liczba pozycji rachunków na indeks."""
+        start = time.perf_counter()
+        indexes = (await session.execute(select(Index.id, Index.name, Index.category_id, Index.synonyms))).all()
+        usage = (await session.execute(
+            select(BillItem.index_id, func.count())
+            .where(BillItem.index_id.isnot(None))
+            .group_by(BillItem.index_id)
+        )).all()
+
+        entries = {row.id: _entry(row.id, row.name, row.category_id, row.synonyms) for row in indexes}
+        terms = [
+            (term, entry.id, label, is_start)
+            for entry in entries.values()
+            for term, (label, is_start) in _terms(entry).items()
+        ]
+        terms.sort()
+        # Podmiana całej struktury naraz - zapytania w trakcie ładowania widzą poprzednią
+        self._entries, self._terms, self._usage = entries, terms, Counter(dict(usage))
+        self._top = {}
+        self.loaded_at = time.monotonic()
+        self.outdated = False
+        logger.info(
+            f"Index autocomplete loaded: {len(entries)} indexes, {len(terms)} terms "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+    def _prefix_matches(self, entry: IndexEntry) -> Dict[str, Tuple[str, bool]]:
+        """Zapamiętane prefiksy, do których pasuje indeks: prefiks -> (tekst źródłowy, początek)."""
+        matches: Dict[str, Tuple[str, bool]] = {}
+        for term, (label, is_start) in _terms(entry).items():
+            for length in range(len(term) + 1):
+                prefix = term[:length]
+                if prefix in self._top and (prefix not in matches or is_start and not matches[prefix][1]):
+                    matches[prefix] = (label, is_start)
+        return matches
+
+    def _forget(self, entry: IndexEntry) -> None:
+        """Usuwa zapamiętane listy zawierające indeks - mógłby spaść poniżej niezapamiętanych wyników."""
+        for prefix in self._prefix_matches(entry):
+            if any(cached_id == entry.id for cached_id, _, _ in self._top[prefix]):
+                del self._top[prefix]
+
+    def _promote(self, entry: IndexEntry) -> None:
+        """Wstawia indeks na zapamiętane listy, jeśli wyprzedza ostatni wynik; pozostałe nie zmieniają pozycji."""
+        for prefix, (label, is_start) in self._prefix_matches(entry).items():
+            cached = self._top[prefix]
+            top = [item for item in cached if item[0] != entry.id]
+            if len(top) == len(cached) and self._rank(entry.id, is_start) >= self._rank(top[-1][0], top[-1][2]):
+                continue
+            top.append((entry.id, label, is_start))
+            top.sort(key=lambda item: self._rank(item[0], item[2]))
+            self._top[prefix] = top[:len(cached)]
+
+    def upsert(self, entry: IndexEntry) -> None:
+        self.remove(entry.id)
+        self._entries[entry.id] = entry
+        for term, (label, is_start) in _terms(entry).items():
+            insort(self._terms, (term, entry.id, label, is_start))
+        self._promote(entry)
+
+    def remove(self, index_id: int) -> None:
+        entry = self._entries.get(index_id)
+        if entry is None:
+            return
+        self._forget(entry)
+        del self._entries[index_id]
+        for term in _terms(entry):
+            position = bisect_left(self._terms, (term, index_id))
+            if position < len(self._terms) and self._terms[position][:2] == (term, index_id):
+                del self._terms[position]
+
+    def add_usage(self, index_id: int, delta: int) -> None:
+        entry = self._entries.get(index_id)
+        if entry is not None and delta < 0:
+            self._forget(entry)
+        self._usage[index_id] += delta
+        if self._usage[index_id] <= 0:
+            del self._usage[index_id]
+        if entry is not None and delta > 0:
+            self._promote(entry)
+
+    def _rank(self, index_id: int, is_start: bool) -> tuple:
+        # Najpierw użycie, potem dopasowanie od początku nazwy/synonimu, na końcu krótsza nazwa
+        entry = self._entries[index_id]
+        return -self._usage[index_id], not is_start, len(entry.name), entry.normalized_name
+
+    def _matches(self, prefix: str) -> Dict[int, Tuple[str, bool]]:
+        """Indeksy z hasłem zaczynającym się od prefiksu: id -> (tekst źródłowy, początek)."""
+        if not prefix:
+            return {index_id: (entry.name, True) for index_id, entry in self._entries.items()}
+        low = bisect_left(self._terms, (prefix,))
+        high = bisect_left(self._terms, (prefix + _PREFIX_END,), low)
+        matches: Dict[int, Tuple[str, bool]] = {}
+        for _, index_id, label, is_start in self._terms[low:high]:
+            if index_id not in matches or is_start and not matches[index_id][1]:
+                matches[index_id] = (label, is_start)
+        return matches
+
+    def _ranked(self, matches: Dict[int, Tuple[str, bool]], limit: int) -> List[Tuple[int, str, bool]]:
+        best = heapq.nsmallest(limit, matches, key=lambda index_id: self._rank(index_id, matches[index_id][1]))
+        return [(index_id, *matches[index_id]) for index_id in best]
+
+    def suggest(self, prefix: str, limit: int = 10, category_id: Optional[int] = None) -> List[Suggestion]:
+        """Indeksy pasujące do prefiksu, od najczęściej używanych; pusty prefiks - najpopularniejsze."""
+        prefix = normalize(prefix)
+        top = self._top.get(prefix)
+        if top is None or category_id is not None or limit > len(top):
+            matches = self._matches(prefix)
+            if category_id is not None:
+                matches = {
+                    index_id: match for index_id, match in matches.items()
+                    if self._entries[index_id].category_id == category_id
+                }
+                top = self._ranked(matches, limit)
+            elif len(matches) > _TOP_CACHE_MIN_MATCHES:
+                top = self._top[prefix] = self._ranked(matches, max(limit, config.INDEX_AUTOCOMPLETE_MAX_LIMIT))
+            else:
+                top = self._ranked(matches, limit)
+        return [
+            Suggestion(self._entries[index_id], self._usage[index_id], label)
+            for index_id, label, _ in top[:limit]
+        ]
+
+    def apply(self, changes: List[Tuple[str, Any]]) -> None:
+        """Nanosi zmiany zebrane z zatwierdzonej transakcji."""
+        for kind, value in changes:
+            if kind == "upsert":
+                self.upsert(value)
+            elif kind == "remove":
+                self.remove(value)
+            elif kind == "usage":
+                self.add_usage(*value)
+            else:
+                # Zmiana bez pełnej migawki - przeładowanie w tle przy następnym zapytaniu
+                self.outdated = True
+
+    def stats(self) -> dict:
+        return {
+            "indexes": len(self._entries),
+            "terms": len(self._terms),
+            "cached_prefixes": len(self._top),
+            "loaded_seconds_ago": None if self.loaded_at is None else round(time.monotonic() - self.loaded_at, 1),
+        }
+
+
+index_autocomplete = IndexAutocomplete()
+
+
+def _snapshot(obj: Index) -> Optional[IndexEntry]:
+    """Migawka z załadowanych atrybutów - zdarzenie flush nie może doczytywać ich z bazy."""
+    state = inspect(obj).dict
+    if not all(name in state for name in ("id", "name", "category_id", "synonyms")):
+        return None
+    return _entry(state["id"], state["name"], state["category_id"], state["synonyms"])
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    if index_autocomplete.loaded_at is None:
+        return
+    changes = session.info.setdefault(_PENDING_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Index):
+            entry = _snapshot(obj)
+            changes.append(("upsert", entry) if entry else ("reload", None))
+        elif isinstance(obj, BillItem) and obj.index_id is not None:
+            changes.append(("usage", (obj.index_id, 1)))
+    for obj in session.dirty:
+        if isinstance(obj, Index) and session.is_modified(obj):
+            entry = _snapshot(obj)
+            changes.append(("upsert", entry) if entry else ("reload", None))
+        elif isinstance(obj, BillItem):
+            history = inspect(obj).attrs.index_id.history
+            changes.extend(("usage", (index_id, -1)) for index_id in history.deleted if index_id is not None)
+            changes.extend(("usage", (index_id, 1)) for index_id in history.added if index_id is not None)
+    for obj in session.deleted:
+        if isinstance(obj, Index):
+            changes.append(("remove", obj.id))
+        elif isinstance(obj, BillItem):
+            state = inspect(obj).dict
+            if "index_id" not in state:
+                changes.append(("reload", None))
+            elif state["index_id"] is not None:
+                changes.append(("usage", (state["index_id"], -1)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        index_autocomplete.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
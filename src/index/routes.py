@@ -1,8 +1,10 @@
 from src.db.main import get_session
-from fastapi import APIRouter, Depends, HTTPException, status
-from src.index.schemas import IndexCreate, IndexRead
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from src.config import config
+from src.index.autocomplete import index_autocomplete
+from src.index.schemas import IndexCreate, IndexRead, IndexSuggestion
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
+from typing import List, Optional
 from src.index import services
 
 router = APIRouter(prefix="/indexes", tags=["Indexes"])
@@ -20,6 +22,30 @@ async def create_index(index_in: IndexCreate, session: AsyncSession = Depends(ge
         )
     return await services.create_index(session, index_in=index_in)
 
+@router.get("/autocomplete", response_model=List[IndexSuggestion])
+async def autocomplete_indexes(
+    q: str = Query("", max_length=100, description="Początek nazwy lub synonimu produktu"),
+    limit: int = Query(10, ge=1, le=config.INDEX_AUTOCOMPLETE_MAX_LIMIT),
+    category_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Podpowiedzi produktów do wyboru indeksu pozycji rachunku - bez rozróżniania
+    wielkości liter i polskich znaków, od najczęściej używanych. Odpowiada z
+    pamięci workera; baza potrzebna jest tylko przy (prze)ładowaniu.
+    """
+    await index_autocomplete.ensure_loaded(session)
+    return [
+        IndexSuggestion(
+            id=suggestion.entry.id,
+            name=suggestion.entry.name,
+            category_id=suggestion.entry.category_id,
+            usage_count=suggestion.usage_count,
+            matched=suggestion.matched,
+        )
+        for suggestion in index_autocomplete.suggest(q, limit=limit, category_id=category_id)
+    ]
+
 # @router.get("/", response_model=List[IndexReadWithCategory])
 # async def get_indexes(skip: int = 0, limit: int = 100, session: AsyncSession = Depends(get_session)):
 #     """
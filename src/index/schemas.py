@@ -23,4 +23,12 @@ class IndexUpdate(SQLModel):
 
 # Zagnieżdżony schemat odczytu z dołączoną kategorią
 class IndexReadWithCategory(IndexRead):
-    category: Optional[CategoryRead] = None
\ No newline at end of file
+    category: Optional[CategoryRead] = None
+
+# Podpowiedź autouzupełniania (GET /indexes/autocomplete)
+class IndexSuggestion(SQLModel):
+    id: int
+    name: str
+    category_id: Optional[int] = None
+    usage_count: int  # Liczba pozycji rachunków przypisanych do indeksu
+    matched: str  # Nazwa lub synonim pasujący do wpisanego tekstu
@@ -1,6 +1,8 @@
 from typing import Optional
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from src.category.services import suggest_categories
+from src.config import config
 from src.db.models import Index
 from src.index.schemas import IndexCreate
 
@@ -12,8 +14,15 @@ async def get_index_by_name(session: AsyncSession, name: str) -> Optional[Index]
     return result.first()
 
 async def create_index(session: AsyncSession, index_in: IndexCreate) -> Index:
-    """Tworzy nowy indeks produktu."""
+    """
+    Tworzy nowy indeks produktu. Bez podanej kategorii przypisuje proponowaną
+    (src/category/suggestions.py), jeśli jej wynik osiąga `CATEGORY_SUGGESTION_MIN_SCORE`.
+    """
     db_index = Index.model_validate(index_in)
+    if db_index.category_id is None and config.CATEGORY_SUGGESTION_MIN_SCORE <= 1:
+        suggestion, = await suggest_categories(session, [db_index.name])
+        if suggestion and suggestion.score >= config.CATEGORY_SUGGESTION_MIN_SCORE:
+            db_index.category_id = suggestion.category_id
     session.add(db_index)
     await session.commit()
     await session.refresh(db_index)
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.config import config
+from src.db.main import get_session
+from src.db.models import Index
+from src.prices import services
+from src.prices.schemas import PriceHistoryRead, PriceSeries, ShopPriceRead
+
+router = APIRouter(prefix="/prices", tags=["Prices"])
+
+
+async def _get_index_or_404(session: AsyncSession, index_id: int) -> Index:
+    db_index = await session.get(Index, index_id)
+    if not db_index:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index not found")
+    return db_index
+
+
+@router.get("/{index_id}/history", response_model=PriceHistoryRead)
+async def get_price_history(
+    index_id: int,
+    shop_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    max_points: int = Query(200, ge=2, le=1000),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Pobiera historię cen produktu (min/średnia/max ceny jednostkowej) osobno dla każdego sklepu.
+
+    Domyślny zakres to ostatnie `PRICE_HISTORY_DEFAULT_DAYS` dni. Gdy zakres ma więcej
+    dni niż `max_points`, punkty obejmują po `bucket_days` dni.
+    """
+    await _get_index_or_404(session, index_id)
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=config.PRICE_HISTORY_DEFAULT_DAYS)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from must not be after date_to")
+
+    width, series = await services.get_price_history(
+        session, index_id, date_from, date_to, shop_id=shop_id, max_points=max_points
+    )
+    return PriceHistoryRead(
+        index_id=index_id,
+        date_from=date_from,
+        date_to=date_to,
+        bucket_days=width,
+        series=[PriceSeries(shop_id=shop, points=points) for shop, points in series.items()]
+    )
+
+
+@router.get("/{index_id}/cheapest", response_model=List[ShopPriceRead])
+async def get_cheapest_shops(
+    index_id: int,
+    days: int = Query(30, ge=1, le=3650),
+    limit: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Zwraca sklepy od najniższej średniej ceny produktu z ostatnich `days` dni.
+    """
+    await _get_index_or_404(session, index_id)
+    return await services.get_cheapest_shops(
+        session, index_id, since=date.today() - timedelta(days=days), limit=limit
+    )
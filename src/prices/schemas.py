@@ -0,0 +1,31 @@
+from datetime import date
+from decimal import Decimal
+from typing import List
+from sqlmodel import SQLModel
+
+class PricePoint(SQLModel):
+    day: date  # Początek przedziału
+    min_price: Decimal
+    avg_price: Decimal
+    max_price: Decimal
+    count: int  # Liczba pozycji rachunków w przedziale
+
+class PriceSeries(SQLModel):
+    shop_id: int
+    points: List[PricePoint] = []
+
+class PriceHistoryRead(SQLModel):
+    index_id: int
+    date_from: date
+    date_to: date
+    bucket_days: int  # Szerokość przedziału po próbkowaniu w dół
+    series: List[PriceSeries] = []
+
+class ShopPriceRead(SQLModel):
+    shop_id: int
+    shop_name: str
+    min_price: Decimal
+    avg_price: Decimal
+    max_price: Decimal
+    count: int
+    last_seen: date
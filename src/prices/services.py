@@ -0,0 +1,240 @@
+"""
+Historia cen produktów (indeksów) w sklepach.
+
+Tabela `pricehistory` trzyma dzienny agregat cen jednostkowych dla pary
+(indeks, sklep): minimum, maksimum, sumę i liczbę pozycji. Agregat
+aktualizowany jest przyrostowo w tej samej transakcji, w której dodawane są
+pozycje rachunku (`record_item_prices`), więc serie cen i "najtańszy sklep"
+nie wymagają skanowania `billitem`. Zmiana sklepu lub daty rachunku przelicza
+agregat dotkniętych produktów z pozycji (`refresh_price_history`).
+Rachunki oznaczone jako duplikaty (`Bill.duplicate_of_id`) nie są liczone.
+"""
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Float, cast, delete, func, insert as sa_insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Bill, BillItem, PriceHistory, Shop
+
+CENT = Decimal("0.01")
+PRICE_HISTORY_COLUMNS = ["index_id", "shop_id", "day", "min_price", "max_price", "price_sum", "price_count"]
+
+
+def _upsert_functions(session: AsyncSession):
+    """Zwraca (insert z ON CONFLICT, least, greatest) dla dialektu sesji."""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert, func.min, func.max
+    from sqlalchemy.dialects.postgresql import insert
+    return insert, func.least, func.greatest
+
+
+async def record_item_prices(
+    session: AsyncSession,
+    shop_id: Optional[int],
+    bill_date: datetime,
+    items: Iterable[BillItem]
+) -> int:
+    """
+    Dolicza ceny pozycji rachunku do agregatu, bez commita - w transakcji
+    wywołującego. Pomija pozycje bez indeksu i rachunki bez sklepu. Zwraca
+    liczbę zaktualizowanych wierszy agregatu.
+    """
+    if shop_id is None:
+        return 0
+
+    prices: Dict[int, List[Decimal]] = defaultdict(list)
+    for item in items:
+        if item.index_id is not None and item.unit_price is not None:
+            prices[item.index_id].append(Decimal(item.unit_price))
+    if not prices:
+        return 0
+
+    insert, least, greatest = _upsert_functions(session)
+    day = bill_date.date()
+    # Stała kolejność kluczy - równoległe rachunki blokują wiersze w tej samej kolejności
+    rows = [
+        {
+            "index_id": index_id,
+            "shop_id": shop_id,
+            "day": day,
+            "min_price": min(values),
+            "max_price": max(values),
+            "price_sum": sum(values),
+            "price_count": len(values),
+        }
+        for index_id, values in sorted(prices.items())
+    ]
+    statement = insert(PriceHistory).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["index_id", "shop_id", "day"],
+        set_={
+            "min_price": least(PriceHistory.min_price, statement.excluded.min_price),
+            "max_price": greatest(PriceHistory.max_price, statement.excluded.max_price),
+            "price_sum": PriceHistory.price_sum + statement.excluded.price_sum,
+            "price_count": PriceHistory.price_count + statement.excluded.price_count,
+        }
+    )
+    await session.execute(statement)
+    return len(rows)
+
+
+async def refresh_price_history(session: AsyncSession, index_ids: Optional[Set[int]] = None) -> None:
+    """
+    Przelicza agregat z pozycji rachunków dla podanych indeksów (None = całość),
+    bez commita. Używane po zmianie sklepu/daty rachunku i do wypełnienia tabeli.
+    """
+    if index_ids is not None and not index_ids:
+        return
+
+    day = func.date(Bill.bill_date)
+    source = (
+        select(
+            BillItem.index_id,
+            Bill.shop_id,
+            day,
+            func.min(BillItem.unit_price),
+            func.max(BillItem.unit_price),
+            func.sum(BillItem.unit_price),
+            func.count(),
+        )
+        .join(Bill, Bill.id == BillItem.bill_id)
+        .where(
+            BillItem.index_id.isnot(None),
+            BillItem.unit_price.isnot(None),
+            Bill.shop_id.isnot(None),
+            Bill.duplicate_of_id.is_(None),
+        )
+        .group_by(BillItem.index_id, Bill.shop_id, day)
+    )
+    clear = delete(PriceHistory)
+    if index_ids is not None:
+        source = source.where(BillItem.index_id.in_(index_ids))
+        clear = clear.where(PriceHistory.index_id.in_(index_ids))
+
+    await session.execute(clear)
+    await session.execute(sa_insert(PriceHistory).from_select(PRICE_HISTORY_COLUMNS, source))
+
+
+async def get_bill_index_ids(session: AsyncSession, bill_id: int) -> Set[int]:
+    result = await session.execute(
+        select(BillItem.index_id).where(BillItem.bill_id == bill_id, BillItem.index_id.isnot(None)).distinct()
+    )
+    return set(result.scalars().all())
+
+
+def _average(price_sum: Decimal, count: int) -> Decimal:
+    return (Decimal(price_sum) / count).quantize(CENT)
+
+
+def bucket_days(date_from: date, date_to: date, max_points: int) -> int:
+    """Szerokość przedziału (w dniach), by seria miała najwyżej `max_points` punktów."""
+    span = (date_to - date_from).days + 1
+    return max(1, math.ceil(span / max_points))
+
+
+async def get_price_history(
+    session: AsyncSession,
+    index_id: int,
+    date_from: date,
+    date_to: date,
+    shop_id: Optional[int] = None,
+    max_points: int = 200
+) -> Tuple[int, Dict[int, List[dict]]]:
+    """
+    Serie cen produktu w sklepach z zakresu dni (włącznie). Dłuższe zakresy są
+    próbkowane w dół do przedziałów po `bucket_days` dni (min z minimów, max
+    z maksimów, średnia ważona liczbą pozycji). Zwraca (szerokość przedziału,
+    {shop_id: punkty}).
+    """
+    statement = (
+        select(
+            PriceHistory.shop_id,
+            PriceHistory.day,
+            PriceHistory.min_price,
+            PriceHistory.max_price,
+            PriceHistory.price_sum,
+            PriceHistory.price_count,
+        )
+        .where(
+            PriceHistory.index_id == index_id,
+            PriceHistory.day >= date_from,
+            PriceHistory.day <= date_to,
+        )
+        .order_by(PriceHistory.shop_id, PriceHistory.day)
+    )
+    if shop_id is not None:
+        statement = statement.where(PriceHistory.shop_id == shop_id)
+    result = await session.execute(statement)
+
+    width = bucket_days(date_from, date_to, max_points)
+    buckets: Dict[int, Dict[date, dict]] = defaultdict(dict)
+    for row in result.all():
+        start = date_from + timedelta(days=(row.day - date_from).days // width * width)
+        point = buckets[row.shop_id].get(start)
+        if point is None:
+            buckets[row.shop_id][start] = {
+                "day": start,
+                "min_price": row.min_price,
+                "max_price": row.max_price,
+                "price_sum": Decimal(row.price_sum),
+                "count": row.price_count,
+            }
+            continue
+        point["min_price"] = min(point["min_price"], row.min_price)
+        point["max_price"] = max(point["max_price"], row.max_price)
+        point["price_sum"] += Decimal(row.price_sum)
+        point["count"] += row.price_count
+
+    series = {}
+    for shop, points in buckets.items():
+        series[shop] = [
+            {
+                "day": point["day"],
+                "min_price": point["min_price"],
+                "avg_price": _average(point["price_sum"], point["count"]),
+                "max_price": point["max_price"],
+                "count": point["count"],
+            }
+            for point in points.values()
+        ]
+    return width, series
+
+
+async def get_cheapest_shops(session: AsyncSession, index_id: int, since: date, limit: int = 10) -> List[dict]:
+    """Sklepy od najniższej średniej ceny produktu od dnia `since` - z agregatu, bez skanowania pozycji."""
+    price_sum = func.sum(PriceHistory.price_sum)
+    price_count = func.sum(PriceHistory.price_count)
+    statement = (
+        select(
+            PriceHistory.shop_id,
+            Shop.name,
+            func.min(PriceHistory.min_price).label("min_price"),
+            func.max(PriceHistory.max_price).label("max_price"),
+            price_sum.label("price_sum"),
+            price_count.label("price_count"),
+            func.max(PriceHistory.day).label("last_seen"),
+        )
+        .join(Shop, Shop.id == PriceHistory.shop_id)
+        .where(PriceHistory.index_id == index_id, PriceHistory.day >= since)
+        .group_by(PriceHistory.shop_id, Shop.name)
+        .order_by((cast(price_sum, Float) / price_count).asc(), PriceHistory.shop_id)
+        .limit(limit)
+    )
+    result = await session.execute(statement)
+    return [
+        {
+            "shop_id": row.shop_id,
+            "shop_name": row.name,
+            "min_price": row.min_price,
+            "avg_price": _average(row.price_sum, row.price_count),
+            "max_price": row.max_price,
+            "count": row.price_count,
+            "last_seen": row.last_seen,
+        }
+        for row in result.all()
+    ]
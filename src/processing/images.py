@@ -0,0 +1,203 @@
+"""
+Przygotowanie zdjęć rachunków do OCR.
+
+Zdjęcia z telefonów są duże i zwykle lekko przekrzywione. Przetwarzanie
+(zmniejszenie, skala szarości, normalizacja kontrastu, prostowanie) obciąża
+CPU, dlatego `preprocess_image` uruchamiana jest w puli procesów
+(`src.processing.pool.run_in_pool`). Wynik zapisywany jest na dysku pod
+nazwą wyznaczoną z SHA-256 treści pliku i parametrów - ponownie wysłane
+zdjęcie nie jest przetwarzane drugi raz.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Zmiana algorytmu = nowa wersja, żeby nie używać starych wyników z cache
+PREPROCESS_VERSION = 1
+
+STEPS = ("hash", "decode", "downscale", "grayscale", "contrast", "deskew", "save")
+
+
+@dataclass
+class PreprocessedImage:
+    path: str
+    content_hash: str
+    cached: bool
+    skew_angle: float = 0.0
+    size: Tuple[int, int] = (0, 0)
+    # Czas poszczególnych kroków w sekundach
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 16) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _row_profile_score(image, angle: float) -> float:
+    """Wariancja sum wierszy po obrocie - maksymalna, gdy linie tekstu są poziome."""
+    from PIL import Image
+
+    rotated = image.rotate(angle, resample=Image.Resampling.BILINEAR, fillcolor=0)
+    rows = list(rotated.resize((1, rotated.height), Image.Resampling.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((value - mean) ** 2 for value in rows) / len(rows)
+
+
+def estimate_skew(image, max_angle: float = 10.0, probe_side: int = 800) -> float:
+    """
+    Szacuje kąt obrotu prostującego tekst (w stopniach, przeciwnie do ruchu
+    wskazówek zegara) metodą profilu projekcji: najpierw co 1°, potem co 0.1°
+    w promieniu 0.5° od najlepszego kąta.
+    """
+    from PIL import Image, ImageChops, ImageFilter
+
+    probe = image.copy()
+    probe.thumbnail((probe_side, probe_side), Image.Resampling.BILINEAR)
+    # Tusz = piksele wyraźnie ciemniejsze od otoczenia (niezależnie od tła zdjęcia),
+    # jako jasne piksele na czarnym tle - obrót dopełnia tłem
+    darker = ImageChops.subtract(probe.filter(ImageFilter.BoxBlur(probe_side // 50)), probe)
+    probe = darker.point(lambda value: 255 if value > 24 else 0)
+
+    def best_of(angles: List[float]) -> float:
+        return max(angles, key=lambda angle: _row_profile_score(probe, angle))
+
+    steps = int(max_angle)
+    coarse = best_of([float(angle) for angle in range(-steps, steps + 1)])
+    return best_of([round(coarse + tenth / 10, 1) for tenth in range(-5, 6)])
+
+
+def image_dhash(image_path: str, hash_side: int = 8) -> int:
+    """
+    Skrót percepcyjny (dHash, 64 bity): porównanie sąsiednich pikseli obrazu
+    zmniejszonego do 9x8. Ponownie skompresowane lub przeskalowane zdjęcie
+    (np. przekazana dalej wiadomość) różni się od oryginału o kilka bitów.
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as source:
+        source.draft("L", (hash_side * 16, hash_side * 16))
+        small = source.convert("L").resize((hash_side + 1, hash_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(hash_side):
+        offset = row * (hash_side + 1)
+        for column in range(hash_side):
+            bits = (bits << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return bits
+
+
+def preprocess_image(
+    image_path: str,
+    output_dir: str,
+    max_side: int = 2000,
+    max_skew: float = 10.0
+) -> PreprocessedImage:
+    """Przygotowuje zdjęcie do OCR; zwraca ścieżkę wyniku (PNG w skali szarości)."""
+    from PIL import Image, ImageOps
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    def mark(step: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[step] = now - started
+        started = now
+
+    content_hash = file_sha256(image_path)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    target = output / f"{content_hash}_v{PREPROCESS_VERSION}_{max_side}.png"
+    mark("hash")
+
+    if target.exists():
+        return PreprocessedImage(path=str(target), content_hash=content_hash, cached=True, timings=timings)
+
+    with Image.open(image_path) as source:
+        # JPEG: dekodowanie od razu w zmniejszonej skali i w odcieniach szarości
+        source.draft("L", (max_side, max_side))
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    mark("decode")
+
+    # reducing_gap - wstępne zmniejszenie całkowitoliczbowe przed LANCZOS
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    mark("downscale")
+
+    image = image.convert("L")
+    mark("grayscale")
+
+    image = ImageOps.autocontrast(image, cutoff=1)
+    mark("contrast")
+
+    angle = estimate_skew(image, max_skew) if max_skew > 0 else 0.0
+    if abs(angle) >= 0.1:
+        image = image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    mark("deskew")
+
+    # Zapis atomowy - równoległe przetwarzanie tego samego zdjęcia nie zostawi uszkodzonego pliku
+    partial = target.with_suffix(f".{os.getpid()}.part")
+    image.save(partial, format="PNG")
+    os.replace(partial, target)
+    mark("save")
+
+    return PreprocessedImage(
+        path=str(target),
+        content_hash=content_hash,
+        cached=False,
+        skew_angle=angle,
+        size=image.size,
+        timings=timings
+    )
+
+
+class PreprocessingStats:
+    """Zbiorcze czasy kroków przygotowania zdjęć (dla bieżącego workera)."""
+
+    def __init__(self):
+        self.images = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self._totals: Dict[str, float] = {step: 0.0 for step in STEPS}
+        self._maxima: Dict[str, float] = {step: 0.0 for step in STEPS}
+        self._lock = threading.Lock()
+
+    def record(self, result: PreprocessedImage) -> None:
+        with self._lock:
+            self.images += 1
+            self.cache_hits += result.cached
+            for step, elapsed in result.timings.items():
+                self._totals[step] += elapsed
+                self._maxima[step] = max(self._maxima[step], elapsed)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        processed = self.images - self.cache_hits
+        return {
+            "images": self.images,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "steps_ms": {
+                step: {
+                    # Krok "hash" wykonywany jest także przy trafieniu w cache
+                    "avg": round(self._totals[step] * 1000 / max(self.images if step == "hash" else processed, 1), 2),
+                    "max": round(self._maxima[step] * 1000, 2),
+                }
+                for step in STEPS
+            },
+        }
+
+
+preprocessing_stats = PreprocessingStats()
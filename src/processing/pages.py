@@ -0,0 +1,19 @@
+"""
+Wejście etapu przetwarzania rachunku.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class BillPage:
+    """
+    Jedna strona rachunku: obraz (zdjęcie, wyrenderowana strona PDF)
+    lub tekst z warstwy tekstowej PDF.
+    """
+    number: int
+    image_path: Optional[str] = None
+    text: Optional[str] = None
+    source: str = "photo"
+    # SHA-256 treści oryginalnego obrazu (ustawiany przy przygotowaniu do OCR)
+    content_hash: Optional[str] = None
@@ -0,0 +1,101 @@
+"""
+Trwały cache wyników rozpoznania rachunków.
+
+Kluczem jest SHA-256 treści rachunku (`receipt_content_hash`) i wersja
+parsera (`PARSER_VERSION` i funkcja z `RECEIPT_PARSER`). Ten sam rachunek przesłany ponownie (przekazana
+dalej wiadomość, ręczne ponowienie przez `/process-bill`) odtwarzany jest
+z zapisanych pozycji bez ponownego rozpoznawania. Wpisy nie wygasają -
+unieważnia je dopiero zmiana wersji parsera.
+"""
+import logging
+from typing import Awaitable, Callable, Optional, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache.singleflight import SingleFlight
+from src.db.models import ReceiptParseResult
+from src.processing.receipts import ParsedReceipt, parser_version
+
+logger = logging.getLogger(__name__)
+
+Parser = Callable[[], Awaitable[Optional[ParsedReceipt]]]
+
+
+def _insert(session: AsyncSession):
+    """Zwraca konstruktor INSERT z obsługą ON CONFLICT dla dialektu sesji."""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
+class ParseResultCache:
+    """Cache wyników parsera w bazie z metrykami trafień (dla bieżącego workera)."""
+
+    def __init__(self, parser_version: str = parser_version()):
+        self.parser_version = parser_version
+        self.hits = 0
+        self.misses = 0
+        self.parses = 0
+        self._flights = SingleFlight()
+
+    async def get(self, session: AsyncSession, content_hash: str) -> Optional[ParsedReceipt]:
+        result = await session.execute(
+            select(ReceiptParseResult.result).where(
+                ReceiptParseResult.content_hash == content_hash,
+                ReceiptParseResult.parser_version == self.parser_version
+            )
+        )
+        data = result.scalar_one_or_none()
+        return ParsedReceipt.from_dict(data) if data is not None else None
+
+    async def put(self, session: AsyncSession, content_hash: str, receipt: ParsedReceipt) -> None:
+        """Zapisuje wynik; równoległy zapis tego samego klucza jest pomijany (ON CONFLICT DO NOTHING)."""
+        insert = _insert(session)
+        await session.execute(
+            insert(ReceiptParseResult)
+            .values(content_hash=content_hash, parser_version=self.parser_version, result=receipt.to_dict())
+            .on_conflict_do_nothing(index_elements=["content_hash", "parser_version"])
+        )
+        await session.commit()
+
+    async def get_or_parse(
+        self,
+        session: AsyncSession,
+        content_hash: str,
+        parse: Parser
+    ) -> Tuple[Optional[ParsedReceipt], bool]:
+        """
+        Zwraca (wynik, czy_z_cache). Przy chybieniu rozpoznaje rachunek raz na klucz
+        w workerze i zapisuje wynik; None (nierozpoznany rachunek) nie jest zapamiętywane.
+        """
+        cached = await self.get(session, content_hash)
+        if cached is not None:
+            self.hits += 1
+            return cached, True
+        self.misses += 1
+
+        async def load() -> Optional[ParsedReceipt]:
+            self.parses += 1
+            receipt = await parse()
+            if receipt is not None:
+                await self.put(session, content_hash, receipt)
+            return receipt
+
+        return await self._flights.do(content_hash, load), False
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "parser_version": self.parser_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "parses": self.parses,
+            "coalesced": self._flights.coalesced,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+parse_cache = ParseResultCache()
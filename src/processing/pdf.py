@@ -0,0 +1,70 @@
+"""
+Ekstrakcja stron z dokumentów PDF (e-paragony).
+
+Strony z warstwą tekstową zwracane są jako tekst, pozostałe (skany) są
+renderowane do PNG. Funkcje uruchamiane są w puli procesów
+(`src.processing.pool.run_in_pool`), więc przyjmują i zwracają tylko
+proste, serializowalne wartości.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from src.processing.pages import BillPage
+
+
+@dataclass
+class PdfExtraction:
+    page_count: int
+    pages: List[BillPage] = field(default_factory=list)
+    # Strony pominięte po przekroczeniu limitu
+    truncated: bool = False
+
+    @property
+    def text_pages(self) -> int:
+        return sum(1 for page in self.pages if page.text)
+
+
+def extract_pdf_pages(
+    pdf_path: str,
+    output_dir: str,
+    max_pages: int = 20,
+    dpi: int = 200,
+    min_text_chars: int = 20,
+    password: Optional[str] = None
+) -> PdfExtraction:
+    """Wyciąga tekst ze stron PDF, renderując strony bez warstwy tekstowej."""
+    import pypdfium2 as pdfium
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    stem = Path(pdf_path).stem
+
+    document = pdfium.PdfDocument(pdf_path, password=password)
+    try:
+        page_count = len(document)
+        extraction = PdfExtraction(page_count=page_count, truncated=page_count > max_pages)
+
+        for index in range(min(page_count, max_pages)):
+            page = document[index]
+            try:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range().strip()
+                textpage.close()
+
+                if len(text) >= min_text_chars:
+                    extraction.pages.append(BillPage(number=index + 1, text=text, source="pdf_text"))
+                    continue
+
+                # Skan - renderowanie strony do obrazu dla OCR
+                image_path = output / f"{stem}_p{index + 1}.png"
+                bitmap = page.render(scale=dpi / 72, grayscale=True)
+                bitmap.to_pil().save(image_path, optimize=False)
+                bitmap.close()
+                extraction.pages.append(BillPage(number=index + 1, image_path=str(image_path), source="pdf_image"))
+            finally:
+                page.close()
+
+        return extraction
+    finally:
+        document.close()
@@ -0,0 +1,69 @@
+"""
+Wspólna pula procesów dla pracy obciążającej CPU (PDF, obrazy).
+
+Zadania wykonywane są poza pętlą zdarzeń workera. Liczba zadań oczekujących
+i wykonywanych jest ograniczona (`PROCESSING_POOL_MAX_PENDING`) - po jej
+przekroczeniu kolejne wywołania czekają, zamiast rozbudowywać kolejkę puli.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from src.config import config
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+# Zadania przekazane do puli oraz czekające na wolne miejsce
+_running = 0
+_waiting = 0
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Tworzy pulę przy pierwszym użyciu - już po forku workera gunicorna."""
+    global _executor
+    if _executor is None:
+        # spawn - procesy potomne nie dziedziczą pętli zdarzeń ani połączeń z bazą
+        _executor = ProcessPoolExecutor(
+            max_workers=config.PROCESSING_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Wykonuje funkcję (importowalną, z argumentami do zserializowania) w puli procesów."""
+    global _slots, _running, _waiting
+    if _slots is None:
+        _slots = asyncio.Semaphore(config.PROCESSING_POOL_MAX_PENDING)
+
+    _waiting += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+
+    _running += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _running -= 1
+        _slots.release()
+
+
+def pool_stats() -> dict:
+    return {
+        "workers": config.PROCESSING_POOL_WORKERS,
+        "max_pending": config.PROCESSING_POOL_MAX_PENDING,
+        "running": _running,
+        "waiting": _waiting,
+        "started": _executor is not None,
+    }
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,131 @@
+"""
+Wynik rozpoznania rachunku - struktura niezależna od bazy danych.
+
+`ParsedReceipt` zapisywany jest w cache wyników (`src.processing.parse_cache`)
+jako JSON, a `Bill`/`BillItem` odtwarzane są z niego bez ponownego
+rozpoznawania obrazu.
+
+Samo rozpoznawanie (OCR + ekstrakcja pozycji) dostarcza funkcja wskazana
+w `RECEIPT_PARSER` ("pakiet.moduł:funkcja") - przyjmuje listę `BillPage`
+(obrazy po przygotowaniu, tekst z PDF) i zwraca `ParsedReceipt` albo None.
+Wywoływana jest w puli procesów, więc musi dać się zaimportować w procesie
+potomnym. Bez niej rozpoznawanie jest wyłączone: strony są przygotowywane
+i zapisywane, ale rachunek nie powstaje (ostrzeżenie przy starcie workera,
+`recognition` w `GET /api/v1/processing/stats`).
+"""
+import hashlib
+import importlib
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import config
+from src.processing.pages import BillPage
+
+# Zmiana sposobu rozpoznawania = nowa wersja; tylko ona unieważnia zapisane wyniki
+PARSER_VERSION = "1"
+
+
+@dataclass
+class ParsedItem:
+    original_text: str
+    quantity: Decimal
+    unit_price: Decimal
+    total_price: Decimal
+    confidence_score: Optional[float] = None
+
+
+@dataclass
+class ParsedReceipt:
+    items: List[ParsedItem] = field(default_factory=list)
+    shop_name: Optional[str] = None
+    # Surowy tekst nagłówka (nazwa, firma, adres, NIP) - do rozpoznania sklepu (src/shop/resolver.py)
+    header: Optional[str] = None
+    total_amount: Optional[Decimal] = None
+    bill_date: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Postać do zapisu w kolumnie JSON (Decimal i datetime jako tekst)."""
+        data = asdict(self)
+        for item in data["items"]:
+            for key in ("quantity", "unit_price", "total_price"):
+                item[key] = str(item[key])
+        data["total_amount"] = str(self.total_amount) if self.total_amount is not None else None
+        data["bill_date"] = self.bill_date.isoformat() if self.bill_date else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParsedReceipt":
+        return cls(
+            items=[
+                ParsedItem(
+                    original_text=item["original_text"],
+                    quantity=Decimal(item["quantity"]),
+                    unit_price=Decimal(item["unit_price"]),
+                    total_price=Decimal(item["total_price"]),
+                    confidence_score=item.get("confidence_score"),
+                )
+                for item in data.get("items", [])
+            ],
+            shop_name=data.get("shop_name"),
+            header=data.get("header"),
+            total_amount=Decimal(data["total_amount"]) if data.get("total_amount") is not None else None,
+            bill_date=datetime.fromisoformat(data["bill_date"]) if data.get("bill_date") else None,
+        )
+
+
+def page_content_hash(page: BillPage) -> str:
+    """SHA-256 treści strony: oryginalnego obrazu lub tekstu z PDF."""
+    if page.content_hash:
+        return page.content_hash
+    if page.text is not None:
+        return hashlib.sha256(page.text.encode("utf-8")).hexdigest()
+
+    from src.processing.images import file_sha256
+    return file_sha256(page.image_path)
+
+
+def receipt_content_hash(pages: List[BillPage]) -> str:
+    """Klucz rachunku: hash jedynej strony lub hash uporządkowanych hashy stron."""
+    hashes = [page_content_hash(page) for page in sorted(pages, key=lambda page: page.number)]
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("\n".join(hashes).encode("ascii")).hexdigest()
+
+
+ReceiptParser = Callable[[List[BillPage]], Optional["ParsedReceipt"]]
+
+
+def recognition_enabled() -> bool:
+    return bool(config.RECEIPT_PARSER)
+
+
+def parser_version() -> str:
+    """Wersja wyników w cache - inna funkcja rozpoznająca nie korzysta z wyników poprzedniej."""
+    return f"{PARSER_VERSION}:{config.RECEIPT_PARSER}" if config.RECEIPT_PARSER else PARSER_VERSION
+
+
+@lru_cache(maxsize=1)
+def receipt_parser() -> Optional[ReceiptParser]:
+    """Funkcja z `RECEIPT_PARSER`, importowana raz na proces; None - rozpoznawanie wyłączone."""
+    if not config.RECEIPT_PARSER:
+        return None
+    module_name, _, attribute = config.RECEIPT_PARSER.partition(":")
+    if not attribute:
+        raise ValueError(f"RECEIPT_PARSER must look like 'package.module:function', got {config.RECEIPT_PARSER!r}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def parse_receipt(pages: List[BillPage]) -> Optional[ParsedReceipt]:
+    """
+    Rozpoznaje pozycje rachunku ze stron funkcją z `RECEIPT_PARSER`.
+
+    Zwraca None, gdy rachunku nie udało się rozpoznać albo rozpoznawanie jest
+    wyłączone - taki wynik nie trafia do cache.
+    """
+    parser = receipt_parser()
+    if parser is None:
+        return None
+    return parser(pages)
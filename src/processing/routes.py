@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+
+from src.config import config
+from src.processing.images import preprocessing_stats
+from src.processing.parse_cache import parse_cache
+from src.processing.pool import pool_stats
+from src.processing.receipts import recognition_enabled
+
+router = APIRouter(prefix="/processing", tags=["Processing"])
+
+
+@router.get("/stats")
+async def get_processing_stats() -> dict:
+    """
+    Obciążenie puli procesów, czasy kroków przygotowania zdjęć, stan
+    rozpoznawania i trafienia cache wyników rozpoznania (dla bieżącego workera).
+    """
+    return {
+        "recognition": {"enabled": recognition_enabled(), "parser": config.RECEIPT_PARSER},
+        "pool": pool_stats(),
+        "preprocessing": preprocessing_stats.stats(),
+        "parse_results": parse_cache.stats(),
+    }
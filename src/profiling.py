@@ -0,0 +1,98 @@
+"""
+Profilowanie czasu startu aplikacji.
+
+`ImportProfiler` mierzy czas wykonania każdego importowanego modułu
+(odpowiednik `python -X importtime`, ale w procesie i bez parsowania stderr),
+żeby przy starcie w trybie debug było widać, które zależności kosztują najwięcej.
+"""
+import sys
+import time
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Optional, Tuple
+
+
+class _TimedLoader:
+    """Loader opakowujący oryginalny - mierzy wyłącznie exec_module."""
+
+    def __init__(self, loader, profiler: "ImportProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        # Moduł widzi oryginalny loader (importlib.resources, pkgutil.get_data itd.)
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+
+        self._profiler._enter()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(module.__name__, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportProfiler(MetaPathFinder):
+    """Zbiera czasy importów: (czas własny, czas skumulowany) w sekundach."""
+
+    def __init__(self):
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self._children: List[float] = []
+
+    def install(self) -> "ImportProfiler":
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _enter(self) -> None:
+        self._children.append(0.0)
+
+    def _exit(self, name: str, elapsed: float) -> None:
+        children = self._children.pop()
+        self.timings[name] = (elapsed - children, elapsed)
+        if self._children:
+            self._children[-1] += elapsed
+
+    @property
+    def total(self) -> float:
+        """Łączny czas importów najwyższego poziomu."""
+        return sum(own for own, _ in self.timings.values())
+
+    def report(self, top: int = 15, prefix: Optional[str] = None) -> str:
+        """Zwraca tabelę najkosztowniejszych importów (sortowaną po czasie skumulowanym)."""
+        rows = [
+            (name, own, cumulative)
+            for name, (own, cumulative) in self.timings.items()
+            if prefix is None or name.startswith(prefix)
+        ]
+        rows.sort(key=lambda row: row[2], reverse=True)
+
+        lines = [f"{'self [ms]':>10} | {'cumulative [ms]':>15} | module"]
+        for name, own, cumulative in rows[:top]:
+            lines.append(f"{own * 1000:>10.1f} | {cumulative * 1000:>15.1f} | {name}")
+        lines.append(f"Total import time: {self.total * 1000:.1f} ms ({len(self.timings)} modules)")
+        return "\n".join(lines)
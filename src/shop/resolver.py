@@ -0,0 +1,491 @@
+"""
+Rozpoznawanie sklepu z nagłówka rachunku w procesie workera.
+
+Nagłówek paragonu to kilka linii: nazwa (często z formą prawną), firma,
+adres i NIP. Sklepy z bazy - nazwy, aliasy (`ShopAlias`), adresy i NIP -
+trzymane są w słownikach w pamięci, więc `resolve` nie wykonuje zapytań:
+
+1. NIP z nagłówka (z poprawną sumą kontrolną) przypisany do sklepu,
+2. linia nagłówka równa nazwie lub aliasowi po normalizacji (wielkość liter,
+   polskie znaki, interpunkcja, forma prawna: "LIDL SP. Z O.O." -> "lidl"),
+3. dopasowanie przybliżone: kandydaci z indeksu wyrazów i ich wariantów bez
+   jednej litery (literówki OCR), oceniani odległością edycyjną.
+
+Dopasowanie inną drogą niż nazwa lub alias zwraca postać nazwy do
+zapamiętania jako alias - następny taki nagłówek trafia już w krok 2. Zmiany
+z tego procesu nanoszone są przez zdarzenia sesji (jak w
+`src/index/autocomplete.py`), zmiany z innych workerów - pełnym
+przeładowaniem co `SHOP_RESOLVER_REFRESH_INTERVAL` sekund.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import Shop, ShopAlias
+from src.index.autocomplete import normalize
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Formy prawne po normalizacji - zdejmowane z końca nazwy, także kilka po sobie ("sp. z o.o. sp.k.")
+_LEGAL_FORMS = sorted(
+    (tuple(form.split(" ")) for form in (
+        "sp z o o", "sp z oo", "sp zo o", "sp zoo", "spolka z o o",
+        "spolka z ograniczona odpowiedzialnoscia", "s a", "sa", "spolka akcyjna",
+        "sp k", "spk", "spolka komandytowa", "sp j", "spolka jawna", "s c", "spolka cywilna",
+        "s k a", "ska", "sp k a", "spolka komandytowo akcyjna",
+    )),
+    key=len, reverse=True,
+)
+_TAX_ID = re.compile(r"\bNIP\W{0,3}((?:PL)?[\d\s-]{10,16})", re.IGNORECASE)
+_TAX_ID_WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+# Linia adresu: ulica/aleja/plac/osiedle na początku albo kod pocztowy
+_ADDRESS = re.compile(r"^(ul|ulica|al|aleja|pl|plac|os|osiedle)\b|\b\d{2}-\d{3}\b")
+# Znaki mylone przez OCR - ich zamiana kosztuje pół edycji
+_OCR_CONFUSIONS = {pair for a, b in ("0o", "1l", "1i", "il", "5s", "8b", "2z") for pair in ((a, b), (b, a))}
+# Nazwa sklepu jest w pierwszych liniach paragonu, nagłówek kończy "PARAGON FISKALNY"
+_HEADER_LINES = 8
+_HEADER_END = re.compile(r"\bparagon\b")
+# Wyrazy od tej długości indeksowane są także bez jednej litery
+_VARIANT_MIN_LENGTH = 4
+# Wyraz pasujący do większej liczby kluczy ("sklep", "market") nie wyznacza kandydatów sam
+_COMMON_WORD_KEYS = 50
+
+# Klucz w Session.info ze zmianami do naniesienia po commit
+_PENDING_KEY = "shop_resolver_pending"
+
+
+def _words(text: str) -> List[str]:
+    return _NON_WORD.sub(" ", normalize(text)).split()
+
+
+def shop_key(text: str) -> str:
+    """Znormalizowana nazwa bez interpunkcji i formy prawnej ("LIDL Sp. z o.o. sp.k." -> "lidl")."""
+    words = _words(text)
+    stripped = True
+    while stripped:
+        stripped = False
+        for form in _LEGAL_FORMS:
+            if len(words) > len(form) and tuple(words[-len(form):]) == form:
+                del words[-len(form):]
+                stripped = True
+                break
+    return " ".join(words)
+
+
+def extract_tax_id(text: str) -> Optional[str]:
+    """Pierwszy NIP z tekstu z poprawną sumą kontrolną, jako 10 cyfr."""
+    for match in _TAX_ID.finditer(text or ""):
+        digits = re.sub(r"\D", "", match.group(1))[:10]
+        if len(digits) == 10:
+            checksum = sum(int(digit) * weight for digit, weight in zip(digits, _TAX_ID_WEIGHTS)) % 11
+            if checksum == int(digits[9]):
+                return digits
+    return None
+
+
+def _numbers(key: str) -> List[str]:
+    return [word for word in key.split(" ") if word.isdigit()]
+
+
+def _is_address(line: str) -> bool:
+    return bool(_ADDRESS.search(normalize(line)))
+
+
+def _name_lines(text: str) -> List[str]:
+    """Linie nagłówka, które mogą być nazwą sklepu (bez adresu i NIP)."""
+    lines = []
+    for line in [line.strip() for line in (text or "").splitlines() if line.strip()][:_HEADER_LINES]:
+        if _HEADER_END.search(normalize(line)):
+            break
+        if not _is_address(line) and not _TAX_ID.search(line):
+            lines.append(line)
+    return lines
+
+
+def header_name(text: str) -> Optional[str]:
+    """Pierwsza linia nagłówka wyglądająca na nazwę - nazwa nowego sklepu."""
+    return next((line for line in _name_lines(text) if shop_key(line)), None)
+
+
+def _word_variants(word: str) -> Iterator[str]:
+    """Wyraz i wyraz bez jednej litery - wspólny wariant mają wyrazy różniące się o jedną edycję."""
+    yield word
+    if len(word) >= _VARIANT_MIN_LENGTH:
+        for position in range(len(word)):
+            yield word[:position] + word[position + 1:]
+
+
+def _variants(key: str) -> Iterator[str]:
+    for word in set(key.split(" ")):
+        yield from _word_variants(word)
+
+
+def _distance(a: str, b: str, limit: float) -> float:
+    """
+    Odległość edycyjna z tańszą zamianą znaków mylonych przez OCR; powyżej
+    `limit` przerywa. Liczone jest tylko pasmo |i - j| <= limit - ścieżka
+    poza nim wymaga więcej wstawień/usunięć niż `limit`.
+    """
+    band = int(limit)
+    over = limit + 1
+    previous = [float(column) if column <= band else over for column in range(len(b) + 1)]
+    for row, char_a in enumerate(a, 1):
+        low, high = max(1, row - band), min(len(b), row + band)
+        current = [over] * (len(b) + 1)
+        if row <= band:
+            current[0] = float(row)
+        for column in range(low, high + 1):
+            char_b = b[column - 1]
+            if char_a == char_b:
+                substitution = 0.0
+            elif (char_a, char_b) in _OCR_CONFUSIONS:
+                substitution = 0.5
+            else:
+                substitution = 1.0
+            current[column] = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + substitution)
+        if min(current[low - 1:high + 1]) > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str, minimum: float = 0.0) -> float:
+    """1 - odległość edycyjna / dłuższa długość; 0, gdy wynik byłby poniżej `minimum`."""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 0.0
+    limit = (1 - minimum) * longest
+    if abs(len(a) - len(b)) > limit:
+        return 0.0
+    # Znaki bez pary w drugim napisie wymagają edycji (zamiana mylonych znaków - pół edycji)
+    paired = sum((Counter(a) & Counter(b)).values())
+    if (longest - paired) / 2 > limit:
+        return 0.0
+    score = 1 - _distance(a, b, limit) / longest
+    return score if score >= minimum else 0.0
+
+
+@dataclass(frozen=True)
+class ShopEntry:
+    """Niezależna od sesji migawka sklepu."""
+    id: int
+    name: str
+    address: Optional[str]
+    tax_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class ShopMatch:
+    shop_id: int
+    name: str
+    score: float
+    method: str  # "tax_id", "name" (nazwa lub alias) albo "fuzzy"
+    matched: str  # Dopasowany NIP lub klucz nazwy/aliasu
+    alias: Optional[str] = None  # Nowa postać nazwy do zapamiętania jako alias
+    tax_id: Optional[str] = None  # NIP z nagłówka do zapisania w sklepie, który go nie ma
+
+
+class ShopResolver:
+    """
+    Słowniki sklepów w pamięci workera.
+
+    `_keys` mapuje klucz nazwy lub aliasu na sklepy (po normalizacji dwa
+    istniejące sklepy mogą mieć ten sam klucz - wtedy wybierany jest ten
+    z pasującym adresem, a przy remisie starszy). `_variants` mapuje wyrazy
+    kluczy i ich warianty bez jednej litery na klucze - to kandydaci do
+    dopasowania przybliżonego, bez przeglądania wszystkich sklepów.
+    """
+
+    def __init__(self):
+        self.loaded_at: Optional[float] = None
+        self.outdated = False
+        self._shops: Dict[int, ShopEntry] = {}
+        self._aliases: Dict[int, Tuple[int, str]] = {}
+        self._keys: Dict[str, Set[int]] = {}
+        self._claims: Counter = Counter()
+        self._variants: Dict[str, Set[str]] = {}
+        self._tax_ids: Dict[str, Set[int]] = {}
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._shops)
+
+    def is_stale(self) -> bool:
+        return (
+            self.loaded_at is None or self.outdated
+            or time.monotonic() - self.loaded_at > config.SHOP_RESOLVER_REFRESH_INTERVAL
+        )
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        """
+        Pierwsze użycie czeka na załadowanie; później przeładowanie po upływie
+        czasu odświeżania odbywa się w tle, a dopasowania korzystają z poprzednich słowników.
+        """
+        if self.loaded_at is None:
+            async with self._lock:
+                if self.loaded_at is None:
+                    await self.load(session)
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        from src.db.main import engine
+
+        try:
+            async with AsyncSession(engine) as session:
+                await self.load(session)
+        except Exception as e:
+            logger.warning(f"Shop resolver refresh failed: {e}")
+
+    async def load(self, session: AsyncSession) -> None:
+        """Pełne przeładowanie sklepów i aliasów."""
+        start = time.perf_counter()
+        shops = (await session.execute(select(Shop.id, Shop.name, Shop.address, Shop.tax_id))).all()
+        aliases = (await session.execute(select(ShopAlias.id, ShopAlias.shop_id, ShopAlias.alias))).all()
+
+        fresh = ShopResolver()
+        for row in shops:
+            fresh.upsert_shop(ShopEntry(row.id, row.name, row.address, row.tax_id))
+        for row in aliases:
+            fresh.upsert_alias(row.id, row.shop_id, row.alias)
+        # Podmiana wszystkich słowników naraz - dopasowania w trakcie ładowania widzą poprzednie
+        self._shops, self._aliases, self._keys = fresh._shops, fresh._aliases, fresh._keys
+        self._claims, self._variants, self._tax_ids = fresh._claims, fresh._variants, fresh._tax_ids
+        self.loaded_at = time.monotonic()
+        self.outdated = False
+        logger.info(
+            f"Shop resolver loaded: {len(self._shops)} shops, {len(self._aliases)} aliases "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+    def _add_key(self, key: str, shop_id: int) -> None:
+        if not key:
+            return
+        self._claims[key, shop_id] += 1
+        owners = self._keys.setdefault(key, set())
+        if not owners:
+            for variant in _variants(key):
+                self._variants.setdefault(variant, set()).add(key)
+        owners.add(shop_id)
+
+    def _drop_key(self, key: str, shop_id: int) -> None:
+        if not self._claims.get((key, shop_id)):
+            return
+        self._claims[key, shop_id] -= 1
+        if self._claims[key, shop_id]:
+            return
+        del self._claims[key, shop_id]
+        owners = self._keys[key]
+        owners.discard(shop_id)
+        if owners:
+            return
+        del self._keys[key]
+        for variant in _variants(key):
+            keys = self._variants[variant]
+            keys.discard(key)
+            if not keys:
+                del self._variants[variant]
+
+    def upsert_shop(self, entry: ShopEntry) -> None:
+        previous = self._shops.get(entry.id)
+        if previous is not None:
+            self._drop_key(shop_key(previous.name), previous.id)
+            if previous.tax_id:
+                self._tax_ids[previous.tax_id].discard(previous.id)
+                if not self._tax_ids[previous.tax_id]:
+                    del self._tax_ids[previous.tax_id]
+        self._shops[entry.id] = entry
+        self._add_key(shop_key(entry.name), entry.id)
+        if entry.tax_id:
+            self._tax_ids.setdefault(entry.tax_id, set()).add(entry.id)
+
+    def remove_shop(self, shop_id: int) -> None:
+        entry = self._shops.get(shop_id)
+        if entry is None:
+            return
+        for alias_id in [alias_id for alias_id, (owner, _) in self._aliases.items() if owner == shop_id]:
+            self.remove_alias(alias_id)
+        self._drop_key(shop_key(entry.name), shop_id)
+        if entry.tax_id:
+            self._tax_ids[entry.tax_id].discard(shop_id)
+            if not self._tax_ids[entry.tax_id]:
+                del self._tax_ids[entry.tax_id]
+        del self._shops[shop_id]
+
+    def upsert_alias(self, alias_id: int, shop_id: int, alias: str) -> None:
+        self.remove_alias(alias_id)
+        if shop_id not in self._shops:
+            # Sklep spoza wczytanych (np. utworzony w innym workerze w trakcie ładowania)
+            self.outdated = True
+            return
+        self._aliases[alias_id] = (shop_id, shop_key(alias))
+        self._add_key(shop_key(alias), shop_id)
+
+    def remove_alias(self, alias_id: int) -> None:
+        alias = self._aliases.pop(alias_id, None)
+        if alias is not None:
+            shop_id, key = alias
+            self._drop_key(key, shop_id)
+
+    def _pick(self, shop_ids: Set[int], header_words: Set[str]) -> ShopEntry:
+        """Sklep o największej części adresu obecnej w nagłówku, przy remisie starszy."""
+        def rank(shop_id: int) -> tuple:
+            address = set(_words(self._shops[shop_id].address or ""))
+            return -(len(address & header_words) / len(address) if address else 0.0), shop_id
+
+        return self._shops[min(shop_ids, key=rank)]
+
+    def resolve(self, text: str, name: Optional[str] = None) -> Optional[ShopMatch]:
+        """
+        Dopasowuje nagłówek rachunku (i ewentualnie osobno rozpoznaną nazwę)
+        do sklepu; None, gdy żaden sklep nie osiąga `SHOP_RESOLVER_MIN_SCORE`.
+        """
+        lines = ([name] if name else []) + _name_lines(text)
+        keys = list(dict.fromkeys(key for key in map(shop_key, lines) if key))
+        header_words = set(_words(text or ""))
+        # Postać nazwy do zapamiętania przy dopasowaniu po NIP lub przybliżonym
+        alias = keys[0] if keys else None
+
+        tax_id = extract_tax_id(text)
+        if tax_id in self._tax_ids:
+            return self._match(self._pick(self._tax_ids[tax_id], header_words), 1.0, "tax_id", tax_id, alias, None)
+
+        for key in keys:
+            if key in self._keys:
+                return self._match(self._pick(self._keys[key], header_words), 1.0, "name", key, None, tax_id)
+
+        best: Optional[Tuple[float, str, str]] = None
+        for key in keys:
+            numbers = _numbers(key)
+            for candidate in self._candidates(key):
+                # Numer sklepu odróżnia sklepy sieci ("Żabka 12" i "Żabka 13") - musi się zgadzać
+                if _numbers(candidate) != numbers:
+                    continue
+                score = similarity(key, candidate, config.SHOP_RESOLVER_MIN_SCORE)
+                if score and (best is None or (score, candidate) > best[:2]):
+                    best = (score, candidate, key)
+        if best is None:
+            return None
+        score, candidate, key = best
+        return self._match(self._pick(self._keys[candidate], header_words), score, "fuzzy", candidate, key, tax_id)
+
+    def _candidates(self, key: str) -> Set[str]:
+        """
+        Klucze z wyrazem podobnym do rzadkiego wyrazu linii; gdy linia ma same
+        częste wyrazy - klucze zawierające podobne do nich wszystkich.
+        """
+        groups = []
+        for word in set(key.split(" ")):
+            keys = self._variants.get(word, set())
+            if len(keys) <= _COMMON_WORD_KEYS:
+                # Częsty wyraz z literówką i tak nie zawęża kandydatów - warianty tylko dla rzadkich
+                keys = set().union(*(self._variants.get(variant, ()) for variant in _word_variants(word)))
+            if keys:
+                groups.append(keys)
+        rare = [keys for keys in groups if len(keys) <= _COMMON_WORD_KEYS]
+        if rare:
+            return set().union(*rare)
+        return set.intersection(*groups) if groups else set()
+
+    def _match(
+        self,
+        entry: ShopEntry,
+        score: float,
+        method: str,
+        matched: str,
+        alias: Optional[str],
+        tax_id: Optional[str]
+    ) -> ShopMatch:
+        if alias in self._keys:
+            alias = None
+        if entry.tax_id or tax_id in self._tax_ids:
+            tax_id = None
+        return ShopMatch(entry.id, entry.name, round(score, 3), method, matched, alias, tax_id)
+
+    def shop(self, shop_id: int) -> Optional[ShopEntry]:
+        return self._shops.get(shop_id)
+
+    def apply(self, changes: List[Tuple[str, Any]]) -> None:
+        """Nanosi zmiany zebrane z zatwierdzonej transakcji."""
+        for kind, value in changes:
+            if kind == "shop":
+                self.upsert_shop(value)
+            elif kind == "remove_shop":
+                self.remove_shop(value)
+            elif kind == "alias":
+                self.upsert_alias(*value)
+            elif kind == "remove_alias":
+                self.remove_alias(value)
+            else:
+                # Zmiana bez pełnej migawki - przeładowanie w tle przy następnym użyciu
+                self.outdated = True
+
+    def stats(self) -> dict:
+        return {
+            "shops": len(self._shops),
+            "aliases": len(self._aliases),
+            "keys": len(self._keys),
+            "variants": len(self._variants),
+            "loaded_seconds_ago": None if self.loaded_at is None else round(time.monotonic() - self.loaded_at, 1),
+        }
+
+
+shop_resolver = ShopResolver()
+
+
+def record_change(session: AsyncSession, kind: str, value: Any) -> None:
+    """Zmiana zapisana z pominięciem ORM (INSERT ... ON CONFLICT, UPDATE) - naniesiona zostanie po commit."""
+    if shop_resolver.loaded_at is not None:
+        session.info.setdefault(_PENDING_KEY, []).append((kind, value))
+
+
+def _snapshot(obj: Any) -> Optional[Tuple[str, Any]]:
+    """Migawka z załadowanych atrybutów - zdarzenie flush nie może doczytywać ich z bazy."""
+    state = inspect(obj).dict
+    if isinstance(obj, Shop):
+        if not all(name in state for name in ("id", "name", "address", "tax_id")):
+            return None
+        return "shop", ShopEntry(state["id"], state["name"], state["address"], state["tax_id"])
+    if not all(name in state for name in ("id", "shop_id", "alias")):
+        return None
+    return "alias", (state["id"], state["shop_id"], state["alias"])
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    if shop_resolver.loaded_at is None:
+        return
+    changes = session.info.setdefault(_PENDING_KEY, [])
+    changed = list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]
+    # Sklepy przed aliasami - alias nowego sklepu wymaga jego wpisu
+    for obj in [obj for obj in changed if isinstance(obj, Shop)] + [obj for obj in changed if isinstance(obj, ShopAlias)]:
+        changes.append(_snapshot(obj) or ("reload", None))
+    for obj in session.deleted:
+        if isinstance(obj, Shop):
+            changes.append(("remove_shop", obj.id))
+        elif isinstance(obj, ShopAlias):
+            changes.append(("remove_alias", obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        shop_resolver.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,8 +1,9 @@
 from src.db.main import get_session
 from fastapi import APIRouter, Depends, HTTPException, status
-from src.shop.schemas import ShopCreate, ShopRead
+from src.shop.schemas import ShopCreate, ShopRead, ShopResolution, ShopResolveRequest
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.shop import services
+from src.shop.resolver import shop_resolver
 
 router = APIRouter(prefix="/shops", tags=["Shops"])
 
@@ -19,6 +20,20 @@ async def create_shop(shop_in: ShopCreate, session: AsyncSession = Depends(get_s
         )
     return await services.create_shop(session, shop_in=shop_in)
 
+@router.post("/resolve", response_model=ShopResolution)
+async def resolve_shop(request: ShopResolveRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Rozpoznaje sklep z nagłówka rachunku (NIP, nazwa lub alias, dopasowanie
+    przybliżone) bez zapytań do bazy. Nie zapisuje aliasów ani nowych sklepów.
+    """
+    await shop_resolver.ensure_loaded(session)
+    match = shop_resolver.resolve(request.text, name=request.name)
+    if match is None:
+        return ShopResolution()
+    return ShopResolution(
+        shop_id=match.shop_id, name=match.name, score=match.score, method=match.method, matched=match.matched
+    )
+
 # @router.get("/", response_model=List[ShopRead])
 # async def get_shops(skip: int = 0, limit: int = 100, session: AsyncSession = Depends(get_session)):
 #     """
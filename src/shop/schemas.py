@@ -1,9 +1,10 @@
 from typing import Optional
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
 
 class ShopBase(SQLModel):
     name: str
     address: Optional[str] = None
+    tax_id: Optional[str] = None
 
 class ShopCreate(ShopBase):
     pass
@@ -13,4 +14,16 @@ class ShopRead(ShopBase):
 
 class ShopUpdate(SQLModel):
     name: Optional[str] = None
-    address: Optional[str] = None
\ No newline at end of file
+    address: Optional[str] = None
+    tax_id: Optional[str] = None
+
+class ShopResolveRequest(SQLModel):
+    text: str = Field(max_length=4000)  # Nagłówek rachunku, linie oddzielone znakiem nowej linii
+    name: Optional[str] = None  # Osobno rozpoznana nazwa sklepu
+
+class ShopResolution(SQLModel):
+    shop_id: Optional[int] = None
+    name: Optional[str] = None
+    score: float = 0.0
+    method: Optional[str] = None  # "tax_id", "name" albo "fuzzy"
+    matched: Optional[str] = None  # Dopasowany NIP lub znormalizowana nazwa/alias
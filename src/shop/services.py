@@ -1,10 +1,23 @@
+from datetime import datetime
 from typing import Optional
-from sqlmodel import select
+from sqlmodel import select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.models import Shop
+from src.bill.cache import invalidate_bills_after_commit
+from src.db.models import Shop, ShopAlias
+from src.processing.receipts import ParsedReceipt
+from src.shop.resolver import ShopEntry, extract_tax_id, header_name, record_change, shop_resolver
 from src.shop.schemas import ShopCreate
 
 
+def _insert(session: AsyncSession):
+    """Zwraca konstruktor INSERT z obsługą ON CONFLICT dla dialektu sesji."""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
 async def get_shop_by_name(session: AsyncSession, name: str) -> Optional[Shop]:
     """Pobiera sklep po jego nazwie."""
     statement = select(Shop).where(Shop.name == name)
@@ -24,4 +37,62 @@ async def get_or_create_shop(session: AsyncSession, shop_in: ShopCreate) -> Shop
     db_shop = await get_shop_by_name(session, name=shop_in.name)
     if not db_shop:
         db_shop = await create_shop(session, shop_in)
-    return db_shop
\ No newline at end of file
+    return db_shop
+
+async def learn_alias(session: AsyncSession, shop_id: int, alias: str) -> None:
+    """Zapisuje alias sklepu; równoległy zapis tego samego aliasu jest pomijany (ON CONFLICT DO NOTHING)."""
+    insert = _insert(session)
+    result = await session.execute(
+        insert(ShopAlias)
+        .values(shop_id=shop_id, alias=alias, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["alias"])
+        .returning(ShopAlias.id)
+    )
+    alias_id = result.scalar_one_or_none()
+    if alias_id is not None:
+        record_change(session, "alias", (alias_id, shop_id, alias))
+
+async def learn_tax_id(session: AsyncSession, shop_id: int, tax_id: str) -> None:
+    """Zapisuje NIP z nagłówka w sklepie, który jeszcze go nie ma."""
+    result = await session.execute(
+        update(Shop).where(Shop.id == shop_id, Shop.tax_id.is_(None)).values(tax_id=tax_id)
+    )
+    if not result.rowcount:
+        return
+    # Odpowiedzi rachunków sklepu zawierają jego NIP (BillReadWithDetails.shop)
+    await invalidate_bills_after_commit(session, shop_ids=[shop_id])
+    entry = shop_resolver.shop(shop_id)
+    if entry is not None:
+        record_change(session, "shop", ShopEntry(entry.id, entry.name, entry.address, tax_id))
+
+async def resolve_receipt_shop(session: AsyncSession, receipt: ParsedReceipt) -> Optional[int]:
+    """
+    Zwraca ID sklepu z nagłówka i nazwy rozpoznanej na rachunku.
+
+    Dopasowanie odbywa się w pamięci workera (src/shop/resolver.py), bez
+    zapytań do bazy. Nowa postać nazwy i nieznany wcześniej NIP zapisywane
+    są przy sklepie, nieznany sklep jest tworzony - w transakcji rachunku.
+    """
+    if not receipt.shop_name and not receipt.header:
+        return None
+    await shop_resolver.ensure_loaded(session)
+    match = shop_resolver.resolve(receipt.header or "", name=receipt.shop_name)
+    if match is not None:
+        if match.alias:
+            await learn_alias(session, match.shop_id, match.alias)
+        if match.tax_id:
+            await learn_tax_id(session, match.shop_id, match.tax_id)
+        return match.shop_id
+
+    name = receipt.shop_name or header_name(receipt.header)
+    if not name:
+        return None
+    # Sklep mógł powstać w innym workerze po ostatnim przeładowaniu
+    result = await session.execute(select(Shop.id).where(Shop.name == name))
+    shop_id = result.scalar_one_or_none()
+    if shop_id is None:
+        db_shop = Shop(name=name, tax_id=extract_tax_id(receipt.header))
+        session.add(db_shop)
+        await session.flush()
+        shop_id = db_shop.id
+    return shop_id
@@ -0,0 +1,131 @@
+"""
+Dziennik zmian do synchronizacji przyrostowej (model `SyncChange`).
+
+Każdy flush, który dodaje, zmienia lub usuwa rachunek, pozycję albo
+wiadomość, dopisuje w tej samej transakcji wiersze dziennika - zmiana
+i jej wpis są zatwierdzane albo wycofywane razem. Zapisy z pominięciem ORM
+(UPDATE wiadomości w src/telegram/services.py) zgłaszane są przez
+`record_changes` / `record_message_changes`.
+
+Numery wpisów (`seq`) przydziela licznik `SyncSequence` użytkownika: UPDATE
+blokuje jego wiersz do commit, więc równoległa transakcja tego samego
+użytkownika czeka i dostaje wyższy numer dopiero po zatwierdzeniu
+poprzedniej. Niezatwierdzony numer jest zawsze wyższy od zatwierdzonych -
+kursor klienta nie przeskoczy zmiany, która pojawi się później.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Bill, BillItem, SyncChange, SyncSequence, TelegramMessage, User
+from src.user.cache import cached_user, find_user
+
+logger = logging.getLogger(__name__)
+
+BILL = "bill"
+ITEM = "item"
+MESSAGE = "message"
+
+_ENTITIES = {Bill: BILL, BillItem: ITEM, TelegramMessage: MESSAGE}
+
+
+def _rows(entity: str, entity_ids: Iterable[int], user_id: int, deleted: bool = False) -> List[dict]:
+    changed_at = datetime.utcnow()
+    return [
+        {"user_id": user_id, "entity": entity, "entity_id": entity_id, "deleted": deleted, "changed_at": changed_at}
+        for entity_id in entity_ids
+    ]
+
+
+def _allocate(connection: Connection, user_id: int, count: int) -> int:
+    """Rezerwuje `count` kolejnych numerów zmian użytkownika; zwraca ostatni."""
+    if connection.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    # Jedno zapytanie: pierwsza zmiana tworzy licznik, kolejne go zwiększają (i blokują wiersz)
+    statement = upsert(SyncSequence).values(user_id=user_id, seq=count)
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id"], set_={"seq": SyncSequence.seq + statement.excluded.seq}
+    ).returning(SyncSequence.seq)
+    return connection.execute(statement).scalar_one()
+
+
+def _insert_changes(connection: Connection, rows: List[dict]) -> None:
+    """Nadaje wpisom numery z liczników ich użytkowników i zapisuje je."""
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+    # Stała kolejność blokowania liczników - bez zakleszczeń przy kilku użytkownikach
+    for user_id in sorted(by_user):
+        user_rows = by_user[user_id]
+        first = _allocate(connection, user_id, len(user_rows)) - len(user_rows) + 1
+        for seq, row in enumerate(user_rows, start=first):
+            row["seq"] = seq
+    connection.execute(insert(SyncChange), rows)
+
+
+async def record_changes(session: AsyncSession, entity: str, entity_ids: Iterable[int], user_id: int) -> None:
+    """Zapisuje zmiany wykonane z pominięciem ORM - w transakcji wywołującego."""
+    rows = _rows(entity, entity_ids, user_id)
+    if rows:
+        await session.run_sync(lambda sync_session: _insert_changes(sync_session.connection(), rows))
+
+
+async def record_message_changes(session: AsyncSession, external_id: int, message_ids: Iterable[int]) -> None:
+    """Jak `record_changes` dla wiadomości użytkownika o danym external_id (chat_id)."""
+    user = await find_user(session, external_id)
+    if user is None:
+        logger.warning(f"Sync change of messages {list(message_ids)} skipped: unknown user {external_id}")
+        return
+    await record_changes(session, MESSAGE, message_ids, user.id)
+
+
+def _owner(session: Session, obj: Any) -> Optional[int]:
+    """User.id właściciela z załadowanych atrybutów; w razie braku - zapytanie w transakcji flush."""
+    state = inspect(obj).dict
+    if isinstance(obj, Bill):
+        return state.get("user_id")
+
+    if isinstance(obj, TelegramMessage):
+        external_id = state.get("user_id")
+        user = cached_user(session, external_id)
+        if user is not None:
+            return user.id
+        statement = select(User.id).where(User.external_id == external_id)
+    else:
+        bill_id = state.get("bill_id")
+        # Rachunek z tej samej sesji - także usuwany w tym flush (wiersza już nie ma)
+        bill = session.identity_map.get(identity_key(Bill, bill_id))
+        if bill is not None and "user_id" in inspect(bill).dict:
+            return inspect(bill).dict["user_id"]
+        statement = select(Bill.user_id).where(Bill.id == bill_id)
+    return session.connection().execute(statement).scalar_one_or_none()
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_changes(session: Session, flush_context) -> None:
+    changed = (
+        [(obj, False) for obj in session.new]
+        + [(obj, False) for obj in session.dirty if session.is_modified(obj)]
+        + [(obj, True) for obj in session.deleted]
+    )
+    rows = []
+    for obj, deleted in changed:
+        entity = _ENTITIES.get(type(obj))
+        if entity is None:
+            continue
+        entity_id = inspect(obj).dict.get("id")
+        user_id = _owner(session, obj)
+        if user_id is None:
+            logger.warning(f"Sync change of {entity} {entity_id} skipped: owner unknown")
+            continue
+        rows.extend(_rows(entity, [entity_id], user_id, deleted))
+    if rows:
+        _insert_changes(session.connection(), rows)
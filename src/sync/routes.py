@@ -0,0 +1,34 @@
+from src.config import config
+from src.db.main import get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from src.sync import services
+from src.sync.schemas import SyncChanges
+
+router = APIRouter(prefix="/users", tags=["Sync"])
+
+
+@router.get("/{user_id}/changes", response_model=SyncChanges)
+async def get_changes(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=config.SYNC_MAX_LIMIT),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Zwraca rachunki, pozycje i wiadomości użytkownika zmienione po `cursor`
+    oraz usunięte (`deleted`).
+
+    Pierwsze wywołanie (bez `cursor`) zwraca `reset=true` i kursor - klient
+    pobiera wtedy pełne dane (`/users/{user_id}/bills`, `/messages`),
+    a dalej tylko zmiany, przekazując `cursor` z poprzedniej odpowiedzi.
+    Przy `has_more=true` kolejną stronę można pobrać od razu. Kursor starszy
+    niż retencja dziennika zmian daje 410 - klient pobiera dane od nowa.
+    """
+    try:
+        return await services.get_changes(session, user_id=user_id, cursor=cursor, limit=limit)
+    except services.CursorExpiredError as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
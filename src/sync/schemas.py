@@ -0,0 +1,41 @@
+from typing import List, Optional
+from datetime import datetime
+from sqlmodel import SQLModel
+from src.bill.schemas import BillRead
+from src.billitem.schemas import BillItemRead
+
+class SyncBillItem(BillItemRead):
+    bill_id: int
+
+# Kolumny jak w listach wiadomości (src/telegram/services.py:MESSAGE_COLUMNS)
+class SyncMessage(SQLModel):
+    id: int
+    telegram_message_id: int
+    chat_id: int
+    message_type: str
+    content: str
+    file_id: Optional[str] = None
+    status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    user_id: int
+    bill_id: Optional[int] = None
+    error_message: Optional[str] = None
+
+# Usunięty obiekt; entity: bill, item lub message
+class SyncTombstone(SQLModel):
+    entity: str
+    id: int
+
+# Zmiany po kursorze - każdy obiekt raz, w stanie bieżącym. Kolejne zmiany pobiera się z `cursor`
+# (także gdy lista jest pusta); reset=true oznacza, że klient musi najpierw pobrać pełne dane.
+# messages_since - wiadomości utworzone wcześniej usuwa retencja bez tombstone; klient usuwa je u siebie.
+class SyncChanges(SQLModel):
+    bills: List[BillRead] = []
+    items: List[SyncBillItem] = []
+    messages: List[SyncMessage] = []
+    deleted: List[SyncTombstone] = []
+    cursor: str
+    has_more: bool = False
+    reset: bool = False
+    messages_since: Optional[datetime] = None
@@ -0,0 +1,129 @@
+"""
+Kanał zmian dla synchronizacji przyrostowej (GET /users/{user_id}/changes).
+
+Strona zmian to zakres indeksu (user_id, seq) dziennika `SyncChange` po
+kursorze klienta; wiele zmian jednego obiektu daje jeden wpis w stanie
+bieżącym, a usunięcia - tombstone. Kursor to (czas, seq ostatniej zmiany):
+seq wskazuje miejsce w dzienniku, a czas pozwala odrzucić kursor starszy niż
+retencja dziennika - wtedy klient pobiera dane od nowa.
+
+Numery seq użytkownika rosną w kolejności commit (src/sync/changes.py), więc
+zmiana zatwierdzona później ma zawsze wyższy numer niż kursor i strona nie
+czeka na trwające transakcje.
+
+Wiadomości odłączane z partycjami przez retencję (src/db/partitions.py) nie
+dostają tombstone - odpowiedź podaje granicę retencji `messages_since`.
+"""
+import base64
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import config
+from src.db.models import Bill, BillItem, SyncChange, TelegramMessage
+from src.db.partitions import retention_cutoff
+from src.sync.changes import BILL, ITEM, MESSAGE
+from src.sync.schemas import SyncBillItem, SyncChanges, SyncMessage, SyncTombstone
+from src.telegram.services import MESSAGE_COLUMNS
+
+
+class CursorExpiredError(Exception):
+    """Kursor starszy niż retencja dziennika - zmiany mogły zostać usunięte."""
+
+
+def encode_sync_cursor(seen_until: datetime, seq: int) -> str:
+    """Kursor - klient zna zmiany do `seq` i stan z chwili `seen_until`."""
+    raw = f"{seen_until.isoformat()}|{seq}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_sync_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Odczytuje kursor; ValueError dla niepoprawnego."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        seen_until, seq = raw.rsplit("|", 1)
+        return datetime.fromisoformat(seen_until), int(seq)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _messages_since(session: AsyncSession) -> Optional[datetime]:
+    """Granica retencji wiadomości (tylko PostgreSQL z partycjami), None bez retencji."""
+    if config.TELEGRAM_MESSAGE_RETENTION_MONTHS <= 0 or session.bind.dialect.name != "postgresql":
+        return None
+    return datetime.combine(retention_cutoff(config.TELEGRAM_MESSAGE_RETENTION_MONTHS), time.min)
+
+async def get_changes(session: AsyncSession, user_id: int, cursor: Optional[str] = None, limit: int = 500) -> SyncChanges:
+    """
+    Zwraca zmiany użytkownika po kursorze (najwyżej `limit` wpisów dziennika).
+
+    Bez kursora zwraca tylko kursor bieżącego stanu i `reset` - klient pobiera
+    pełne dane dopiero po nim, więc zmiany z tego czasu przyjdą w kolejnej
+    synchronizacji (ponowne naniesienie tego samego stanu nic nie zmienia).
+    """
+    now = datetime.utcnow()
+    messages_since = _messages_since(session)
+
+    if cursor is None:
+        result = await session.execute(select(func.max(SyncChange.seq)).where(SyncChange.user_id == user_id))
+        return SyncChanges(cursor=encode_sync_cursor(now, result.scalar() or 0), reset=True, messages_since=messages_since)
+
+    seen_until, after_seq = decode_sync_cursor(cursor)
+    if seen_until < now - timedelta(days=config.SYNC_CHANGE_RETENTION_DAYS):
+        raise CursorExpiredError("Cursor expired, full resync required")
+
+    result = await session.execute(
+        select(SyncChange.seq, SyncChange.entity, SyncChange.entity_id, SyncChange.deleted, SyncChange.changed_at)
+        .where(SyncChange.user_id == user_id, SyncChange.seq > after_seq)
+        .order_by(SyncChange.seq)
+        .limit(limit + 1)
+    )
+    changes = result.all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Ostatni stan każdego obiektu na stronie: True - usunięty
+    latest: Dict[Tuple[str, int], bool] = {}
+    for change in changes:
+        latest[(change.entity, change.entity_id)] = change.deleted
+    wanted = {entity: [] for entity in (BILL, ITEM, MESSAGE)}
+    for (entity, entity_id), deleted in latest.items():
+        if not deleted:
+            wanted[entity].append(entity_id)
+
+    page = SyncChanges(cursor="", has_more=has_more, messages_since=messages_since)
+    found = set()
+    if wanted[BILL]:
+        result = await session.execute(select(Bill).where(Bill.id.in_(wanted[BILL]), Bill.user_id == user_id))
+        page.bills = list(result.scalars().all())
+        found.update((BILL, bill.id) for bill in page.bills)
+    if wanted[ITEM]:
+        result = await session.execute(select(BillItem).where(BillItem.id.in_(wanted[ITEM])))
+        page.items = [SyncBillItem.model_validate(item) for item in result.scalars().all()]
+        found.update((ITEM, item.id) for item in page.items)
+    if wanted[MESSAGE]:
+        result = await session.execute(select(*MESSAGE_COLUMNS).where(TelegramMessage.id.in_(wanted[MESSAGE])))
+        page.messages = [SyncMessage.model_validate(dict(row._mapping)) for row in result.all()]
+        found.update((MESSAGE, message.id) for message in page.messages)
+
+    # Usunięte w dzienniku i te, których już nie ma (np. po retencji partycji wiadomości)
+    page.deleted = [
+        SyncTombstone(entity=entity, id=entity_id)
+        for (entity, entity_id), deleted in latest.items()
+        if deleted or (entity, entity_id) not in found
+    ]
+
+    if has_more:
+        page.cursor = encode_sync_cursor(changes[-1].changed_at, changes[-1].seq)
+    else:
+        # Wszystkie zatwierdzone zmiany odczytane - klient zna stan z tej chwili
+        page.cursor = encode_sync_cursor(now, changes[-1].seq if changes else after_seq)
+    return page
+
+async def prune_changes(session: AsyncSession, days: int) -> int:
+    """Usuwa wpisy dziennika starsze niż `days` dni; zwraca ich liczbę."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = await session.execute(delete(SyncChange).where(SyncChange.changed_at < cutoff))
+    await session.commit()
+    return result.rowcount
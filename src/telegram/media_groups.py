@@ -0,0 +1,78 @@
+"""
+Buforowanie albumów Telegram (wiele zdjęć ze wspólnym `media_group_id`).
+
+Telegram wysyła każde zdjęcie albumu jako osobną aktualizację, jedna po
+drugiej. Agregator odkłada przetworzenie grupy do momentu, gdy przez
+`window` sekund nie nadejdzie kolejna część, a następnie wywołuje handler
+raz dla całej grupy.
+
+Bufor jest lokalny dla workera - handler odczytuje części albumu z bazy,
+więc obejmuje także zdjęcia przyjęte przez inne workery.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MediaGroupHandler = Callable[[int, str, Optional[str]], Awaitable[None]]
+
+
+@dataclass
+class _PendingGroup:
+    chat_id: int
+    media_group_id: str
+    caption: Optional[str]
+    parts: int
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MediaGroupAggregator:
+    """Odkłada przetworzenie albumu do zakończenia napływu jego części."""
+
+    def __init__(self, window: float, handler: MediaGroupHandler):
+        self.window = window
+        self.handler = handler
+        self._pending: Dict[Tuple[int, str], _PendingGroup] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, chat_id: int, media_group_id: str, caption: Optional[str] = None) -> None:
+        """Rejestruje część albumu i przesuwa termin jego przetworzenia."""
+        key = (chat_id, media_group_id)
+        group = self._pending.get(key)
+        if group is None:
+            group = _PendingGroup(chat_id=chat_id, media_group_id=media_group_id, caption=caption, parts=0)
+            self._pending[key] = group
+        else:
+            group.timer.cancel()
+            # Podpis albumu jest zwykle tylko przy jednym ze zdjęć
+            group.caption = group.caption or caption
+
+        group.parts += 1
+        group.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+    def _flush(self, key: Tuple[int, str]) -> None:
+        group = self._pending.pop(key, None)
+        if group is None:
+            return
+        task = asyncio.create_task(self._run(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: _PendingGroup) -> None:
+        try:
+            await self.handler(group.chat_id, group.media_group_id, group.caption)
+        except Exception:
+            logger.exception(f"Error processing media group {group.media_group_id} ({group.parts} parts)")
+
+    async def drain(self) -> None:
+        """Przetwarza od razu wszystkie oczekujące albumy (przy wyłączaniu workera)."""
+        for key, group in list(self._pending.items()):
+            group.timer.cancel()
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._pending)
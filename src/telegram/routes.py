@@ -1,15 +1,21 @@
+import logging
+from datetime import datetime
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import ValidationError
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.db.main import get_session
 from src.telegram import services
 from src.telegram.schemas import TelegramWebhook, BotCommand, BotCommandList
+from src.telegram.update_log import update_log
 from src.config import config
 from src.files.services import FileService
 from src.files.schemas import FileResponse as FileResponseSchema
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # =============================================================================
@@ -23,6 +29,21 @@ async def webhook_test():
     """
     return {"status": "ok", "message": "Webhook endpoint is working"}
 
+async def _read_limited_body(request: Request, limit: int) -> bytes:
+    """Czyta ciało żądania, przerywając po przekroczeniu limitu bajtów."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Webhook body too large")
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Webhook body too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 @router.post("/webhook")
 async def process_webhook(
     request: Request,
@@ -33,40 +54,29 @@ async def process_webhook(
     
     Ten endpoint otrzymuje wiadomości z Telegram Bot API.
     Przetwarza różne typy wiadomości (tekst, zdjęcia, dokumenty).
+    
+    Telegram wysyła wyłącznie JSON, więc surowe bajty walidowane są w jednym
+    przebiegu przez `model_validate_json` - bez pośredniego słownika, a pola
+    nieopisane w schemacie są pomijane już podczas parsowania.
+    
+    Surowe ciało trafia do dziennika aktualizacji (także niepoprawne - bez
+    `update_id`), zanim aktualizacja zostanie przetworzona.
     """
     try:
-        # Sprawdź Content-Type
-        content_type = request.headers.get("content-type", "")
-        print(f"🔍 Content-Type: {content_type}")
-        
-        # Pobierz dane z request w zależności od Content-Type
-        if "application/json" in content_type:
-            webhook_data = await request.json()
-        elif "application/x-www-form-urlencoded" in content_type:
-            # Telegram może wysyłać dane w formacie form-data
-            form_data = await request.form()
-            webhook_data = dict(form_data)
-            print(f"📝 Form data: {webhook_data}")
-        else:
-            # Spróbuj pobrać jako JSON (fallback)
-            try:
-                webhook_data = await request.json()
-            except:
-                # Jeśli nie JSON, pobierz jako tekst
-                body = await request.body()
-                print(f"📄 Raw body: {body}")
-                raise HTTPException(status_code=400, detail=f"Unsupported content type: {content_type}")
-        
-        print(f"📊 Webhook data: {webhook_data}")
+        body = await _read_limited_body(request, config.TELEGRAM_WEBHOOK_MAX_BODY)
         
         # Waliduj dane webhooka
         try:
-            webhook = TelegramWebhook(**webhook_data)
-        except Exception as e:
-            print(f"❌ Validation error: {e}")
-            print(f"📊 Data that failed validation: {webhook_data}")
+            webhook = TelegramWebhook.model_validate_json(body)
+        except ValidationError as e:
+            logger.warning(f"Invalid webhook data: {e.error_count()} errors, {len(body)} bytes")
+            if config.UPDATE_LOG_ENABLED:
+                update_log.append(body)
             raise HTTPException(status_code=400, detail=f"Invalid webhook data: {str(e)}")
         
+        if config.UPDATE_LOG_ENABLED:
+            update_log.append(body, webhook.update_id)
+        
         # Przetwórz webhook
         success = await services.process_webhook(session, webhook)
         
@@ -78,9 +88,7 @@ async def process_webhook(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected webhook error")
         raise HTTPException(status_code=500, detail=f"Webhook processing error: {str(e)}")
 
 # =============================================================================
@@ -198,181 +206,119 @@ async def telegram_health_check() -> dict:
 # Message Management Endpoints
 # =============================================================================
 
-@router.get("/messages")
+def _pagination(total: int, limit: int, offset: int) -> dict:
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "has_more": offset + limit < total
+    }
+
+@router.get("/messages", response_class=ORJSONResponse)
 async def get_all_messages(
     limit: int = 50,
     offset: int = 0,
     chat_id: Optional[int] = None,
     message_type: Optional[str] = None,
     status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     session: AsyncSession = Depends(get_session)
-) -> dict:
+) -> ORJSONResponse:
     """
     Pobieranie wszystkich wiadomości z filtrami
     
     Endpoint do pobierania wiadomości z opcjonalnymi filtrami.
+    Zakres `date_from`/`date_to` (created_at) ogranicza skanowane partycje.
     """
     try:
-        messages = await services.get_telegram_messages(
+        rows = await services.get_telegram_messages(
             session, 
             skip=offset, 
             limit=limit,
             chat_id=chat_id,
             message_type=message_type,
-            status=status
+            status=status,
+            date_from=date_from,
+            date_to=date_to
         )
         
         total_count = await services.count_telegram_messages(
             session,
             chat_id=chat_id,
             message_type=message_type,
-            status=status
+            status=status,
+            date_from=date_from,
+            date_to=date_to
         )
         
-        return {
+        return ORJSONResponse({
             "status": "success",
-            "pagination": {
-                "total": total_count,
-                "limit": limit,
-                "offset": offset,
-                "has_more": offset + limit < total_count
-            },
-            "messages": [
-                {
-                    "id": msg.id,
-                    "telegram_message_id": msg.telegram_message_id,
-                    "chat_id": msg.chat_id,
-                    "message_type": msg.message_type,
-                    "content": msg.content,
-                    "file_id": msg.file_id,
-                    "status": msg.status,
-                    "created_at": msg.created_at.isoformat(),
-                    "updated_at": msg.updated_at.isoformat() if msg.updated_at else None,
-                    "user_id": msg.user_id,
-                    "bill_id": msg.bill_id,
-                    "error_message": msg.error_message
-                }
-                for msg in messages
-            ]
-        }
+            "pagination": _pagination(total_count, limit, offset),
+            "messages": [services.message_row_to_dict(row) for row in rows]
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching messages: {str(e)}")
 
-@router.get("/messages/{message_id}")
-async def get_message_by_id(
-    message_id: int,
-    session: AsyncSession = Depends(get_session)
-) -> dict:
-    """
-    Pobieranie konkretnej wiadomości po ID
-    
-    Endpoint do pobierania szczegółów konkretnej wiadomości.
-    """
-    try:
-        message = await services.get_telegram_message(session, message_id)
-        
-        if not message:
-            raise HTTPException(status_code=404, detail="Message not found")
-        
-        return {
-            "status": "success",
-            "message": {
-                "id": message.id,
-                "telegram_message_id": message.telegram_message_id,
-                "chat_id": message.chat_id,
-                "message_type": message.message_type,
-                "content": message.content,
-                "file_id": message.file_id,
-                "status": message.status,
-                "created_at": message.created_at.isoformat(),
-                "updated_at": message.updated_at.isoformat() if message.updated_at else None,
-                "user_id": message.user_id,
-                "bill_id": message.bill_id,
-                "error_message": message.error_message
-            }
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching message: {str(e)}")
-
-@router.get("/messages/chat/{chat_id}")
+@router.get("/messages/chat/{chat_id}", response_class=ORJSONResponse)
 async def get_messages_by_chat(
     chat_id: int,
     limit: int = 50,
     offset: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     session: AsyncSession = Depends(get_session)
-) -> dict:
+) -> ORJSONResponse:
     """
     Pobieranie wiadomości dla konkretnego czatu
     
     Endpoint do pobierania historii wiadomości dla danego użytkownika.
     """
     try:
-        messages = await services.get_telegram_messages(
+        rows = await services.get_telegram_messages(
             session,
             skip=offset,
             limit=limit,
-            chat_id=chat_id
+            chat_id=chat_id,
+            date_from=date_from,
+            date_to=date_to
         )
         
-        total_count = await services.count_telegram_messages(session, chat_id=chat_id)
+        total_count = await services.count_telegram_messages(
+            session, chat_id=chat_id, date_from=date_from, date_to=date_to
+        )
         
         if total_count == 0:
-            return {
+            return ORJSONResponse({
                 "status": "success",
                 "message": f"No messages found for chat_id {chat_id}",
-                "pagination": {
-                    "total": 0,
-                    "limit": limit,
-                    "offset": offset,
-                    "has_more": False
-                },
+                "pagination": _pagination(0, limit, offset),
                 "messages": []
-            }
+            })
         
-        return {
+        return ORJSONResponse({
             "status": "success",
-            "pagination": {
-                "total": total_count,
-                "limit": limit,
-                "offset": offset,
-                "has_more": offset + limit < total_count
-            },
-            "messages": [
-                {
-                    "id": msg.id,
-                    "telegram_message_id": msg.telegram_message_id,
-                    "message_type": msg.message_type,
-                    "content": msg.content,
-                    "file_id": msg.file_id,
-                    "status": msg.status,
-                    "created_at": msg.created_at.isoformat(),
-                    "updated_at": msg.updated_at.isoformat() if msg.updated_at else None,
-                    "user_id": msg.user_id,
-                    "bill_id": msg.bill_id,
-                    "error_message": msg.error_message
-                }
-                for msg in messages
-            ]
-        }
+            "pagination": _pagination(total_count, limit, offset),
+            "messages": [services.message_row_to_dict(row) for row in rows]
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching chat messages: {str(e)}")
 
 @router.get("/messages/stats")
 async def get_messages_stats(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     session: AsyncSession = Depends(get_session)
 ) -> dict:
     """
     Statystyki wiadomości
     
-    Endpoint do pobierania statystyk wiadomości.
+    Endpoint do pobierania statystyk wiadomości (opcjonalnie dla zakresu dat).
     """
     try:
-        stats = await services.get_telegram_messages_stats(session)
+        stats = await services.get_telegram_messages_stats(session, date_from=date_from, date_to=date_to)
         
         return {
             "status": "success",
@@ -388,92 +334,93 @@ async def get_messages_stats(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
 
-@router.get("/messages/search")
+@router.get("/messages/search", response_class=ORJSONResponse)
 async def search_messages(
     query: str,
     limit: int = 20,
     offset: int = 0,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     session: AsyncSession = Depends(get_session)
-) -> dict:
+) -> ORJSONResponse:
     """
     Wyszukiwanie wiadomości
     
-    Endpoint do wyszukiwania wiadomości po treści.
+    Endpoint do wyszukiwania wiadomości po treści. Bez `date_from` przeszukiwane
+    są ostatnie `TELEGRAM_SEARCH_WINDOW_DAYS` dni.
     """
     try:
-        messages = await services.search_telegram_messages(
+        date_from = date_from or services.search_window_start()
+        rows = await services.search_telegram_messages(
             session,
             query=query,
             skip=offset,
-            limit=limit
+            limit=limit,
+            date_from=date_from,
+            date_to=date_to
         )
         
-        total_count = await services.count_search_results(session, query)
+        total_count = await services.count_search_results(session, query, date_from=date_from, date_to=date_to)
         
-        return {
+        return ORJSONResponse({
             "status": "success",
             "search_query": query,
-            "pagination": {
-                "total": total_count,
-                "limit": limit,
-                "offset": offset,
-                "has_more": offset + limit < total_count
-            },
-            "messages": [
-                {
-                    "id": msg.id,
-                    "telegram_message_id": msg.telegram_message_id,
-                    "chat_id": msg.chat_id,
-                    "message_type": msg.message_type,
-                    "content": msg.content,
-                    "file_id": msg.file_id,
-                    "status": msg.status,
-                    "created_at": msg.created_at.isoformat(),
-                    "user_id": msg.user_id,
-                    "bill_id": msg.bill_id
-                }
-                for msg in messages
-            ]
-        }
+            "date_from": date_from,
+            "pagination": _pagination(total_count, limit, offset),
+            "messages": [services.message_row_to_dict(row) for row in rows]
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching messages: {str(e)}")
 
+# Trasa z parametrem po trasach statycznych - inaczej przechwyciłaby /messages/stats i /messages/search
+@router.get("/messages/{message_id}", response_class=ORJSONResponse)
+async def get_message_by_id(
+    message_id: int,
+    session: AsyncSession = Depends(get_session)
+) -> ORJSONResponse:
+    """
+    Pobieranie konkretnej wiadomości po ID
+    
+    Endpoint do pobierania szczegółów konkretnej wiadomości.
+    """
+    try:
+        row = await services.get_telegram_message_row(session, message_id)
+        
+        if not row:
+            raise HTTPException(status_code=404, detail="Message not found")
+        
+        return ORJSONResponse({
+            "status": "success",
+            "message": services.message_row_to_dict(row)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching message: {str(e)}")
+
 # =============================================================================
 # Debug Endpoints (tylko w trybie development)
 # =============================================================================
 
-@router.get("/debug/messages")
+@router.get("/debug/messages", response_class=ORJSONResponse)
 async def get_telegram_messages_debug(
     limit: int = 10,
     session: AsyncSession = Depends(get_session)
-) -> dict:
+) -> ORJSONResponse:
     """
     Pobieranie ostatnich wiadomości Telegram (debug)
     
     Endpoint tylko do celów debugowania.
     """
     try:
-        messages = await services.get_telegram_messages(session, skip=0, limit=limit)
+        rows = await services.get_telegram_messages(session, skip=0, limit=limit)
         
-        return {
+        return ORJSONResponse({
             "status": "success",
-            "messages": [
-                {
-                    "id": msg.id,
-                    "telegram_message_id": msg.telegram_message_id,
-                    "chat_id": msg.chat_id,
-                    "message_type": msg.message_type,
-                    "content": msg.content,
-                    "file_id": msg.file_id,
-                    "status": msg.status,
-                    "created_at": msg.created_at.isoformat(),
-                    "user_id": msg.user_id,
-                    "bill_id": msg.bill_id
-                }
-                for msg in messages
-            ]
-        }
+            "messages": [services.message_row_to_dict(row) for row in rows]
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching messages: {str(e)}")
@@ -519,12 +466,12 @@ async def process_bill_manual(
     Endpoint do testowania przetwarzania rachunków bez Telegram.
     """
     try:
-        # TODO: Implement bill processing logic
-        # For now, just send confirmation
+        bill_id = await services.process_bill_file(chat_id, file_id)
         
         return {
             "status": "success",
-            "message": "Bill processing started",
+            "message": "Bill processed" if bill_id else "Bill not recognised",
+            "bill_id": bill_id,
             "chat_id": chat_id,
             "user_id": user_id
         }
@@ -546,7 +493,7 @@ async def get_telegram_message_file(
     Pobiera plik z wiadomości Telegram.
     
     Zwraca plik (zdjęcie/dokument) powiązany z wiadomością Telegram.
-    Plik jest pobierany z lokalnego katalogu uploads.
+    Plik jest pobierany z magazynu plików (lub z archiwum).
     
     Args:
         message_id: ID wiadomości Telegram w bazie danych
@@ -562,25 +509,6 @@ async def get_telegram_message_file(
     try:
         print(f"🔍 DEBUG: Getting file for Telegram message ID: {message_id}")
         
-        # Upewnij się, że katalogi istnieją
-        FileService._ensure_directories()
-        
-        # DEBUG: Wyświetl wszystkie pliki w katalogu uploads
-        print("🔍 DEBUG: Listing all files in uploads directory...")
-        from pathlib import Path
-        uploads_dir = Path(FileService.UPLOADS_DIR)
-        if uploads_dir.exists():
-            print(f"📁 Uploads directory: {uploads_dir.absolute()}")
-            for root, dirs, files in uploads_dir.rglob("*"):
-                if files:
-                    print(f"  📂 {root}:")
-                    for file in files:
-                        file_path_full = root / file
-                        file_size = file_path_full.stat().st_size if file_path_full.exists() else 0
-                        print(f"    📄 {file} ({file_size} bytes)")
-        else:
-            print(f"❌ Uploads directory does not exist: {uploads_dir.absolute()}")
-        
         # Pobierz plik z wiadomości Telegram
         file_path, file_info = await FileService.get_file_by_telegram_message(
             session, message_id
@@ -596,16 +524,9 @@ async def get_telegram_message_file(
                 detail="No file associated with this message"
             )
         
-        # Pobierz typ MIME
-        media_type = FileService.get_file_content_type(file_path)
-        print(f"📄 Media type: {media_type}")
-        
-        # Zwróć plik
-        return FileResponse(
-            path=file_path,
-            media_type=media_type,
-            filename=file_info.file_name
-        )
+        # Zwróć plik (z magazynu lub z archiwum)
+        print(f"📄 Media type: {file_info.file_type}, archived: {file_info.archived}")
+        return await FileService.file_response(session, file_path, file_info)
         
     except HTTPException:
         raise
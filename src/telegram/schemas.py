@@ -18,6 +18,7 @@ class TelegramMessageType(str, Enum):
 
 class TelegramMessageStatus(str, Enum):
     SENT = "sent"
+    PROCESSING = "processing"  # Część albumu przejęta do przetworzenia
     DELIVERED = "delivered"
     READ = "read"
     FAILED = "failed"
@@ -65,6 +66,7 @@ class TelegramMessageSchema(BaseModel):
     photo: Optional[List[TelegramPhotoSize]] = None
     document: Optional[TelegramDocument] = None
     caption: Optional[str] = None
+    media_group_id: Optional[str] = None  # Wspólny dla zdjęć wysłanych jako album
 
 class TelegramUpdate(BaseModel):
     update_id: int
@@ -1,17 +1,43 @@
+import asyncio
+import dataclasses
+import mimetypes
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import List, Optional, Dict, Any
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
 import httpx
 import logging
 import sentry_sdk
 
-from src.db.models import TelegramMessage, User, TelegramMessageStatus
+from src.cache.memory import TTLCache
+from src.cache.singleflight import SingleFlight
+from src.bill.services import create_bill_from_parsed
+from src.db.main import engine
+from src.files.services import FileService
+from src.files.storage import get_storage, storage_key
+from src.processing.images import image_dhash, preprocess_image, preprocessing_stats
+from src.processing.pages import BillPage
+from src.processing.parse_cache import parse_cache
+from src.processing.pdf import extract_pdf_pages
+from src.processing.pool import run_in_pool
+from src.processing.receipts import parse_receipt, receipt_content_hash, recognition_enabled
+from src.db.models import TelegramMessage, TelegramMessageKey, TelegramMessageStatus
+from src.sync.changes import record_message_changes
+from src.telegram.media_groups import MediaGroupAggregator
 from src.telegram.schemas import TelegramWebhook, BotCommandList
+from src.user import cache as user_cache
+from src.user.cache import CachedUser
 from src.config import config
 
 logger = logging.getLogger(__name__)
 
+PDF_MIME_TYPES = {"application/pdf", "application/x-pdf"}
+
 # =============================================================================
 # Telegram Message Services
 # =============================================================================
@@ -20,16 +46,59 @@ async def get_telegram_message(session: AsyncSession, message_id: int) -> Option
     """Pobiera jedną wiadomość Telegram po jej ID."""
     return await session.get(TelegramMessage, message_id)
 
+# Kolumny zwracane przez endpointy list wiadomości - bez hydratacji obiektów ORM
+MESSAGE_COLUMNS = (
+    TelegramMessage.id,
+    TelegramMessage.telegram_message_id,
+    TelegramMessage.chat_id,
+    TelegramMessage.message_type,
+    TelegramMessage.content,
+    TelegramMessage.file_id,
+    TelegramMessage.status,
+    TelegramMessage.created_at,
+    TelegramMessage.updated_at,
+    TelegramMessage.user_id,
+    TelegramMessage.bill_id,
+    TelegramMessage.error_message,
+)
+
+def message_row_to_dict(row) -> Dict[str, Any]:
+    """Mapuje wiersz z `MESSAGE_COLUMNS` na słownik gotowy do serializacji JSON."""
+    return dict(row._mapping)
+
+async def get_telegram_message_row(session: AsyncSession, message_id: int):
+    """Pobiera kolumny jednej wiadomości lub None."""
+    result = await session.execute(select(*MESSAGE_COLUMNS).where(TelegramMessage.id == message_id))
+    return result.first()
+
+def _created_between(statement, date_from: Optional[datetime], date_to: Optional[datetime]):
+    """
+    Ogranicza zapytanie do zakresu `created_at` - w PostgreSQL planer pomija
+    wtedy partycje miesięczne spoza zakresu (src/db/partitions.py).
+    """
+    if date_from:
+        statement = statement.where(TelegramMessage.created_at >= date_from)
+    if date_to:
+        statement = statement.where(TelegramMessage.created_at < date_to)
+    return statement
+
+def search_window_start() -> Optional[datetime]:
+    """Domyślny początek zakresu wyszukiwania (`TELEGRAM_SEARCH_WINDOW_DAYS`)."""
+    days = config.TELEGRAM_SEARCH_WINDOW_DAYS
+    return datetime.now(timezone.utc) - timedelta(days=days) if days > 0 else None
+
 async def get_telegram_messages(
     session: AsyncSession, 
     skip: int = 0, 
     limit: int = 100,
     chat_id: Optional[int] = None,
     message_type: Optional[str] = None,
-    status: Optional[str] = None
-) -> List[TelegramMessage]:
-    """Pobiera listę wiadomości Telegram z filtrami i paginacją."""
-    statement = select(TelegramMessage)
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> List[Any]:
+    """Pobiera listę wiadomości Telegram (wiersze `MESSAGE_COLUMNS`) z filtrami i paginacją."""
+    statement = _created_between(select(*MESSAGE_COLUMNS), date_from, date_to)
     
     if chat_id:
         statement = statement.where(TelegramMessage.chat_id == chat_id)
@@ -42,16 +111,18 @@ async def get_telegram_messages(
     
     statement = statement.order_by(TelegramMessage.created_at.desc()).offset(skip).limit(limit)
     result = await session.execute(statement)
-    return result.scalars().all()
+    return result.all()
 
 async def count_telegram_messages(
     session: AsyncSession,
     chat_id: Optional[int] = None,
     message_type: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
 ) -> int:
     """Liczy wiadomości z opcjonalnymi filtrami."""
-    statement = select(func.count(TelegramMessage.id))
+    statement = _created_between(select(func.count(TelegramMessage.id)), date_from, date_to)
     
     if chat_id:
         statement = statement.where(TelegramMessage.chat_id == chat_id)
@@ -69,51 +140,67 @@ async def search_telegram_messages(
     session: AsyncSession,
     query: str,
     skip: int = 0,
-    limit: int = 100
-) -> List[TelegramMessage]:
-    """Wyszukuje wiadomości po treści."""
+    limit: int = 100,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> List[Any]:
+    """Wyszukuje wiadomości po treści (wiersze `MESSAGE_COLUMNS`)."""
     search_query = f"%{query}%"
-    statement = select(TelegramMessage).where(TelegramMessage.content.ilike(search_query))
+    statement = select(*MESSAGE_COLUMNS).where(TelegramMessage.content.ilike(search_query))
+    statement = _created_between(statement, date_from, date_to)
     statement = statement.order_by(TelegramMessage.created_at.desc()).offset(skip).limit(limit)
     result = await session.execute(statement)
-    return result.scalars().all()
+    return result.all()
 
-async def count_search_results(session: AsyncSession, query: str) -> int:
+async def count_search_results(
+    session: AsyncSession,
+    query: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> int:
     """Liczy wyniki wyszukiwania."""
     search_query = f"%{query}%"
     statement = select(func.count(TelegramMessage.id)).where(TelegramMessage.content.ilike(search_query))
+    statement = _created_between(statement, date_from, date_to)
     result = await session.execute(statement)
     return result.scalar()
 
-async def get_telegram_messages_stats(session: AsyncSession) -> Dict[str, Any]:
-    """Pobiera statystyki wiadomości."""
+async def get_telegram_messages_stats(
+    session: AsyncSession,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Pobiera statystyki wiadomości (opcjonalnie dla zakresu dat)."""
+    def in_range(statement):
+        return _created_between(statement, date_from, date_to)
+    
     # Liczba wszystkich wiadomości
-    total_result = await session.execute(select(func.count(TelegramMessage.id)))
+    total_result = await session.execute(in_range(select(func.count(TelegramMessage.id))))
     total_messages = total_result.scalar()
     
     # Liczba wiadomości według typu
     type_stats_result = await session.execute(
-        select(TelegramMessage.message_type, func.count(TelegramMessage.id))
+        in_range(select(TelegramMessage.message_type, func.count(TelegramMessage.id)))
         .group_by(TelegramMessage.message_type)
     )
     type_stats = dict(type_stats_result.all())
     
     # Liczba wiadomości według statusu
     status_stats_result = await session.execute(
-        select(TelegramMessage.status, func.count(TelegramMessage.id))
+        in_range(select(TelegramMessage.status, func.count(TelegramMessage.id)))
         .group_by(TelegramMessage.status)
     )
     status_stats = dict(status_stats_result.all())
     
     # Liczba unikalnych użytkowników
     unique_users_result = await session.execute(
-        select(func.count(func.distinct(TelegramMessage.chat_id)))
+        in_range(select(func.count(func.distinct(TelegramMessage.chat_id))))
     )
     unique_users = unique_users_result.scalar()
     
     # Ostatnia aktywność
     last_activity_result = await session.execute(
-        select(func.max(TelegramMessage.created_at))
+        in_range(select(func.max(TelegramMessage.created_at)))
     )
     last_activity = last_activity_result.scalar()
     
@@ -137,7 +224,7 @@ async def send_text_message(chat_id: int, text: str) -> bool:
             logger.error("Bot token not configured")
             return False
         
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        url = f"{config.TELEGRAM_API_URL}/bot{bot_token}/sendMessage"
         payload = {
             "chat_id": chat_id,
             "text": text,
@@ -171,7 +258,7 @@ async def set_webhook(webhook_url: str) -> bool:
             logger.error("Bot token not configured")
             return False
         
-        url = f"https://api.telegram.org/bot{bot_token}/setWebhook"
+        url = f"{config.TELEGRAM_API_URL}/bot{bot_token}/setWebhook"
         payload = {"url": webhook_url}
         
         async with httpx.AsyncClient() as client:
@@ -201,7 +288,7 @@ async def set_commands(commands: List[Dict[str, str]]) -> bool:
             logger.error("Bot token not configured")
             return False
         
-        url = f"https://api.telegram.org/bot{bot_token}/setMyCommands"
+        url = f"{config.TELEGRAM_API_URL}/bot{bot_token}/setMyCommands"
         payload = {"commands": commands}
         
         async with httpx.AsyncClient() as client:
@@ -231,7 +318,7 @@ async def get_bot_info() -> Optional[Dict[str, Any]]:
             logger.error("Bot token not configured")
             return None
         
-        url = f"https://api.telegram.org/bot{bot_token}/getMe"
+        url = f"{config.TELEGRAM_API_URL}/bot{bot_token}/getMe"
         
         async with httpx.AsyncClient() as client:
             response = await client.get(url)
@@ -251,15 +338,53 @@ async def get_bot_info() -> Optional[Dict[str, Any]]:
         logger.error(f"Error getting bot info: {str(e)}")
         return None
 
+@dataclass(frozen=True)
+class TelegramFileInfo:
+    """Wynik getFile - file_path jest ważny po stronie Telegram przez około godzinę."""
+    file_path: str
+    file_size: Optional[int] = None
+
+# file_id -> TelegramFileInfo, wspólne dla całego procesu pobierania plików
+file_info_cache = TTLCache(maxsize=config.TELEGRAM_FILE_CACHE_SIZE, ttl=config.TELEGRAM_FILE_CACHE_TTL)
+_file_lookups = SingleFlight()
+
+async def get_file_info(file_id: str) -> Optional[TelegramFileInfo]:
+    """
+    Zwraca informacje o pliku z cache lub z Bot API (getFile).
+
+    Równoczesne zapytania o ten sam file_id wykonują jedno wywołanie API;
+    zapamiętywane są tylko udane odpowiedzi.
+    """
+    cached = file_info_cache.get(file_id)
+    if cached is not None:
+        return cached
+
+    async def lookup() -> Optional[TelegramFileInfo]:
+        file_info = await _request_file_info(file_id)
+        if file_info:
+            file_info_cache.set(file_id, file_info)
+        return file_info
+
+    return await _file_lookups.do(file_id, lookup)
+
+def invalidate_file_info(file_id: str) -> None:
+    """Usuwa file_id z cache (np. gdy pobranie po zapamiętanym file_path się nie powiodło)."""
+    file_info_cache.delete(file_id)
+
 async def get_file_path(file_id: str) -> Optional[str]:
-    """Pobiera file_path dla danego file_id z Telegram Bot API."""
+    """Pobiera file_path dla danego file_id (przez cache getFile)."""
+    file_info = await get_file_info(file_id)
+    return file_info.file_path if file_info else None
+
+async def _request_file_info(file_id: str) -> Optional[TelegramFileInfo]:
+    """Wywołuje getFile w Telegram Bot API."""
     try:
         bot_token = config.TELEGRAM_BOT_TOKEN
         if not bot_token or bot_token == "your-bot-token":
             logger.error("Bot token not configured")
             return None
         
-        url = f"https://api.telegram.org/bot{bot_token}/getFile"
+        url = f"{config.TELEGRAM_API_URL}/bot{bot_token}/getFile"
         payload = {"file_id": file_id}
         
         async with httpx.AsyncClient() as client:
@@ -268,7 +393,10 @@ async def get_file_path(file_id: str) -> Optional[str]:
             if response.status_code == 200:
                 result = response.json()
                 if result.get("ok"):
-                    return result["result"]["file_path"]
+                    return TelegramFileInfo(
+                        file_path=result["result"]["file_path"],
+                        file_size=result["result"].get("file_size")
+                    )
                 else:
                     logger.error(f"Failed to get file path: {result}")
                     sentry_sdk.capture_message(f"Telegram API error: {result}", level="error")
@@ -283,39 +411,63 @@ async def get_file_path(file_id: str) -> Optional[str]:
         sentry_sdk.capture_exception(e)
         return None
 
-async def download_file(file_path: str, local_path: str) -> bool:
-    """Pobiera plik z Telegram i zapisuje lokalnie."""
+class FileTooLargeError(Exception):
+    """Plik przekracza dopuszczalny rozmiar pobierania."""
+
+async def download_file(file_path: str, local_path: str, max_bytes: Optional[int] = None) -> bool:
+    """
+    Pobiera plik z Telegram strumieniowo i zapisuje w magazynie plików.
+
+    Treść zapisywana jest fragmentami do pliku tymczasowego (bez trzymania
+    całości w pamięci), a po przekroczeniu `max_bytes` pobieranie jest przerywane.
+    Plik pod `local_path` to kopia robocza dla przetwarzania, publikowana
+    w magazynie (`src/files/storage.py`) pod kluczem wynikającym ze ścieżki.
+    """
+    tmp_path = f"{local_path}.part"
     try:
         bot_token = config.TELEGRAM_BOT_TOKEN
         if not bot_token or bot_token == "your-bot-token":
             logger.error("Bot token not configured")
             return False
         
-        url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
+        url = f"{config.TELEGRAM_API_URL}/file/bot{bot_token}/{file_path}"
         
         async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            
-            if response.status_code == 200:
+            async with client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    logger.error(f"HTTP error {response.status_code}: {body[:500]!r}")
+                    sentry_sdk.capture_message(f"File download HTTP error {response.status_code}", level="error")
+                    return False
+                
                 # Utwórz katalog jeśli nie istnieje
-                import os
                 os.makedirs(os.path.dirname(local_path), exist_ok=True)
                 
-                # Zapisz plik
-                with open(local_path, 'wb') as f:
-                    f.write(response.content)
-                
-                logger.info(f"File downloaded successfully: {local_path}")
-                return True
-            else:
-                logger.error(f"HTTP error {response.status_code}: {response.text}")
-                sentry_sdk.capture_message(f"File download HTTP error {response.status_code}: {response.text}", level="error")
-                return False
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(64 * 1024):
+                        size += len(chunk)
+                        if max_bytes is not None and size > max_bytes:
+                            raise FileTooLargeError(f"File exceeds {max_bytes} bytes")
+                        f.write(chunk)
+        
+        os.replace(tmp_path, local_path)
+        # Przy magazynie lokalnym kopia robocza jest już plikiem w magazynie
+        await get_storage().save_file(storage_key(local_path), Path(local_path))
+        logger.info(f"File downloaded successfully: {local_path}")
+        return True
                 
+    except FileTooLargeError as e:
+        logger.warning(f"Download aborted for {file_path}: {e}")
+        return False
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}")
         sentry_sdk.capture_exception(e)
+        await get_storage().discard_working_copy(local_path)
         return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 # =============================================================================
 # Telegram Webhook Processing Services
@@ -340,9 +492,16 @@ async def process_webhook(session: AsyncSession, webhook_data: TelegramWebhook)
         return False
 
 async def _process_message(session: AsyncSession, message) -> None:
-    """Przetwarza pojedynczą wiadomość."""
+    """
+    Przetwarza pojedynczą wiadomość.
+
+    Użytkownik i wiadomość zapisywane są w jednej transakcji (jeden commit);
+    id wiadomości wraca z INSERT ... RETURNING, bez dodatkowego refresh.
+    Transakcja jest zatwierdzana przed wysyłką odpowiedzi i pobieraniem pliku,
+    żeby połączenie nie czekało w stanie "idle in transaction".
+    """
     try:
-        # Znajdź lub stwórz użytkownika
+        # Znajdź lub stwórz użytkownika (bez commit - część tej samej transakcji)
         user = await _find_or_create_user(session, message.chat.id)
         
         # Określ typ wiadomości i file_id
@@ -350,6 +509,8 @@ async def _process_message(session: AsyncSession, message) -> None:
         file_id = None
         file_path = None
         content = message.text or message.caption or ''
+        # Zdjęcia albumu przetwarzane są razem, po zebraniu wszystkich części
+        media_group_id = message.media_group_id if message.photo else None
         
         # Sprawdź czy to zdjęcie
         if message.photo:
@@ -370,20 +531,31 @@ async def _process_message(session: AsyncSession, message) -> None:
             content=content,
             file_id=file_id,
             file_path=file_path,  # Będzie ustawione po pobraniu pliku
+            media_group_id=media_group_id,
             status=TelegramMessageStatus.SENT,
             user_id=user.external_id
         )
         
+        # Najpierw klucz (czat, id wiadomości) - ponowiony webhook kończy się na nim
+        # IntegrityError, zanim zapisze wiadomość drugi raz
+        session.add(TelegramMessageKey(chat_id=message.chat.id, telegram_message_id=message.message_id))
+        await session.flush()
         session.add(telegram_message)
         await session.commit()
-        await session.refresh(telegram_message)
         
         # Przetwórz wiadomość w zależności od typu
         if message.text:
             await _process_text_message(message.chat.id, message.text)
+        elif media_group_id:
+            media_group_aggregator.add(message.chat.id, media_group_id, message.caption)
         elif message.photo:
             await _process_photo_message(session, telegram_message, file_id, message.caption)
+        elif message.document:
+            await _process_document_message(session, telegram_message, message.document, message.caption)
             
+    except IntegrityError:
+        logger.info(f"Message {message.message_id} in chat {message.chat.id} already processed")
+        await session.rollback()
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}")
         await session.rollback()
@@ -395,27 +567,9 @@ async def _process_callback_query(session: AsyncSession, callback_query) -> None
     except Exception as e:
         logger.error(f"Error processing callback query: {str(e)}")
 
-async def _find_or_create_user(session: AsyncSession, chat_id: int) -> User:
-    """Znajduje lub tworzy użytkownika na podstawie chat_id."""
-    # Sprawdź czy użytkownik już istnieje
-    statement = select(User).where(User.external_id == chat_id)
-    result = await session.execute(statement)
-    user = result.scalar_one_or_none()
-    
-    if user:
-        return user
-    
-    # Stwórz nowego użytkownika
-    user = User(
-        external_id=chat_id,
-        is_active=True
-    )
-    
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
-    
-    return user
+async def _find_or_create_user(session: AsyncSession, chat_id: int) -> CachedUser:
+    """Znajduje lub tworzy użytkownika na podstawie chat_id (przez cache w procesie)."""
+    return await user_cache.get_or_create_user(session, chat_id)
 
 async def _process_text_message(chat_id: int, text: str) -> None:
     """Przetwarza wiadomość tekstową."""
@@ -513,6 +667,33 @@ Dziękujemy za cierpliwość!
     """
     await send_text_message(chat_id, error_text.strip())
 
+async def _download_photo(chat_id: int, file_id: str, name_suffix: str = "") -> Optional[str]:
+    """Pobiera zdjęcie do katalogu uploads/photos; zwraca lokalną ścieżkę lub None."""
+    from datetime import datetime
+
+    # Pobierz file_path z Telegram API
+    file_path = await get_file_path(file_id)
+    if not file_path:
+        return None
+    
+    # Utwórz katalog na zdjęcia
+    photos_dir = "uploads/photos"
+    os.makedirs(photos_dir, exist_ok=True)
+    
+    # Wygeneruj unikalną nazwę pliku
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_extension = os.path.splitext(file_path)[1] or '.jpg'
+    local_filename = f"photo_{chat_id}_{timestamp}{name_suffix}{file_extension}"
+    local_path = os.path.join(photos_dir, local_filename)
+    
+    # Pobierz plik; zapamiętany file_path mógł wygasnąć - wtedy jedno ponowne getFile
+    success = await download_file(file_path, local_path)
+    if not success:
+        invalidate_file_info(file_id)
+        file_path = await get_file_path(file_id)
+        success = bool(file_path) and await download_file(file_path, local_path)
+    return local_path if success else None
+
 async def _process_photo_message(session: AsyncSession, telegram_message: TelegramMessage, file_id: str, caption: Optional[str] = None) -> None:
     """Przetwarza wiadomość ze zdjęciem."""
     try:
@@ -527,42 +708,361 @@ async def _process_photo_message(session: AsyncSession, telegram_message: Telegr
         
         await send_text_message(chat_id, response_text)
         
-        # Pobierz file_path z Telegram API
-        file_path = await get_file_path(file_id)
-        if not file_path:
-            await send_text_message(chat_id, "❌ <b>Błąd pobierania zdjęcia</b>\n\nNie udało się pobrać informacji o pliku.")
+        local_path = await _download_photo(chat_id, file_id)
+        if not local_path:
+            await send_text_message(chat_id, "❌ <b>Błąd pobierania zdjęcia</b>\n\nNie udało się pobrać pliku.")
             return
         
-        # Wygeneruj lokalną ścieżkę dla pliku
-        import os
-        from datetime import datetime
+        # Zaktualizuj rekord w bazie danych z file_path (transakcja po pobraniu pliku)
+        await session.execute(
+            update(TelegramMessage)
+            .where(TelegramMessage.id == telegram_message.id)
+            .values(file_path=local_path)
+        )
+        await record_message_changes(session, chat_id, [telegram_message.id])
+        await session.commit()
+        telegram_message.file_path = local_path
         
-        # Utwórz katalog na zdjęcia
-        photos_dir = "uploads/photos"
-        os.makedirs(photos_dir, exist_ok=True)
+        # Wyślij potwierdzenie pobrania
+        local_filename = os.path.basename(local_path)
+        await send_text_message(chat_id, f"✅ <b>Zdjęcie pobrane!</b>\n\n📁 Zapisano jako: <code>{local_filename}</code>\n\n🔄 Przetwarzam rachunek...")
         
-        # Wygeneruj unikalną nazwę pliku
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = os.path.splitext(file_path)[1] or '.jpg'
-        local_filename = f"photo_{chat_id}_{timestamp}{file_extension}"
-        local_path = os.path.join(photos_dir, local_filename)
+        try:
+            await _process_bill_pages(chat_id, [BillPage(number=1, image_path=local_path)])
+        finally:
+            await get_storage().discard_working_copy(local_path)
         
-        # Pobierz plik
-        success = await download_file(file_path, local_path)
-        if not success:
-            await send_text_message(chat_id, "❌ <b>Błąd pobierania zdjęcia</b>\n\nNie udało się pobrać pliku.")
+    except Exception as e:
+        logger.error(f"Error processing photo message: {str(e)}")
+        await _send_error_message(chat_id)
+
+def _media_group_claimable(stale_before: datetime):
+    """
+    Części albumu do przejęcia: nowe (SENT) i przejęte dawno temu przez worker,
+    który nie skończył - o ile nie wyczerpały limitu prób.
+    """
+    return and_(
+        TelegramMessage.attempts < config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS,
+        or_(
+            TelegramMessage.status == TelegramMessageStatus.SENT,
+            and_(
+                TelegramMessage.status == TelegramMessageStatus.PROCESSING,
+                TelegramMessage.updated_at < stale_before
+            )
+        )
+    )
+
+async def _set_media_group_status(
+    session: AsyncSession,
+    chat_id: int,
+    message_ids: List[int],
+    status: TelegramMessageStatus,
+    error_message: Optional[str] = None
+) -> None:
+    await session.execute(
+        update(TelegramMessage)
+        .where(TelegramMessage.id.in_(message_ids))
+        .values(status=status, error_message=error_message)
+    )
+    await record_message_changes(session, chat_id, message_ids)
+    await session.commit()
+
+async def _process_media_group(chat_id: int, media_group_id: str, caption: Optional[str] = None) -> None:
+    """
+    Przetwarza album zdjęć jako jeden rachunek.
+
+    Części albumu przejmowane są warunkowym UPDATE (SENT -> PROCESSING), więc
+    album przetwarza dokładnie jeden worker, nawet jeśli jego zdjęcia trafiły
+    do różnych workerów. Pliki pobierane są równolegle, a użytkownik dostaje
+    jedno potwierdzenie. Po przetworzeniu części mają status DELIVERED, po
+    nieudanym pobraniu - FAILED (użytkownik wysyła album ponownie), a po
+    wyjątku wracają do SENT i album można przetworzyć jeszcze raz
+    (`resume_media_groups`). Przejęcie starsze niż
+    `TELEGRAM_MEDIA_GROUP_CLAIM_TIMEOUT` (worker przerwany w trakcie) można
+    przejąć ponownie.
+
+    Każde przejęcie zwiększa `attempts`; po `TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS`
+    nieudanych próbach części mają status FAILED. O błędzie użytkownik
+    dowiaduje się tylko przy pierwszej próbie - wznowienia są ciche.
+    """
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=config.TELEGRAM_MEDIA_GROUP_CLAIM_TIMEOUT)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        result = await session.execute(
+            update(TelegramMessage)
+            .where(
+                TelegramMessage.chat_id == chat_id,
+                TelegramMessage.media_group_id == media_group_id,
+                _media_group_claimable(stale_before)
+            )
+            .values(status=TelegramMessageStatus.PROCESSING, attempts=TelegramMessage.attempts + 1)
+            .returning(
+                TelegramMessage.id, TelegramMessage.telegram_message_id, TelegramMessage.file_id,
+                TelegramMessage.attempts
+            )
+        )
+        parts = sorted(result.all(), key=lambda part: part.telegram_message_id)
+        await record_message_changes(session, chat_id, [part.id for part in parts])
+        await session.commit()
+        
+        if not parts:
+            # Album przejęty już przez inny worker
             return
         
-        # Zaktualizuj rekord w bazie danych z file_path
-        telegram_message.file_path = local_path
+        part_ids = [part.id for part in parts]
+        attempt = max(part.attempts for part in parts)
+        local_paths = []
+        try:
+            local_paths = await asyncio.gather(*(
+                _download_photo(chat_id, part.file_id, name_suffix=f"_{page}")
+                for page, part in enumerate(parts, start=1)
+            ))
+            
+            downloaded = [
+                {"id": part.id, "file_path": local_path}
+                for part, local_path in zip(parts, local_paths) if local_path
+            ]
+            if downloaded:
+                # Aktualizacja wsadowa po kluczu głównym
+                await session.execute(update(TelegramMessage), downloaded)
+                await record_message_changes(session, chat_id, [part["id"] for part in downloaded])
+                await session.commit()
+            
+            if len(downloaded) < len(parts):
+                await _set_media_group_status(
+                    session, chat_id, part_ids, TelegramMessageStatus.FAILED,
+                    f"Downloaded {len(downloaded)} of {len(parts)} album photos"
+                )
+                if attempt == 1:
+                    await send_text_message(
+                        chat_id,
+                        f"❌ <b>Błąd pobierania albumu</b>\n\nPobrano {len(downloaded)} z {len(parts)} zdjęć. Wyślij album ponownie."
+                    )
+                return
+            
+            response_text = f"📸 <b>Album otrzymany!</b>\n\n✅ Pobrano {len(parts)} zdjęć rachunku.\n\n"
+            if caption:
+                response_text += f"<i>Opis: {caption}</i>\n\n"
+            response_text += "🔄 Przetwarzam rachunek..."
+            await send_text_message(chat_id, response_text)
+            
+            await _process_bill_pages(chat_id, [
+                BillPage(number=page, image_path=row["file_path"])
+                for page, row in enumerate(downloaded, start=1)
+            ])
+            await _set_media_group_status(session, chat_id, part_ids, TelegramMessageStatus.DELIVERED)
+            
+        except Exception as e:
+            exhausted = attempt >= config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS
+            logger.error(
+                f"Error processing media group {media_group_id} "
+                f"(attempt {attempt}/{config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS}): {str(e)}"
+            )
+            await session.rollback()
+            try:
+                # Zwolnienie przejęcia do kolejnej próby, a po ostatniej - FAILED
+                await _set_media_group_status(
+                    session, chat_id, part_ids,
+                    TelegramMessageStatus.FAILED if exhausted else TelegramMessageStatus.SENT,
+                    f"Attempt {attempt}: {str(e)}"
+                )
+            except Exception as release_error:
+                logger.error(f"Could not release media group {media_group_id}: {str(release_error)}")
+            # Użytkownik czeka na odpowiedź tylko przy pierwszej próbie
+            if attempt == 1:
+                await _send_error_message(chat_id)
+        finally:
+            for local_path in local_paths:
+                await get_storage().discard_working_copy(local_path)
+
+async def resume_media_groups() -> int:
+    """
+    Wznawia albumy, których nie dokończył poprzedni proces: części SENT albo
+    przejęte dawniej niż `TELEGRAM_MEDIA_GROUP_CLAIM_TIMEOUT`, nie starsze niż
+    `TELEGRAM_MEDIA_GROUP_RESUME_HOURS`. Przy starcie workera; zwraca liczbę albumów.
+    Porzucone przejęcia po ostatniej próbie (np. album przerywający worker)
+    dostają status FAILED.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=config.TELEGRAM_MEDIA_GROUP_CLAIM_TIMEOUT)
+    async with AsyncSession(engine) as session:
+        result = await session.execute(
+            update(TelegramMessage)
+            .where(
+                TelegramMessage.media_group_id.is_not(None),
+                TelegramMessage.status == TelegramMessageStatus.PROCESSING,
+                TelegramMessage.updated_at < stale_before,
+                TelegramMessage.attempts >= config.TELEGRAM_MEDIA_GROUP_MAX_ATTEMPTS
+            )
+            .values(status=TelegramMessageStatus.FAILED, error_message="Abandoned after the last attempt")
+            .returning(TelegramMessage.chat_id, TelegramMessage.id)
+        )
+        abandoned = {}
+        for chat_id, message_id in result.all():
+            abandoned.setdefault(chat_id, []).append(message_id)
+        for chat_id, message_ids in abandoned.items():
+            await record_message_changes(session, chat_id, message_ids)
         await session.commit()
         
-        # Wyślij potwierdzenie pobrania
-        await send_text_message(chat_id, f"✅ <b>Zdjęcie pobrane!</b>\n\n📁 Zapisano jako: <code>{local_filename}</code>\n\n🔄 Przetwarzam rachunek...")
+        result = await session.execute(
+            select(TelegramMessage.chat_id, TelegramMessage.media_group_id)
+            .where(
+                TelegramMessage.media_group_id.is_not(None),
+                TelegramMessage.created_at >= now - timedelta(hours=config.TELEGRAM_MEDIA_GROUP_RESUME_HOURS),
+                # Albumy, które właśnie napływają, przetworzy worker, który je odbiera
+                TelegramMessage.updated_at < stale_before,
+                _media_group_claimable(stale_before)
+            )
+            .distinct()
+        )
+        groups = result.all()
+    for chat_id, media_group_id in groups:
+        media_group_aggregator.add(chat_id, media_group_id)
+    return len(groups)
+
+async def _process_document_message(session: AsyncSession, telegram_message: TelegramMessage, document, caption: Optional[str] = None) -> None:
+    """
+    Przetwarza dokument (e-paragon PDF).
+
+    Dokument jest sprawdzany po typie MIME i rozmiarze z aktualizacji, pobierany
+    strumieniowo do katalogu dokumentów, a strony wyciągane są w puli procesów:
+    tekst z warstwy tekstowej, skany renderowane do obrazów.
+    """
+    chat_id = telegram_message.chat_id
+    local_path = None
+    try:
+        mime_type = document.mime_type or mimetypes.guess_type(document.file_name or "")[0]
+        if mime_type not in PDF_MIME_TYPES:
+            await send_text_message(chat_id, "📄 <b>Nieobsługiwany dokument</b>\n\nPrzetwarzam tylko rachunki w formacie PDF lub zdjęcia.")
+            return
+        
+        max_size = config.TELEGRAM_DOCUMENT_MAX_SIZE
+        if document.file_size and document.file_size > max_size:
+            await send_text_message(chat_id, f"📄 <b>Dokument jest za duży</b>\n\nMaksymalny rozmiar to {max_size // 1_000_000} MB.")
+            return
+        
+        await send_text_message(chat_id, "📄 <b>Dokument otrzymany!</b>\n\n🔄 Pobieram plik...")
         
-        # TODO: Tutaj będzie logika przetwarzania rachunku
-        logger.info(f"Photo downloaded successfully: {local_path}")
+        file_path = await get_file_path(document.file_id)
+        local_path = str(FileService.DOCUMENTS_DIR / f"document_{chat_id}_{telegram_message.telegram_message_id}.pdf")
+        if not file_path or not await download_file(file_path, local_path, max_bytes=max_size):
+            await send_text_message(chat_id, "❌ <b>Błąd pobierania dokumentu</b>\n\nNie udało się pobrać pliku.")
+            return
+        
+        await session.execute(
+            update(TelegramMessage)
+            .where(TelegramMessage.id == telegram_message.id)
+            .values(file_path=local_path)
+        )
+        await record_message_changes(session, chat_id, [telegram_message.id])
+        await session.commit()
+        telegram_message.file_path = local_path
+        
+        extraction = await run_in_pool(
+            extract_pdf_pages,
+            local_path,
+            str(FileService.DOCUMENTS_DIR / "pages"),
+            config.PDF_MAX_PAGES,
+            config.PDF_RENDER_DPI
+        )
+        if not extraction.pages:
+            await send_text_message(chat_id, "❌ <b>Pusty dokument</b>\n\nPlik PDF nie zawiera stron.")
+            return
+        
+        response_text = f"✅ <b>Dokument pobrany!</b>\n\n📄 Stron: {len(extraction.pages)}"
+        if extraction.truncated:
+            response_text += f" (z {extraction.page_count})"
+        response_text += "\n\n🔄 Przetwarzam rachunek..."
+        await send_text_message(chat_id, response_text)
+        
+        await _process_bill_pages(chat_id, extraction.pages)
         
     except Exception as e:
-        logger.error(f"Error processing photo message: {str(e)}")
-        await _send_error_message(chat_id) 
\ No newline at end of file
+        logger.error(f"Error processing document message: {str(e)}")
+        await _send_error_message(chat_id)
+    finally:
+        await get_storage().discard_working_copy(local_path)
+
+async def _prepare_page(page: BillPage) -> BillPage:
+    """Przygotowuje obraz strony do OCR w puli procesów; przy błędzie zostaje oryginał."""
+    if not page.image_path:
+        return page
+    try:
+        result = await run_in_pool(
+            preprocess_image,
+            page.image_path,
+            str(FileService.UPLOADS_DIR / "preprocessed"),
+            config.IMAGE_PREPROCESS_MAX_SIDE,
+            config.IMAGE_DESKEW_MAX_ANGLE
+        )
+    except Exception as e:
+        preprocessing_stats.record_error()
+        logger.warning(f"Image preprocessing failed for {page.image_path}: {str(e)}")
+        return page
+
+    preprocessing_stats.record(result)
+    timings_ms = {step: round(elapsed * 1000, 1) for step, elapsed in result.timings.items()}
+    logger.debug(
+        f"Preprocessed {page.image_path} -> {result.path} "
+        f"(cached={result.cached}, skew={result.skew_angle}, timings_ms={timings_ms})"
+    )
+    return dataclasses.replace(page, image_path=result.path, content_hash=result.content_hash)
+
+async def _page_phash(pages: List[BillPage]) -> Optional[int]:
+    """Skrót percepcyjny pierwszej strony-obrazu (do wykrywania duplikatów); przy błędzie None."""
+    image_path = next((page.image_path for page in pages if page.image_path), None)
+    if not image_path:
+        return None
+    try:
+        return await run_in_pool(image_dhash, image_path)
+    except Exception as e:
+        logger.warning(f"Perceptual hash failed for {image_path}: {str(e)}")
+        return None
+
+async def _process_bill_pages(chat_id: int, pages: List[BillPage]) -> Optional[int]:
+    """
+    Wspólne wejście przetwarzania rachunku: zdjęcie, strony albumu lub strony PDF.
+
+    Wynik rozpoznania pobierany jest z cache po SHA-256 treści stron i wersji
+    parsera; rozpoznawanie (w puli procesów) wykonywane jest tylko przy chybieniu.
+    Zwraca ID utworzonego rachunku lub None, gdy rachunku nie rozpoznano.
+    """
+    image_url = pages[0].image_path if pages else None
+    pages = list(await asyncio.gather(*(_prepare_page(page) for page in pages)))
+    content_hash = await asyncio.to_thread(receipt_content_hash, pages)
+    
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        receipt, cached = await parse_cache.get_or_parse(
+            session, content_hash, lambda: run_in_pool(parse_receipt, pages)
+        )
+        if receipt is None:
+            reason = "not recognised" if recognition_enabled() else "not parsed, RECEIPT_PARSER is not set"
+            logger.info(f"Bill pages {reason} for chat {chat_id}: {[page.image_path or page.source for page in pages]}")
+            return None
+        
+        user = await _find_or_create_user(session, chat_id)
+        phash = await _page_phash(pages)
+        bill, duplicate_of = await create_bill_from_parsed(session, user.id, receipt, image_url=image_url, phash=phash)
+    
+    response_text = f"✅ <b>Rachunek rozpoznany!</b>\n\n🧾 Pozycji: {len(receipt.items)}"
+    if receipt.total_amount is not None:
+        response_text += f"\n💰 Suma: {receipt.total_amount} PLN"
+    if duplicate_of is not None and bill.id == duplicate_of:
+        response_text += f"\n\n♻️ Ten rachunek jest już zapisany (#{duplicate_of}) - nie utworzono kolejnego."
+    elif duplicate_of is not None:
+        response_text += f"\n\n⚠️ Ten rachunek wygląda na duplikat rachunku #{duplicate_of}."
+    elif cached:
+        response_text += "\n\n♻️ Ten rachunek był już przetwarzany - użyto zapisanego wyniku."
+    await send_text_message(chat_id, response_text)
+    return bill.id
+
+async def process_bill_file(chat_id: int, file_id: str) -> Optional[int]:
+    """Pobiera zdjęcie rachunku po file_id i przetwarza je (ręczne ponowienie)."""
+    local_path = await _download_photo(chat_id, file_id)
+    if not local_path:
+        raise ValueError(f"Could not download file {file_id}")
+    try:
+        return await _process_bill_pages(chat_id, [BillPage(number=1, image_path=local_path)])
+    finally:
+        await get_storage().discard_working_copy(local_path)
+
+media_group_aggregator = MediaGroupAggregator(config.TELEGRAM_MEDIA_GROUP_WINDOW, _process_media_group)
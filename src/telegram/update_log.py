@@ -0,0 +1,459 @@
+"""
+Dziennik surowych aktualizacji webhooka (tylko do dopisywania).
+
+Po `_process_message` z aktualizacji zostają jedynie pola `TelegramMessage`,
+więc oryginalne ciało webhooka trafia też do dziennika - do ponownego
+przetworzenia po poprawkach parsera i do odtwarzania prawdziwego ruchu
+(`scripts/replay_updates.py`).
+
+Każdy worker dopisuje do własnych segmentów
+`updates_<start>_<pid>_NNNN.log` w `UPDATE_LOG_DIR`, więc zapisy procesów
+się nie przeplatają. Webhook tylko odkłada ciało do bufora; zadanie w tle
+co `UPDATE_LOG_FLUSH_INTERVAL` sekund (albo po `UPDATE_LOG_FLUSH_BYTES`)
+kompresuje bufor jednym blokiem zlib i dopisuje go z fsync w wątku, bez
+blokowania pętli zdarzeń.
+
+Blok: nagłówek (magic, długość danych, liczba aktualizacji, zakres
+`update_id` i czasu odbioru) i skompresowane rekordy (update_id, czas w ms,
+długość, ciało). Te same pola z przesunięciem bloku dopisywane są do pliku
+`.idx` obok segmentu - odczyt zakresu `update_id` lub czasu dekompresuje
+tylko pasujące bloki. Indeks da się odtworzyć z nagłówków bloków; przerwany
+zapis zostawia na końcu segmentu niepełny blok, na którym odczyt się kończy.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MAGIC = b"BUL1"
+# magic, długość skompresowanych danych, liczba rekordów, min/max update_id, pierwszy/ostatni odbiór (ms)
+BLOCK_HEADER = struct.Struct(">4sIIqqqq")
+# update_id (-1 = ciało bez poprawnego update_id), czas odbioru (ms), długość ciała
+RECORD_HEADER = struct.Struct(">qqI")
+# przesunięcie bloku, długość danych i pola nagłówka bez magic
+INDEX_ENTRY = struct.Struct(">QIIqqqq")
+SEGMENT_GLOB = "updates_*.log"
+COMPRESSION_LEVEL = 6
+
+
+@dataclass(frozen=True)
+class BlockIndex:
+    segment: Path
+    offset: int
+    length: int  # Skompresowane dane za nagłówkiem
+    count: int
+    min_update_id: int
+    max_update_id: int
+    first_ms: int
+    last_ms: int
+
+    def overlaps(
+        self,
+        since_ms: Optional[int],
+        until_ms: Optional[int],
+        from_update_id: Optional[int],
+        to_update_id: Optional[int]
+    ) -> bool:
+        if since_ms is not None and self.last_ms < since_ms:
+            return False
+        if until_ms is not None and self.first_ms >= until_ms:
+            return False
+        if from_update_id is not None and self.max_update_id < from_update_id:
+            return False
+        if to_update_id is not None and (self.min_update_id < 0 or self.min_update_id > to_update_id):
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class LoggedUpdate:
+    update_id: Optional[int]
+    received_ms: int
+    body: bytes
+
+    @property
+    def received_at(self) -> datetime:
+        """Czas odbioru w UTC (bez strefy, jak `datetime.utcnow()` w modelach)."""
+        return datetime.fromtimestamp(self.received_ms / 1000, timezone.utc).replace(tzinfo=None)
+
+
+def to_ms(moment: datetime) -> int:
+    """Znacznik czasu w ms; datetime bez strefy traktowany jest jako UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class UpdateLog:
+    """
+    Buforowany zapis aktualizacji jednego procesu.
+
+    `append` nie wykonuje operacji na plikach; jeśli zapis nie nadąża
+    (bufor ponad `max_buffer` bajtów), nowe aktualizacje są pomijane
+    i liczone w `dropped` - webhook nie czeka na dysk.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        segment_size: int,
+        flush_interval: float,
+        flush_bytes: int,
+        max_buffer: int,
+        retention_days: int = 0
+    ):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocks = 0
+        self._buffer: List[Tuple[int, int, bytes]] = []
+        self._buffered = 0
+        self._lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._sequence = 0
+        self._handle = None
+        self._index_handle = None
+
+    def append(self, body: bytes, update_id: Optional[int] = None, received_at: Optional[float] = None) -> None:
+        """Odkłada ciało webhooka do zapisu w tle (wymaga działającej pętli zdarzeń)."""
+        if self._buffered + len(body) > self.max_buffer:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Update log is behind, {self.dropped} updates dropped so far")
+            return
+        received_ms = int((time.time() if received_at is None else received_at) * 1000)
+        self._buffer.append((-1 if update_id is None else update_id, received_ms, body))
+        self._buffered += len(body)
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        if self._buffered >= self.flush_bytes:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Zapisuje bufor jednym blokiem; po powrocie aktualizacje są na dysku (fsync)."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            records, self._buffer, self._buffered = self._buffer, [], 0
+            try:
+                await asyncio.to_thread(self._write_block, records)
+            except Exception as e:
+                self.failed += len(records)
+                logger.error(f"Update log write failed, {len(records)} updates lost: {e}")
+
+    async def close(self) -> None:
+        """Zapisuje resztę bufora i zamyka segment (przy wyłączaniu workera)."""
+        if self._task is not None and not self._task.done():
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+        await self.flush()
+        await asyncio.to_thread(self._close_segment)
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "blocks": self.blocks,
+            "buffered": len(self._buffer),
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "segment": self._handle.name if self._handle is not None else None,
+        }
+
+    # --- Zapis (wątek; bloki zapisywane są pojedynczo pod `_lock`) ---
+
+    def _write_block(self, records: List[Tuple[int, int, bytes]]) -> None:
+        payload = b"".join(RECORD_HEADER.pack(update_id, received_ms, len(body)) + body
+                           for update_id, received_ms, body in records)
+        data = zlib.compress(payload, COMPRESSION_LEVEL)
+        update_ids = [update_id for update_id, _, _ in records if update_id >= 0]
+        received = [received_ms for _, received_ms, _ in records]
+        fields = (
+            len(records),
+            min(update_ids) if update_ids else -1,
+            max(update_ids) if update_ids else -1,
+            min(received),
+            max(received),
+        )
+
+        handle = self._writable_segment()
+        offset = handle.tell()
+        handle.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(data), *fields))
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+        # Indeks po segmencie - brakujący wpis odtwarza odczyt z nagłówków bloków
+        self._index_handle.write(INDEX_ENTRY.pack(offset, len(data), *fields))
+        self._index_handle.flush()
+        self.written += len(records)
+        self.blocks += 1
+        if handle.tell() >= self.segment_size:
+            self._close_segment()
+
+    def _writable_segment(self):
+        if self._handle is not None:
+            return self._handle
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._prune()
+        started = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        while True:
+            path = self.directory / f"updates_{started}_{os.getpid()}_{self._sequence:04d}.log"
+            self._sequence += 1
+            try:
+                # Nowy plik zawsze - dopisanie za niepełnym blokiem ucięłoby odczyt segmentu
+                self._handle = open(path, "xb")
+                break
+            except FileExistsError:
+                continue
+        self._index_handle = open(path.with_suffix(".idx"), "wb")
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+        return self._handle
+
+    def _close_segment(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._index_handle.close()
+            self._handle = self._index_handle = None
+
+    def _prune(self) -> None:
+        """Usuwa segmenty niezmieniane dłużej niż `retention_days` (także innych workerów)."""
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for path in self.directory.glob(SEGMENT_GLOB):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    path.with_suffix(".idx").unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+
+update_log = UpdateLog(
+    Path(config.UPDATE_LOG_DIR),
+    segment_size=config.UPDATE_LOG_SEGMENT_SIZE,
+    flush_interval=config.UPDATE_LOG_FLUSH_INTERVAL,
+    flush_bytes=config.UPDATE_LOG_FLUSH_BYTES,
+    max_buffer=config.UPDATE_LOG_MAX_BUFFER,
+    retention_days=config.UPDATE_LOG_RETENTION_DAYS,
+)
+
+
+# --- Odczyt (bez bazy; także dla segmentów, do których worker wciąż dopisuje) ---
+
+def segments(directory: Optional[Path] = None) -> List[Path]:
+    return sorted(Path(directory or config.UPDATE_LOG_DIR).glob(SEGMENT_GLOB))
+
+
+def _scan_blocks(path: Path) -> List[BlockIndex]:
+    """Indeks z nagłówków bloków; kończy na niepełnym lub uszkodzonym bloku."""
+    size = path.stat().st_size
+    blocks = []
+    offset = 0
+    with open(path, "rb") as handle:
+        while offset + BLOCK_HEADER.size <= size:
+            handle.seek(offset)
+            magic, length, *fields = BLOCK_HEADER.unpack(handle.read(BLOCK_HEADER.size))
+            if magic != BLOCK_MAGIC or offset + BLOCK_HEADER.size + length > size:
+                logger.warning(f"Incomplete update log block in {path.name} at offset {offset}")
+                break
+            blocks.append(BlockIndex(path, offset, length, *fields))
+            offset += BLOCK_HEADER.size + length
+    return blocks
+
+
+def read_index(path: Path) -> List[BlockIndex]:
+    """Bloki segmentu z pliku `.idx`; gdy indeksu brak lub nie pokrywa segmentu - z nagłówków bloków."""
+    try:
+        raw = path.with_suffix(".idx").read_bytes()
+    except FileNotFoundError:
+        return _scan_blocks(path)
+    blocks = [
+        BlockIndex(path, *INDEX_ENTRY.unpack_from(raw, position))
+        for position in range(0, len(raw) - len(raw) % INDEX_ENTRY.size, INDEX_ENTRY.size)
+    ]
+    end = blocks[-1].offset + BLOCK_HEADER.size + blocks[-1].length if blocks else 0
+    if end != path.stat().st_size:
+        return _scan_blocks(path)
+    return blocks
+
+
+def read_block(block: BlockIndex) -> List[LoggedUpdate]:
+    with open(block.segment, "rb") as handle:
+        handle.seek(block.offset + BLOCK_HEADER.size)
+        payload = zlib.decompress(handle.read(block.length))
+    updates = []
+    position = 0
+    while position < len(payload):
+        update_id, received_ms, length = RECORD_HEADER.unpack_from(payload, position)
+        position += RECORD_HEADER.size
+        updates.append(LoggedUpdate(
+            None if update_id < 0 else update_id, received_ms, payload[position:position + length]
+        ))
+        position += length
+    return updates
+
+
+def select_blocks(
+    path: Path,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    from_update_id: Optional[int] = None,
+    to_update_id: Optional[int] = None
+) -> List[BlockIndex]:
+    """Bloki segmentu, które mogą zawierać aktualizacje z zakresu."""
+    since_ms = to_ms(since) if since else None
+    until_ms = to_ms(until) if until else None
+    return [
+        block for block in read_index(path)
+        if block.overlaps(since_ms, until_ms, from_update_id, to_update_id)
+    ]
+
+
+def iter_segment(
+    path: Path,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    from_update_id: Optional[int] = None,
+    to_update_id: Optional[int] = None
+) -> Iterator[LoggedUpdate]:
+    """Aktualizacje segmentu z zakresu [since, until) i [from_update_id, to_update_id], w kolejności odbioru."""
+    since_ms = to_ms(since) if since else None
+    until_ms = to_ms(until) if until else None
+    for block in select_blocks(path, since, until, from_update_id, to_update_id):
+        for update in read_block(block):
+            if since_ms is not None and update.received_ms < since_ms:
+                continue
+            if until_ms is not None and update.received_ms >= until_ms:
+                continue
+            if from_update_id is not None and (update.update_id is None or update.update_id < from_update_id):
+                continue
+            if to_update_id is not None and (update.update_id is None or update.update_id > to_update_id):
+                continue
+            yield update
+
+
+def iter_updates(directory: Optional[Path] = None, **filters) -> Iterator[LoggedUpdate]:
+    """Aktualizacje ze wszystkich segmentów (wszystkich workerów) scalone po czasie odbioru."""
+    return heapq.merge(
+        *(iter_segment(path, **filters) for path in segments(directory)),
+        key=lambda update: update.received_ms
+    )
+
+
+# --- Odtwarzanie ---
+
+@dataclass
+class ReplayStats:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0  # Handler zwrócił None - np. wiadomość już zapisana
+    duration: float = 0.0
+    max_lag: float = 0.0  # Największe opóźnienie startu względem harmonogramu (s)
+    latencies: Optional[List[float]] = None
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.duration if self.duration else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """Percentyl czasu obsługi (s) metodą najbliższej rangi."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+async def replay(
+    updates: Iterable[LoggedUpdate],
+    handler: Callable[[LoggedUpdate], Awaitable[Optional[bool]]],
+    rate: float = 0.0,
+    speed: float = 0.0,
+    concurrency: int = 8
+) -> ReplayStats:
+    """
+    Przekazuje aktualizacje do `handler` strumieniowo, najwyżej `concurrency` naraz.
+
+    `rate` - stała liczba aktualizacji na sekundę; `speed` - odstępy jak przy
+    odbiorze, przyspieszone `speed` razy; oba 0 - tak szybko, jak pozwala
+    `concurrency`. Handler zwraca None dla pominiętej aktualizacji.
+    """
+    stats = ReplayStats(latencies=[])
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    start = time.perf_counter()
+    first_ms = None
+
+    async def run(update: LoggedUpdate) -> None:
+        began = time.perf_counter()
+        try:
+            ok = await handler(update)
+        except Exception as e:
+            logger.warning(f"Replay of update {update.update_id} failed: {e}")
+            ok = False
+        finally:
+            semaphore.release()
+        stats.latencies.append(time.perf_counter() - began)
+        if ok is None:
+            stats.skipped += 1
+        elif ok:
+            stats.succeeded += 1
+        else:
+            stats.failed += 1
+
+    for number, update in enumerate(updates):
+        due = None
+        if rate > 0:
+            due = start + number / rate
+        elif speed > 0:
+            first_ms = update.received_ms if first_ms is None else first_ms
+            due = start + (update.received_ms - first_ms) / 1000 / speed
+        if due is not None and due > time.perf_counter():
+            await asyncio.sleep(due - time.perf_counter())
+        await semaphore.acquire()
+        if due is not None:
+            stats.max_lag = max(stats.max_lag, time.perf_counter() - due)
+        stats.total += 1
+        task = asyncio.create_task(run(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    stats.duration = time.perf_counter() - start
+    return stats
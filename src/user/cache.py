@@ -0,0 +1,182 @@
+"""
+Cache użytkowników Telegram (chat_id -> użytkownik) w procesie workera.
+
+W stanie ustalonym przetwarzanie webhooka nie wykonuje żadnego zapytania
+o użytkownika. Przy braku w cache wykonywany jest atomowy upsert
+(`ON CONFLICT (external_id) DO NOTHING`), więc równoległe webhooki
+tego samego czatu nie ścigają się o INSERT. Upsert nie zatwierdza
+transakcji - robi to wywołujący razem z resztą jednostki pracy.
+
+Opcjonalnie workery unieważniają wpisy nawzajem przez LISTEN/NOTIFY
+Postgresa (`USER_CACHE_INVALIDATION_CHANNEL`).
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache.memory import MISSING, TTLCache
+from src.config import config
+from src.db.models import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Niezależna od sesji migawka użytkownika."""
+    id: int
+    external_id: int
+    is_active: bool
+
+
+user_cache = TTLCache(
+    maxsize=config.USER_CACHE_SIZE,
+    ttl=config.USER_CACHE_TTL,
+    negative_ttl=config.USER_CACHE_NEGATIVE_TTL,
+)
+
+# Klucz w Session.info z użytkownikami utworzonymi w bieżącej transakcji
+_PENDING_KEY = "user_cache_pending"
+# Klucz w Session.info z external_id do unieważnienia po commit
+_INVALIDATIONS_KEY = "user_cache_invalidations"
+
+
+def _insert(session: AsyncSession):
+    """Zwraca konstruktor INSERT z obsługą ON CONFLICT dla dialektu sesji."""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
+async def find_user(session: AsyncSession, external_id: int) -> Optional[CachedUser]:
+    """Pobiera użytkownika po external_id, zapamiętując także brak użytkownika."""
+    cached = user_cache.get(external_id)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return cached
+
+    result = await session.execute(
+        select(User.id, User.is_active).where(User.external_id == external_id)
+    )
+    row = result.first()
+    if row is None:
+        user_cache.set_missing(external_id)
+        return None
+
+    user = CachedUser(id=row.id, external_id=external_id, is_active=row.is_active)
+    user_cache.set(external_id, user)
+    return user
+
+
+async def get_or_create_user(session: AsyncSession, external_id: int) -> CachedUser:
+    """Zwraca użytkownika z cache lub wykonuje atomowy upsert."""
+    cached = user_cache.get(external_id)
+    if cached is not None and cached is not MISSING:
+        return cached
+
+    now = datetime.utcnow()
+    insert = _insert(session)
+    statement = (
+        insert(User)
+        .values(external_id=external_id, is_active=True, created_at=now, updated_at=now)
+        .on_conflict_do_nothing(index_elements=["external_id"])
+        .returning(User.id, User.is_active)
+    )
+    result = await session.execute(statement)
+    row = result.first()
+
+    if row is None:
+        # Użytkownik już istniał (lub został utworzony równolegle)
+        result = await session.execute(
+            select(User.id, User.is_active).where(User.external_id == external_id)
+        )
+        row = result.one()
+        user = CachedUser(id=row.id, external_id=external_id, is_active=row.is_active)
+        user_cache.set(external_id, user)
+        return user
+
+    # Nowy użytkownik trafia do cache dopiero po commit transakcji wywołującego -
+    # wycofana transakcja nie może zostawić wpisu wskazującego na nieistniejący wiersz
+    user = CachedUser(id=row.id, external_id=external_id, is_active=row.is_active)
+    session.sync_session.info.setdefault(_PENDING_KEY, []).append(user)
+    return user
+
+
+def cached_user(session: Session, external_id: int) -> Optional[CachedUser]:
+    """Użytkownik z cache lub utworzony w bieżącej transakcji sesji - bez zapytań do bazy."""
+    cached = user_cache.get(external_id)
+    if cached is not None and cached is not MISSING:
+        return cached
+    for user in session.info.get(_PENDING_KEY, []):
+        if user.external_id == external_id:
+            return user
+    return None
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_pending_users(session: Session) -> None:
+    for external_id in session.info.pop(_INVALIDATIONS_KEY, ()):
+        invalidate(external_id)
+    for user in session.info.pop(_PENDING_KEY, []):
+        user_cache.set(user.external_id, user)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_INVALIDATIONS_KEY, None)
+
+
+def invalidate(external_id: int) -> None:
+    """Usuwa wpis z lokalnego cache."""
+    user_cache.delete(external_id)
+
+
+async def publish_invalidation(session: AsyncSession, external_id: int) -> None:
+    """
+    Unieważnia wpis lokalnie i (opcjonalnie) w pozostałych workerach.
+
+    Oba unieważnienia następują dopiero po zatwierdzeniu transakcji sesji:
+    lokalne w `after_commit`, a NOTIFY Postgres dostarcza po commit. Wcześniejsze
+    usunięcie wpisu pozwoliłoby równoległemu webhookowi załadować do cache
+    stan sprzed zmiany.
+    """
+    session.sync_session.info.setdefault(_INVALIDATIONS_KEY, set()).add(external_id)
+
+    channel = config.USER_CACHE_INVALIDATION_CHANNEL
+    if channel and session.bind.dialect.name == "postgresql":
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": channel, "payload": str(external_id)}
+        )
+
+
+def _on_invalidation(connection, pid, channel, payload) -> None:
+    try:
+        invalidate(int(payload))
+    except ValueError:
+        logger.warning(f"Invalid user cache invalidation payload: {payload}")
+
+
+async def start_invalidation_listener():
+    """Nasłuchuje unieważnień z innych workerów; zwraca połączenie do zamknięcia przy wyłączeniu."""
+    channel = config.USER_CACHE_INVALIDATION_CHANNEL
+    if not channel:
+        return None
+
+    import asyncpg
+
+    dsn = config.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+    connection = await asyncpg.connect(dsn)
+    await connection.add_listener(channel, _on_invalidation)
+    logger.info(f"Listening for user cache invalidations on channel '{channel}'")
+    return connection
@@ -1,10 +1,13 @@
 from src.bill.schemas import BillRead
 from src.db.main import get_session
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
+from typing import List, Optional
 from src.user.schemas import UserCreate, UserRead, UserUpdate
 from src.user import services
+from src.bill import services as bill_services
+from src.cache.responses import response_cache, user_key
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -24,12 +27,18 @@ async def create_user(user_in: UserCreate, session: AsyncSession = Depends(get_s
 @router.get("/{user_id}", response_model=UserRead)
 async def get_user(user_id: int, session: AsyncSession = Depends(get_session)):
     """
-    Pobiera informacje o jednym użytkowniku.
+    Pobiera informacje o jednym użytkowniku (przez cache odpowiedzi).
     """
-    db_user = await services.get_user(session, user_id=user_id)
-    if not db_user:
+    async def load_user() -> Optional[bytes]:
+        db_user = await services.get_user(session, user_id=user_id)
+        if not db_user:
+            return None
+        return UserRead.model_validate(db_user).model_dump_json().encode()
+
+    body = await response_cache.get_or_load(user_key(user_id), load_user)
+    if body is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return db_user
+    return Response(content=body, media_type="application/json")
 
 @router.patch("/{user_id}", response_model=UserRead)
 async def update_user(user_id: int, user_in: UserUpdate, session: AsyncSession = Depends(get_session)):
@@ -51,4 +60,4 @@ async def get_user_bills(user_id: int, session: AsyncSession = Depends(get_sessi
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    return await services.get_bills_by_user(session=session, user_id=user_id)
\ No newline at end of file
+    return await bill_services.get_bills_by_user(session=session, user_id=user_id)
\ No newline at end of file
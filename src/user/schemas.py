@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlmodel import SQLModel
 
 class UserBase(SQLModel):
-    external_id: str
+    external_id: int
     is_active: bool = True
 
 class UserCreate(UserBase):
@@ -14,5 +14,5 @@ class UserRead(UserBase):
     created_at: datetime
 
 class UserUpdate(SQLModel):
-    external_id: Optional[str] = None
+    external_id: Optional[int] = None
     is_active: Optional[bool] = None
\ No newline at end of file
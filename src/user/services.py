@@ -1,15 +1,17 @@
 from typing import List, Optional
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.models import User
+from src.db.models import Bill, User
 from src.user.schemas import UserCreate, UserUpdate
+from src.user import cache as user_cache
+from src.cache.responses import bill_key, response_cache, user_key
 
 
 async def get_user(session: AsyncSession, user_id: int) -> Optional[User]:
     """Pobiera jednego użytkownika po jego ID."""
     return await session.get(User, user_id)
 
-async def get_user_by_external_id(session: AsyncSession, external_id: str) -> Optional[User]:
+async def get_user_by_external_id(session: AsyncSession, external_id: int) -> Optional[User]:
     """Pobiera jednego użytkownika po jego zewnętrznym ID."""
     statement = select(User).where(User.external_id == external_id)
     result = await session.execute(statement)
@@ -27,14 +29,24 @@ async def create_user(session: AsyncSession, user_in: UserCreate) -> User:
     session.add(db_user)
     await session.commit()
     await session.refresh(db_user)
+    # Usuń ewentualny negatywny wpis cache dla tego external_id
+    user_cache.invalidate(db_user.external_id)
     return db_user
 
 async def update_user(session: AsyncSession, db_user: User, user_in: UserUpdate) -> User:
     """Aktualizuje dane użytkownika."""
+    previous_external_id = db_user.external_id
     user_data = user_in.model_dump(exclude_unset=True)
     for key, value in user_data.items():
         setattr(db_user, key, value)
     session.add(db_user)
+    # Unieważnij wpisy cache webhooków (także w pozostałych workerach po commit)
+    await user_cache.publish_invalidation(session, previous_external_id)
+    if db_user.external_id != previous_external_id:
+        await user_cache.publish_invalidation(session, db_user.external_id)
     await session.commit()
+    # Odpowiedzi rachunków zawierają użytkownika (BillReadWithDetails.user)
+    result = await session.execute(select(Bill.id).where(Bill.user_id == db_user.id))
+    await response_cache.invalidate(user_key(db_user.id), *(bill_key(bill_id) for bill_id in result.scalars()))
     await session.refresh(db_user)
     return db_user
\ No newline at end of file